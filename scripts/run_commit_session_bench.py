@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import statistics
+import tempfile
+import time
+from argparse import Namespace
+from pathlib import Path
+from types import ModuleType
+from typing import Any
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+SB_PATH = REPO_ROOT / "scripts" / "sb_cli.py"
+DEFAULT_SIZES = "1000,10000,100000"
+FILLER_TOOLS = ("chatgpt", "claude", "gemini", "cursor")
+
+
+def load_sb() -> ModuleType:
+    spec = importlib.util.spec_from_file_location("sb", SB_PATH)
+    if spec is None or spec.loader is None:
+        raise SystemExit(f"cannot load {SB_PATH}")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def session_doc(tool: str, n: int) -> dict[str, Any]:
+    day = 1 + (n % 28)
+    month = 1 + ((n // 28) % 12)
+    return {
+        "artifact_id": f"artifact/{tool}_2026_{month:02d}_{day:02d}_bench-session-{n}",
+        "session_date": f"2026-{month:02d}-{day:02d}",
+        "resumption_score": n % 11,
+        "summary": f"Synthetic {tool} benchmark session {n}.",
+    }
+
+
+def write_sessions(sessions_dir: Path, tool: str, start: int, stop: int) -> None:
+    tool_dir = sessions_dir / tool
+    tool_dir.mkdir(parents=True, exist_ok=True)
+    for n in range(start, stop):
+        (tool_dir / f"bench-{n:07d}.json").write_text(json.dumps(session_doc(tool, n)) + "\n", encoding="utf-8")
+
+
+def time_commits(sb: ModuleType, work_dir: Path, tool: str, repeats: int, seq0: int) -> list[float]:
+    out: list[float] = []
+    for i in range(repeats):
+        payload = work_dir / "commit_input.json"
+        payload.write_text(json.dumps(session_doc(tool, seq0 + i)), encoding="utf-8")
+        args = Namespace(
+            legacy_session_write=True,
+            json_file=str(payload),
+            tool=tool,
+            filename=f"commit-{seq0 + i:07d}.json",
+        )
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            sb.cmd_commit_session(args)
+        out.append((time.perf_counter() - t0) * 1000.0)
+    return out
+
+
+def run_bench(sizes: list[int], target_size: int, repeats: int, with_rebuild: bool) -> dict[str, Any]:
+    sb = load_sb()
+    rows: list[dict[str, Any]] = []
+    with tempfile.TemporaryDirectory(prefix="sb_commit_bench_") as tmp:
+        root = Path(tmp)
+        sb.SESSIONS_DIR = root / "sessions"
+        sb.INDEX_MANIFEST_DIR = root / "state" / "cache" / "session_index"
+
+        target_tool = "codex"
+        write_sessions(sb.SESSIONS_DIR, target_tool, 0, target_size)
+        sb.rebuild_tool_index(sb.SESSIONS_DIR / target_tool)
+
+        filled = 0
+        written = {tool: 0 for tool in FILLER_TOOLS}
+        seq = 10_000_000
+        for size in sorted(sizes):
+            need = max(0, size - target_size - filled)
+            per_tool = need // len(FILLER_TOOLS)
+            for j, tool in enumerate(FILLER_TOOLS):
+                extra = per_tool + (1 if j < need % len(FILLER_TOOLS) else 0)
+                write_sessions(sb.SESSIONS_DIR, tool, written[tool], written[tool] + extra)
+                written[tool] += extra
+            filled += need
+
+            samples = time_commits(sb, root, target_tool, repeats, seq)
+            seq += repeats
+            row: dict[str, Any] = {
+                "corpus_sessions": target_size + filled,
+                "target_tool_index_size": target_size,
+                "commit_ms_median": round(statistics.median(samples), 3),
+                "commit_ms_max": round(max(samples), 3),
+            }
+            if with_rebuild:
+                t0 = time.perf_counter()
+                sb.rebuild_indexes(full=True)
+                row["full_rebuild_ms"] = round((time.perf_counter() - t0) * 1000.0, 3)
+            rows.append(row)
+            print(json.dumps(row), flush=True)
+
+    first, last = rows[0]["commit_ms_median"], rows[-1]["commit_ms_median"]
+    return {
+        "benchmark": "sb_commit_session_latency_v0",
+        "repeats_per_size": repeats,
+        "results": rows,
+        "commit_latency_growth_ratio": round(last / first, 3) if first else None,
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmark sb commit-session latency as the sessions corpus grows")
+    ap.add_argument("--sizes", default=DEFAULT_SIZES, help=f"Comma-separated corpus sizes (default: {DEFAULT_SIZES})")
+    ap.add_argument("--target-size", type=int, default=200, help="Sessions already in the committed tool's index")
+    ap.add_argument("--repeats", type=int, default=5, help="Commits timed per corpus size")
+    ap.add_argument("--with-full-rebuild", action="store_true", help="Also time a cold rebuild_indexes() per size")
+    ap.add_argument("--out-file", help="Optional output JSON report path")
+    args = ap.parse_args()
+
+    sizes = [int(x) for x in args.sizes.split(",") if x.strip()]
+    report = run_bench(sizes, args.target_size, args.repeats, args.with_full_rebuild)
+    if args.out_file:
+        out_file = Path(args.out_file)
+        out_file.parent.mkdir(parents=True, exist_ok=True)
+        out_file.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
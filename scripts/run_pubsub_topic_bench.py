@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+from typing import Any
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT / "scripts"))
+
+import sb_pubsub  # noqa: E402
+
+DEFAULT_EVENTS = 200_000
+DEFAULT_TOPICS = 16
+DEFAULT_SKEW = 1.2
+BASE_TS = "2026-01-01T00:00:00Z"
+
+
+def topic_weights(n_topics: int, skew: float) -> list[float]:
+    """Zipf weights: topic k is published (k + 1) ** skew times less often than the hottest one."""
+    return [1.0 / (k + 1) ** skew for k in range(n_topics)]
+
+
+def write_log(events_file: Path, n_events: int, topics: list[str], weights: list[float], seed: int) -> dict[str, int]:
+    rng = random.Random(seed)
+    base = sb_pubsub.parse_rfc3339_z(BASE_TS)
+    counts = dict.fromkeys(topics, 0)
+    events_file.parent.mkdir(parents=True, exist_ok=True)
+    with events_file.open("w", encoding="utf-8") as f:
+        for n, topic in enumerate(rng.choices(topics, weights, k=n_events)):
+            counts[topic] += 1
+            event = {
+                "event_id": f"evt_bench_{n:09d}",
+                "ts": sb_pubsub.format_ts(base + timedelta(seconds=n)),
+                "topic": topic,
+                "scope": f"bench/{n % 97}",
+                "actor": f"agent_{n % 7}",
+                "payload": {"n": n, "path": f"scene/bench_{n % 1000:04d}.json"},
+                "ttl_s": 0,
+                "idempotency_key": f"bench|{n}",
+            }
+            f.write(sb_pubsub.encode_event(event) + "\n")
+    return counts
+
+
+def time_read(events_file: Path, topics: set[str], next_line: int, max_events: int, use_index: bool, repeats: int) -> tuple[list[float], int]:
+    now = sb_pubsub.parse_rfc3339_z(BASE_TS)
+    samples: list[float] = []
+    delivered = 0
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        selected, _, _, _ = sb_pubsub.read_events(
+            events_file, {"next_line": next_line}, next_line, topics, now, max_events, use_topic_index=use_index
+        )
+        samples.append((time.perf_counter() - t0) * 1000.0)
+        delivered = len(selected)
+    return samples, delivered
+
+
+def run_bench(n_events: int, n_topics: int, skew: float, repeats: int, seed: int) -> dict[str, Any]:
+    topics = [f"bench.topic_{k:02d}" for k in range(n_topics)]
+    counts: dict[str, int]
+    rows: list[dict[str, Any]] = []
+    with tempfile.TemporaryDirectory(prefix="sb_pubsub_topic_bench_") as tmp:
+        events_file = Path(tmp) / "events_v0.ndjson"
+        counts = write_log(events_file, n_events, topics, topic_weights(n_topics, skew), seed)
+
+        # The first segmented publish adopts the log and builds the topic indexes in one pass.
+        t0 = time.perf_counter()
+        sb_pubsub.publish(events_file, sb_pubsub.build_event("bench.marker", "bench", "bench", "{}", 0, ts_override=BASE_TS))
+        index_build_ms = round((time.perf_counter() - t0) * 1000.0, 3)
+
+        ranked = sorted(topics, key=lambda t: -counts[t])
+        cases = [
+            ("hot", {ranked[0]}),
+            ("median", {ranked[len(ranked) // 2]}),
+            ("rare", {ranked[-1]}),
+            ("hot+rare", {ranked[0], ranked[-1]}),
+        ]
+        tail_line = max(1, n_events - n_events // 100)
+        for label, selected_topics in cases:
+            for window, next_line in (("full", 1), ("tail_1pct", tail_line)):
+                for max_events in (50, n_events):
+                    scan, n_scan = time_read(events_file, selected_topics, next_line, max_events, False, repeats)
+                    indexed, n_indexed = time_read(events_file, selected_topics, next_line, max_events, True, repeats)
+                    if n_scan != n_indexed:
+                        raise SystemExit(f"indexed read delivered {n_indexed} events, scan delivered {n_scan} ({label}, {window})")
+                    scan_ms = statistics.median(scan)
+                    indexed_ms = statistics.median(indexed)
+                    row = {
+                        "topics": label,
+                        "topic_share": round(sum(counts[t] for t in selected_topics) / n_events, 5),
+                        "window": window,
+                        "max_events": max_events,
+                        "delivered": n_indexed,
+                        "scan_ms_median": round(scan_ms, 3),
+                        "indexed_ms_median": round(indexed_ms, 3),
+                        "speedup": round(scan_ms / indexed_ms, 2) if indexed_ms else None,
+                    }
+                    rows.append(row)
+                    print(json.dumps(row), flush=True)
+
+    return {
+        "benchmark": "sb_pubsub_topic_index_v0",
+        "events": n_events,
+        "topics": n_topics,
+        "zipf_skew": skew,
+        "seed": seed,
+        "repeats": repeats,
+        "topic_counts": {t: counts[t] for t in sorted(topics, key=lambda t: -counts[t])},
+        "index_build_ms": index_build_ms,
+        "results": rows,
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmark topic-filtered pub/sub reads (index vs full scan) on a skewed log")
+    ap.add_argument("--events", type=int, default=DEFAULT_EVENTS, help=f"Events in the log (default: {DEFAULT_EVENTS})")
+    ap.add_argument("--topics", type=int, default=DEFAULT_TOPICS, help=f"Distinct topics (default: {DEFAULT_TOPICS})")
+    ap.add_argument("--skew", type=float, default=DEFAULT_SKEW, help=f"Zipf exponent of the topic distribution (default: {DEFAULT_SKEW})")
+    ap.add_argument("--repeats", type=int, default=3, help="Timed reads per case (default: 3)")
+    ap.add_argument("--seed", type=int, default=0, help="Topic sampling seed (default: 0)")
+    ap.add_argument("--out-file", help="Optional output JSON report path")
+    args = ap.parse_args()
+
+    if args.events < 1 or args.topics < 2:
+        raise SystemExit("--events must be >= 1 and --topics >= 2")
+    report = run_bench(args.events, args.topics, args.skew, args.repeats, args.seed)
+    if args.out_file:
+        out_file = Path(args.out_file)
+        out_file.parent.mkdir(parents=True, exist_ok=True)
+        out_file.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
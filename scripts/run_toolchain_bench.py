@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, NamedTuple
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+# Copied verbatim into every bench root so entry points resolve REPO_ROOT to it.
+COPY_PATHS = ("tools", "scripts", "scenes/_schemas", "scene")
+SESSION_TOOLS = ("chatgpt", "claude", "codex")
+SCENE_SHAPES = ("graph_native", "phase_history", "custom_object", "document_scene")
+BASE_TIME = datetime(2026, 1, 1, tzinfo=timezone.utc)
+NOW_TS = "2026-07-01T00:00:00Z"
+CORE_PROJECT = "project/dan_personal_cognitive_infrastructure"
+CLAIM_TARGET = "scene/task_queue/v0.json"
+DEFAULT_SCALES = "1,10"
+BENCHMARK_ID = "sb_toolchain_v0"
+
+WORDS = (
+    "agent", "audit", "closeout", "cursor", "drift", "gate", "graph", "index", "invariant", "kalshi",
+    "ledger", "loop", "mailbox", "ontology", "pattern", "phase", "principle", "project", "pubsub",
+    "resumption", "scene", "session", "signal", "spec", "summary", "task", "terminology", "vision",
+)
+
+
+@dataclass(frozen=True)
+class CorpusSpec:
+    sessions_per_tool: int = 5
+    scenes_per_shape: int = 8
+    events: int = 200
+    ledger_entries: int = 50
+    claim_lines: int = 100
+
+    def scaled(self, factor: int) -> CorpusSpec:
+        return CorpusSpec(**{k: v * factor for k, v in asdict(self).items()})
+
+
+class EntryPoint(NamedTuple):
+    name: str
+    argv: list[str]
+    # Run before every timed repeat (not timed), e.g. to reset consumer offsets.
+    prepare: Callable[[Path], None] | None = None
+
+
+def ts(offset_s: int) -> str:
+    return (BASE_TIME + timedelta(seconds=offset_s)).replace(microsecond=0).isoformat().replace("+00:00", "Z")
+
+
+def sentence(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + "."
+
+
+def write_json(path: Path, value: Any) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(value, indent=2) + "\n", encoding="utf-8")
+
+
+def principle_ids(spec: CorpusSpec) -> list[str]:
+    return [f"principle/bench_{i:03d}" for i in range(max(4, spec.scenes_per_shape))]
+
+
+def session_doc(rng: random.Random, tool: str, n: int, principles: list[str]) -> tuple[str, dict[str, Any]]:
+    day = BASE_TIME + timedelta(days=n % 180)
+    slug = f"bench-{n:06d}"
+    doc = {
+        "artifact_id": f"artifact/{tool}_{day:%Y_%m_%d}_{slug}",
+        "session_date": f"{day:%Y-%m-%d}",
+        "llm_used": tool,
+        "project_links": [CORE_PROJECT],
+        "principle_links": rng.sample(principles, 2) if rng.random() < 0.8 else [],
+        "pattern_links": [f"pattern/bench_{rng.randrange(20):02d}"],
+        "tool_links": [f"tool/{tool}"],
+        "related_artifact_links": [],
+        "summary": sentence(rng, 14),
+        "key_decisions": [sentence(rng, 8) for _ in range(rng.randrange(1, 4))],
+        "open_questions": [sentence(rng, 8)],
+        "next_steps": [sentence(rng, 8)],
+        "thinking_trace_attachments": [],
+        "prompt_lineage": [{"role": "user", "summary": sentence(rng, 6)}],
+        "resumption_score": rng.randrange(4, 11),
+        "resumption_notes": sentence(rng, 10),
+    }
+    return f"{day:%Y-%m-%d}-{slug}.json", doc
+
+
+def scene_doc(rng: random.Random, shape: str, n: int, principles: list[str]) -> dict[str, Any]:
+    if shape == "graph_native":
+        base = f"bench/g{n:05d}"
+        nodes = [{"id": f"{base}/n{i}", "type": "concept", "label": sentence(rng, 4)} for i in range(8)]
+        if n == 0:
+            nodes += [{"id": p, "type": "principle", "label": sentence(rng, 3)} for p in principles]
+        edges = [
+            {"from": CORE_PROJECT, "to": nodes[0]["id"], "type": "includes"},
+            *({"from": nodes[i]["id"], "to": nodes[i + 1]["id"], "type": rng.choice(("relates_to", "supports", "refines"))} for i in range(7)),
+            {"from": nodes[rng.randrange(8)]["id"], "to": rng.choice(principles), "type": "aligns_with"},
+        ]
+        return {"nodes": [{"id": CORE_PROJECT, "type": "project", "label": "Core project"}] + nodes, "edges": edges}
+    if shape == "phase_history":
+        phases = ("discovery", "framing", "implementation", "validation")
+        return {
+            "schema_version": "v0",
+            "project_id": f"bench_{n:05d}",
+            "phase_events": [
+                {
+                    "phase": phase,
+                    "entered_on": f"{BASE_TIME + timedelta(days=7 * i + n % 30):%Y-%m-%d}",
+                    "trigger_artifact": f"scenes/bench_graph_native_{n:05d}.scene.json",
+                    "confidence_score": round(rng.uniform(0.5, 0.95), 2),
+                    "notes": sentence(rng, 8),
+                }
+                for i, phase in enumerate(phases)
+            ],
+            "drift_signals": {"regression": False, "oscillation": sentence(rng, 6), "stagnation": False},
+            "generated_on": f"{BASE_TIME:%Y-%m-%d}",
+        }
+    if shape == "custom_object":
+        return {
+            "artifact": f"artifact/bench_custom_{n:05d}",
+            "type": "playbook",
+            "version": "v0",
+            "purpose": sentence(rng, 12),
+            "steps": [sentence(rng, 6) for _ in range(6)],
+            "relations": [{"target": rng.choice(principles), "type": "applies"}, {"target": CORE_PROJECT, "type": "supports"}],
+        }
+    return {
+        "meta": {"name": f"Bench document {n}", "purpose": sentence(rng, 12)},
+        "core_entities": [{"name": rng.choice(WORDS), "description": sentence(rng, 10)} for _ in range(5)],
+        "relations": [{"target": CORE_PROJECT, "type": "documents"}],
+        "notes": [sentence(rng, 12) for _ in range(4)],
+    }
+
+
+def generate_corpus(root: Path, spec: CorpusSpec, seed: int) -> dict[str, int]:
+    """Write a deterministic synthetic corpus for `spec` under `root` (same seed -> same bytes)."""
+    rng = random.Random(seed)
+    principles = principle_ids(spec)
+
+    for tool in SESSION_TOOLS:
+        for n in range(spec.sessions_per_tool):
+            name, doc = session_doc(rng, tool, n, principles)
+            write_json(root / "sessions" / tool / name, doc)
+
+    for shape in SCENE_SHAPES:
+        for n in range(spec.scenes_per_shape):
+            write_json(root / "scenes" / f"bench_{shape}_{n:05d}.scene.json", scene_doc(rng, shape, n, principles))
+
+    events_file = root / "state" / "pubsub" / "events_v0.ndjson"
+    events_file.parent.mkdir(parents=True, exist_ok=True)
+    with events_file.open("w", encoding="utf-8") as f:
+        for n in range(spec.events):
+            topic = rng.choice(("scene.updated", "session.committed", "claim.appended", "audit.completed"))
+            event = {
+                "event_id": f"evt_bench_{n:08d}",
+                "ts": ts(n),
+                "topic": topic,
+                "scope": f"bench/{rng.randrange(50):02d}",
+                "actor": f"agent_{rng.randrange(8)}",
+                "payload": {"n": n, "note": sentence(rng, 5)},
+                "ttl_s": 365 * 86400,
+                "idempotency_key": f"bench|{n}",
+            }
+            f.write(json.dumps(event, sort_keys=True, separators=(",", ":")) + "\n")
+
+    # Replaces the ledger copied from the repo, so `sb ledger` sees only generated rows.
+    ledger = root / "scene" / "ledger" / "mutations_v0.jsonl"
+    ledger.parent.mkdir(parents=True, exist_ok=True)
+    with ledger.open("w", encoding="utf-8") as f:
+        for n in range(spec.ledger_entries):
+            agent = f"agent/bench_{rng.randrange(8)}"
+            entry = {
+                "mutation_id": f"mut_bench_{n:08d}",
+                "timestamp": ts(60 * n),
+                "agent_id": agent,
+                "target_path": rng.choice((CLAIM_TARGET, f"scene/agent/bench_{rng.randrange(8)}/status_v0.json", "scene/health/bench_v0.json")),
+                "mutation_type": rng.choice(("CREATE", "UPDATE", "UPDATE", "UPDATE")),
+                "inputs": [f"scenes/bench_graph_native_{rng.randrange(max(1, spec.scenes_per_shape)):05d}.scene.json"],
+                "reason": sentence(rng, 6),
+                "pre_hash": f"sha256:{rng.getrandbits(256):064x}",
+                "post_hash": f"sha256:{rng.getrandbits(256):064x}",
+                "gate_status": rng.choice(("not_applicable", "not_evaluated", "passed")),
+            }
+            f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+    with (root / "coord_claims.md").open("w", encoding="utf-8") as f:
+        targets = [CLAIM_TARGET] + [f"scenes/bench_graph_native_{i:05d}.scene.json" for i in range(spec.scenes_per_shape)]
+        for n in range(spec.claim_lines):
+            f.write(f"{rng.choice(targets)} | agent_{rng.randrange(8)} | {ts(30 * n)}\n")
+
+    return {
+        "sessions": spec.sessions_per_tool * len(SESSION_TOOLS),
+        "scenes": spec.scenes_per_shape * len(SCENE_SHAPES),
+        "events": spec.events,
+        "ledger_entries": spec.ledger_entries,
+        "claim_lines": spec.claim_lines,
+    }
+
+
+def prepare_root(root: Path, spec: CorpusSpec, seed: int) -> dict[str, int]:
+    for rel in COPY_PATHS:
+        src = REPO_ROOT / rel
+        if src.is_dir():
+            shutil.copytree(src, root / rel, ignore=shutil.ignore_patterns("__pycache__"))
+        elif src.is_file():
+            (root / rel).parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(src, root / rel)
+    counts = generate_corpus(root, spec, seed)
+    # Entry points are timed as installed: imported modules load from cached bytecode.
+    subprocess.run([sys.executable, "-m", "compileall", "-q", "tools", "scripts"], cwd=root, check=True)
+    for rel in ("graph", "reports"):
+        (root / rel).mkdir(parents=True, exist_ok=True)
+    # The secret scan reads `git ls-files`; index.json files come from an untimed first reindex.
+    subprocess.run(["git", "init", "-q"], cwd=root, check=True)
+    subprocess.run([sys.executable, "tools/sb.py", "reindex", "--full"], cwd=root, env=bench_env(root), check=True, capture_output=True)
+    subprocess.run(["git", "add", "-A"], cwd=root, check=True)
+    return counts
+
+
+def bench_env(root: Path) -> dict[str, str]:
+    env = dict(os.environ)
+    env["SB_NO_DAEMON"] = "1"
+    env["SB_SOCKET"] = str(root / "state" / "bench-no-daemon.sock")
+    return env
+
+
+def remove(*rels: str) -> Callable[[Path], None]:
+    def run(root: Path) -> None:
+        for rel in rels:
+            path = root / rel
+            if path.is_dir():
+                shutil.rmtree(path)
+            elif path.exists():
+                path.unlink()
+
+    return run
+
+
+def poll_from_tail(keep: int, events: int) -> Callable[[Path], None]:
+    def run(root: Path) -> None:
+        write_json(root / "state" / "pubsub" / "offsets" / "bench_tail.json", {"consumer": "bench_tail", "next_line": max(1, events - keep + 1)})
+
+    return run
+
+
+def entry_points(spec: CorpusSpec) -> list[EntryPoint]:
+    py = sys.executable
+    ingest = [
+        "bash", "tools/sb_graph_ingest_v0.sh", "--scene", "scenes", "--graph", "graph/graph.json",
+        "--canonical-jsonl", "graph/canonical.jsonl", "--include-session-indexes", "sessions", "--mode", "apply",
+    ]
+    return [
+        EntryPoint("reindex_full", [py, "tools/sb.py", "reindex", "--full"]),
+        EntryPoint("reindex_incremental", [py, "tools/sb.py", "reindex"]),
+        EntryPoint("validate", [py, "tools/sb.py", "validate"]),
+        EntryPoint("graph_ingest_cold", ingest + ["--no-cache"], remove("graph", "state/cache/graph_ingest")),
+        EntryPoint("graph_ingest_warm", ingest),
+        EntryPoint("kpi_compute", ["bash", "tools/sb_kpi_compute_v0.sh", "--out-file", "reports/bench/kpi_dashboard_metrics_v0.json"]),
+        EntryPoint("audit_vision_alignment", [py, "scripts/run_vision_alignment_audit.py", "--out-file", "reports/bench/vision.json"]),
+        EntryPoint("audit_namespace_boundary", [py, "scripts/run_namespace_boundary_audit.py", "--out-file", "reports/bench/namespace.json"]),
+        EntryPoint("audit_secret_scan", [py, "scripts/run_secret_scan_audit.py", "--out-file", "reports/bench/secret_scan.json"]),
+        EntryPoint("audit_shell_embedding", [py, "scripts/run_shell_embedding_audit.py", "--out-file", "reports/bench/shell_embedding.json"]),
+        EntryPoint("audit_beads_boundary", [py, "scripts/run_beads_boundary_audit.py", "--out-file", "reports/bench/beads.json"]),
+        EntryPoint(
+            "pubsub_poll_head",
+            [py, "tools/sb.py", "pubsub", "poll", "--consumer", "bench_head", "--now-ts", NOW_TS],
+            remove("state/pubsub/offsets/bench_head.json"),
+        ),
+        EntryPoint(
+            "pubsub_poll_tail",
+            [py, "tools/sb.py", "pubsub", "poll", "--consumer", "bench_tail", "--now-ts", NOW_TS],
+            poll_from_tail(50, spec.events),
+        ),
+        EntryPoint("ledger_query", [py, "tools/sb.py", "ledger", "--path-prefix", "scene/agent/", "--limit", "20"]),
+        EntryPoint(
+            "claim_preflight",
+            [py, "tools/sb.py", "claim", "preflight", "--path", CLAIM_TARGET, "--actor", "agent_0", "--now-ts", NOW_TS],
+        ),
+    ]
+
+
+def time_entry(root: Path, entry: EntryPoint, repeats: int) -> dict[str, Any]:
+    samples: list[float] = []
+    error = None
+    env = bench_env(root)
+    for _ in range(repeats):
+        if entry.prepare is not None:
+            entry.prepare(root)
+        t0 = time.perf_counter()
+        proc = subprocess.run(entry.argv, cwd=root, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        elapsed = (time.perf_counter() - t0) * 1000.0
+        if proc.returncode != 0:
+            error = proc.stderr.decode("utf-8", errors="replace").strip().splitlines()[-1:] or [f"exit {proc.returncode}"]
+            break
+        samples.append(elapsed)
+    if error is not None:
+        return {"ok": False, "error": error[0]}
+    return {
+        "ok": True,
+        "ms_median": round(statistics.median(samples), 3),
+        "ms_min": round(min(samples), 3),
+        "ms_max": round(max(samples), 3),
+        "samples": len(samples),
+    }
+
+
+def run_bench(base: CorpusSpec, scales: list[int], repeats: int, seed: int, only: set[str], keep_root: bool) -> dict[str, Any]:
+    results: list[dict[str, Any]] = []
+    for scale in scales:
+        spec = base.scaled(scale)
+        tmp = Path(tempfile.mkdtemp(prefix=f"sb_toolchain_bench_x{scale}_"))
+        try:
+            t0 = time.perf_counter()
+            corpus = prepare_root(tmp, spec, seed)
+            setup_ms = round((time.perf_counter() - t0) * 1000.0, 3)
+            entries: dict[str, Any] = {}
+            for entry in entry_points(spec):
+                if only and entry.name not in only:
+                    continue
+                entries[entry.name] = time_entry(tmp, entry, repeats)
+                print(json.dumps({"scale": scale, "entry": entry.name, **entries[entry.name]}), flush=True)
+            results.append({"scale": scale, "corpus": corpus, "setup_ms": setup_ms, "entries": entries})
+        finally:
+            if keep_root:
+                print(json.dumps({"scale": scale, "root": str(tmp)}), file=sys.stderr)
+            else:
+                shutil.rmtree(tmp, ignore_errors=True)
+    return {
+        "benchmark": BENCHMARK_ID,
+        "generated_at": datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z"),
+        "seed": seed,
+        "repeats": repeats,
+        "base_corpus": asdict(base),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+
+def compare(report: dict[str, Any], baseline: dict[str, Any], threshold: float, min_delta_ms: float) -> dict[str, Any]:
+    """Median-vs-median comparison for every (scale, entry) present in both reports."""
+    base_rows = {(r["scale"], name): e for r in baseline.get("results", []) for name, e in r.get("entries", {}).items()}
+    rows: list[dict[str, Any]] = []
+    regressions: list[str] = []
+    for result in report["results"]:
+        for name, cur in result["entries"].items():
+            prev = base_rows.get((result["scale"], name))
+            if not prev or not prev.get("ok") or not cur.get("ok"):
+                continue
+            delta = cur["ms_median"] - prev["ms_median"]
+            ratio = cur["ms_median"] / prev["ms_median"] if prev["ms_median"] else None
+            regressed = ratio is not None and ratio > 1.0 + threshold and delta > min_delta_ms
+            rows.append(
+                {
+                    "scale": result["scale"],
+                    "entry": name,
+                    "baseline_ms": prev["ms_median"],
+                    "current_ms": cur["ms_median"],
+                    "delta_ms": round(delta, 3),
+                    "ratio": round(ratio, 3) if ratio is not None else None,
+                    "regressed": regressed,
+                }
+            )
+            if regressed:
+                regressions.append(f"{name}@x{result['scale']}")
+    return {
+        "baseline_generated_at": baseline.get("generated_at"),
+        "comparable": baseline.get("seed") == report["seed"] and baseline.get("base_corpus") == report["base_corpus"],
+        "threshold": threshold,
+        "min_delta_ms": min_delta_ms,
+        "rows": rows,
+        "regressions": regressions,
+    }
+
+
+def main() -> None:
+    defaults = CorpusSpec()
+    ap = argparse.ArgumentParser(description="Time every sb entry point against deterministic synthetic corpora at several scales")
+    ap.add_argument("--scales", default=DEFAULT_SCALES, help=f"Comma-separated corpus multipliers (default: {DEFAULT_SCALES})")
+    ap.add_argument("--sessions-per-tool", type=int, default=defaults.sessions_per_tool, help="Sessions per tool at scale 1")
+    ap.add_argument("--scenes-per-shape", type=int, default=defaults.scenes_per_shape, help="Scenes per classify() shape at scale 1")
+    ap.add_argument("--events", type=int, default=defaults.events, help="Pub/sub events at scale 1")
+    ap.add_argument("--ledger-entries", type=int, default=defaults.ledger_entries, help="Mutation ledger rows at scale 1")
+    ap.add_argument("--claim-lines", type=int, default=defaults.claim_lines, help="coord_claims.md lines at scale 1")
+    ap.add_argument("--seed", type=int, default=0, help="Corpus generator seed (default: 0)")
+    ap.add_argument("--repeats", type=int, default=3, help="Timed runs per entry point and scale (default: 3)")
+    ap.add_argument("--only", help="Comma-separated entry point names to run (default: all)")
+    ap.add_argument("--out-file", help="Write the results JSON here")
+    ap.add_argument("--baseline", help="Earlier results JSON to compare medians against")
+    ap.add_argument("--threshold", type=float, default=0.25, help="Relative slowdown counted as a regression (default: 0.25)")
+    ap.add_argument("--min-delta-ms", type=float, default=5.0, help="Ignore slowdowns smaller than this (default: 5.0)")
+    ap.add_argument("--fail-on-regression", action="store_true", help="Exit 1 when the baseline comparison finds regressions")
+    ap.add_argument("--keep-root", action="store_true", help="Keep the generated bench roots (paths printed to stderr)")
+    args = ap.parse_args()
+
+    scales = [int(x) for x in args.scales.split(",") if x.strip()]
+    if not scales or min(scales) < 1:
+        raise SystemExit("--scales must be positive integers")
+    if args.repeats < 1:
+        raise SystemExit("--repeats must be >= 1")
+    base = CorpusSpec(args.sessions_per_tool, args.scenes_per_shape, args.events, args.ledger_entries, args.claim_lines)
+    only = {x.strip() for x in (args.only or "").split(",") if x.strip()}
+    unknown = only - {e.name for e in entry_points(base)}
+    if unknown:
+        raise SystemExit(f"unknown entry point(s): {', '.join(sorted(unknown))}")
+
+    report = run_bench(base, scales, args.repeats, args.seed, only, args.keep_root)
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        report["comparison"] = compare(report, baseline, args.threshold, args.min_delta_ms)
+    if args.out_file:
+        out_file = Path(args.out_file)
+        out_file.parent.mkdir(parents=True, exist_ok=True)
+        out_file.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    print(json.dumps(report, indent=2))
+    if args.fail_on_regression and report.get("comparison", {}).get("regressions"):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
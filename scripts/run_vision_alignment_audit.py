@@ -8,6 +8,8 @@ from datetime import date
 from pathlib import Path
 from typing import Any
 
+import sb_corpus
+
 
 REPO_ROOT = Path(__file__).resolve().parents[1]
 SESSIONS_DIR = REPO_ROOT / "sessions"
@@ -28,107 +30,22 @@ class ArtifactEval:
     resumption_score: int | None
 
 
-def load_json(path: Path) -> Any:
-    with path.open("r", encoding="utf-8") as f:
-        return json.load(f)
-
-
 def canonical_principle_ids() -> set[str]:
-    out: set[str] = set()
-    for p in sorted(SCENES_DIR.glob("*.scene.json")):
-        try:
-            data = load_json(p)
-        except Exception:
-            continue
-        nodes = data.get("nodes") if isinstance(data, dict) else None
-        if not isinstance(nodes, list):
-            continue
-        for node in nodes:
-            if isinstance(node, dict):
-                nid = node.get("id")
-                if isinstance(nid, str) and nid.startswith("principle/"):
-                    out.add(nid)
-    return out
-
-
-def extract_eval(obj: dict[str, Any], canonical: set[str]) -> ArtifactEval | None:
-    artifact_id = obj.get("artifact_id") or obj.get("id")
-    if not isinstance(artifact_id, str):
-        return None
-
-    principles: list[str] = []
-    patterns: list[str] = []
-
-    p_links = obj.get("principle_links")
-    if isinstance(p_links, list):
-        principles.extend(x for x in p_links if isinstance(x, str))
-    links = obj.get("links")
-    if isinstance(links, dict):
-        p2 = links.get("principles")
-        if isinstance(p2, list):
-            principles.extend(x for x in p2 if isinstance(x, str))
+    return sb_corpus.canonical_principle_ids(SCENES_DIR)
 
-    pat_links = obj.get("pattern_links")
-    if isinstance(pat_links, list):
-        patterns.extend(x for x in pat_links if isinstance(x, str))
-    if isinstance(links, dict):
-        pat2 = links.get("patterns_used")
-        if isinstance(pat2, list):
-            patterns.extend(x for x in pat2 if isinstance(x, str))
 
-    summary = obj.get("summary")
-    has_summary = False
-    has_decision_or_step = False
-
-    if isinstance(summary, str):
-        has_summary = bool(summary.strip())
-    elif isinstance(summary, dict):
-        hl = summary.get("high_level")
-        has_summary = isinstance(hl, str) and bool(hl.strip())
-        kd = summary.get("key_decisions")
-        has_decision_or_step = isinstance(kd, list) and any(isinstance(x, str) and x.strip() for x in kd)
-
-    kd2 = obj.get("key_decisions")
-    ns2 = obj.get("next_steps")
-    if isinstance(kd2, list) and any(isinstance(x, str) and x.strip() for x in kd2):
-        has_decision_or_step = True
-    if isinstance(ns2, list) and any(isinstance(x, str) and x.strip() for x in ns2):
-        has_decision_or_step = True
-
-    non_trivial = has_summary and has_decision_or_step
-
-    v1_keys = {
-        "artifact_id",
-        "session_date",
-        "llm_used",
-        "project_links",
-        "principle_links",
-        "pattern_links",
-        "tool_links",
-        "related_artifact_links",
-        "summary",
-        "key_decisions",
-        "open_questions",
-        "next_steps",
-        "thinking_trace_attachments",
-        "prompt_lineage",
-        "resumption_score",
-        "resumption_notes",
-    }
-    has_v1_contract_shape = v1_keys.issubset(set(obj.keys()))
-    rs = obj.get("resumption_score")
-    resumption_score = rs if isinstance(rs, int) and 0 <= rs <= 10 else None
-
-    canon_count = sum(1 for p in principles if p in canonical)
+def extract_eval(rec: sb_corpus.SessionRecord, canonical: set[str]) -> ArtifactEval:
+    rs = rec.resumption_score
+    canon_count = sum(1 for p in rec.principle_links if p in canonical)
     return ArtifactEval(
-        artifact_id=artifact_id,
+        artifact_id=rec.artifact_id,
         has_principle_link=canon_count > 0,
-        principles_total=len(principles),
+        principles_total=len(rec.principle_links),
         principles_canonical=canon_count,
-        patterns_total=len(patterns),
-        is_non_trivial=non_trivial,
-        has_v1_contract_shape=has_v1_contract_shape,
-        resumption_score=resumption_score,
+        patterns_total=len(rec.pattern_links),
+        is_non_trivial=rec.is_non_trivial,
+        has_v1_contract_shape=rec.has_v1_contract_shape,
+        resumption_score=rs if rs is not None and 0 <= rs <= 10 else None,
     )
 
 
@@ -139,21 +56,7 @@ def run_audit(
     trigger_out_file: Path | None = None,
 ) -> dict[str, Any]:
     canonical = canonical_principle_ids()
-    evals: list[ArtifactEval] = []
-
-    for tool_dir in sorted([p for p in sessions_dir.iterdir() if p.is_dir()]):
-        for jf in sorted(tool_dir.glob("*.json")):
-            if jf.name == "index.json":
-                continue
-            try:
-                obj = load_json(jf)
-            except Exception:
-                continue
-            if not isinstance(obj, dict):
-                continue
-            ev = extract_eval(obj, canonical)
-            if ev is not None:
-                evals.append(ev)
+    evals = [extract_eval(rec, canonical) for rec in sb_corpus.load_sessions(sessions_dir)]
 
     eligible = [e for e in evals if e.is_non_trivial]
     with_principle = [e for e in eligible if e.has_principle_link]
@@ -0,0 +1,275 @@
+"""In-process agent run cycle (steps 3-5) used by tools/sb_agent_run_cycle_v0.sh and `sb agent-cycle`.
+
+Plan, claims, the optional exec command, hashing, the cursor update and the
+ledger append all run in one process. Target hashes come from a persistent
+(path, size, mtime) -> sha256 cache, so files that did not change since the
+last cycle are not read again.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import subprocess
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path, PurePosixPath
+from typing import Any
+
+import sb_coord_claims
+from sb_jsonl_append import append_records
+
+AGENT_ID_RE = re.compile(r"^agent/([a-z0-9_]+)_(v[0-9]+)$")
+ACTOR_RE = re.compile(r"^[A-Za-z0-9._-]+$")
+HASH_CACHE_VERSION = 1
+# An entry is trusted only if the file's mtime is this much older than the hash;
+# a write landing in the same mtime tick as the hash would otherwise go unseen.
+HASH_CACHE_RACY_NS = 2_000_000_000
+
+
+class HashCache:
+    """sha256 of repo files keyed by repo-relative path, reused while (size, mtime_ns) is unchanged."""
+
+    def __init__(self, cache_file: Path) -> None:
+        self.cache_file = cache_file
+        self.entries: dict[str, list[int | str]] = {}
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+        # Swarm jobs share one cache across threads; files are hashed outside the lock.
+        self._lock = threading.Lock()
+        try:
+            raw = json.loads(cache_file.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return
+        if isinstance(raw, dict) and raw.get("version") == HASH_CACHE_VERSION and isinstance(raw.get("entries"), dict):
+            self.entries = raw["entries"]
+
+    def digest(self, repo_root: Path, rel: str) -> str:
+        st = (repo_root / rel).stat()
+        with self._lock:
+            entry = self.entries.get(rel)
+            # entry: [size, mtime_ns, hashed_at_ns, sha256]
+            if entry is not None and entry[0] == st.st_size and entry[1] == st.st_mtime_ns and st.st_mtime_ns < int(entry[2]) - HASH_CACHE_RACY_NS:
+                self.hits += 1
+                return str(entry[3])
+        hashed_at = time.time_ns()
+        with (repo_root / rel).open("rb") as f:
+            digest = hashlib.file_digest(f, "sha256").hexdigest()
+        with self._lock:
+            self.misses += 1
+            self.entries[rel] = [st.st_size, st.st_mtime_ns, hashed_at, digest]
+            self._dirty = True
+        return digest
+
+    def digests(self, repo_root: Path, rels: list[str]) -> dict[str, str]:
+        return {rel: self.digest(repo_root, rel) for rel in rels}
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.cache_file.with_name(f".{self.cache_file.name}.{os.getpid()}.tmp")
+            tmp.write_text(json.dumps({"version": HASH_CACHE_VERSION, "entries": self.entries}, separators=(",", ":")), encoding="utf-8")
+            os.replace(tmp, self.cache_file)
+            self._dirty = False
+
+
+def scoped(target: str, allowed_scopes: list[str]) -> bool:
+    for scope in allowed_scopes:
+        if scope.endswith("/") and target.startswith(scope):
+            return True
+        if target == scope:
+            return True
+        if target.startswith(scope) and scope in {"scene/", "spec/", "project/", "inv/"}:
+            return True
+    return False
+
+
+def allowed_scopes(registry: Any, agent_id: str, mutation_type: str) -> list[str]:
+    tuples = registry.get("authority_tuples", []) if isinstance(registry, dict) else []
+    scopes: list[str] = []
+    for t in tuples:
+        if not isinstance(t, dict) or t.get("agent_id") != agent_id:
+            continue
+        muts = t.get("allowed_mutations", [])
+        if not isinstance(muts, list):
+            continue
+        if mutation_type not in muts and "UPDATE" not in muts:
+            continue
+        tuple_scopes = t.get("scope", [])
+        if isinstance(tuple_scopes, list):
+            scopes.extend(s for s in tuple_scopes if isinstance(s, str))
+    return scopes
+
+
+def build_plan(
+    repo_root: Path,
+    agent_id: str,
+    targets_csv: str,
+    reason: str,
+    registry_file: Path,
+    ledger_file: Path,
+    actor: str = "",
+    mutation_type: str = "UPDATE",
+    inputs_csv: str = "",
+    task_id: str = "",
+    phase: str = "cycle_complete",
+    skip_authority: bool = False,
+    dry_run: bool = False,
+) -> dict[str, Any]:
+    repo_root = repo_root.resolve()
+    m = AGENT_ID_RE.match(agent_id)
+    if not m:
+        raise SystemExit("--agent-id must match agent/<name>_vN")
+    agent_base, version = m.group(1), m.group(2)
+
+    cursor_rel = f"scene/agent/{agent_base}/cursor_{version}.json"
+    if not (repo_root / cursor_rel).resolve().exists():
+        raise SystemExit(f"cursor file not found: {cursor_rel}")
+
+    actor = actor.strip() if actor.strip() else agent_id.replace("/", "_")
+    if not ACTOR_RE.match(actor):
+        raise SystemExit("derived/provided actor alias is invalid for claim scripts")
+
+    raw_targets = [t.strip() for t in targets_csv.split(",") if t.strip()]
+    if not raw_targets:
+        raise SystemExit("--targets must contain at least one path")
+    # Ensure cursor always gets updated/claimed in cycle step 5.
+    if cursor_rel not in raw_targets:
+        raw_targets.append(cursor_rel)
+
+    norm_targets: list[str] = []
+    for t in raw_targets:
+        if t.startswith("./") or t.startswith("/") or "\\" in t:
+            raise SystemExit(f"invalid target path: {t}")
+        norm = str(PurePosixPath(t))
+        if norm != t or norm.startswith("../") or "/../" in norm or norm == "..":
+            raise SystemExit(f"invalid target path: {t}")
+        abs_t = (repo_root / norm).resolve()
+        if repo_root not in abs_t.parents and abs_t != repo_root:
+            raise SystemExit(f"target escapes repo root: {t}")
+        if not abs_t.exists():
+            raise SystemExit(f"target path does not exist: {t}")
+        if norm not in norm_targets:
+            norm_targets.append(norm)
+
+    if not registry_file.exists():
+        raise SystemExit(f"registry file not found: {registry_file}")
+    if not skip_authority:
+        registry = json.loads(registry_file.read_text(encoding="utf-8"))
+        scopes = allowed_scopes(registry, agent_id, mutation_type)
+        unauthorized = [t for t in norm_targets if not scoped(t, scopes)]
+        if unauthorized:
+            raise SystemExit("authority check failed for targets: " + ", ".join(unauthorized))
+
+    return {
+        "agent_id": agent_id,
+        "actor": actor,
+        "targets": norm_targets,
+        "cursor_path": cursor_rel,
+        "reason": reason,
+        "task_id": task_id or None,
+        "phase": phase,
+        "mutation_type": mutation_type,
+        "inputs": [x.strip() for x in inputs_csv.split(",") if x.strip()],
+        "registry_file": str(registry_file),
+        "ledger_file": str(ledger_file),
+        "dry_run": dry_run,
+    }
+
+
+def mutation_id(stamp: str, agent_id: str, i: int) -> str:
+    return f"mut_{stamp}_{agent_id.replace('/', '_')}_{i}"
+
+
+def cycle_time(cursor_file: Path, agent_id: str) -> datetime:
+    """Current UTC time, moved past the second of the agent's previous cycle.
+
+    Mutation ids carry a one-second stamp, so two cycles of one agent in the
+    same second (back-to-back swarm jobs) would otherwise reuse ids.
+    """
+    now = datetime.now(timezone.utc)
+    try:
+        last = str(json.loads(cursor_file.read_text(encoding="utf-8")).get("last_mutation_id") or "")
+    except (FileNotFoundError, ValueError, AttributeError):
+        return now
+    if last.startswith(f"mut_{now.strftime('%Y%m%dT%H%M%SZ')}_{agent_id.replace('/', '_')}_"):
+        time.sleep(1.0 - now.microsecond / 1_000_000)
+        now = datetime.now(timezone.utc)
+    return now
+
+
+def update_cursor(cursor_file: Path, last_mutation_id: str, ts: str, phase: str, task_id: str | None) -> None:
+    obj = json.loads(cursor_file.read_text(encoding="utf-8"))
+    obj["phase"] = phase
+    obj["last_mutation_id"] = last_mutation_id
+    obj["last_updated"] = ts
+    if task_id:
+        obj["current_task_id"] = task_id
+    cursor_file.write_text(json.dumps(obj, indent=2) + "\n", encoding="utf-8")
+
+
+def run_cycle(
+    repo_root: Path,
+    plan: dict[str, Any],
+    claims_file: Path,
+    metrics_file: Path,
+    hash_cache: HashCache,
+    exec_cmd: str = "",
+) -> dict[str, Any]:
+    """Claim, run `exec_cmd`, update the cursor and append one ledger row per target; returns the run summary."""
+    targets: list[str] = plan["targets"]
+    actor: str = plan["actor"]
+    claims_file.touch(exist_ok=True)
+    for target in targets:
+        _, warnings = sb_coord_claims.preflight(repo_root, claims_file, metrics_file, target, actor, mode="edit")
+        sb_coord_claims.print_warnings(warnings)
+        _ = sb_coord_claims.append_claim(repo_root, claims_file, metrics_file, target, actor)
+
+    pre_hash = hash_cache.digests(repo_root, targets)
+    hash_cache.save()
+
+    if exec_cmd:
+        proc = subprocess.run(["bash", "-lc", exec_cmd], cwd=repo_root)
+        if proc.returncode != 0:
+            raise SystemExit(proc.returncode)
+
+    now = cycle_time(repo_root / plan["cursor_path"], plan["agent_id"])
+    ts = now.replace(microsecond=0).isoformat().replace("+00:00", "Z")
+    stamp = now.strftime("%Y%m%dT%H%M%SZ")
+    update_cursor(repo_root / plan["cursor_path"], mutation_id(stamp, plan["agent_id"], len(targets)), ts, plan["phase"], plan["task_id"])
+
+    post_hash = hash_cache.digests(repo_root, targets)
+    hash_cache.save()
+
+    rows = [
+        {
+            "mutation_id": mutation_id(stamp, plan["agent_id"], i),
+            "timestamp": ts,
+            "agent_id": plan["agent_id"],
+            "target_path": target,
+            "mutation_type": plan["mutation_type"],
+            "inputs": plan["inputs"],
+            "reason": plan["reason"],
+            "pre_hash": f"sha256:{pre_hash[target]}",
+            "post_hash": f"sha256:{post_hash[target]}",
+            "gate_status": "not_evaluated",
+        }
+        for i, target in enumerate(targets, start=1)
+    ]
+    # One block per cycle: concurrent agents' rows never interleave, and their fsyncs are shared.
+    _ = append_records(Path(plan["ledger_file"]), rows)
+
+    return {
+        "agent_id": plan["agent_id"],
+        "actor": actor,
+        "targets": targets,
+        "mutation_type": plan["mutation_type"],
+        "phase": plan["phase"],
+        "task_id": plan["task_id"],
+        "timestamp": ts,
+    }
@@ -0,0 +1,1570 @@
+"""The `sb` command line, run through tools/sb.py.
+
+Kept out of tools/sb.py so that its bytecode is cached: a script is
+recompiled from source on every run, an imported module is not.
+"""
+from __future__ import annotations
+
+import argparse
+import bisect
+import contextlib
+import fcntl
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Iterable, cast
+
+import sb_client
+import sb_session_index
+
+JsonObj = dict[str, Any]
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+# Subcommand modules are imported by the handlers that use them: every wrapper
+# call is a fresh interpreter, and most need only one of them.
+if TYPE_CHECKING:
+    import socket
+
+    import sb_ledger_index
+    import sb_schema
+    import sb_search
+
+SESSIONS_DIR = REPO_ROOT / "sessions"
+SCENES_DIR = REPO_ROOT / "scenes"
+SCHEMAS_DIR = SCENES_DIR / "_schemas"
+GRAPH_FILE = REPO_ROOT / "graph" / "graph.json"
+CLAIMS_FILE = REPO_ROOT / "coord_claims.md"
+COORD_METRICS_FILE = REPO_ROOT / "state" / "coord_kpi_v0.json"
+PUBSUB_EVENTS_FILE = REPO_ROOT / "state" / "pubsub" / "events_v0.ndjson"
+PUBSUB_OFFSETS_DIR = REPO_ROOT / "state" / "pubsub" / "offsets"
+PUBSUB_GROUPS_DIR = REPO_ROOT / "state" / "pubsub" / "groups"
+DAEMON_MODULES = ("sb_coord_claims", "sb_graph_query", "sb_ledger_index", "sb_pubsub", "sb_pubsub_groups", "sb_query", "sb_schema", "sb_search")
+INDEX_MANIFEST_DIR = REPO_ROOT / "state" / "cache" / "session_index"
+INDEX_MANIFEST_VERSION = 1
+QUERY_INDEX_FILE = REPO_ROOT / "state" / "cache" / "query_index_v0.bin"
+SEARCH_INDEX_DIR = REPO_ROOT / "state" / "cache" / "search_v0"
+LEDGER_FILE = REPO_ROOT / "scene" / "ledger" / "mutations_v0.jsonl"
+REGISTRY_FILE = REPO_ROOT / "scene" / "authority" / "registry_v0.json"
+HASH_CACHE_FILE = REPO_ROOT / "state" / "cache" / "hash_v0.json"
+SWARM_SPEC_FILE = REPO_ROOT / "spec" / "swarm_runner_v0.md"
+LEDGER_INDEX_DIR = REPO_ROOT / "state" / "cache" / "ledger_v0"
+LEDGER_TS_RE = re.compile(r"^[0-9]{4}-[0-9]{2}-[0-9]{2}(T[0-9]{2}:[0-9]{2}:[0-9]{2}Z)?$")
+
+
+def die(msg: str, code: int = 1) -> None:
+    print(f"error: {msg}", file=sys.stderr)
+    raise SystemExit(code)
+
+
+def read_json_from_stdin() -> JsonObj:
+    raw = sys.stdin.read()
+    if not raw.strip():
+        die("no input on stdin. Pipe JSON into this command.")
+    try:
+        value = json.loads(raw)
+    except Exception as e:
+        die(f"stdin is not valid JSON: {e}")
+    if not isinstance(value, dict):
+        die("stdin JSON must be an object at the top level.")
+    return cast(JsonObj, value)
+
+
+def read_json_input(json_file: str | None) -> JsonObj:
+    if json_file:
+        return read_json_file(Path(json_file))
+    return read_json_from_stdin()
+
+
+def read_index_file(path: Path) -> list[str]:
+    try:
+        value = json.loads(path.read_text(encoding="utf-8"))
+    except Exception as e:
+        die(f"invalid JSON file: {path} ({e})")
+    try:
+        return index_artifact_ids(value, path)
+    except ValueError as e:
+        die(str(e))
+    return []
+
+
+def index_artifact_ids(value: Any, path: Path) -> list[str]:
+    out: list[str] = []
+    if isinstance(value, list):
+        for i, item in enumerate(value):
+            if not isinstance(item, str):
+                raise ValueError(f"index.json item #{i} must be a string: {path}")
+            out.append(item)
+        return out
+    if isinstance(value, dict):
+        artifacts = value.get("artifacts")
+        if not isinstance(artifacts, list):
+            raise ValueError(f"index.json object form requires artifacts[]: {path}")
+        for i, item in enumerate(artifacts):
+            if isinstance(item, str):
+                out.append(item)
+            elif isinstance(item, dict):
+                aid = item.get("id")
+                if not isinstance(aid, str):
+                    raise ValueError(f"index.json artifacts[{i}].id must be string: {path}")
+                out.append(aid)
+            else:
+                raise ValueError(f"index.json artifacts[{i}] must be string or object: {path}")
+        return out
+    raise ValueError(f"index.json must be a JSON array or object: {path}")
+
+
+def read_json_file(path: Path) -> JsonObj:
+    try:
+        text = path.read_text(encoding="utf-8")
+    except Exception as e:
+        die(f"invalid JSON file: {path} ({e})")
+    return parse_json_object(text, path)
+
+
+def parse_json_object(text: str, path: Path) -> JsonObj:
+    try:
+        value = json.loads(text)
+    except Exception as e:
+        die(f"invalid JSON file: {path} ({e})")
+    if not isinstance(value, dict):
+        die(f"JSON file must be an object at top level: {path}")
+    return cast(JsonObj, value)
+
+
+_JSON_CACHE: dict[str, tuple[tuple[int, int], Any]] = {}
+
+
+def load_json_cached(path: Path) -> Any:
+    # Parsed JSON keyed by (mtime_ns, size), read by validate. Short-lived in
+    # one-shot CLI runs; under `sb serve` it keeps scenes and tool indexes warm.
+    st = path.stat()
+    sig = (st.st_mtime_ns, st.st_size)
+    key = str(path)
+    hit = _JSON_CACHE.get(key)
+    if hit is not None and hit[0] == sig:
+        return hit[1]
+    value = json.loads(path.read_text(encoding="utf-8"))
+    _JSON_CACHE[key] = (sig, value)
+    return value
+
+
+def write_json_file(path: Path, data: Any) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, indent=2, sort_keys=False) + "\n", encoding="utf-8")
+
+
+def write_json_atomic(path: Path, data: Any, compact: bool = False) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    text = json.dumps(data, separators=(",", ":")) if compact else json.dumps(data, indent=2, sort_keys=False)
+    try:
+        with tmp.open("w", encoding="utf-8") as f:
+            f.write(text + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def utc_now_z() -> str:
+    return datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
+
+
+def slugify(s: str) -> str:
+    keep: list[str] = []
+    for ch in s.lower():
+        if ch.isalnum():
+            keep.append(ch)
+        elif ch in ["-", "_", " "]:
+            keep.append("-")
+    out = "".join(keep)
+    while "--" in out:
+        out = out.replace("--", "-")
+    return out.strip("-")
+
+
+def infer_filename_from_artifact_id(artifact_id: str) -> str:
+    # artifact/chatgpt_session_2026_02_11_second_brain_architecture -> 2026-02-11-second-brain-architecture.json
+    if not artifact_id.startswith("artifact/"):
+        die(f"artifact id must start with 'artifact/': {artifact_id}")
+
+    tail = artifact_id.split("/", 1)[1]
+    parts = tail.split("_")
+
+    date_idx: int | None = None
+    for i in range(len(parts) - 2):
+        a, b, c = parts[i], parts[i + 1], parts[i + 2]
+        if len(a) == 4 and len(b) == 2 and len(c) == 2 and a.isdigit() and b.isdigit() and c.isdigit():
+            date_idx = i
+            break
+
+    if date_idx is None:
+        date_str = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        slug = slugify(tail)
+        return f"{date_str}-{slug}.json"
+
+    yyyy, mm, dd = parts[date_idx], parts[date_idx + 1], parts[date_idx + 2]
+    date_str = f"{yyyy}-{mm}-{dd}"
+    slug_parts = parts[date_idx + 3 :]
+    slug = slugify("-".join(slug_parts)) if slug_parts else slugify(tail)
+    return f"{date_str}-{slug}.json"
+
+
+def index_manifest_path(tool: str) -> Path:
+    return INDEX_MANIFEST_DIR / f"{tool}.json"
+
+
+def load_index_manifest(tool: str) -> dict[str, JsonObj]:
+    # Manifest maps session filename -> {size, mtime_ns, sha256, record}; any
+    # unreadable or version-mismatched manifest degrades to a cold rebuild.
+    try:
+        value = json.loads(index_manifest_path(tool).read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+    if not isinstance(value, dict) or value.get("manifest_version") != INDEX_MANIFEST_VERSION:
+        return {}
+    files = value.get("files")
+    if not isinstance(files, dict):
+        return {}
+    return cast(dict[str, JsonObj], files)
+
+
+def save_index_manifest(tool: str, files: dict[str, JsonObj]) -> None:
+    payload = {"manifest_version": INDEX_MANIFEST_VERSION, "tool": tool, "files": files}
+    write_json_atomic(index_manifest_path(tool), payload, compact=True)
+
+
+def index_lock(tool: str) -> Any:
+    # Serializes the read-modify-write of one tool's index.json and manifest.
+    INDEX_MANIFEST_DIR.mkdir(parents=True, exist_ok=True)
+    fh = (INDEX_MANIFEST_DIR / f"{tool}.lock").open("a")
+    fcntl.flock(fh, fcntl.LOCK_EX)
+    return fh
+
+
+def scan_session_file(f: Path, prev: JsonObj | None) -> tuple[JsonObj, bool]:
+    st = f.stat()
+    if prev is not None and prev.get("size") == st.st_size and prev.get("mtime_ns") == st.st_mtime_ns:
+        return prev, False
+    raw = f.read_bytes()
+    digest = hashlib.sha256(raw).hexdigest()
+    if prev is not None and prev.get("sha256") == digest:
+        return {**prev, "size": st.st_size, "mtime_ns": st.st_mtime_ns}, False
+    record: JsonObj | None = None
+    try:
+        record = sb_session_index.index_record(parse_json_object(raw.decode("utf-8"), f))
+    except (SystemExit, UnicodeDecodeError):
+        # skip invalid JSON; validate will catch
+        record = None
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest, "record": record}, True
+
+
+def rebuild_tool_index(tool_dir: Path, full: bool = False) -> int:
+    with index_lock(tool_dir.name):
+        return _rebuild_tool_index_locked(tool_dir, full)
+
+
+def _rebuild_tool_index_locked(tool_dir: Path, full: bool = False) -> int:
+    previous = {} if full else load_index_manifest(tool_dir.name)
+    files: dict[str, JsonObj] = {}
+    records_by_id: dict[str, JsonObj] = {}
+    parsed = 0
+
+    for f in sorted(tool_dir.glob("*.json")):
+        if f.name == "index.json":
+            continue
+        try:
+            entry, was_parsed = scan_session_file(f, previous.get(f.name))
+        except OSError:
+            continue
+        parsed += int(was_parsed)
+        files[f.name] = entry
+        record = entry.get("record")
+        if isinstance(record, dict):
+            records_by_id[record["id"]] = record
+
+    idx_path = tool_dir / "index.json"
+    # Same files with the same records: index.json already holds these artifacts,
+    # and rewriting it would only bump last_updated.
+    unchanged = (
+        not full
+        and idx_path.exists()
+        and files.keys() == previous.keys()
+        and all(entry.get("record") == previous[name].get("record") for name, entry in files.items())
+    )
+    if not unchanged:
+        artifacts = sorted(records_by_id.values(), key=index_sort_key)
+        write_json_atomic(idx_path, {"tool": tool_dir.name, "artifacts": artifacts, "last_updated": utc_now_z()})
+    if files != previous:
+        save_index_manifest(tool_dir.name, files)
+    return parsed
+
+
+def index_sort_key(record: JsonObj) -> tuple[str, str]:
+    return (str(record.get("date", "")), str(record.get("id", "")))
+
+
+def upsert_index_record(tool_dir: Path, session_path: Path) -> None:
+    """Insert or replace one session's record in its tool index without rescanning the corpus."""
+    with index_lock(tool_dir.name):
+        _upsert_index_record_locked(tool_dir, session_path)
+
+
+def _upsert_index_record_locked(tool_dir: Path, session_path: Path) -> None:
+    idx_path = tool_dir / "index.json"
+    try:
+        value = json.loads(idx_path.read_text(encoding="utf-8"))
+    except Exception:
+        value = None
+    artifacts = value.get("artifacts") if isinstance(value, dict) else None
+    if not isinstance(artifacts, list) or not all(isinstance(a, dict) and isinstance(a.get("id"), str) for a in artifacts):
+        # Missing or legacy list-form index: fall back to rebuilding this one tool.
+        _ = _rebuild_tool_index_locked(tool_dir)
+        return
+
+    files = load_index_manifest(tool_dir.name)
+    prev = files.get(session_path.name)
+    entry, _ = scan_session_file(session_path, None)
+    record = entry.get("record")
+
+    stale_ids: set[str] = set()
+    prev_record = prev.get("record") if isinstance(prev, dict) else None
+    if isinstance(prev_record, dict):
+        stale_ids.add(str(prev_record.get("id")))
+    if isinstance(record, dict):
+        stale_ids.add(record["id"])
+    held_elsewhere = {
+        str(e["record"].get("id")) for name, e in files.items() if name != session_path.name and isinstance(e.get("record"), dict)
+    }
+    if stale_ids & held_elsewhere:
+        # Another file holds one of these ids; which record wins is the rebuild's call.
+        _ = _rebuild_tool_index_locked(tool_dir)
+        return
+    if stale_ids:
+        artifacts = [a for a in artifacts if a["id"] not in stale_ids]
+    if isinstance(record, dict):
+        bisect.insort(artifacts, record, key=index_sort_key)
+
+    write_json_atomic(idx_path, {"tool": tool_dir.name, "artifacts": artifacts, "last_updated": utc_now_z()})
+    files[session_path.name] = entry
+    save_index_manifest(tool_dir.name, files)
+
+
+def rebuild_indexes(full: bool = False, jobs: int | None = None) -> None:
+    if not SESSIONS_DIR.exists():
+        return
+
+    tool_dirs = sorted([p for p in SESSIONS_DIR.iterdir() if p.is_dir()])
+    workers = min(jobs or os.cpu_count() or 1, len(tool_dirs))
+    if workers <= 1:
+        for tool_dir in tool_dirs:
+            rebuild_tool_index(tool_dir, full)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(rebuild_tool_index, tool_dirs, [full] * len(tool_dirs)))
+
+
+_SEARCH_INDEX: sb_search.SearchIndex | None = None
+
+
+def search_index() -> sb_search.SearchIndex:
+    # One instance per process so `sb serve` keeps loaded shards between requests.
+    import sb_search
+
+    global _SEARCH_INDEX
+    if _SEARCH_INDEX is None or _SEARCH_INDEX.index_dir != SEARCH_INDEX_DIR:
+        _SEARCH_INDEX = sb_search.SearchIndex(SEARCH_INDEX_DIR, REPO_ROOT)
+    return _SEARCH_INDEX
+
+
+_LEDGER_INDEX: sb_ledger_index.LedgerIndex | None = None
+
+
+def ledger_index(ledger_file: Path) -> sb_ledger_index.LedgerIndex:
+    # Kept across `sb serve` requests so segment key directories stay loaded.
+    import sb_ledger_index
+
+    global _LEDGER_INDEX
+    if _LEDGER_INDEX is None or _LEDGER_INDEX.ledger != ledger_file:
+        _LEDGER_INDEX = sb_ledger_index.LedgerIndex(LEDGER_INDEX_DIR, ledger_file)
+    return _LEDGER_INDEX
+
+
+def update_search_index(path: Path) -> None:
+    # Keep an existing index current; a missing one is built by the first `sb search`.
+    if not (SEARCH_INDEX_DIR / "manifest.json").exists():
+        return
+    import sb_search
+
+    if sb_search.is_source(REPO_ROOT, path):
+        _ = search_index().update([path])
+
+
+def cmd_commit_session(args: argparse.Namespace) -> None:
+    if not bool(getattr(args, "legacy_session_write", False)):
+        die(
+            "session writes are deprecated by default in this repository; "
+            "re-run with --legacy-session-write for controlled migration/backfill."
+        )
+
+    data = read_json_input(cast(str | None, args.json_file))
+    artifact_id = data.get("artifact_id") or data.get("id")
+    if not isinstance(artifact_id, str):
+        die("session JSON must contain a string field 'artifact_id' or 'id' (artifact/...)")
+
+    tool = cast(str, args.tool)
+    if not tool.strip():
+        die("tool must be non-empty")
+
+    out_dir = SESSIONS_DIR / tool
+    filename_arg = cast(str | None, args.filename)
+    out_name = filename_arg or infer_filename_from_artifact_id(artifact_id)
+    out_path = out_dir / out_name
+
+    write_json_file(out_path, data)
+    upsert_index_record(out_dir, out_path)
+    update_search_index(out_path)
+    print(str(out_path))
+
+
+def cmd_commit_scene(args: argparse.Namespace) -> None:
+    data = read_json_input(cast(str | None, args.json_file))
+    name = cast(str, args.name)
+    if not name:
+        die("scene name required (example: workflow_operational_model)")
+
+    out_path = SCENES_DIR / f"{slugify(name)}.scene.json"
+    write_json_file(out_path, data)
+    update_search_index(out_path)
+    print(str(out_path))
+
+
+_SCENE_VALIDATORS: dict[str, sb_schema.Validator] | None = None
+
+
+def init_validate_worker(schemas_dir: str | None) -> None:
+    # Compile scene schemas once per worker process; every file reuses them.
+    # None (no --schema) turns the schema checks off.
+    global _SCENE_VALIDATORS
+    if schemas_dir is None:
+        _SCENE_VALIDATORS = None
+        return
+    import sb_schema
+
+    _SCENE_VALIDATORS = sb_schema.compile_scene_validators(Path(schemas_dir))
+
+
+def validate_one(task: tuple[str, str]) -> JsonObj:
+    path_str, kind = task
+    path = Path(path_str)
+    t0 = time.perf_counter()
+    error: str | None = None
+    try:
+        value = load_json_cached(path)
+    except Exception as e:
+        error = f"invalid JSON file: {path} ({e})"
+    else:
+        if kind == "index":
+            try:
+                _ = index_artifact_ids(value, path)
+            except ValueError as e:
+                error = str(e)
+        elif not isinstance(value, dict):
+            error = f"JSON file must be an object at top level: {path}"
+        elif kind == "scene" and _SCENE_VALIDATORS is not None:
+            import sb_schema
+
+            schema_name = sb_schema.scene_schema_name(value)
+            validator = _SCENE_VALIDATORS.get(schema_name) if schema_name else None
+            errs = validator(value, "$") if validator else []
+            if errs:
+                more = f" (+{len(errs) - 1} more)" if len(errs) > 1 else ""
+                error = f"{schema_name} schema violation: {path}: {errs[0]}{more}"
+    try:
+        rel = str(path.relative_to(REPO_ROOT))
+    except ValueError:
+        rel = str(path)
+    return {
+        "path": rel,
+        "kind": kind,
+        "ok": error is None,
+        "error": error,
+        "duration_ms": round((time.perf_counter() - t0) * 1000.0, 3),
+    }
+
+
+def validation_tasks() -> list[tuple[str, str]]:
+    tasks: list[tuple[str, str]] = []
+    if SCENES_DIR.exists():
+        tasks.extend((str(f), "scene") for f in sorted(SCENES_DIR.glob("*.json")))
+    if SESSIONS_DIR.exists():
+        for tool_dir in sorted([p for p in SESSIONS_DIR.iterdir() if p.is_dir()]):
+            for f in sorted(tool_dir.glob("*.json")):
+                tasks.append((str(f), "index" if f.name == "index.json" else "session"))
+    return tasks
+
+
+def cmd_validate(args: argparse.Namespace) -> None:
+    tasks = validation_tasks()
+    jobs = cast(int | None, args.jobs) or os.cpu_count() or 1
+    ndjson = bool(args.ndjson)
+    fail_fast = bool(args.fail_fast)
+    schemas_dir = str(SCHEMAS_DIR) if args.schema else None
+    errors = 0
+
+    def report(result: JsonObj) -> bool:
+        nonlocal errors
+        if ndjson:
+            print(json.dumps(result), flush=True)
+        if not result["ok"]:
+            errors += 1
+            if not ndjson:
+                print(f"error: {result['error']}", file=sys.stderr, flush=True)
+            return fail_fast
+        return False
+
+    # Small trees are faster inline than paying process-pool startup.
+    if jobs <= 1 or len(tasks) < 64:
+        init_validate_worker(schemas_dir)
+        for task in tasks:
+            if report(validate_one(task)):
+                break
+    else:
+        import multiprocessing
+
+        chunksize = max(1, min(64, len(tasks) // (jobs * 8)))
+        with multiprocessing.Pool(jobs, initializer=init_validate_worker, initargs=(schemas_dir,)) as pool:
+            for result in pool.imap_unordered(validate_one, tasks, chunksize=chunksize):
+                if report(result):
+                    pool.terminate()
+                    break
+
+    if errors:
+        die(f"validation failed with {errors} error(s)")
+    if not ndjson:
+        print("ok")
+
+
+def cmd_reindex(args: argparse.Namespace) -> None:
+    rebuild_indexes(full=bool(args.full), jobs=cast(int | None, args.jobs))
+    print("reindexed")
+
+
+def write_json_lines(records: Iterable[JsonObj], limit: int | None = None) -> int:
+    """Stream records to stdout as JSON lines in chunks; returns how many were written."""
+    emitted = 0
+    chunk: list[str] = []
+    for record in records:
+        if limit is not None and emitted >= limit:
+            break
+        chunk.append(json.dumps(record))
+        emitted += 1
+        if len(chunk) >= 512:
+            sys.stdout.write("\n".join(chunk) + "\n")
+            chunk = []
+    if chunk:
+        sys.stdout.write("\n".join(chunk) + "\n")
+    sys.stdout.flush()
+    return emitted
+
+
+def cmd_query(args: argparse.Namespace) -> None:
+    import sb_query
+
+    for flag in ("since", "until"):
+        value = cast(str | None, getattr(args, flag))
+        if value is not None and not sb_query.valid_date(value):
+            die(f"--{flag} must be YYYY-MM-DD: {value}")
+    limit = cast(int | None, args.limit)
+    if limit is not None and limit < 0:
+        die("--limit must be >= 0")
+    tools = split_values(args.tool)
+
+    t0 = time.perf_counter()
+    index = sb_query.load(SESSIONS_DIR, QUERY_INDEX_FILE)
+    t1 = time.perf_counter()
+    matches = index.select(
+        since=args.since,
+        until=args.until,
+        min_score=args.min_score,
+        tools=tools or None,
+        id_prefix=args.id_prefix,
+        descending=bool(args.desc),
+    )
+    emitted = write_json_lines((index.record(pos) for pos in matches), limit)
+    if args.stats:
+        stats = {
+            "indexed": len(index),
+            "returned": emitted,
+            "load_ms": round((t1 - t0) * 1000.0, 3),
+            "query_ms": round((time.perf_counter() - t1) * 1000.0, 3),
+        }
+        print(json.dumps(stats), file=sys.stderr)
+
+
+def cmd_search(args: argparse.Namespace) -> None:
+    limit = cast(int, args.limit)
+    if limit < 1:
+        die("--limit must be >= 1")
+    index = search_index()
+    t0 = time.perf_counter()
+    if args.rebuild:
+        _ = index.rebuild()
+    elif args.refresh:
+        _ = index.refresh()
+    t1 = time.perf_counter()
+    hits = index.search(" ".join(cast(list[str], args.terms)), limit=limit, kind=args.kind)
+    for hit in hits:
+        print(json.dumps(hit))
+    if args.stats:
+        stats = {
+            "returned": len(hits),
+            "maintenance_ms": round((t1 - t0) * 1000.0, 3),
+            "query_ms": round((time.perf_counter() - t1) * 1000.0, 3),
+        }
+        print(json.dumps(stats), file=sys.stderr)
+
+
+def split_values(values: list[str] | None) -> list[str]:
+    return [v.strip() for value in (values or []) for v in value.split(",") if v.strip()]
+
+
+def cmd_graph(args: argparse.Namespace) -> None:
+    import sb_graph_query
+
+    limit = cast(int | None, args.limit)
+    if limit is not None and limit < 0:
+        die("--limit must be >= 0")
+    depth = cast(int | None, getattr(args, "depth", None))
+    if depth is not None and depth < 0:
+        die("--depth must be >= 0")
+    edge_types = split_values(args.edge_type) or None
+    node_types = set(split_values(args.node_type)) or None
+    direction = cast(str, args.direction)
+
+    t0 = time.perf_counter()
+    graph_file = Path(args.graph_file)
+    try:
+        index = sb_graph_query.load(graph_file)
+    except FileNotFoundError:
+        die(f"graph file not found: {graph_file}")
+    except (OSError, ValueError) as e:
+        die(f"cannot load graph: {graph_file} ({e})")
+    t1 = time.perf_counter()
+
+    records: Iterable[JsonObj]
+    try:
+        if args.graph_cmd == "node":
+            node = index.node(cast(str, args.id))
+            if node is None:
+                raise KeyError(args.id)
+            records = [node]
+        elif args.graph_cmd == "neighbors":
+            records = index.neighbors(cast(str, args.id), direction, edge_types, node_types)
+        elif args.graph_cmd == "khop":
+            records = index.k_hop(cast(list[str], args.ids), depth, direction, edge_types, node_types)
+        elif args.graph_cmd == "path":
+            path = index.shortest_path(
+                cast(str, args.source), cast(str, args.target), direction, edge_types, node_types, depth
+            )
+            if path is None:
+                die(f"no path from {args.source} to {args.target}", code=2)
+            records = cast(list[JsonObj], path)
+        else:
+            seeds = cast(list[str], args.ids)
+            members = [r["id"] for r in index.k_hop(seeds, depth, direction, edge_types, node_types)]
+            records = index.subgraph(members, edge_types)
+        emitted = write_json_lines(records, limit)
+    except KeyError as e:
+        die(f"unknown node id: {e.args[0]}")
+    if args.stats:
+        stats = {
+            "backend": index.backend,
+            "nodes": len(index),
+            "edges": index.edge_count,
+            "returned": emitted,
+            "load_ms": round((t1 - t0) * 1000.0, 3),
+            "query_ms": round((time.perf_counter() - t1) * 1000.0, 3),
+        }
+        print(json.dumps(stats), file=sys.stderr)
+
+
+def cmd_append(args: argparse.Namespace) -> None:
+    import sb_jsonl_append
+
+    lines = [raw.rstrip("\n") for raw in sys.stdin if raw.strip()]
+    if args.json:
+        for n, line in enumerate(lines, start=1):
+            try:
+                obj = json.loads(line)
+            except ValueError as e:
+                die(f"stdin line {n} is not valid JSON: {e}")
+            if not isinstance(obj, dict):
+                die(f"stdin line {n} must be a JSON object")
+    result = sb_jsonl_append.append_lines(Path(args.file), lines, fsync=not args.no_fsync)
+    if args.stats:
+        print(json.dumps({"lines": len(lines), **result}, sort_keys=True), file=sys.stderr)
+
+
+def cmd_ledger(args: argparse.Namespace) -> None:
+    since = cast(str | None, args.since)
+    until = cast(str | None, args.until)
+    for flag, value in (("since", since), ("until", until)):
+        if value is not None and not LEDGER_TS_RE.match(value):
+            die(f"--{flag} must be YYYY-MM-DD or YYYY-MM-DDTHH:MM:SSZ: {value}")
+    limit = cast(int | None, args.limit)
+    if limit is not None and limit < 0:
+        die("--limit must be >= 0")
+    if args.path is None and args.path_prefix is None and args.agent is None and since is None and until is None:
+        die("give at least one of --path, --path-prefix, --agent, --since, --until")
+    ledger_file = Path(args.ledger_file)
+    if not ledger_file.exists():
+        die(f"ledger not found: {ledger_file}")
+
+    index = ledger_index(ledger_file)
+    t0 = time.perf_counter()
+    maintenance = index.rebuild() if args.rebuild else index.refresh()
+    t1 = time.perf_counter()
+    offsets, via = index.select(
+        path=args.path,
+        path_prefix=args.path_prefix,
+        agent=args.agent,
+        since=since,
+        until=until,
+        descending=bool(args.desc),
+    )
+
+    def matches() -> Iterable[JsonObj]:
+        # The index narrows to candidates; every filter is re-checked on the row itself.
+        for _, row in index.rows(offsets):
+            target = row.get("target_path")
+            ts = row.get("timestamp")
+            if args.path is not None and target != args.path:
+                continue
+            if args.path_prefix is not None and not (isinstance(target, str) and target.startswith(args.path_prefix)):
+                continue
+            if args.agent is not None and row.get("agent_id") != args.agent:
+                continue
+            if since is not None and not (isinstance(ts, str) and ts[: len(since)] >= since):
+                continue
+            if until is not None and not (isinstance(ts, str) and ts[: len(until)] <= until):
+                continue
+            yield row
+
+    emitted = write_json_lines(matches(), limit)
+    if args.stats:
+        manifest = index.load_manifest() or {}
+        stats = {
+            "indexed": manifest.get("lines", 0),
+            "segments": len(manifest.get("segments", [])),
+            "candidates": len(offsets),
+            "candidates_via": via,
+            "returned": emitted,
+            **maintenance,
+            "maintenance_ms": round((t1 - t0) * 1000.0, 3),
+            "query_ms": round((time.perf_counter() - t1) * 1000.0, 3),
+        }
+        print(json.dumps(stats), file=sys.stderr)
+
+
+def cmd_agent_cycle(args: argparse.Namespace) -> None:
+    import sb_agent_cycle
+
+    # Relative file options are repo-root-relative, as in the wrapper (which runs from the repo root).
+    ledger_file = REPO_ROOT / cast(str, args.ledger_file)
+    registry_file = REPO_ROOT / cast(str, args.registry_file)
+    ledger_file.parent.mkdir(parents=True, exist_ok=True)
+    ledger_file.touch(exist_ok=True)
+    plan = sb_agent_cycle.build_plan(
+        REPO_ROOT,
+        cast(str, args.agent_id),
+        cast(str, args.targets),
+        cast(str, args.reason),
+        registry_file,
+        ledger_file,
+        actor=cast(str, args.actor),
+        mutation_type=cast(str, args.mutation_type),
+        inputs_csv=cast(str, args.inputs),
+        task_id=cast(str, args.task_id),
+        phase=cast(str, args.phase),
+        skip_authority=bool(args.skip_authority_check),
+        dry_run=bool(args.dry_run),
+    )
+    if args.dry_run:
+        print(json.dumps(plan, indent=2, ensure_ascii=False))
+        return
+    t0 = time.perf_counter()
+    hash_cache = sb_agent_cycle.HashCache(HASH_CACHE_FILE)
+    out = sb_agent_cycle.run_cycle(REPO_ROOT, plan, CLAIMS_FILE, COORD_METRICS_FILE, hash_cache, exec_cmd=cast(str, args.exec_cmd))
+    print(json.dumps(out, indent=2, ensure_ascii=False))
+    if args.stats:
+        stats = {"hash_hits": hash_cache.hits, "hash_misses": hash_cache.misses, "cycle_ms": round((time.perf_counter() - t0) * 1000.0, 3)}
+        print(json.dumps(stats), file=sys.stderr)
+
+
+def cmd_swarm_run(args: argparse.Namespace) -> None:
+    import sb_swarm_runner
+
+    workers = cast(int, args.workers)
+    if workers < 1:
+        die("--workers must be >= 1")
+    raw = Path(args.jobs_file).read_text(encoding="utf-8") if args.jobs_file else sys.stdin.read()
+    try:
+        jobs = sb_swarm_runner.parse_jobs(raw)
+    except ValueError as e:
+        die(f"invalid jobs: {e}")
+    spec_file = REPO_ROOT / cast(str, args.spec_file)
+    try:
+        gates = sb_swarm_runner.spec_gates(spec_file.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        die(f"spec file not found: {spec_file}")
+    if not gates:
+        die(f"no gate named in the {sb_swarm_runner.RULE_HEADING} of {spec_file}")
+    ledger_file = REPO_ROOT / cast(str, args.ledger_file)
+    ledger_file.parent.mkdir(parents=True, exist_ok=True)
+    ledger_file.touch(exist_ok=True)
+    runner = sb_swarm_runner.SwarmRun(
+        REPO_ROOT,
+        REPO_ROOT / cast(str, args.registry_file),
+        ledger_file,
+        CLAIMS_FILE,
+        COORD_METRICS_FILE,
+        HASH_CACHE_FILE,
+        gates,
+        workers=workers,
+    )
+    report = runner.run(jobs)
+    for warning in report["warnings"]:
+        print(f"warning: {warning}", file=sys.stderr)
+    if args.out_file:
+        out_file = Path(args.out_file)
+        out_file.parent.mkdir(parents=True, exist_ok=True)
+        out_file.write_text(json.dumps(report, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if report["jobs_failed"] or report["jobs_rejected"]:
+        raise SystemExit(1)
+
+
+def cmd_claim_preflight(args: argparse.Namespace) -> None:
+    import sb_coord_claims
+
+    out, warnings = sb_coord_claims.preflight(
+        REPO_ROOT,
+        Path(args.claims_file),
+        Path(args.metrics_file),
+        cast(str, args.path),
+        cast(str, args.actor),
+        ttl_s=cast(int, args.ttl_s),
+        mode=cast(str, args.mode),
+        now_ts=cast(str, args.now_ts or ""),
+        table_file=Path(args.table_file) if args.table_file else None,
+    )
+    sb_coord_claims.print_warnings(warnings)
+    print(json.dumps(out, sort_keys=True))
+
+
+def cmd_claim_append(args: argparse.Namespace) -> None:
+    import sb_coord_claims
+
+    line = sb_coord_claims.append_claim(
+        REPO_ROOT,
+        Path(args.claims_file),
+        Path(args.metrics_file),
+        cast(str, args.path),
+        cast(str, args.actor),
+        ts_override=cast(str, args.ts or ""),
+        table_file=Path(args.table_file) if args.table_file else None,
+    )
+    print(line)
+
+
+def cmd_pubsub_poll(args: argparse.Namespace) -> None:
+    import sb_pubsub
+
+    consumer = cast(str, args.consumer)
+    result = sb_pubsub.poll(
+        Path(args.events_file),
+        Path(args.offsets_dir) / f"{consumer}.json",
+        consumer,
+        sb_pubsub.parse_topics(cast(str, args.topics or "")),
+        cast(int, args.max_events),
+        now_ts=cast(str, args.now_ts or ""),
+    )
+    print(json.dumps(result, indent=2, sort_keys=True))
+
+
+def cmd_pubsub_subscribe(args: argparse.Namespace) -> None:
+    import signal
+
+    import sb_pubsub
+
+    consumer = cast(str, args.consumer)
+    if args.max_events is not None and args.max_events < 1:
+        die("--max-events must be >= 1")
+    if args.commit_every < 1:
+        die("--commit-every must be >= 1")
+
+    def emit(event: dict[str, Any]) -> None:
+        sys.stdout.write(sb_pubsub.encode_event(event) + "\n")
+        sys.stdout.flush()
+
+    def on_term(_signum: int, _frame: Any) -> None:
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, on_term)
+    try:
+        result = sb_pubsub.subscribe(
+            Path(args.events_file),
+            Path(args.offsets_dir) / f"{consumer}.json",
+            consumer,
+            sb_pubsub.parse_topics(cast(str, args.topics or "")),
+            emit,
+            timeout_s=cast(float | None, args.timeout_s),
+            max_events=cast(int | None, args.max_events),
+            commit_every=cast(int, args.commit_every),
+            commit_interval_s=cast(int, args.commit_interval_ms) / 1000.0,
+            poll_interval=cast(float, args.poll_interval),
+            force_poll=cast(bool, args.poll),
+            now_ts=cast(str, args.now_ts or ""),
+        )
+    except BrokenPipeError:
+        # Reader went away; the undelivered batch stays uncommitted. Silence the flush at exit.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        raise SystemExit(1)
+    if args.stats:
+        print(json.dumps(result, sort_keys=True), file=sys.stderr)
+
+
+def cmd_pubsub_publish(args: argparse.Namespace) -> None:
+    import sb_pubsub
+
+    event = sb_pubsub.build_event(
+        cast(str, args.topic),
+        cast(str, args.scope),
+        cast(str, args.actor),
+        cast(str, args.payload_json),
+        cast(int, args.ttl_s),
+        idem_key=cast(str, args.idempotency_key or ""),
+        ts_override=cast(str, args.ts or ""),
+        event_id_override=cast(str, args.event_id or ""),
+    )
+    line = sb_pubsub.publish(
+        Path(args.events_file),
+        event,
+        segment_max_bytes=cast(int, args.segment_max_bytes),
+        segment_max_age_s=cast(int, args.segment_max_age_s),
+    )
+    if line is None:
+        print(f"skipped: idempotency_key already published: {event['idempotency_key']}", file=sys.stderr)
+        return
+    print(line)
+
+
+def cmd_pubsub_publish_batch(args: argparse.Namespace) -> None:
+    import sb_pubsub
+
+    if args.ttl_s < 0:
+        die("--ttl-s must be >= 0")
+    events: list[dict[str, Any]] = []
+    for n, raw in enumerate(sys.stdin, start=1):
+        if not raw.strip():
+            continue
+        try:
+            events.append(sb_pubsub.event_from_record(json.loads(raw), cast(int, args.ttl_s)))
+        except ValueError as e:
+            die(f"stdin line {n}: {e}")
+    result = sb_pubsub.publish_batch(
+        Path(args.events_file),
+        events,
+        segment_max_bytes=cast(int, args.segment_max_bytes),
+        segment_max_age_s=cast(int, args.segment_max_age_s),
+    )
+    print(json.dumps({"events_file": args.events_file, "received": len(events), **result}, indent=2, sort_keys=True))
+
+
+def cmd_pubsub_group_poll(args: argparse.Namespace) -> None:
+    import sb_pubsub
+    import sb_pubsub_groups
+
+    if args.partitions is not None and args.partitions < 1:
+        die("--partitions must be >= 1")
+    if args.lease_s < 1:
+        die("--lease-s must be >= 1")
+    result = sb_pubsub_groups.group_poll(
+        Path(args.events_file),
+        Path(args.groups_dir),
+        cast(str, args.group),
+        cast(str, args.worker),
+        sb_pubsub.parse_topics(cast(str, args.topics or "")),
+        cast(int, args.max_events),
+        partitions=cast(int | None, args.partitions),
+        lease_s=cast(int, args.lease_s),
+        now_ts=cast(str, args.now_ts or ""),
+    )
+    print(json.dumps(result, indent=2, sort_keys=True))
+
+
+def cmd_pubsub_group_commit(args: argparse.Namespace) -> None:
+    import sb_pubsub_groups
+
+    batch = read_json_from_stdin()
+    cursor = batch.get("cursor")
+    if not isinstance(cursor, dict) or not all(isinstance(v, dict) for v in cursor.values()):
+        die("stdin must be a group-poll result with a cursor object")
+    for key in ("group", "worker"):
+        if not isinstance(batch.get(key), str):
+            die(f"stdin group-poll result is missing {key}")
+    result = sb_pubsub_groups.group_commit(
+        Path(args.groups_dir),
+        cast(str, batch["group"]),
+        cast(str, batch["worker"]),
+        cast(dict[str, Any], cursor),
+        lease_s=cast(int, args.lease_s),
+        now_ts=cast(str, args.now_ts or ""),
+    )
+    print(json.dumps(result, indent=2, sort_keys=True))
+    if result["rejected"]:
+        raise SystemExit(1)
+
+
+def cmd_pubsub_group_leave(args: argparse.Namespace) -> None:
+    import sb_pubsub_groups
+
+    result = sb_pubsub_groups.group_leave(
+        Path(args.groups_dir), cast(str, args.group), cast(str, args.worker), now_ts=cast(str, args.now_ts or "")
+    )
+    print(json.dumps(result, indent=2, sort_keys=True))
+
+
+def cmd_pubsub_lag(args: argparse.Namespace) -> None:
+    import sb_pubsub_groups
+
+    result = sb_pubsub_groups.lag(
+        Path(args.events_file),
+        Path(args.offsets_dir),
+        Path(args.groups_dir),
+        by_topic=not args.no_topics,
+        now_ts=cast(str, args.now_ts or ""),
+    )
+    print(json.dumps(result, indent=2, sort_keys=True))
+
+
+def cmd_pubsub_compact(args: argparse.Namespace) -> None:
+    import sb_pubsub
+
+    result = sb_pubsub.compact(
+        Path(args.events_file),
+        now_ts=cast(str, args.now_ts or ""),
+        retention_s=cast(int, args.tombstone_retention_s),
+        segment_max_age_s=cast(int, args.segment_max_age_s),
+        apply=cast(str, args.mode) == "apply",
+    )
+    print(json.dumps(result, indent=2, sort_keys=True))
+
+
+def daemon_socket_path() -> Path:
+    return Path(sb_client.socket_path())
+
+
+class _FrameWriter(io.TextIOBase):
+    """Forward writes to a daemon client as NDJSON frames so output streams as it is produced."""
+
+    def __init__(self, conn: socket.socket, fd: int) -> None:
+        self.conn = conn
+        self.fd = fd
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, s: str) -> int:
+        if s:
+            self.conn.sendall((json.dumps({"fd": self.fd, "data": s}) + "\n").encode("utf-8"))
+        return len(s)
+
+
+def exit_code_of(e: SystemExit) -> int:
+    if e.code is None:
+        return 0
+    if isinstance(e.code, int):
+        return e.code
+    print(e.code, file=sys.stderr)
+    return 1
+
+
+def warm_daemon_state() -> None:
+    import importlib
+
+    import sb_graph_query
+    import sb_query
+
+    # Load every module a served command needs, so no request pays an import.
+    for name in DAEMON_MODULES:
+        _ = importlib.import_module(name)
+    # validate is the only reader of _JSON_CACHE; query and graph warm their own indexes below.
+    paths: list[Path] = []
+    if SCENES_DIR.exists():
+        paths.extend(sorted(SCENES_DIR.glob("*.json")))
+    if SESSIONS_DIR.exists():
+        paths.extend(sorted(SESSIONS_DIR.glob("*/index.json")))
+    for path in paths:
+        try:
+            _ = load_json_cached(path)
+        except Exception:
+            continue
+    _ = sb_query.load(SESSIONS_DIR, QUERY_INDEX_FILE)
+    with contextlib.suppress(OSError, ValueError):
+        _ = sb_graph_query.load(GRAPH_FILE)
+
+
+def daemon_serves(args: argparse.Namespace) -> bool:
+    return sb_client.serves(args.cmd, getattr(args, f"{args.cmd}_cmd", None))
+
+
+def serve_request(conn: socket.socket, parser: argparse.ArgumentParser) -> None:
+    buf = b""
+    while not buf.endswith(b"\n"):
+        chunk = conn.recv(65536)
+        if not chunk:
+            break
+        buf += chunk
+    if not buf.strip():
+        # Liveness probes (e.g. a second `sb serve`) connect and close without a request.
+        return
+    request = json.loads(buf.decode("utf-8"))
+    argv = [str(a) for a in request.get("argv", [])]
+
+    code = 0
+    prev_cwd = os.getcwd()
+    prev_stdin = sys.stdin
+    try:
+        os.chdir(str(request.get("cwd") or prev_cwd))
+        sys.stdin = io.StringIO(str(request.get("stdin") or ""))
+        with contextlib.redirect_stdout(_FrameWriter(conn, 1)), contextlib.redirect_stderr(_FrameWriter(conn, 2)):
+            try:
+                args = parser.parse_args(argv)
+                if not daemon_serves(args):
+                    die(f"command not served by the sb daemon: {' '.join(argv[:2])}")
+                args.func(args)
+            except SystemExit as e:
+                code = exit_code_of(e)
+            except Exception:
+                import traceback
+
+                # Same traceback the command would print in-process; the daemon keeps serving.
+                traceback.print_exc()
+                code = 1
+    except OSError as e:
+        _FrameWriter(conn, 2).write(f"error: {e}\n")
+        code = 1
+    finally:
+        os.chdir(prev_cwd)
+        sys.stdin = prev_stdin
+    conn.sendall((json.dumps({"exit_code": code}) + "\n").encode("utf-8"))
+
+
+def cmd_serve(args: argparse.Namespace) -> None:
+    import signal
+    import socket
+
+    sock_path = Path(args.socket) if args.socket else daemon_socket_path()
+    if sock_path.exists():
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(str(sock_path))
+            except OSError:
+                sock_path.unlink()
+            else:
+                die(f"sb daemon already running on {sock_path}")
+    sock_path.parent.mkdir(parents=True, exist_ok=True)
+
+    def on_term(_signum: int, _frame: Any) -> None:
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, on_term)
+    parser = build_parser()
+    warm_daemon_state()
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # Create the socket owner-only; a chmod after bind would leave it open to others meanwhile.
+    prev_umask = os.umask(0o177)
+    try:
+        server.bind(str(sock_path))
+    finally:
+        _ = os.umask(prev_umask)
+    server.listen(16)
+    print(f"sb daemon listening on {sock_path}", file=sys.stderr, flush=True)
+    try:
+        # Requests are served one at a time: commands share module state,
+        # cwd and redirected stdio, exactly as they would in a CLI process.
+        while True:
+            conn, _ = server.accept()
+            with conn:
+                try:
+                    serve_request(conn, parser)
+                except Exception as e:
+                    # Malformed request or a client that went away mid-reply.
+                    print(f"warning: dropped daemon request: {e}", file=sys.stderr, flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        sock_path.unlink(missing_ok=True)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(prog="sb", description="Second-brain CLI")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    s1 = sub.add_parser(
+        "commit-session",
+        help="Legacy: commit a session artifact from stdin JSON (or --json-file) and update its tool index",
+    )
+    _ = s1.add_argument("--tool", required=True, help="Session tool name (e.g. codex, chatgpt, claude)")
+    _ = s1.add_argument("--filename", help="Override output filename")
+    _ = s1.add_argument("--json-file", help="Read input JSON from a file instead of stdin")
+    _ = s1.add_argument(
+        "--legacy-session-write",
+        action="store_true",
+        help="Required opt-in for legacy session writes under sessions/.",
+    )
+    s1.set_defaults(func=cmd_commit_session)
+
+    s2 = sub.add_parser("commit-scene", help="Commit a scene JSON from stdin (or --json-file)")
+    _ = s2.add_argument("--name", required=True, help="Scene name (used for filename)")
+    _ = s2.add_argument("--json-file", help="Read input JSON from a file instead of stdin")
+    s2.set_defaults(func=cmd_commit_scene)
+
+    s3 = sub.add_parser("validate", help="Validate JSON in scenes/ and legacy sessions/")
+    _ = s3.add_argument("--jobs", type=int, help="Worker processes (default: CPU count)")
+    _ = s3.add_argument("--ndjson", action="store_true", help="Stream one JSON result line per file as it completes")
+    _ = s3.add_argument("--fail-fast", action="store_true", help="Stop at the first failing file")
+    _ = s3.add_argument(
+        "--schema",
+        action="store_true",
+        help="Also check graph and phase-history scenes against scenes/_schemas (draft-07 subset, see scripts/sb_schema.py)",
+    )
+    s3.set_defaults(func=cmd_validate)
+
+    s4 = sub.add_parser("reindex", help="Legacy: rebuild sessions/*/index.json from session artifacts")
+    _ = s4.add_argument(
+        "--full",
+        action="store_true",
+        help="Ignore the per-tool manifest under state/cache/ and re-parse every session file.",
+    )
+    _ = s4.add_argument("--jobs", type=int, help="Parallel tool-directory workers (default: CPU count)")
+    s4.set_defaults(func=cmd_reindex)
+
+    s5 = sub.add_parser("claim", help="Coordination claims in coord_claims.md")
+    claim_sub = s5.add_subparsers(dest="claim_cmd", required=True)
+    c1 = claim_sub.add_parser("preflight", help="Check active claims before editing a path")
+    _ = c1.add_argument("--path", required=True, help="Repo-relative path")
+    _ = c1.add_argument("--actor", required=True, help="Claim actor name")
+    _ = c1.add_argument("--claims-file", default=str(CLAIMS_FILE), help="Claim file path (default: coord_claims.md)")
+    _ = c1.add_argument("--metrics-file", default=str(COORD_METRICS_FILE), help="Coordination metrics file")
+    _ = c1.add_argument("--ttl-s", type=int, default=600, help="Active-claim ttl (default: 600)")
+    _ = c1.add_argument("--window-lines", type=int, help=argparse.SUPPRESS)  # ignored: the active-claim table covers the whole log
+    _ = c1.add_argument("--table-file", help="Active-claim table (default: state/<claims stem>_active_v0.json beside the claims file)")
+    _ = c1.add_argument("--mode", choices=("edit", "claim"), default="edit", help="edit checks active claim by actor")
+    _ = c1.add_argument("--now-ts", help="Current timestamp override (RFC3339)")
+    c1.set_defaults(func=cmd_claim_preflight)
+    c2 = claim_sub.add_parser("append", help="Append a claim line")
+    _ = c2.add_argument("--path", required=True, help="Repo-relative path")
+    _ = c2.add_argument("--actor", required=True, help="Claim actor name")
+    _ = c2.add_argument("--claims-file", default=str(CLAIMS_FILE), help="Claim file path (default: coord_claims.md)")
+    _ = c2.add_argument("--metrics-file", default=str(COORD_METRICS_FILE), help="Coordination metrics file")
+    _ = c2.add_argument("--ts", help="Timestamp override (RFC3339)")
+    _ = c2.add_argument("--table-file", help="Active-claim table (default: state/<claims stem>_active_v0.json beside the claims file)")
+    c2.set_defaults(func=cmd_claim_append)
+
+    s6 = sub.add_parser("pubsub", help="File-native pub/sub bus (meta/PUBSUB_BUS_SPEC_v0.md)")
+    pubsub_sub = s6.add_subparsers(dest="pubsub_cmd", required=True)
+    b1 = pubsub_sub.add_parser("poll", help="Read new events for a consumer and advance its offset")
+    _ = b1.add_argument("--consumer", required=True, help="Consumer name")
+    _ = b1.add_argument("--topics", help="Optional topic filter, comma-separated")
+    _ = b1.add_argument("--max-events", type=int, default=50, help="Max events to emit after filtering (default: 50)")
+    _ = b1.add_argument("--events-file", default=str(PUBSUB_EVENTS_FILE), help="Event log path")
+    _ = b1.add_argument("--offsets-dir", default=str(PUBSUB_OFFSETS_DIR), help="Offsets directory")
+    _ = b1.add_argument("--now-ts", help="Now override for TTL filtering (RFC3339)")
+    b1.set_defaults(func=cmd_pubsub_poll)
+    b4 = pubsub_sub.add_parser("subscribe", help="Stream new events as NDJSON, blocking on file changes between appends")
+    _ = b4.add_argument("--consumer", required=True, help="Consumer name")
+    _ = b4.add_argument("--topics", help="Optional topic filter, comma-separated")
+    _ = b4.add_argument("--timeout-s", type=float, help="Exit after this many seconds without delivering an event (default: wait forever)")
+    _ = b4.add_argument("--max-events", type=int, help="Exit after delivering this many events (default: unlimited)")
+    _ = b4.add_argument(
+        "--commit-every",
+        type=int,
+        default=100,
+        help="Commit the offset after this many delivered events (default: %(default)s)",
+    )
+    _ = b4.add_argument(
+        "--commit-interval-ms",
+        type=int,
+        default=1000,
+        help="Commit an advanced offset at least this often (default: %(default)s)",
+    )
+    _ = b4.add_argument("--poll", action="store_true", help="Use stat polling instead of inotify")
+    _ = b4.add_argument("--poll-interval", type=float, default=0.5, help="Seconds between scans with the polling backend (default: 0.5)")
+    _ = b4.add_argument("--events-file", default=str(PUBSUB_EVENTS_FILE), help="Event log path")
+    _ = b4.add_argument("--offsets-dir", default=str(PUBSUB_OFFSETS_DIR), help="Offsets directory")
+    _ = b4.add_argument("--now-ts", help="Now override for TTL filtering (RFC3339)")
+    _ = b4.add_argument("--stats", action="store_true", help="Print a delivery summary to stderr on exit")
+    b4.set_defaults(func=cmd_pubsub_subscribe)
+    b2 = pubsub_sub.add_parser("publish", help="Append one event to the bus")
+    _ = b2.add_argument("--topic", required=True)
+    _ = b2.add_argument("--scope", required=True)
+    _ = b2.add_argument("--actor", required=True)
+    _ = b2.add_argument("--payload-json", default="{}", help="JSON object payload (default: {})")
+    _ = b2.add_argument("--ttl-s", type=int, default=600, help="TTL in seconds, advisory (default: 600)")
+    _ = b2.add_argument("--idempotency-key", help="Optional explicit key (default: the event id)")
+    _ = b2.add_argument("--ts", help="Timestamp override (RFC3339)")
+    _ = b2.add_argument("--event-id", help="Event id override")
+    _ = b2.add_argument("--events-file", default=str(PUBSUB_EVENTS_FILE), help="Event log path")
+    _ = b2.add_argument(
+        "--segment-max-bytes",
+        type=int,
+        default=8 * 1024 * 1024,
+        help="Roll the active segment at this size (default: %(default)s)",
+    )
+    _ = b2.add_argument(
+        "--segment-max-age-s",
+        type=int,
+        default=86400,
+        help="Roll the active segment at this age (default: %(default)s)",
+    )
+    b2.set_defaults(func=cmd_pubsub_publish)
+    b5 = pubsub_sub.add_parser(
+        "publish-batch",
+        help="Append NDJSON events from stdin under one lock and fsync, skipping already-used idempotency keys",
+    )
+    _ = b5.add_argument("--ttl-s", type=int, default=600, help="TTL for records without ttl_s (default: 600)")
+    _ = b5.add_argument("--events-file", default=str(PUBSUB_EVENTS_FILE), help="Event log path")
+    _ = b5.add_argument(
+        "--segment-max-bytes",
+        type=int,
+        default=8 * 1024 * 1024,
+        help="Roll the active segment at this size (default: %(default)s)",
+    )
+    _ = b5.add_argument(
+        "--segment-max-age-s",
+        type=int,
+        default=86400,
+        help="Roll the active segment at this age (default: %(default)s)",
+    )
+    b5.set_defaults(func=cmd_pubsub_publish_batch)
+    b6 = pubsub_sub.add_parser("group-poll", help="Lease partitions of a consumer group and read their next events (commit with group-commit)")
+    _ = b6.add_argument("--group", required=True)
+    _ = b6.add_argument("--worker", required=True)
+    _ = b6.add_argument("--topics", default="", help="Optional topic filter, comma-separated")
+    _ = b6.add_argument("--max-events", type=int, default=50, help="Max events to return (default: 50)")
+    _ = b6.add_argument(
+        "--partitions",
+        type=int,
+        help="Partition count when creating the group (default: 4); must match afterwards",
+    )
+    _ = b6.add_argument(
+        "--lease-s",
+        type=int,
+        default=30,
+        help="Lease and heartbeat length in seconds (default: %(default)s)",
+    )
+    _ = b6.add_argument("--events-file", default=str(PUBSUB_EVENTS_FILE), help="Event log path")
+    _ = b6.add_argument("--groups-dir", default=str(PUBSUB_GROUPS_DIR), help="Consumer group state directory")
+    _ = b6.add_argument("--now-ts", help="Optional now override for leases and TTL filtering (RFC3339)")
+    b6.set_defaults(func=cmd_pubsub_group_poll)
+    b7 = pubsub_sub.add_parser("group-commit", help="Commit the cursor of a group-poll result read from stdin")
+    _ = b7.add_argument(
+        "--lease-s",
+        type=int,
+        default=30,
+        help="Renew committed leases for this long (default: %(default)s)",
+    )
+    _ = b7.add_argument("--groups-dir", default=str(PUBSUB_GROUPS_DIR), help="Consumer group state directory")
+    _ = b7.add_argument("--now-ts", help="Optional now override (RFC3339)")
+    b7.set_defaults(func=cmd_pubsub_group_commit)
+    b8 = pubsub_sub.add_parser("group-leave", help="Release a worker's partition leases")
+    _ = b8.add_argument("--group", required=True)
+    _ = b8.add_argument("--worker", required=True)
+    _ = b8.add_argument("--groups-dir", default=str(PUBSUB_GROUPS_DIR), help="Consumer group state directory")
+    _ = b8.add_argument("--now-ts", help="Optional now override (RFC3339)")
+    b8.set_defaults(func=cmd_pubsub_group_leave)
+    b9 = pubsub_sub.add_parser("lag", help="Per-consumer, per-group and per-topic lag in events and bytes")
+    _ = b9.add_argument("--events-file", default=str(PUBSUB_EVENTS_FILE), help="Event log path")
+    _ = b9.add_argument("--offsets-dir", default=str(PUBSUB_OFFSETS_DIR), help="Consumer offsets directory")
+    _ = b9.add_argument("--groups-dir", default=str(PUBSUB_GROUPS_DIR), help="Consumer group state directory")
+    _ = b9.add_argument("--no-topics", action="store_true", help="Skip the per-topic breakdown")
+    _ = b9.add_argument("--now-ts", help="Optional now override for lease liveness (RFC3339)")
+    b9.set_defaults(func=cmd_pubsub_lag)
+    b3 = pubsub_sub.add_parser("compact", help="Drop fully expired segments, keeping idempotency-key tombstones")
+    _ = b3.add_argument("--events-file", default=str(PUBSUB_EVENTS_FILE), help="Event log path")
+    _ = b3.add_argument("--mode", choices=("dry-run", "apply"), default="apply", help="dry-run reports without deleting (default: apply)")
+    _ = b3.add_argument("--now-ts", help="Now override for expiry (RFC3339)")
+    _ = b3.add_argument(
+        "--tombstone-retention-s",
+        type=int,
+        default=7 * 86400,
+        help="Keep tombstones this long past event expiry (default: %(default)s)",
+    )
+    _ = b3.add_argument(
+        "--segment-max-age-s",
+        type=int,
+        default=86400,
+        help="Seal an idle active segment older than this first (default: %(default)s)",
+    )
+    b3.set_defaults(func=cmd_pubsub_compact)
+
+    s8 = sub.add_parser("query", help="Query the merged cross-tool session index; streams JSON lines in date order")
+    _ = s8.add_argument("--since", help="Earliest session date, inclusive (YYYY-MM-DD)")
+    _ = s8.add_argument("--until", help="Latest session date, inclusive (YYYY-MM-DD)")
+    _ = s8.add_argument("--min-score", type=int, help="Minimum resumption_score")
+    _ = s8.add_argument("--tool", action="append", help="Restrict to a tool; repeat or comma-separate for several")
+    _ = s8.add_argument("--id-prefix", help="Artifact id prefix (e.g. artifact/codex_2026_02)")
+    _ = s8.add_argument("--limit", type=int, help="Stop after this many results")
+    _ = s8.add_argument("--desc", action="store_true", help="Newest first")
+    _ = s8.add_argument("--stats", action="store_true", help="Print load/query timings to stderr")
+    s8.set_defaults(func=cmd_query)
+
+    s9 = sub.add_parser("search", help="BM25 full-text search over session text and scene node labels")
+    _ = s9.add_argument("terms", nargs="+", help="Search terms")
+    _ = s9.add_argument("--limit", type=int, default=10, help="Max results (default: 10)")
+    _ = s9.add_argument("--kind", choices=("session", "scene"), help="Only sessions or only scene nodes")
+    _ = s9.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Re-index files changed outside sb commit-* (stat scan of sessions/ and scenes/) before searching",
+    )
+    _ = s9.add_argument("--rebuild", action="store_true", help="Rebuild the index from scratch before searching")
+    _ = s9.add_argument("--stats", action="store_true", help="Print maintenance/query timings to stderr")
+    s9.set_defaults(func=cmd_search)
+
+    s10 = sub.add_parser("graph", help="Query graph/graph.json (uses graph/graph.bin when fresh); streams JSON lines")
+    graph_sub = s10.add_subparsers(dest="graph_cmd", required=True)
+    g1 = graph_sub.add_parser("node", help="Print one node")
+    _ = g1.add_argument("id")
+    g2 = graph_sub.add_parser("neighbors", help="Incident edges of a node with the node on the other end")
+    _ = g2.add_argument("id")
+    g3 = graph_sub.add_parser("khop", help="Nodes within --depth hops of the seeds, nearest first")
+    _ = g3.add_argument("ids", nargs="+", metavar="id")
+    _ = g3.add_argument("--depth", type=int, default=1, help="Max hops (default: 1)")
+    g4 = graph_sub.add_parser("path", help="Fewest-hop path between two nodes (exit 2 when none)")
+    _ = g4.add_argument("source")
+    _ = g4.add_argument("target")
+    _ = g4.add_argument("--depth", type=int, help="Give up beyond this many hops")
+    g5 = graph_sub.add_parser(
+        "subgraph", help="Induced subgraph of the --depth neighborhood of the seeds, as canonical.jsonl records"
+    )
+    _ = g5.add_argument("ids", nargs="+", metavar="id")
+    _ = g5.add_argument("--depth", type=int, default=1, help="Neighborhood radius (default: 1; 0 = seeds only)")
+    for g in (g1, g2, g3, g4, g5):
+        _ = g.add_argument("--direction", choices=("out", "in", "both"), default="out", help="Edge direction to follow (default: out)")
+        _ = g.add_argument("--edge-type", action="append", help="Only follow these edge types; repeat or comma-separate")
+        _ = g.add_argument("--node-type", action="append", help="Only visit/return nodes of these types; repeat or comma-separate")
+        _ = g.add_argument("--limit", type=int, help="Stop after this many records")
+        _ = g.add_argument("--graph-file", default=str(GRAPH_FILE), help="Graph JSON path (default: graph/graph.json)")
+        _ = g.add_argument("--stats", action="store_true", help="Print backend and load/query timings to stderr")
+        g.set_defaults(func=cmd_graph)
+
+    s11 = sub.add_parser(
+        "append",
+        help="Append stdin lines to a log under its shared lock, group-committed with concurrent writers",
+    )
+    _ = s11.add_argument("--file", required=True, help="Log to append to (JSONL ledger, alerts, mailbox, checkpoint index, claims)")
+    _ = s11.add_argument("--json", action="store_true", help="Reject input unless every line is a JSON object")
+    _ = s11.add_argument("--no-fsync", action="store_true", help="Skip the fsync after the batch write")
+    _ = s11.add_argument("--stats", action="store_true", help="Print batch stats to stderr")
+    s11.set_defaults(func=cmd_append)
+
+    s12 = sub.add_parser(
+        "ledger",
+        help="Query the mutation ledger through its sidecar index; streams matching rows as JSON lines in ledger order",
+    )
+    _ = s12.add_argument("--path", help="Exact target_path")
+    _ = s12.add_argument("--path-prefix", help="target_path prefix (e.g. scene/agent/)")
+    _ = s12.add_argument("--agent", help="Exact agent_id (e.g. agent/project_manager_v0)")
+    _ = s12.add_argument("--since", help="Earliest timestamp, inclusive (YYYY-MM-DD or YYYY-MM-DDTHH:MM:SSZ)")
+    _ = s12.add_argument("--until", help="Latest timestamp, inclusive (YYYY-MM-DD or YYYY-MM-DDTHH:MM:SSZ)")
+    _ = s12.add_argument("--limit", type=int, help="Stop after this many rows")
+    _ = s12.add_argument("--desc", action="store_true", help="Newest first")
+    _ = s12.add_argument("--rebuild", action="store_true", help="Rebuild the index from scratch before querying")
+    _ = s12.add_argument("--ledger-file", default=str(LEDGER_FILE), help="Ledger path (default: scene/ledger/mutations_v0.jsonl)")
+    _ = s12.add_argument("--stats", action="store_true", help="Print index and query stats to stderr")
+    s12.set_defaults(func=cmd_ledger)
+
+    s13 = sub.add_parser(
+        "agent-cycle",
+        help="Run agent cycle steps 3-5 (claims, exec, cursor, ledger) in one process (tools/sb_agent_run_cycle_v0.sh)",
+    )
+    _ = s13.add_argument("--agent-id", required=True, help="Agent id, e.g. agent/project_manager_v0")
+    _ = s13.add_argument("--targets", required=True, help="Repo-relative paths (comma-separated)")
+    _ = s13.add_argument("--reason", required=True, help="Short mutation reason")
+    _ = s13.add_argument("--task-id", default="", help="Task id for the cursor")
+    _ = s13.add_argument("--phase", default="cycle_complete", help="Cursor phase (default: cycle_complete)")
+    _ = s13.add_argument("--mutation-type", default="UPDATE", help="Mutation type (default: UPDATE)")
+    _ = s13.add_argument("--inputs", default="", help="Scene/input refs for ledger entries (comma-separated)")
+    _ = s13.add_argument("--exec-cmd", default="", help="Shell command to run between claim and ledger write")
+    _ = s13.add_argument("--actor", default="", help="Claim actor alias (default derived from agent id)")
+    _ = s13.add_argument("--registry-file", default=str(REGISTRY_FILE), help="Authority registry path")
+    _ = s13.add_argument("--ledger-file", default=str(LEDGER_FILE), help="Mutation ledger path")
+    _ = s13.add_argument("--skip-authority-check", action="store_true", help="Bypass the scoped authority check")
+    _ = s13.add_argument("--dry-run", action="store_true", help="Print the plan only, no file mutation")
+    _ = s13.add_argument("--stats", action="store_true", help="Print hash-cache hits/misses and cycle time to stderr")
+    s13.set_defaults(func=cmd_agent_cycle)
+
+    s14 = sub.add_parser("swarm", help="Parallel agent cycles (spec/swarm_runner_v0.md)")
+    swarm_sub = s14.add_subparsers(dest="swarm_cmd", required=True)
+    w1 = swarm_sub.add_parser(
+        "run",
+        help="Run a batch of agent-cycle jobs; non-conflicting jobs run concurrently, conflicting ones in order",
+    )
+    _ = w1.add_argument(
+        "--jobs-file",
+        help="JSON array or NDJSON of {agent_id, targets, exec_cmd, reason, task_id, ...} (default: stdin)",
+    )
+    _ = w1.add_argument("--workers", type=int, default=4, help="Worker threads (default: %(default)s)")
+    _ = w1.add_argument("--registry-file", default=str(REGISTRY_FILE), help="Authority registry path")
+    _ = w1.add_argument("--ledger-file", default=str(LEDGER_FILE), help="Mutation ledger path")
+    _ = w1.add_argument(
+        "--spec-file",
+        default=str(SWARM_SPEC_FILE),
+        help="Spec whose Non-Interference Rule names the gate scenes and the paths they close",
+    )
+    _ = w1.add_argument("--out-file", help="Also write the run report here")
+    w1.set_defaults(func=cmd_swarm_run)
+
+    s7 = sub.add_parser(
+        "serve",
+        help=(
+            "Run a long-lived daemon on a Unix socket that answers sb commands warm; "
+            "clients still start Python but skip loading the CLI and its modules"
+        ),
+    )
+    _ = s7.add_argument("--socket", help="Socket path (default: $SB_SOCKET or state/sb.sock)")
+    s7.set_defaults(func=cmd_serve)
+
+    return p
+
+
+def main() -> None:
+    args = build_parser().parse_args()
+    func = cast(Callable[[argparse.Namespace], None], getattr(args, "func", None))
+    if func is None:
+        die("no command provided")
+    try:
+        func(args)
+    except BrokenPipeError:
+        # The reader went away (e.g. `sb validate --ndjson | head`). Point stdout at
+        # /dev/null so the interpreter's final flush does not raise again.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        raise SystemExit(1)
+
@@ -0,0 +1,81 @@
+"""Forward `sb` invocations to a running `sb serve` before the CLI is loaded.
+
+The wrapper still starts a Python interpreter; what a served call skips is
+importing scripts/sb_cli.py, building its argparse parser and loading the
+command modules. The decision is made from the raw argv; json and socket
+are imported only once a daemon socket exists.
+"""
+from __future__ import annotations
+
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+DEFAULT_SOCKET = os.path.join(REPO_ROOT, "state", "sb.sock")
+
+# Commands the `sb serve` daemon answers; everything else always runs in-process.
+DAEMON_COMMANDS = {"commit-session", "commit-scene", "validate", "reindex", "claim", "pubsub", "query", "search", "graph", "ledger"}
+STDIN_COMMANDS = {"commit-session", "commit-scene"}
+# Long-running subcommands would hold the single-threaded daemon; they always run in-process.
+IN_PROCESS_SUBCOMMANDS = {("pubsub", "subscribe"), ("pubsub", "publish-batch"), ("pubsub", "group-commit")}
+
+
+def socket_path() -> str:
+    return os.environ.get("SB_SOCKET") or DEFAULT_SOCKET
+
+
+def serves(cmd: str | None, subcmd: str | None) -> bool:
+    return cmd in DAEMON_COMMANDS and (cmd, subcmd) not in IN_PROCESS_SUBCOMMANDS
+
+
+def _reads_stdin(argv: list[str]) -> bool:
+    if argv[0] not in STDIN_COMMANDS:
+        return False
+    for arg in argv[1:]:
+        opt = arg.split("=", 1)[0]
+        # argparse accepts unambiguous prefixes, e.g. --json-f.
+        if len(opt) > 2 and "--json-file".startswith(opt):
+            return False
+    return True
+
+
+def forward(argv: list[str]) -> int | None:
+    """Run argv on the daemon and return its exit code; None means run in-process instead."""
+    if os.environ.get("SB_NO_DAEMON") or not argv:
+        return None
+    # No served command takes options before its subcommand, so argv[1] is the subcommand.
+    if not serves(argv[0], argv[1] if len(argv) > 1 else None):
+        return None
+    sock_path = socket_path()
+    if not os.path.exists(sock_path):
+        return None
+
+    import json
+    import socket
+
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.connect(sock_path)
+    except OSError:
+        conn.close()
+        return None
+
+    # Read stdin only once connected, so the in-process fallback still sees it.
+    stdin_data = sys.stdin.read() if _reads_stdin(argv) else None
+    request = {"argv": argv, "cwd": os.getcwd(), "stdin": stdin_data}
+    with conn, conn.makefile("rb") as frames:
+        conn.sendall((json.dumps(request) + "\n").encode("utf-8"))
+        for raw in frames:
+            frame = json.loads(raw.decode("utf-8"))
+            if "exit_code" in frame:
+                return int(frame["exit_code"])
+            stream = sys.stdout if frame.get("fd") == 1 else sys.stderr
+            try:
+                stream.write(frame.get("data", ""))
+                stream.flush()
+            except BrokenPipeError:
+                # Same as the in-process path: the reader went away, exit without a traceback.
+                os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+                return 1
+    print(f"error: sb daemon closed the connection without a result: {sock_path}", file=sys.stderr)
+    return 1
@@ -0,0 +1,321 @@
+"""Claim append/preflight logic shared by tools/sb_coord_claim_*_v0.sh and `sb claim`."""
+from __future__ import annotations
+
+import fcntl
+import heapq
+import json
+import os
+import re
+import sys
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path, PurePosixPath
+from typing import Any, Iterator
+
+from sb_jsonl_append import append_lines
+
+CLAIM_RE = re.compile(r"^([^|]+) \| ([A-Za-z0-9._-]+) \| (\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}Z)$")
+ACTOR_RE = re.compile(r"^[A-Za-z0-9._-]+$")
+METRIC_KEYS = ("claims_written", "warnings_emitted", "edits_without_claim")
+TABLE_FORMAT = "coord_claims_active_v0"
+TABLE_ANCHOR_BYTES = 64
+DEFAULT_TTL_S = 600
+# Malformed lines keep warning on every preflight while they are among the last this many lines.
+WARN_WINDOW_LINES = 200
+
+
+def parse_ts(value: str) -> datetime:
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        raise ValueError("timestamp must include timezone")
+    return dt.astimezone(timezone.utc)
+
+
+def format_ts(dt: datetime) -> str:
+    return dt.replace(microsecond=0).isoformat().replace("+00:00", "Z")
+
+
+def validate_actor(actor: str) -> None:
+    if not ACTOR_RE.match(actor):
+        raise SystemExit("invalid --actor (allowed: A-Za-z0-9._-)")
+
+
+def canonical_target(repo_root: Path, target_path: str) -> str:
+    if target_path.startswith("./"):
+        raise SystemExit("invalid --path: must not start with './'")
+    if target_path.startswith("/"):
+        raise SystemExit("invalid --path: must be repo-root-relative, not absolute")
+    if "\\" in target_path:
+        raise SystemExit("invalid --path: use '/' separators only")
+    norm = str(PurePosixPath(target_path))
+    if norm != target_path:
+        raise SystemExit("invalid --path: must be canonical repo-root-relative path")
+    if norm.startswith("../") or "/../" in norm or norm == "..":
+        raise SystemExit("invalid --path: must not escape repo root")
+    abs_target = (repo_root / norm).resolve()
+    if repo_root not in abs_target.parents and abs_target != repo_root:
+        raise SystemExit("invalid --path: escapes repo root")
+    if not abs_target.exists():
+        raise SystemExit("invalid --path: must match an existing repository path")
+    return norm
+
+
+def load_metrics(metrics_file: Path) -> dict[str, Any]:
+    metrics: dict[str, Any] = {k: 0 for k in METRIC_KEYS}
+    if metrics_file.exists():
+        try:
+            loaded = json.loads(metrics_file.read_text(encoding="utf-8"))
+            if isinstance(loaded, dict):
+                for k in metrics:
+                    if isinstance(loaded.get(k), int):
+                        metrics[k] = loaded[k]
+        except Exception:
+            pass
+    return metrics
+
+
+def save_metrics(metrics_file: Path, metrics: dict[str, Any], updated_at: str) -> None:
+    metrics["updated_at"] = updated_at
+    metrics_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp = metrics_file.with_name(f".{metrics_file.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(metrics, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+    os.replace(tmp, metrics_file)
+
+
+def append_claim(
+    repo_root: Path,
+    claims_file: Path,
+    metrics_file: Path,
+    target_path: str,
+    actor: str,
+    ts_override: str = "",
+    table_file: Path | None = None,
+) -> str:
+    repo_root = repo_root.resolve()
+    validate_actor(actor)
+    norm = canonical_target(repo_root, target_path)
+
+    ts_dt = parse_ts(ts_override) if ts_override else datetime.now(timezone.utc)
+    line = f"{norm} | {actor} | {format_ts(ts_dt)}"
+    claims_file.parent.mkdir(parents=True, exist_ok=True)
+    append_lines(claims_file, [line])
+    with _table_lock(table_file or default_table_file(claims_file)) as path:
+        # Fold the new line (and anything appended since the last sync) into the active-claim table.
+        table, _warnings, _stats = sync_table(path, claims_file, ts_dt, DEFAULT_TTL_S)
+        write_table(path, table)
+        # Metrics are read-modify-write; the table lock keeps concurrent claimers from losing updates.
+        metrics = load_metrics(metrics_file)
+        metrics["claims_written"] += 1
+        save_metrics(metrics_file, metrics, format_ts(datetime.now(timezone.utc)))
+    return line
+
+
+def default_table_file(claims_file: Path) -> Path:
+    """Active-claim table for a claims file: state/coord_claims_active_v0.json beside its repo's state/."""
+    return claims_file.parent / "state" / f"{claims_file.stem}_active_v0.json"
+
+
+@contextmanager
+def _table_lock(table_file: Path) -> Iterator[Path]:
+    """Serialize table updates; claim appends themselves go through the shared appender."""
+    table_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(table_file.with_name(f"{table_file.name}.lock"), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        yield table_file
+
+
+def _empty_table(claims_file: Path, retain_s: int) -> dict[str, Any]:
+    return {
+        "format": TABLE_FORMAT,
+        "claims_file": str(claims_file.resolve()),
+        "retain_s": retain_s,
+        "applied_bytes": 0,
+        "applied_lines": 0,
+        "anchor": "",
+        "pruned_through": None,
+        "claims": {},
+        "expiry_heap": [],
+        "bad_lines": [],
+    }
+
+
+def read_table(table_file: Path) -> dict[str, Any] | None:
+    try:
+        table = json.loads(table_file.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return None
+    return table if isinstance(table, dict) and table.get("format") == TABLE_FORMAT else None
+
+
+def write_table(table_file: Path, table: dict[str, Any]) -> None:
+    tmp = table_file.with_name(f".{table_file.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(table, sort_keys=True, separators=(",", ":")) + "\n", encoding="utf-8")
+    os.replace(tmp, table_file)
+
+
+def _apply_lines(table: dict[str, Any], f: Any) -> None:
+    """Fold complete claim lines from `f` (positioned at applied_bytes) into the table.
+
+    Malformed lines are recorded in bad_lines as [line number, warning] and
+    dropped once they fall out of the last WARN_WINDOW_LINES lines.
+    """
+    retain = timedelta(seconds=table["retain_s"])
+    claims: dict[str, dict[str, dict[str, str]]] = table["claims"]
+    for raw_bytes in f:
+        if not raw_bytes.endswith(b"\n"):
+            break  # append in flight: picked up on the next sync
+        table["applied_bytes"] += len(raw_bytes)
+        table["applied_lines"] += 1
+        raw = raw_bytes.decode("utf-8", errors="replace").rstrip("\n")
+        if not raw.strip():
+            continue
+        m = CLAIM_RE.match(raw.strip())
+        if not m:
+            table["bad_lines"].append([table["applied_lines"], f"malformed claim line at {table['applied_lines']}: {raw}"])
+            continue
+        p, claim_actor, ts = m.groups()
+        try:
+            claim_ts = parse_ts(ts)
+        except Exception:
+            table["bad_lines"].append([table["applied_lines"], f"invalid timestamp at {table['applied_lines']}: {raw}"])
+            continue
+        current = claims.get(p, {}).get(claim_actor)
+        if current is not None and parse_ts(current["ts"]) >= claim_ts:
+            continue
+        expires_at = format_ts(claim_ts + retain)
+        claims.setdefault(p, {})[claim_actor] = {"ts": format_ts(claim_ts), "expires_at": expires_at}
+        heapq.heappush(table["expiry_heap"], [expires_at, p, claim_actor])
+    floor = table["applied_lines"] - WARN_WINDOW_LINES
+    table["bad_lines"] = [entry for entry in table["bad_lines"] if entry[0] > floor]
+
+
+def _prune(table: dict[str, Any], now: datetime) -> None:
+    """Pop claims whose retention ran out; heap entries superseded by a later claim are skipped."""
+    heap: list[list[str]] = table["expiry_heap"]
+    now_s = format_ts(now)
+    claims = table["claims"]
+    while heap and heap[0][0] <= now_s:
+        expires_at, p, claim_actor = heapq.heappop(heap)
+        entry = claims.get(p, {}).get(claim_actor)
+        if entry is not None and entry["expires_at"] == expires_at:
+            del claims[p][claim_actor]
+            if not claims[p]:
+                del claims[p]
+    if table["pruned_through"] is None or now_s > table["pruned_through"]:
+        table["pruned_through"] = now_s
+
+
+def sync_table(table_file: Path, claims_file: Path, now: datetime, ttl_s: int) -> tuple[dict[str, Any], list[str], dict[str, Any]]:
+    """The active-claim table caught up with `claims_file`, valid for a `ttl_s` lookup at `now`.
+
+    New lines are applied from the last synced byte. The table is rebuilt from
+    the whole file instead when it is missing, belongs to another file, the file
+    was rewritten under it (shorter, or the 64 bytes before the synced offset
+    changed), the
+    lookup wants a longer TTL than the table retains, or `now` is earlier than
+    a time the table was already pruned at. The returned warnings repeat every
+    malformed line still among the last WARN_WINDOW_LINES lines.
+    """
+    table = read_table(table_file)
+    warnings: list[str] = []
+    rebuilt = False
+    claims_file.touch()
+    with claims_file.open("rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        if table is not None:
+            applied = table["applied_bytes"]
+            anchor = b""
+            if applied <= size:
+                f.seek(max(0, applied - TABLE_ANCHOR_BYTES))
+                anchor = f.read(min(applied, TABLE_ANCHOR_BYTES))
+            stale = (
+                table.get("claims_file") != str(claims_file.resolve())
+                or applied > size
+                or anchor.hex() != table["anchor"]
+                or ttl_s > table["retain_s"]
+                or "bad_lines" not in table
+                or (table["pruned_through"] is not None and format_ts(now) < table["pruned_through"])
+            )
+            if stale:
+                table = None
+        if table is None:
+            table = _empty_table(claims_file, max(ttl_s, DEFAULT_TTL_S))
+            rebuilt = True
+        f.seek(table["applied_bytes"])
+        lines_before = table["applied_lines"]
+        _apply_lines(table, f)
+        f.seek(max(0, table["applied_bytes"] - TABLE_ANCHOR_BYTES))
+        table["anchor"] = f.read(min(table["applied_bytes"], TABLE_ANCHOR_BYTES)).hex()
+    _prune(table, now)
+    # Reported on every sync, like the trailing-window scan this table replaced.
+    warnings.extend(w for _, w in table["bad_lines"])
+    return table, warnings, {"rebuilt": rebuilt, "lines_applied": table["applied_lines"] - lines_before}
+
+
+def preflight(
+    repo_root: Path,
+    claims_file: Path,
+    metrics_file: Path,
+    target_path: str,
+    actor: str,
+    ttl_s: int = DEFAULT_TTL_S,
+    mode: str = "edit",
+    now_ts: str = "",
+    table_file: Path | None = None,
+) -> tuple[dict[str, Any], list[str]]:
+    repo_root = repo_root.resolve()
+    validate_actor(actor)
+    norm = canonical_target(repo_root, target_path)
+
+    now = parse_ts(now_ts) if now_ts else datetime.now(timezone.utc)
+    claims_file.parent.mkdir(parents=True, exist_ok=True)
+    with _table_lock(table_file or default_table_file(claims_file)) as path:
+        table, warnings, stats = sync_table(path, claims_file, now, ttl_s)
+        write_table(path, table)
+
+    has_active_claim_for_actor = False
+    has_conflict = False
+    for claim_actor, entry in sorted(table["claims"].get(norm, {}).items()):
+        age = now - parse_ts(entry["ts"])
+        if age >= timedelta(seconds=ttl_s):
+            continue
+        if claim_actor == actor:
+            has_active_claim_for_actor = True
+        else:
+            has_conflict = True
+            warnings.append(
+                f"active conflicting claim on {norm}: actor={claim_actor}, age_s={int(age.total_seconds())}"
+            )
+
+    edits_without_claim = 0
+    if mode == "edit" and not has_active_claim_for_actor:
+        warnings.append(f"edit requested without active claim for {norm} by {actor}")
+        edits_without_claim = 1
+
+    with _table_lock(table_file or default_table_file(claims_file)):
+        metrics = load_metrics(metrics_file)
+        metrics["warnings_emitted"] += len(warnings)
+        metrics["edits_without_claim"] += edits_without_claim
+        save_metrics(metrics_file, metrics, format_ts(now))
+
+    out = {
+        "path": norm,
+        "actor": actor,
+        "mode": mode,
+        "claims_table": {
+            "active_paths": len(table["claims"]),
+            "lines_applied": stats["lines_applied"],
+            "rebuilt": stats["rebuilt"],
+        },
+        "has_active_claim_for_actor": has_active_claim_for_actor,
+        "conflict_detected": has_conflict,
+        "warnings_count": len(warnings),
+    }
+    return out, warnings
+
+
+def print_warnings(warnings: list[str]) -> None:
+    for w in warnings:
+        print(f"warning: {w}", file=sys.stderr)
@@ -0,0 +1,343 @@
+"""Shared, snapshot-cached loader for sessions/ and scenes/ used by the audit and KPI tools.
+
+Each file is parsed at most once per change: records are memoized in-process and
+persisted under state/cache/corpus/ keyed by (size, mtime_ns), with a sha256
+fallback so touched-but-unchanged files are not re-parsed either.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Iterable, TypeVar
+
+import sb_session_index
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+CACHE_DIR = REPO_ROOT / "state" / "cache" / "corpus"
+# Bump when record extraction changes so stale snapshots are discarded.
+RECORD_VERSION = 1
+
+V1_CONTRACT_KEYS = frozenset(
+    {
+        "artifact_id",
+        "session_date",
+        "llm_used",
+        "project_links",
+        "principle_links",
+        "pattern_links",
+        "tool_links",
+        "related_artifact_links",
+        "summary",
+        "key_decisions",
+        "open_questions",
+        "next_steps",
+        "thinking_trace_attachments",
+        "prompt_lineage",
+        "resumption_score",
+        "resumption_notes",
+    }
+)
+
+
+@dataclass(frozen=True, slots=True)
+class SessionRecord:
+    path: str
+    tool: str
+    artifact_id: str
+    date_key: str
+    index_date: str
+    resumption_score: int | None
+    summary_snippet: str
+    has_summary: bool
+    is_non_trivial: bool
+    has_v1_contract_shape: bool
+    principle_links: tuple[str, ...]
+    pattern_links: tuple[str, ...]
+    text: str
+
+    def index_record(self) -> dict[str, Any] | None:
+        """The sessions/<tool>/index.json entry; None for ids outside artifact/."""
+        if not self.artifact_id.startswith(sb_session_index.ARTIFACT_PREFIX):
+            return None
+        return {
+            "id": self.artifact_id,
+            "date": self.index_date,
+            "resumption_score": self.resumption_score,
+            "summary_snippet": self.summary_snippet,
+        }
+
+
+@dataclass(frozen=True, slots=True)
+class SceneRecord:
+    path: str
+    name: str
+    node_ids: tuple[str, ...]
+    node_labels: tuple[tuple[str, str], ...]
+    edge_endpoints: tuple[str, ...]
+    mappings: tuple[tuple[str, str], ...]
+
+    def ids_with_prefix(self, prefix: str) -> set[str]:
+        return {n for n in self.node_ids if n.startswith(prefix)}
+
+
+def _str_list(value: Any) -> list[str]:
+    return [x for x in value if isinstance(x, str)] if isinstance(value, list) else []
+
+
+def _has_text_item(value: Any) -> bool:
+    return isinstance(value, list) and any(isinstance(x, str) and x.strip() for x in value)
+
+
+def flatten_text(obj: dict[str, Any]) -> str:
+    parts: list[str] = []
+    summary = obj.get("summary")
+    if isinstance(summary, str):
+        parts.append(summary)
+    elif isinstance(summary, dict):
+        for v in summary.values():
+            if isinstance(v, str):
+                parts.append(v)
+            elif isinstance(v, list):
+                parts.extend(str(x) for x in v if isinstance(x, str))
+    for key in ("key_decisions", "open_questions", "next_steps", "resumption_notes"):
+        v = obj.get(key)
+        if isinstance(v, list):
+            parts.extend(str(x) for x in v if isinstance(x, str))
+        elif isinstance(v, str):
+            parts.append(v)
+    return "\n".join(parts)
+
+
+def artifact_date_key(obj: dict[str, Any], path: Path) -> str:
+    sd = obj.get("session_date")
+    if isinstance(sd, str) and re.match(r"^\d{4}-\d{2}-\d{2}$", sd):
+        return sd
+    m = re.search(r"(\d{4})_(\d{2})_(\d{2})", str(obj.get("artifact_id", "")))
+    if m:
+        return f"{m.group(1)}-{m.group(2)}-{m.group(3)}"
+    m2 = re.search(r"(\d{4})-(\d{2})-(\d{2})", path.name)
+    if m2:
+        return f"{m2.group(1)}-{m2.group(2)}-{m2.group(3)}"
+    return "0000-00-00"
+
+
+def session_record(obj: Any, path: Path, tool: str) -> SessionRecord | None:
+    if not isinstance(obj, dict):
+        return None
+    aid = sb_session_index.artifact_id(obj)
+    if aid is None:
+        return None
+
+    summary = obj.get("summary")
+    snippet = sb_session_index.summary_snippet(obj)
+    has_summary = bool(snippet)
+    has_decision_or_step = False
+    if isinstance(summary, dict):
+        has_decision_or_step = _has_text_item(summary.get("key_decisions"))
+    if _has_text_item(obj.get("key_decisions")) or _has_text_item(obj.get("next_steps")):
+        has_decision_or_step = True
+
+    links = obj.get("links") if isinstance(obj.get("links"), dict) else {}
+    principles = _str_list(obj.get("principle_links")) + _str_list(links.get("principles"))
+    patterns = _str_list(obj.get("pattern_links")) + _str_list(links.get("patterns_used"))
+
+    return SessionRecord(
+        path=str(path),
+        tool=tool,
+        artifact_id=aid,
+        date_key=artifact_date_key(obj, path),
+        index_date=sb_session_index.session_date(obj, aid),
+        resumption_score=sb_session_index.resumption_score(obj),
+        summary_snippet=snippet,
+        has_summary=has_summary,
+        is_non_trivial=has_summary and has_decision_or_step,
+        has_v1_contract_shape=V1_CONTRACT_KEYS.issubset(obj.keys()),
+        principle_links=tuple(principles),
+        pattern_links=tuple(patterns),
+        text=flatten_text(obj),
+    )
+
+
+def scene_record(obj: Any, path: Path) -> SceneRecord:
+    nodes = obj.get("nodes") if isinstance(obj, dict) else None
+    edges = obj.get("edges") if isinstance(obj, dict) else None
+    node_ids: list[str] = []
+    labels: list[tuple[str, str]] = []
+    mappings: list[tuple[str, str]] = []
+    if isinstance(nodes, list):
+        for n in nodes:
+            if not isinstance(n, dict):
+                continue
+            nid = n.get("id")
+            if isinstance(nid, str):
+                node_ids.append(nid)
+                if isinstance(n.get("label"), str):
+                    labels.append((nid, n["label"]))
+            mapping = n.get("mapping")
+            if isinstance(mapping, dict) and isinstance(mapping.get("from"), str) and isinstance(mapping.get("to"), str):
+                mappings.append((mapping["from"], mapping["to"]))
+    endpoints: list[str] = []
+    if isinstance(edges, list):
+        for e in edges:
+            if isinstance(e, dict):
+                endpoints.extend(v for v in (e.get("from"), e.get("to")) if isinstance(v, str))
+    return SceneRecord(
+        path=str(path),
+        name=path.name,
+        node_ids=tuple(node_ids),
+        node_labels=tuple(labels),
+        edge_endpoints=tuple(endpoints),
+        mappings=tuple(mappings),
+    )
+
+
+R = TypeVar("R")
+_MEMO: dict[str, dict[str, Any]] = {}
+
+
+def _snapshot_path(kind: str, root: Path) -> Path | None:
+    # Only trees inside this repository get an on-disk snapshot; temp dirs used by
+    # tests and benchmarks stay in-process so they never litter state/cache/.
+    try:
+        root.resolve().relative_to(REPO_ROOT)
+    except ValueError:
+        return None
+    digest = hashlib.sha1(str(root.resolve()).encode("utf-8")).hexdigest()[:16]
+    return CACHE_DIR / f"{kind}_{digest}.json"
+
+
+def _load_snapshot(path: Path | None) -> dict[str, Any]:
+    if path is None:
+        return {}
+    try:
+        value = json.loads(path.read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+    if not isinstance(value, dict) or value.get("record_version") != RECORD_VERSION:
+        return {}
+    files = value.get("files")
+    return files if isinstance(files, dict) else {}
+
+
+def _save_snapshot(path: Path | None, files: dict[str, Any]) -> None:
+    if path is None:
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps({"record_version": RECORD_VERSION, "files": files}, separators=(",", ":")), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _load_cached(
+    kind: str,
+    root: Path,
+    paths: list[tuple[Path, str]],
+    extract: Callable[[Any, Path, str], dict[str, Any] | None],
+    build: Callable[[dict[str, Any]], R],
+    groups: set[str] | None = None,
+) -> list[R]:
+    snap_path = _snapshot_path(kind, root)
+    memo_key = f"{kind}:{root.resolve()}"
+    previous = _MEMO.get(memo_key)
+    if previous is None:
+        previous = _load_snapshot(snap_path)
+
+    # When only some groups (tools) were rescanned, keep the others' entries as-is.
+    files: dict[str, Any] = {}
+    if groups is not None:
+        files = {k: v for k, v in previous.items() if v.get("group") not in groups}
+    changed = False
+    out: list[R] = []
+    for path, group in paths:
+        key = str(path)
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        prev = previous.get(key)
+        if prev is not None and prev.get("size") == st.st_size and prev.get("mtime_ns") == st.st_mtime_ns:
+            entry = prev
+        else:
+            raw = path.read_bytes()
+            digest = hashlib.sha256(raw).hexdigest()
+            if prev is not None and prev.get("sha256") == digest:
+                entry = {**prev, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+            else:
+                try:
+                    obj = json.loads(raw.decode("utf-8"))
+                except Exception:
+                    obj = None
+                    record = None
+                else:
+                    record = extract(obj, path, group)
+                entry = {"group": group, "size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest, "record": record}
+            changed = True
+        files[key] = entry
+        if entry.get("record") is not None:
+            out.append(build(entry["record"]))
+
+    if changed or set(files) != set(previous):
+        _save_snapshot(snap_path, files)
+    _MEMO[memo_key] = files
+    return out
+
+
+def _session_from_dict(d: dict[str, Any]) -> SessionRecord:
+    return SessionRecord(**{**d, "principle_links": tuple(d["principle_links"]), "pattern_links": tuple(d["pattern_links"])})
+
+
+def _scene_from_dict(d: dict[str, Any]) -> SceneRecord:
+    return SceneRecord(
+        path=d["path"],
+        name=d["name"],
+        node_ids=tuple(d["node_ids"]),
+        node_labels=tuple((a, b) for a, b in d["node_labels"]),
+        edge_endpoints=tuple(d["edge_endpoints"]),
+        mappings=tuple((a, b) for a, b in d["mappings"]),
+    )
+
+
+def session_paths(sessions_dir: Path, tools: Iterable[str] | None = None) -> list[tuple[Path, str]]:
+    if not sessions_dir.is_dir():
+        return []
+    wanted = set(tools) if tools is not None else None
+    out: list[tuple[Path, str]] = []
+    for tool_dir in sorted(p for p in sessions_dir.iterdir() if p.is_dir()):
+        if wanted is not None and tool_dir.name not in wanted:
+            continue
+        for f in sorted(tool_dir.glob("*.json")):
+            if f.name != "index.json":
+                out.append((f, tool_dir.name))
+    return out
+
+
+def load_sessions(sessions_dir: Path, tools: Iterable[str] | None = None) -> list[SessionRecord]:
+    """Session artifacts (dict JSON with a string artifact_id/id) in sorted tool/file order."""
+
+    def extract(obj: Any, path: Path, tool: str) -> dict[str, Any] | None:
+        rec = session_record(obj, path, tool)
+        return asdict(rec) if rec is not None else None
+
+    wanted = set(tools) if tools is not None else None
+    return _load_cached("sessions", sessions_dir, session_paths(sessions_dir, wanted), extract, _session_from_dict, wanted)
+
+
+def load_scenes(scenes_dir: Path) -> list[SceneRecord]:
+    """Every parseable scenes/*.scene.json file in sorted name order."""
+    paths = [(p, "") for p in sorted(scenes_dir.glob("*.scene.json"))] if scenes_dir.is_dir() else []
+    return _load_cached("scenes", scenes_dir, paths, lambda obj, path, _g: asdict(scene_record(obj, path)), _scene_from_dict)
+
+
+def canonical_ids(scenes: Iterable[SceneRecord], prefix: str) -> set[str]:
+    out: set[str] = set()
+    for scene in scenes:
+        out |= scene.ids_with_prefix(prefix)
+    return out
+
+
+def canonical_principle_ids(scenes_dir: Path = REPO_ROOT / "scenes") -> set[str]:
+    return canonical_ids(load_scenes(scenes_dir), "principle/")
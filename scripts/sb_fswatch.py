@@ -0,0 +1,238 @@
+"""Directory watcher: inotify through ctypes on Linux, stat polling everywhere else.
+
+Used by `scripts/update_index.py --watch`. Events are coarse on purpose (created,
+modified, deleted, overflow); callers re-read the affected paths rather than
+trusting event payloads, so both backends behave the same.
+"""
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import time
+from pathlib import Path
+from typing import NamedTuple
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (
+    IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+)
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class FsEvent(NamedTuple):
+    path: str
+    kind: str  # created | modified | deleted | overflow
+    is_dir: bool
+    observed: float  # time.monotonic() when the watcher saw it
+
+
+def _load_libc() -> ctypes.CDLL | None:
+    if not hasattr(os, "uname") or os.uname().sysname != "Linux":
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class FsWatcher:
+    """Watch `root` and its subdirectories down to `depth` levels (0 = root only).
+
+    Subdirectories created while watching are picked up automatically, and any
+    files already inside them are reported as created so nothing is lost to the
+    window between mkdir and the new watch being registered.
+    """
+
+    def __init__(self, root: Path, depth: int = 0, poll_interval: float = 1.0, force_poll: bool = False) -> None:
+        self.root = Path(root)
+        self.depth = depth
+        self.poll_interval = poll_interval
+        self._libc = None if force_poll else _load_libc()
+        self._fd = -1
+        self._wd_paths: dict[int, Path] = {}
+        self._snapshot: dict[Path, dict[str, tuple[bool, int, int]]] = {}
+        self._next_poll = 0.0
+        if self._libc is not None:
+            fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd < 0:
+                self._libc = None
+            else:
+                self._fd = fd
+        if self._libc is not None:
+            self._add_tree(self.root, 0, [])
+        else:
+            self._snapshot = self._scan()
+
+    @property
+    def backend(self) -> str:
+        return "inotify" if self._libc is not None else "poll"
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def __enter__(self) -> FsWatcher:
+        return self
+
+    def __exit__(self, *_exc: object) -> None:
+        self.close()
+
+    def _level(self, path: Path) -> int:
+        return len(path.relative_to(self.root).parts)
+
+    def _add_tree(self, path: Path, level: int, out: list[FsEvent], report_existing: bool = False) -> None:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err in (errno.ENOENT, errno.ENOTDIR) and path != self.root:
+                return
+            raise OSError(err, os.strerror(err), str(path))
+        self._wd_paths[wd] = path
+        now = time.monotonic()
+        try:
+            entries = sorted(os.scandir(path), key=lambda e: e.name)
+        except OSError:
+            return
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if level < self.depth:
+                    if report_existing:
+                        out.append(FsEvent(entry.path, "created", True, now))
+                    self._add_tree(Path(entry.path), level + 1, out, report_existing)
+            elif report_existing:
+                out.append(FsEvent(entry.path, "created", False, now))
+
+    def events(self, timeout: float | None = None) -> list[FsEvent]:
+        """Block up to `timeout` seconds (forever when None) for at least one event."""
+        if self._libc is not None:
+            return self._read_inotify(timeout)
+        return self._read_poll(timeout)
+
+    def _read_inotify(self, timeout: float | None) -> list[FsEvent]:
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return []
+        buf = b""
+        while True:
+            try:
+                chunk = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            if not chunk:
+                break
+            buf += chunk
+        now = time.monotonic()
+        out: list[FsEvent] = []
+        pos = 0
+        while pos + _EVENT_HEADER.size <= len(buf):
+            wd, mask, _cookie, name_len = _EVENT_HEADER.unpack_from(buf, pos)
+            pos += _EVENT_HEADER.size
+            name = buf[pos : pos + name_len].rstrip(b"\0")
+            pos += name_len
+            if mask & IN_Q_OVERFLOW:
+                out.append(FsEvent(str(self.root), "overflow", True, now))
+                continue
+            base = self._wd_paths.get(wd)
+            if base is None:
+                continue
+            if mask & IN_IGNORED:
+                self._wd_paths.pop(wd, None)
+                continue
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                out.append(FsEvent(str(base), "deleted", True, now))
+                continue
+            path = base / os.fsdecode(name)
+            is_dir = bool(mask & IN_ISDIR)
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                if is_dir:
+                    level = self._level(path)
+                    if level <= self.depth:
+                        out.append(FsEvent(str(path), "created", True, now))
+                        self._add_tree(path, level, out, report_existing=True)
+                else:
+                    out.append(FsEvent(str(path), "created", False, now))
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                out.append(FsEvent(str(path), "deleted", is_dir, now))
+            elif mask & (IN_MODIFY | IN_CLOSE_WRITE):
+                out.append(FsEvent(str(path), "modified", is_dir, now))
+        return out
+
+    def _scan(self) -> dict[Path, dict[str, tuple[bool, int, int]]]:
+        snap: dict[Path, dict[str, tuple[bool, int, int]]] = {}
+        pending = [(self.root, 0)]
+        while pending:
+            path, level = pending.pop()
+            entries: dict[str, tuple[bool, int, int]] = {}
+            try:
+                it = list(os.scandir(path))
+            except OSError:
+                continue
+            for entry in it:
+                try:
+                    st = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                is_dir = entry.is_dir(follow_symlinks=False)
+                entries[entry.name] = (is_dir, st.st_size, st.st_mtime_ns)
+                if is_dir and level < self.depth:
+                    pending.append((Path(entry.path), level + 1))
+            snap[path] = entries
+        return snap
+
+    def _read_poll(self, timeout: float | None) -> list[FsEvent]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            now = time.monotonic()
+            if now < self._next_poll:
+                wait = self._next_poll - now
+                if deadline is not None:
+                    wait = min(wait, max(0.0, deadline - now))
+                time.sleep(wait)
+                now = time.monotonic()
+            if now >= self._next_poll:
+                self._next_poll = now + self.poll_interval
+                snap = self._scan()
+                out = self._diff(self._snapshot, snap, now)
+                self._snapshot = snap
+                if out:
+                    return out
+            if deadline is not None and time.monotonic() >= deadline:
+                return []
+
+    def _diff(self, old: dict[Path, dict[str, tuple[bool, int, int]]], new: dict[Path, dict[str, tuple[bool, int, int]]], now: float) -> list[FsEvent]:
+        out: list[FsEvent] = []
+        for d in sorted(set(old) | set(new)):
+            before, after = old.get(d, {}), new.get(d, {})
+            for name in sorted(set(before) | set(after)):
+                b, a = before.get(name), after.get(name)
+                path = str(d / name)
+                if b is None:
+                    out.append(FsEvent(path, "created", a[0], now))
+                elif a is None:
+                    out.append(FsEvent(path, "deleted", b[0], now))
+                elif a != b and not a[0]:
+                    out.append(FsEvent(path, "modified", False, now))
+        return out
@@ -0,0 +1,435 @@
+"""Compact binary companion to graph/graph.json (graph/graph.bin), read through mmap.
+
+Layout (little-endian, every section 8-byte aligned, offsets derived from the
+header counts):
+
+    header        HEADER struct (magic, version, counts, source stamp)
+    str_offsets   u32[n_strings + 1]   byte offsets into str_blob
+    node_type     u32[n_nodes]         index into node_types, NONE when untyped
+    node_attr     u32[n_nodes]         string holding the node's other fields as
+                                       compact JSON; NONE for ids that only appear
+                                       as edge endpoints
+    node_types    u32[n_node_types]    string index, sorted by value
+    edge_types    u32[n_edge_types]    string index, sorted by value
+    edge_src      u32[n_edges]         edges in graph.json order (from, to, type)
+    edge_dst      u32[n_edges]
+    edge_type     u32[n_edges]         index into edge_types
+    edge_attr     u32[n_edges]         string index, NONE when (from, to, type) only
+    out_offsets   u32[n_nodes + 1]     CSR over outgoing edges
+    out_edges     u32[n_edges]         edge indexes, grouped per node by (type, dst)
+    in_offsets    u32[n_nodes + 1]     CSR over incoming edges
+    in_edges      u32[n_edges]         edge indexes, grouped per node by (type, src)
+    str_blob      utf-8 bytes
+
+Strings 0..n_nodes-1 are the node ids in sorted order, so node index == string
+index and id lookup is a bisect over the mmap. Types are interned in sorted
+order, so comparing type indexes compares the type strings.
+"""
+from __future__ import annotations
+
+import bisect
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from functools import cached_property
+from pathlib import Path
+from typing import Any, Iterator
+
+MAGIC = b"SBGRAPH\0"
+FORMAT_VERSION = 1
+NONE = 0xFFFFFFFF
+# magic, version, n_nodes, n_edges, n_strings, n_node_types, n_edge_types,
+# blob_len, source_size, source_mtime_ns, source_sha256
+HEADER = struct.Struct("<8sIIIIIIQQq32s")
+
+JsonObj = dict[str, Any]
+
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def _layout(n_nodes: int, n_edges: int, n_strings: int, n_node_types: int, n_edge_types: int) -> list[tuple[str, int]]:
+    return [
+        ("str_offsets", n_strings + 1),
+        ("node_type", n_nodes),
+        ("node_attr", n_nodes),
+        ("node_types", n_node_types),
+        ("edge_types", n_edge_types),
+        ("edge_src", n_edges),
+        ("edge_dst", n_edges),
+        ("edge_type", n_edges),
+        ("edge_attr", n_edges),
+        ("out_offsets", n_nodes + 1),
+        ("out_edges", n_edges),
+        ("in_offsets", n_nodes + 1),
+        ("in_edges", n_edges),
+    ]
+
+
+def _u32(values: list[int]) -> array:
+    arr = array("I", values)
+    if arr.itemsize != 4:
+        arr = array("L", values)
+    if sys.byteorder != "little":
+        arr.byteswap()
+    return arr
+
+
+def source_stamp(source_path: str | Path) -> tuple[int, int, bytes]:
+    st = os.stat(source_path)
+    with open(source_path, "rb") as f:
+        digest = hashlib.sha256(f.read()).digest()
+    return st.st_size, st.st_mtime_ns, digest
+
+
+def encode(graph: JsonObj, stamp: tuple[int, int, bytes] = (0, 0, b"\0" * 32)) -> bytes:
+    """Serialize a {"nodes": [...], "edges": [...]} graph; `stamp` ties it to its JSON source."""
+    attrs_by_id: dict[str, tuple[str | None, str]] = {}
+    for node in graph.get("nodes", []):
+        if not isinstance(node, dict) or not isinstance(node.get("id"), str):
+            continue
+        node_type = node.get("type") if isinstance(node.get("type"), str) else None
+        rest = {k: v for k, v in node.items() if k != "id" and not (k == "type" and node_type is not None)}
+        attrs_by_id[node["id"]] = (node_type, json.dumps(rest, ensure_ascii=False, separators=(",", ":")) if rest else "")
+
+    edges: list[tuple[str, str, str, str]] = []
+    for edge in graph.get("edges", []):
+        if not isinstance(edge, dict):
+            continue
+        a, b, t = edge.get("from"), edge.get("to"), edge.get("type")
+        if not all(isinstance(v, str) for v in (a, b, t)):
+            continue
+        rest = {k: v for k, v in edge.items() if k not in ("from", "to", "type")}
+        edges.append((a, b, t, json.dumps(rest, ensure_ascii=False, separators=(",", ":")) if rest else ""))
+
+    node_ids = sorted(set(attrs_by_id) | {e[0] for e in edges} | {e[1] for e in edges})
+    node_index = {nid: i for i, nid in enumerate(node_ids)}
+    node_type_names = sorted({t for t, _ in attrs_by_id.values() if t is not None})
+    node_type_index = {t: i for i, t in enumerate(node_type_names)}
+    edge_type_names = sorted({e[2] for e in edges})
+    edge_type_index = {t: i for i, t in enumerate(edge_type_names)}
+
+    strings: list[str] = list(node_ids)
+    interned: dict[str, int] = {s: i for i, s in enumerate(strings)}
+
+    def intern(value: str) -> int:
+        idx = interned.get(value)
+        if idx is None:
+            idx = interned[value] = len(strings)
+            strings.append(value)
+        return idx
+
+    node_type_strs = [intern(t) for t in node_type_names]
+    edge_type_strs = [intern(t) for t in edge_type_names]
+    node_type_col = [NONE] * len(node_ids)
+    node_attr_col = [NONE] * len(node_ids)
+    for nid, (node_type, attrs) in attrs_by_id.items():
+        i = node_index[nid]
+        node_type_col[i] = NONE if node_type is None else node_type_index[node_type]
+        node_attr_col[i] = intern(attrs)
+
+    edge_src = [node_index[e[0]] for e in edges]
+    edge_dst = [node_index[e[1]] for e in edges]
+    edge_type = [edge_type_index[e[2]] for e in edges]
+    edge_attr = [intern(e[3]) if e[3] else NONE for e in edges]
+
+    def csr(owner: list[int], other: list[int]) -> tuple[list[int], list[int]]:
+        order = sorted(range(len(edges)), key=lambda k: (owner[k], edge_type[k], other[k], k))
+        offsets = [0] * (len(node_ids) + 1)
+        for k in order:
+            offsets[owner[k] + 1] += 1
+        for i in range(len(node_ids)):
+            offsets[i + 1] += offsets[i]
+        return offsets, order
+
+    out_offsets, out_edges = csr(edge_src, edge_dst)
+    in_offsets, in_edges = csr(edge_dst, edge_src)
+
+    blob = bytearray()
+    str_offsets = [0]
+    for s in strings:
+        blob += s.encode("utf-8")
+        str_offsets.append(len(blob))
+
+    sections = {
+        "str_offsets": str_offsets,
+        "node_type": node_type_col,
+        "node_attr": node_attr_col,
+        "node_types": node_type_strs,
+        "edge_types": edge_type_strs,
+        "edge_src": edge_src,
+        "edge_dst": edge_dst,
+        "edge_type": edge_type,
+        "edge_attr": edge_attr,
+        "out_offsets": out_offsets,
+        "out_edges": out_edges,
+        "in_offsets": in_offsets,
+        "in_edges": in_edges,
+    }
+    size, mtime_ns, digest = stamp
+    out = bytearray(
+        HEADER.pack(
+            MAGIC,
+            FORMAT_VERSION,
+            len(node_ids),
+            len(edges),
+            len(strings),
+            len(node_type_names),
+            len(edge_type_names),
+            len(blob),
+            size,
+            mtime_ns,
+            digest,
+        )
+    )
+    for name, count in _layout(len(node_ids), len(edges), len(strings), len(node_type_names), len(edge_type_names)):
+        out += b"\0" * (_align(len(out)) - len(out))
+        values = sections[name]
+        assert len(values) == count, name
+        out += _u32(values).tobytes()
+    out += b"\0" * (_align(len(out)) - len(out))
+    out += blob
+    return bytes(out)
+
+
+def write(graph: JsonObj, bin_path: str | Path, source_path: str | Path | None = None) -> None:
+    """Atomically write `graph` to `bin_path`, stamped with `source_path` (its graph.json) when given."""
+    stamp = source_stamp(source_path) if source_path is not None else (0, 0, b"\0" * 32)
+    data = encode(graph, stamp)
+    bin_path = Path(bin_path)
+    tmp = bin_path.with_name(f".{bin_path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, bin_path)
+
+
+class GraphBinary:
+    """Read-only view over a graph.bin file. Nothing is decoded until asked for."""
+
+    def __init__(self, path: str | Path, data: bytes | None = None) -> None:
+        """Map `path`, or wrap `data` (the output of encode()) when given; `path` is then only a label."""
+        self.path = Path(path)
+        self._mm: mmap.mmap | None = None
+        if data is None:
+            with open(self.path, "rb") as f:
+                if os.fstat(f.fileno()).st_size < HEADER.size:
+                    raise ValueError(f"not a graph binary: {self.path}")
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._buf: mmap.mmap | bytes = self._mm
+        else:
+            if len(data) < HEADER.size:
+                raise ValueError(f"not a graph binary: {self.path}")
+            self._buf = data
+        size = len(self._buf)
+        (
+            magic,
+            version,
+            self.n_nodes,
+            self.n_edges,
+            self.n_strings,
+            n_node_types,
+            n_edge_types,
+            blob_len,
+            self.source_size,
+            self.source_mtime_ns,
+            self.source_sha256,
+        ) = HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            if self._mm is not None:
+                self._mm.close()
+            raise ValueError(f"not a graph binary (v{FORMAT_VERSION}): {self.path}")
+
+        view = memoryview(self._buf)
+        self._views: list[memoryview] = [view]
+        pos = HEADER.size
+        arrays: dict[str, Any] = {}
+        for name, count in _layout(self.n_nodes, self.n_edges, self.n_strings, n_node_types, n_edge_types):
+            pos = _align(pos)
+            if pos + 4 * count > size:
+                self.close()
+                raise ValueError(f"truncated graph binary: {self.path}")
+            raw = view[pos : pos + 4 * count]
+            self._views.append(raw)
+            if sys.byteorder == "little":
+                arrays[name] = raw.cast("I")
+                self._views.append(arrays[name])
+            else:
+                arr = array("I")
+                arr.frombytes(raw)
+                arr.byteswap()
+                arrays[name] = arr
+            pos += 4 * count
+        pos = _align(pos)
+        if pos + blob_len > size:
+            self.close()
+            raise ValueError(f"truncated graph binary: {self.path}")
+        self._blob_start = pos
+        self._str_offsets = arrays["str_offsets"]
+        self._node_type = arrays["node_type"]
+        self._node_attr = arrays["node_attr"]
+        self._node_types = arrays["node_types"]
+        self._edge_types = arrays["edge_types"]
+        self._edge_src = arrays["edge_src"]
+        self._edge_dst = arrays["edge_dst"]
+        self._edge_type = arrays["edge_type"]
+        self._edge_attr = arrays["edge_attr"]
+        self._out_offsets = arrays["out_offsets"]
+        self._out_edges = arrays["out_edges"]
+        self._in_offsets = arrays["in_offsets"]
+        self._in_edges = arrays["in_edges"]
+
+    # Type tables are small but decoding them on open would dominate open time.
+    @cached_property
+    def node_type_names(self) -> list[str]:
+        return [self.string(s) for s in self._node_types]
+
+    @cached_property
+    def edge_type_names(self) -> list[str]:
+        return [self.string(s) for s in self._edge_types]
+
+    @cached_property
+    def _edge_type_index(self) -> dict[str, int]:
+        return {t: i for i, t in enumerate(self.edge_type_names)}
+
+    def close(self) -> None:
+        for v in reversed(self._views):
+            v.release()
+        self._views = []
+        if self._mm is not None:
+            self._mm.close()
+
+    def __enter__(self) -> GraphBinary:
+        return self
+
+    def __exit__(self, *_exc: object) -> None:
+        self.close()
+
+    def is_fresh(self, source_path: str | Path) -> bool:
+        """True when `source_path` (graph.json) is the file this binary was built from."""
+        try:
+            st = os.stat(source_path)
+        except OSError:
+            return False
+        if st.st_size != self.source_size:
+            return False
+        if st.st_mtime_ns == self.source_mtime_ns:
+            return True
+        return source_stamp(source_path)[2] == self.source_sha256
+
+    # Strings and nodes
+
+    def _string_bytes(self, idx: int) -> bytes:
+        start = self._blob_start + self._str_offsets[idx]
+        return self._buf[start : self._blob_start + self._str_offsets[idx + 1]]
+
+    def string(self, idx: int) -> str:
+        return self._string_bytes(idx).decode("utf-8")
+
+    def index_of(self, node_id: str) -> int | None:
+        # UTF-8 byte order is code point order, so the raw bytes bisect like the str ids.
+        key = node_id.encode("utf-8")
+        i = bisect.bisect_left(range(self.n_nodes), key, key=self._string_bytes)
+        if i < self.n_nodes and self._string_bytes(i) == key:
+            return i
+        return None
+
+    def node_id(self, i: int) -> str:
+        return self.string(i)
+
+    def node_type(self, i: int) -> str | None:
+        t = self._node_type[i]
+        return None if t == NONE else self.node_type_names[t]
+
+    def has_node(self, i: int) -> bool:
+        """False for ids that only appear as an edge endpoint in graph.json."""
+        return self._node_attr[i] != NONE
+
+    def node(self, i: int) -> JsonObj | None:
+        attr = self._node_attr[i]
+        if attr == NONE:
+            return None
+        out: JsonObj = {"id": self.node_id(i)}
+        node_type = self.node_type(i)
+        if node_type is not None:
+            out["type"] = node_type
+        s = self.string(attr)
+        if s:
+            out.update(json.loads(s))
+        return out
+
+    def node_ids(self) -> Iterator[str]:
+        for i in range(self.n_nodes):
+            if self.has_node(i):
+                yield self.node_id(i)
+
+    # Edges
+
+    def edge(self, k: int) -> JsonObj:
+        out: JsonObj = {
+            "from": self.node_id(self._edge_src[k]),
+            "to": self.node_id(self._edge_dst[k]),
+            "type": self.edge_type_names[self._edge_type[k]],
+        }
+        attr = self._edge_attr[k]
+        if attr != NONE:
+            out.update(json.loads(self.string(attr)))
+        return out
+
+    def edge_endpoints(self, k: int) -> tuple[int, int, int]:
+        return self._edge_src[k], self._edge_dst[k], self._edge_type[k]
+
+    def _slice(self, i: int, outgoing: bool, edge_type: str | None) -> range | None:
+        offsets = self._out_offsets if outgoing else self._in_offsets
+        lo, hi = offsets[i], offsets[i + 1]
+        if edge_type is None:
+            return range(lo, hi)
+        t = self._edge_type_index.get(edge_type)
+        if t is None:
+            return None
+        edges, types = (self._out_edges if outgoing else self._in_edges), self._edge_type
+        a = bisect.bisect_left(range(lo, hi), t, key=lambda p: types[edges[p]])
+        b = bisect.bisect_right(range(lo, hi), t, key=lambda p: types[edges[p]])
+        return range(lo + a, lo + b)
+
+    def out_edges(self, i: int, edge_type: str | None = None) -> list[int]:
+        """Edge indexes leaving node `i`, ordered by (type, target)."""
+        span = self._slice(i, True, edge_type)
+        return [] if span is None else [self._out_edges[p] for p in span]
+
+    def in_edges(self, i: int, edge_type: str | None = None) -> list[int]:
+        """Edge indexes entering node `i`, ordered by (type, source)."""
+        span = self._slice(i, False, edge_type)
+        return [] if span is None else [self._in_edges[p] for p in span]
+
+    def successors(self, i: int, edge_type: str | None = None) -> list[int]:
+        return [self._edge_dst[k] for k in self.out_edges(i, edge_type)]
+
+    def predecessors(self, i: int, edge_type: str | None = None) -> list[int]:
+        return [self._edge_src[k] for k in self.in_edges(i, edge_type)]
+
+    def out_degree(self, i: int) -> int:
+        return self._out_offsets[i + 1] - self._out_offsets[i]
+
+    def in_degree(self, i: int) -> int:
+        return self._in_offsets[i + 1] - self._in_offsets[i]
+
+    def to_graph(self) -> JsonObj:
+        """Rebuild the {"nodes", "edges"} document (nodes and edges in graph.json order)."""
+        nodes = [n for n in (self.node(i) for i in range(self.n_nodes)) if n is not None]
+        return {"nodes": nodes, "edges": [self.edge(k) for k in range(self.n_edges)]}
+
+
+def open_fresh(bin_path: str | Path, source_path: str | Path) -> GraphBinary | None:
+    """Open `bin_path` if it exists, is readable and still matches `source_path`; otherwise None."""
+    try:
+        g = GraphBinary(bin_path)
+    except (OSError, ValueError):
+        return None
+    if not g.is_fresh(source_path):
+        g.close()
+        return None
+    return g
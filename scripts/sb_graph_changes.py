@@ -0,0 +1,258 @@
+"""Streaming diff of canonical.jsonl exports and the append-only graph change log (graph/changes_v0.jsonl).
+
+canonical.jsonl is sorted: node records by id, then edge records by
+(from, to, type). Two exports can therefore be diffed with one sorted merge
+that holds a single record from each side at a time. The previous export is
+read line by line and never loaded whole.
+
+Change log layout: each export that changes anything appends one batch of
+change records followed by its commit line. All of them share a `seq`:
+
+    {"seq": 7, "op": "add"|"remove"|"change", "kind": "node"|"edge", "key": ..., "data": {...}, "prev": {...}}
+    {"seq": 7, "op": "commit", "format": "graph_changes_v0", "ts": ..., "base_sha256": ..., "sha256": ..., "reset": false, "counts": {...}}
+
+`key` is the node id or [from, to, type]. `data` is the new record ("remove"
+carries the old one) and `prev` appears only on "change". Readers apply only
+committed batches. A consumer holding the export whose sha256 equals a batch's
+base_sha256 can apply that batch to reach its sha256. On a mismatch, or when
+`reset` is true, it reloads canonical.jsonl.
+"""
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+FORMAT = "graph_changes_v0"
+CHANGE_LOG_NAME = "changes_v0.jsonl"
+
+JsonObj = dict[str, Any]
+RecordKey = tuple[int, str, str, str]
+
+
+class UnsortedExport(ValueError):
+    pass
+
+
+def utc_now_iso() -> str:
+    return datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
+
+
+def record_key(record: JsonObj) -> RecordKey:
+    data = record.get("data")
+    data = data if isinstance(data, dict) else {}
+    if record.get("kind") == "node":
+        return (0, str(data.get("id", "")), "", "")
+    return (1, str(data.get("from", "")), str(data.get("to", "")), str(data.get("type", "")))
+
+
+def canonical_records(graph: JsonObj) -> Iterator[JsonObj]:
+    for node in graph["nodes"]:
+        yield {"kind": "node", "data": node}
+    for edge in graph["edges"]:
+        yield {"kind": "edge", "data": edge}
+
+
+def canonical_line(record: JsonObj) -> str:
+    return json.dumps(record, ensure_ascii=False) + "\n"
+
+
+def read_canonical(path: str | Path, digest: Any = None) -> Iterator[JsonObj]:
+    """Stream records from an existing export, feeding raw bytes to `digest` when given."""
+    with open(path, "rb") as f:
+        for raw in f:
+            if digest is not None:
+                digest.update(raw)
+            if not raw.strip():
+                continue
+            try:
+                record = json.loads(raw)
+            except ValueError as e:
+                raise UnsortedExport(f"unreadable canonical record in {path}: {e}") from e
+            if not isinstance(record, dict):
+                raise UnsortedExport(f"canonical record is not an object in {path}")
+            yield record
+
+
+def _checked(records: Iterable[JsonObj], label: str) -> Iterator[tuple[RecordKey, JsonObj]]:
+    prev: RecordKey | None = None
+    for record in records:
+        key = record_key(record)
+        if prev is not None and key <= prev:
+            raise UnsortedExport(f"{label} export is not in canonical order at {list(key)}")
+        prev = key
+        yield key, record
+
+
+def _change(op: str, key: RecordKey, data: JsonObj, prev: JsonObj | None = None) -> JsonObj:
+    kind = "node" if key[0] == 0 else "edge"
+    out: JsonObj = {"op": op, "kind": kind, "key": key[1] if kind == "node" else [key[1], key[2], key[3]], "data": data}
+    if prev is not None:
+        out["prev"] = prev
+    return out
+
+
+def diff_records(old: Iterable[JsonObj], new: Iterable[JsonObj]) -> Iterator[JsonObj]:
+    """Sorted-merge diff of two canonical record streams; raises UnsortedExport if either is out of order."""
+    old_it = _checked(old, "previous")
+    new_it = _checked(new, "new")
+    o = next(old_it, None)
+    n = next(new_it, None)
+    while o is not None or n is not None:
+        if n is None or (o is not None and o[0] < n[0]):
+            assert o is not None
+            yield _change("remove", o[0], o[1].get("data"))
+            o = next(old_it, None)
+        elif o is None or n[0] < o[0]:
+            yield _change("add", n[0], n[1].get("data"))
+            n = next(new_it, None)
+        else:
+            if o[1] != n[1]:
+                yield _change("change", n[0], n[1].get("data"), o[1].get("data"))
+            o = next(old_it, None)
+            n = next(new_it, None)
+
+
+def _last_seq(f: Any) -> int:
+    """Highest seq in the log's trailing lines, reading backwards from the end (0 for an empty log)."""
+    end = f.seek(0, os.SEEK_END)
+    window = 64 * 1024
+    while True:
+        start = max(0, end - window)
+        f.seek(start)
+        lines = f.read(end - start).splitlines()
+        if start > 0:
+            lines = lines[1:]  # first line may be cut by the window
+        for raw in reversed(lines):
+            try:
+                seq = json.loads(raw).get("seq")
+            except (ValueError, AttributeError):
+                continue  # torn tail from an interrupted append
+            if isinstance(seq, int):
+                return seq
+        if start == 0:
+            return 0
+        window *= 4
+
+
+def export_canonical(
+    canonical_path: str | Path,
+    graph: JsonObj,
+    change_log: str | Path | None = None,
+    apply: bool = True,
+) -> JsonObj:
+    """Diff `graph` against the export at `canonical_path` and (in apply mode) replace it, logging the batch.
+
+    The new export is written to a temp file while the diff streams, then
+    swapped in. The batch's commit line is appended only after the swap, so
+    the log never claims a state that is not on disk.
+    """
+    canonical_path = Path(canonical_path)
+    counts = {f"{kind}s_{op}": 0 for kind in ("node", "edge") for op in ("added", "removed", "changed")}
+    op_names = {"add": "added", "remove": "removed", "change": "changed"}
+
+    def run_diff(old_path: Path | None, log: Any, seq: int) -> tuple[str | None, str, Path | None]:
+        for k in counts:
+            counts[k] = 0
+        old_digest = hashlib.sha256()
+        new_digest = hashlib.sha256()
+        tmp = canonical_path.with_name(f".{canonical_path.name}.{os.getpid()}.tmp") if apply else None
+        out = open(tmp, "w", encoding="utf-8") if tmp is not None else None
+
+        def new_records() -> Iterator[JsonObj]:
+            for record in canonical_records(graph):
+                line = canonical_line(record)
+                new_digest.update(line.encode("utf-8"))
+                if out is not None:
+                    out.write(line)
+                yield record
+
+        try:
+            old = read_canonical(old_path, old_digest) if old_path is not None else iter(())
+            for change in diff_records(old, new_records()):
+                counts[f"{change['kind']}s_{op_names[change['op']]}"] += 1
+                if log is not None:
+                    log.write(json.dumps({"seq": seq, **change}, ensure_ascii=False) + "\n")
+        except BaseException:
+            if out is not None:
+                out.close()
+                assert tmp is not None
+                tmp.unlink(missing_ok=True)
+            raise
+        if out is not None:
+            out.close()
+        return (old_digest.hexdigest() if old_path is not None else None), new_digest.hexdigest(), tmp
+
+    log = None
+    seq = 0
+    if apply and change_log is not None:
+        Path(change_log).parent.mkdir(parents=True, exist_ok=True)
+        log = open(change_log, "a+", encoding="utf-8")
+        fcntl.flock(log, fcntl.LOCK_EX)
+    try:
+        if log is not None:
+            with open(change_log, "rb") as rf:
+                seq = _last_seq(rf) + 1
+                rf.seek(0, os.SEEK_END)
+                if rf.tell() > 0:
+                    rf.seek(-1, os.SEEK_END)
+                    if rf.read(1) != b"\n":
+                        log.write("\n")
+        old_path = canonical_path if canonical_path.is_file() else None
+        reset = False
+        try:
+            base_sha, new_sha, tmp = run_diff(old_path, log, seq)
+        except UnsortedExport:
+            # Hand-edited or foreign export: log a reset batch of pure adds instead.
+            # Records already written under this seq stay uncommitted and are ignored.
+            reset = True
+            seq += 1
+            _, new_sha, tmp = run_diff(None, log, seq)
+            base_sha = None
+        if tmp is not None:
+            os.replace(tmp, canonical_path)
+        changed = any(counts.values())
+        if log is not None and (changed or reset):
+            commit = {
+                "seq": seq,
+                "op": "commit",
+                "format": FORMAT,
+                "ts": utc_now_iso(),
+                "base_sha256": base_sha,
+                "sha256": new_sha,
+                "reset": reset,
+                "counts": counts,
+            }
+            log.write(json.dumps(commit) + "\n")
+            log.flush()
+            os.fsync(log.fileno())
+        return {**counts, "reset": reset, "seq": seq if log is not None and (changed or reset) else None}
+    finally:
+        if log is not None:
+            log.close()
+
+
+def read_batches(change_log: str | Path, after_seq: int = 0) -> Iterator[tuple[JsonObj, list[JsonObj]]]:
+    """Yield (commit, changes) for each committed batch with seq > after_seq, oldest first."""
+    pending: list[JsonObj] = []
+    pending_seq: int | None = None
+    with open(change_log, "r", encoding="utf-8") as f:
+        for raw in f:
+            try:
+                record = json.loads(raw)
+            except ValueError:
+                continue
+            seq = record.get("seq") if isinstance(record, dict) else None
+            if not isinstance(seq, int) or seq <= after_seq:
+                continue
+            if seq != pending_seq:
+                pending, pending_seq = [], seq
+            if record.get("op") == "commit":
+                yield record, pending
+                pending, pending_seq = [], None
+            else:
+                pending.append(record)
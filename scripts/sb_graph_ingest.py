@@ -0,0 +1,734 @@
+"""Scene -> graph ingest behind tools/sb_graph_ingest_v0.sh (operations/incorporate_scene_into_graph_v0.md).
+
+Each scene's normalized fragment (nodes and edges, pre-sorted) is cached under
+state/cache/graph_ingest/, keyed by scene path, content sha256 and
+NORMALIZER_VERSION, so unchanged scenes are neither re-parsed nor re-normalized.
+The final graph is a k-way merge of the previous export and the per-scene
+fragments that keeps the original last-wins upsert semantics and summary
+counts; output is byte-identical to a cold run. Apply mode also writes the
+mmap-able graph.bin next to graph.json (scripts/sb_graph_binary.py), and with
+--canonical-jsonl the new export is diffed against the previous one and the
+delta appended to the graph change log (scripts/sb_graph_changes.py).
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import hashlib
+import heapq
+import io
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Iterable, Iterator, cast
+
+import sb_graph_binary
+import sb_graph_changes
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_CACHE_DIR = REPO_ROOT / "state" / "cache" / "graph_ingest"
+# Bump whenever classify() or a normalize_* function changes its output.
+NORMALIZER_VERSION = 1
+# Below this many uncached scenes, process-pool startup costs more than it saves.
+PARALLEL_MIN_SCENES = 16
+
+JsonObj = dict[str, Any]
+
+
+def die(msg: str) -> None:
+    print(f"error: {msg}", file=sys.stderr)
+    raise SystemExit(1)
+
+
+def normalize_path(p: str, repo_root: str) -> str:
+    abs_path = os.path.abspath(p)
+    return os.path.relpath(abs_path, repo_root)
+
+
+def scene_stem(scene_rel: str) -> str:
+    base = os.path.basename(scene_rel)
+    if base.endswith(".scene.json"):
+        return base[: -len(".scene.json")]
+    return os.path.splitext(base)[0]
+
+
+def load_json_obj(path: str) -> dict[str, Any]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception as e:
+        die(f"invalid JSON: {path} ({e})")
+    if not isinstance(data, dict):
+        die(f"JSON top-level object required: {path}")
+    return data
+
+
+def list_scene_files(path: str) -> list[str]:
+    if os.path.isfile(path):
+        return [os.path.abspath(path)]
+    if os.path.isdir(path):
+        out: list[str] = []
+        for root, _, files in os.walk(path):
+            for name in files:
+                if name.endswith(".scene.json"):
+                    out.append(os.path.abspath(os.path.join(root, name)))
+        return sorted(out)
+    die(f"scene input is not a file or directory: {path}")
+
+
+def as_id(value: str, prefix: str) -> str:
+    if "/" in value:
+        return value
+    cleaned = value.strip().replace(" ", "_").replace("-", "_")
+    return f"{prefix}/{cleaned}"
+
+
+def normalize_graph_native(scene: dict[str, Any], _scene_rel: str) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+    nodes = scene.get("nodes")
+    edges = scene.get("edges")
+    if not isinstance(nodes, list) or not isinstance(edges, list):
+        die("graph_native scene requires nodes[] and edges[]")
+
+    out_nodes: list[dict[str, Any]] = []
+    for i, node in enumerate(nodes):
+        if not isinstance(node, dict):
+            die(f"graph_native node #{i} must be an object")
+        node_id = node.get("id")
+        if not isinstance(node_id, str) or not node_id:
+            die(f"graph_native node #{i} missing string id")
+        out_nodes.append(node)
+
+    out_edges: list[dict[str, Any]] = []
+    for i, edge in enumerate(edges):
+        if not isinstance(edge, dict):
+            die(f"graph_native edge #{i} must be an object")
+        for key in ("from", "to", "type"):
+            v = edge.get(key)
+            if not isinstance(v, str) or not v:
+                die(f"graph_native edge #{i} missing string field: {key}")
+        out_edges.append(edge)
+
+    return out_nodes, out_edges
+
+
+def normalize_phase_history(scene: dict[str, Any], scene_rel: str) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+    project_id = scene.get("project_id")
+    phase_events = scene.get("phase_events")
+    if not isinstance(project_id, str) or not project_id:
+        die(f"phase_history missing project_id: {scene_rel}")
+    if not isinstance(phase_events, list):
+        die(f"phase_history missing phase_events[]: {scene_rel}")
+
+    project_node_id = as_id(project_id, "project")
+    project_node = {
+        "id": project_node_id,
+        "type": "project",
+        "label": project_id,
+        "source_scene": scene_rel,
+    }
+
+    nodes: list[dict[str, Any]] = [project_node]
+    edges: list[dict[str, Any]] = []
+
+    for i, ev in enumerate(phase_events):
+        if not isinstance(ev, dict):
+            die(f"phase_event #{i} must be object: {scene_rel}")
+        phase = ev.get("phase")
+        entered_on = ev.get("entered_on")
+        if not isinstance(phase, str) or not phase:
+            die(f"phase_event #{i} missing phase: {scene_rel}")
+        if not isinstance(entered_on, str) or not entered_on:
+            die(f"phase_event #{i} missing entered_on: {scene_rel}")
+
+        event_id = f"phase_event/{project_id}/{entered_on}/{phase}"
+        nodes.append(
+            {
+                "id": event_id,
+                "type": "phase_event",
+                "label": f"{project_id} {phase} {entered_on}",
+                "phase": phase,
+                "entered_on": entered_on,
+                "trigger_artifact": ev.get("trigger_artifact"),
+                "confidence_score": ev.get("confidence_score"),
+                "source_scene": scene_rel,
+            }
+        )
+        edges.append({"from": project_node_id, "to": event_id, "type": "has_phase_event"})
+
+    return nodes, edges
+
+
+def normalize_custom_object(scene: dict[str, Any], scene_rel: str) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+    raw_id = scene.get("id")
+    if not isinstance(raw_id, str) or not raw_id:
+        raw_id = scene.get("artifact")
+    raw_type = scene.get("type")
+    if not isinstance(raw_id, str) or not raw_id:
+        die(f"custom_object missing id/artifact: {scene_rel}")
+    if not isinstance(raw_type, str) or not raw_type:
+        die(f"custom_object missing type: {scene_rel}")
+
+    source_id = as_id(raw_id, raw_type)
+    node = {
+        "id": source_id,
+        "type": raw_type,
+        "label": scene.get("title") if isinstance(scene.get("title"), str) else raw_id,
+        "summary": scene.get("summary"),
+        "tags": scene.get("tags") if isinstance(scene.get("tags"), list) else [],
+        "source_scene": scene_rel,
+    }
+
+    edges: list[dict[str, Any]] = []
+    rels = scene.get("relations")
+    if isinstance(rels, list):
+        for i, rel in enumerate(rels):
+            if not isinstance(rel, dict):
+                die(f"relation #{i} must be object: {scene_rel}")
+            rel_type = rel.get("type")
+            if not isinstance(rel_type, str) or not rel_type:
+                die(f"relation #{i} missing type: {scene_rel}")
+            target = rel.get("target")
+            to_value = rel.get("to")
+            if isinstance(target, str) and target:
+                to_id = as_id(target, "concept")
+                from_id = source_id
+            elif isinstance(to_value, str) and to_value:
+                from_value = rel.get("from")
+                from_id = as_id(from_value, "concept") if isinstance(from_value, str) and from_value else source_id
+                to_id = as_id(to_value, "concept")
+            else:
+                die(f"relation #{i} missing target/to: {scene_rel}")
+            edges.append({"from": from_id, "to": to_id, "type": rel_type})
+
+    return [node], edges
+
+
+def normalize_document_scene(scene: dict[str, Any], scene_rel: str) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+    raw_type = scene.get("type") if isinstance(scene.get("type"), str) and scene.get("type") else "scene_document"
+    raw_id = scene.get("id")
+    if not isinstance(raw_id, str) or not raw_id:
+        raw_id = scene.get("artifact")
+    if not isinstance(raw_id, str) or not raw_id:
+        raw_id = scene_stem(scene_rel)
+
+    meta = scene.get("meta") if isinstance(scene.get("meta"), dict) else {}
+    title = scene.get("title")
+    if not isinstance(title, str) or not title:
+        title = meta.get("name") if isinstance(meta.get("name"), str) else raw_id
+
+    summary = scene.get("summary")
+    if not isinstance(summary, str) and not isinstance(summary, dict):
+        summary = scene.get("purpose")
+    if not isinstance(summary, str) and not isinstance(summary, dict):
+        summary = meta.get("purpose")
+
+    source_id = as_id(raw_id, raw_type)
+    node = {
+        "id": source_id,
+        "type": raw_type,
+        "label": title,
+        "summary": summary,
+        "tags": scene.get("tags") if isinstance(scene.get("tags"), list) else [],
+        "source_scene": scene_rel,
+    }
+
+    edges: list[dict[str, Any]] = []
+    rels = scene.get("relations")
+    if isinstance(rels, list):
+        for i, rel in enumerate(rels):
+            if not isinstance(rel, dict):
+                die(f"relation #{i} must be object: {scene_rel}")
+            rel_type = rel.get("type")
+            if not isinstance(rel_type, str) or not rel_type:
+                die(f"relation #{i} missing type: {scene_rel}")
+            target = rel.get("target")
+            to_value = rel.get("to")
+            if isinstance(target, str) and target:
+                to_id = as_id(target, "concept")
+                from_id = source_id
+            elif isinstance(to_value, str) and to_value:
+                from_value = rel.get("from")
+                from_id = as_id(from_value, "concept") if isinstance(from_value, str) and from_value else source_id
+                to_id = as_id(to_value, "concept")
+            else:
+                die(f"relation #{i} missing target/to: {scene_rel}")
+            edges.append({"from": from_id, "to": to_id, "type": rel_type})
+
+    return [node], edges
+
+
+def classify(scene: dict[str, Any]) -> str:
+    if isinstance(scene.get("nodes"), list) and isinstance(scene.get("edges"), list):
+        return "graph_native"
+    if all(k in scene for k in ("schema_version", "project_id", "phase_events")):
+        return "phase_history"
+    if isinstance(scene.get("type"), str) and (
+        isinstance(scene.get("id"), str) or isinstance(scene.get("artifact"), str)
+    ):
+        return "custom_object"
+    return "document_scene"
+
+
+def node_sort_key(n: dict[str, Any]) -> tuple[str, str]:
+    return (str(n.get("id", "")), str(n.get("type", "")))
+
+
+def edge_sort_key(e: dict[str, Any]) -> tuple[str, str, str]:
+    return (str(e.get("from", "")), str(e.get("to", "")), str(e.get("type", "")))
+
+
+def sort_nodes(nodes: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    return sorted(nodes, key=node_sort_key)
+
+
+def sort_edges(edges: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    return sorted(edges, key=edge_sort_key)
+
+def ingest_session_indexes(indexes_root: str, repo_root: str) -> tuple[list[dict[str, Any]], list[dict[str, Any]], int]:
+    if not indexes_root:
+        return [], [], 0
+    if not os.path.isdir(indexes_root):
+        die(f"session indexes directory not found: {indexes_root}")
+
+    nodes: list[dict[str, Any]] = []
+    edges: list[dict[str, Any]] = []
+    processed = 0
+
+    for name in sorted(os.listdir(indexes_root)):
+        tool_dir = os.path.join(indexes_root, name)
+        if not os.path.isdir(tool_dir):
+            continue
+        idx_path = os.path.join(tool_dir, "index.json")
+        if not os.path.isfile(idx_path):
+            continue
+
+        try:
+            with open(idx_path, "r", encoding="utf-8") as f:
+                idx = json.load(f)
+        except Exception as e:
+            die(f"invalid session index JSON: {idx_path} ({e})")
+
+        index_node_id = f"artifact/session_index_{name}"
+        nodes.append(
+            {
+                "id": index_node_id,
+                "type": "artifact",
+                "artifact_type": "session_index",
+                "label": f"{name} session index",
+                "source_scene": normalize_path(idx_path, repo_root),
+            }
+        )
+
+        artifact_ids: list[str] = []
+        if isinstance(idx, list):
+            artifact_ids = [x for x in idx if isinstance(x, str)]
+        elif isinstance(idx, dict):
+            arts = idx.get("artifacts")
+            if isinstance(arts, list):
+                for item in arts:
+                    if isinstance(item, dict):
+                        aid = item.get("id")
+                        if isinstance(aid, str):
+                            artifact_ids.append(aid)
+                    elif isinstance(item, str):
+                        artifact_ids.append(item)
+        else:
+            die(f"session index must be list or object: {idx_path}")
+
+        for aid in artifact_ids:
+            if isinstance(aid, str) and aid.startswith("artifact/"):
+                edges.append({"from": index_node_id, "to": aid, "type": "indexes_session_artifact"})
+
+        processed += 1
+
+    return nodes, edges, processed
+
+
+def normalize_scene(scene: JsonObj, scene_rel: str) -> tuple[str, list[JsonObj], list[JsonObj]]:
+    scene_type = classify(scene)
+    if scene_type == "graph_native":
+        nodes, edges = normalize_graph_native(scene, scene_rel)
+    elif scene_type == "phase_history":
+        nodes, edges = normalize_phase_history(scene, scene_rel)
+    elif scene_type == "custom_object":
+        nodes, edges = normalize_custom_object(scene, scene_rel)
+    elif scene_type == "document_scene":
+        nodes, edges = normalize_document_scene(scene, scene_rel)
+    else:
+        die(f"unsupported scene shape: {scene_rel}")
+    return scene_type, sort_nodes(nodes), sort_edges(edges)
+
+
+def fragment_cache_path(cache_dir: Path, scene_rel: str) -> Path:
+    return cache_dir / "fragments" / f"{hashlib.sha256(scene_rel.encode('utf-8')).hexdigest()[:24]}.json"
+
+
+def lookup_fragment(scene_path: str, scene_rel: str, cache_dir: Path | None) -> tuple[JsonObj | None, bytes | None]:
+    """Return (cached fragment or None, scene bytes if they had to be read to check the sha256)."""
+    if cache_dir is None:
+        return None, None
+    cache_path = fragment_cache_path(cache_dir, scene_rel)
+    try:
+        cached = json.loads(cache_path.read_text(encoding="utf-8"))
+    except Exception:
+        return None, None
+    if not isinstance(cached, dict) or cached.get("normalizer_version") != NORMALIZER_VERSION or cached.get("scene_rel") != scene_rel:
+        return None, None
+
+    st = os.stat(scene_path)
+    if cached.get("size") == st.st_size and cached.get("mtime_ns") == st.st_mtime_ns:
+        return cached, None
+    with open(scene_path, "rb") as f:
+        raw = f.read()
+    if cached.get("sha256") == hashlib.sha256(raw).hexdigest():
+        fragment = {**cached, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+        write_fragment(cache_path, fragment)
+        return fragment, None
+    return None, raw
+
+
+def build_fragment(
+    scene_path: str, scene_rel: str, cache_dir: Path | None, raw: bytes | None = None
+) -> tuple[JsonObj, JsonObj]:
+    """Parse and normalize one scene, caching the result; returns (fragment, per-scene profile)."""
+    st = os.stat(scene_path)
+    t0 = time.perf_counter()
+    if raw is None:
+        with open(scene_path, "rb") as f:
+            raw = f.read()
+    try:
+        scene = json.loads(raw.decode("utf-8"))
+    except Exception as e:
+        die(f"invalid JSON: {scene_path} ({e})")
+    if not isinstance(scene, dict):
+        die(f"JSON top-level object required: {scene_path}")
+    t1 = time.perf_counter()
+    scene_type, nodes, edges = normalize_scene(scene, scene_rel)
+    t2 = time.perf_counter()
+    fragment = {
+        "normalizer_version": NORMALIZER_VERSION,
+        "scene_rel": scene_rel,
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "sha256": hashlib.sha256(raw).hexdigest(),
+        "scene_type": scene_type,
+        "nodes": nodes,
+        "edges": edges,
+    }
+    if cache_dir is not None:
+        write_fragment(fragment_cache_path(cache_dir, scene_rel), fragment)
+    profile = {
+        "scene": scene_rel,
+        "shape": scene_type,
+        "bytes": len(raw),
+        "parse_ms": (t1 - t0) * 1000.0,
+        "normalize_ms": (t2 - t1) * 1000.0,
+    }
+    return fragment, profile
+
+
+def _build_fragment_task(task: tuple[str, str, str | None]) -> tuple[bool, Any]:
+    """Pool entry point: die() output is captured and handed back so the parent reports errors in scene order."""
+    scene_path, scene_rel, cache_dir = task
+    err = io.StringIO()
+    try:
+        with contextlib.redirect_stderr(err):
+            return True, build_fragment(scene_path, scene_rel, None if cache_dir is None else Path(cache_dir))
+    except SystemExit:
+        return False, err.getvalue()
+
+
+def normalize_scenes(
+    scenes: list[tuple[str, str]], cache_dir: Path | None, workers: int
+) -> tuple[list[JsonObj], list[JsonObj], int]:
+    """Fragments for (scene_path, scene_rel) pairs in input order, plus profiles of the scenes normalized now.
+
+    Cache lookups happen inline. Misses fan out over a process pool when there
+    are enough of them to pay for it. At most 4 * workers scenes are in flight,
+    and results are consumed in submission order, so the merged output and the
+    first reported error match a serial run.
+    """
+    fragments: list[JsonObj | None] = [None] * len(scenes)
+    misses: list[tuple[int, bytes | None]] = []
+    for pos, (scene_path, scene_rel) in enumerate(scenes):
+        fragment, raw = lookup_fragment(scene_path, scene_rel, cache_dir)
+        if fragment is None:
+            misses.append((pos, raw))
+        else:
+            fragments[pos] = fragment
+
+    profiles: list[JsonObj] = []
+    if workers <= 1 or len(misses) < PARALLEL_MIN_SCENES:
+        for pos, raw in misses:
+            fragment, profile = build_fragment(*scenes[pos], cache_dir, raw)
+            fragments[pos] = fragment
+            profiles.append(profile)
+    else:
+        cache_arg = None if cache_dir is None else str(cache_dir)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            in_flight: deque[tuple[int, Future[tuple[bool, Any]]]] = deque()
+            todo = iter(misses)
+            while True:
+                while len(in_flight) < 4 * workers:
+                    nxt = next(todo, None)
+                    if nxt is None:
+                        break
+                    pos = nxt[0]
+                    in_flight.append((pos, pool.submit(_build_fragment_task, (*scenes[pos], cache_arg))))
+                if not in_flight:
+                    break
+                pos, future = in_flight.popleft()
+                ok, result = future.result()
+                if not ok:
+                    for _, other in in_flight:
+                        other.cancel()
+                    sys.stderr.write(result)
+                    raise SystemExit(1)
+                fragments[pos], profile = result
+                profiles.append(profile)
+    return cast(list[JsonObj], fragments), profiles, len(misses)
+
+
+def profile_summary(fragments: list[JsonObj], profiles: list[JsonObj], top: int = 5) -> JsonObj:
+    """Per-shape cost of the normalize stage and the slowest scenes normalized in this run."""
+    by_shape: dict[str, JsonObj] = {}
+    for fragment in fragments:
+        entry = by_shape.setdefault(
+            fragment["scene_type"], {"scenes": 0, "normalized": 0, "bytes": 0, "parse_ms": 0.0, "normalize_ms": 0.0, "max_ms": 0.0}
+        )
+        entry["scenes"] += 1
+    for profile in profiles:
+        entry = by_shape[profile["shape"]]
+        total = profile["parse_ms"] + profile["normalize_ms"]
+        entry["normalized"] += 1
+        entry["bytes"] += profile["bytes"]
+        entry["parse_ms"] += profile["parse_ms"]
+        entry["normalize_ms"] += profile["normalize_ms"]
+        entry["max_ms"] = max(entry["max_ms"], total)
+    for entry in by_shape.values():
+        for k in ("parse_ms", "normalize_ms", "max_ms"):
+            entry[k] = round(entry[k], 3)
+    slowest = sorted(profiles, key=lambda p: p["parse_ms"] + p["normalize_ms"], reverse=True)[:top]
+    return {
+        "by_shape": dict(sorted(by_shape.items())),
+        "slowest": [
+            {"scene": p["scene"], "shape": p["shape"], "ms": round(p["parse_ms"] + p["normalize_ms"], 3)} for p in slowest
+        ],
+    }
+
+
+def write_fragment(cache_path: Path | None, fragment: JsonObj) -> None:
+    if cache_path is None:
+        return
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = cache_path.with_name(f".{cache_path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(fragment, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+    os.replace(tmp, cache_path)
+
+
+def _keyed_nodes(stream: int, nodes: list[JsonObj]) -> Iterator[tuple[str, int, str, int, JsonObj]]:
+    for pos, node in enumerate(nodes):
+        node_id, node_type = node_sort_key(node)
+        yield node_id, stream, node_type, pos, node
+
+
+def _keyed_edges(stream: int, edges: list[JsonObj]) -> Iterator[tuple[tuple[str, str, str], int, int, JsonObj]]:
+    for pos, edge in enumerate(edges):
+        yield edge_sort_key(edge), stream, pos, edge
+
+
+def merge_nodes(base: list[JsonObj], fragments: Iterable[list[JsonObj]]) -> tuple[list[JsonObj], int, int]:
+    """K-way merge of the previous graph's nodes (stream 0) with pre-sorted per-scene fragments.
+
+    Ordering by (id, stream, type, position) replays exactly the sequence of
+    upserts a scene-by-scene loop would perform for each id, so the last write
+    wins and added/updated counts come out the same.
+    """
+    streams = [_keyed_nodes(0, base)] + [_keyed_nodes(i, frag) for i, frag in enumerate(fragments, start=1)]
+    out: list[JsonObj] = []
+    added = updated = 0
+    current: JsonObj | None = None
+    current_id: str | None = None
+    for node_id, stream, _type, _pos, node in heapq.merge(*streams):
+        if node_id != current_id:
+            if current is not None:
+                out.append(current)
+            current_id, current = node_id, None
+        if stream > 0:
+            if current is None:
+                added += 1
+            elif current != node:
+                updated += 1
+        current = node
+    if current is not None:
+        out.append(current)
+    return out, added, updated
+
+
+def merge_edges(base: list[JsonObj], fragments: Iterable[list[JsonObj]]) -> tuple[list[JsonObj], int, int]:
+    streams = [_keyed_edges(0, base)] + [_keyed_edges(i, frag) for i, frag in enumerate(fragments, start=1)]
+    out: list[JsonObj] = []
+    added = deduped = 0
+    current: JsonObj | None = None
+    current_key: tuple[str, str, str] | None = None
+    for key, stream, _pos, edge in heapq.merge(*streams):
+        if key != current_key:
+            if current is not None:
+                out.append(current)
+            current_key, current = key, None
+        if stream > 0:
+            if current is None:
+                added += 1
+            else:
+                deduped += 1
+        current = edge
+    if current is not None:
+        out.append(current)
+    return out, added, deduped
+
+
+def base_graph(graph: JsonObj) -> tuple[list[JsonObj], list[JsonObj]]:
+    node_map: dict[str, JsonObj] = {}
+    for node in graph["nodes"]:
+        if isinstance(node, dict) and isinstance(node.get("id"), str) and node["id"]:
+            node_map[node["id"]] = node
+    edge_map: dict[tuple[str, str, str], JsonObj] = {}
+    for edge in graph["edges"]:
+        if not isinstance(edge, dict):
+            continue
+        a, b, c = edge.get("from"), edge.get("to"), edge.get("type")
+        if all(isinstance(v, str) and v for v in (a, b, c)):
+            edge_map[(a, b, c)] = edge
+    return sort_nodes(list(node_map.values())), sort_edges(list(edge_map.values()))
+
+
+def binary_path(graph_path: str) -> str:
+    """graph/graph.json -> graph/graph.bin (see scripts/sb_graph_binary.py)."""
+    return os.path.splitext(graph_path)[0] + ".bin"
+
+
+def run(
+    repo_root: str,
+    scene_input: str,
+    graph_path: str,
+    mode: str,
+    canonical_jsonl: str = "",
+    indexes_dir: str = "",
+    cache_dir: Path | None = DEFAULT_CACHE_DIR,
+    change_log: str = "",
+    workers: int = 1,
+) -> JsonObj:
+    timings: dict[str, float] = {}
+    t = time.perf_counter()
+
+    def lap(phase: str) -> None:
+        nonlocal t
+        now = time.perf_counter()
+        timings[phase] = round((now - t) * 1000.0, 3)
+        t = now
+
+    if os.path.exists(graph_path):
+        graph = load_json_obj(graph_path)
+        if not isinstance(graph.get("nodes"), list) or not isinstance(graph.get("edges"), list):
+            die(f"graph file must contain nodes[] and edges[]: {graph_path}")
+    else:
+        graph = {"nodes": [], "edges": []}
+    base_nodes, base_edges = base_graph(graph)
+    lap("load_graph_ms")
+
+    scene_files = list_scene_files(scene_input)
+    if not scene_files:
+        die(f"no .scene.json files found: {scene_input}")
+    scene_files = sorted(scene_files, key=lambda p: normalize_path(p, repo_root))
+    lap("discover_ms")
+
+    scenes = [(scene_path, normalize_path(scene_path, repo_root)) for scene_path in scene_files]
+    fragments, profiles, normalized = normalize_scenes(scenes, cache_dir, workers)
+    idx_nodes, idx_edges, indexes_processed = ingest_session_indexes(indexes_dir, repo_root)
+    lap("normalize_ms")
+
+    node_streams = [f["nodes"] for f in fragments] + [sort_nodes(idx_nodes)]
+    edge_streams = [f["edges"] for f in fragments] + [sort_edges(idx_edges)]
+    final_nodes, nodes_added, nodes_updated = merge_nodes(base_nodes, node_streams)
+    final_edges, edges_added, edges_deduped = merge_edges(base_edges, edge_streams)
+    final_graph = {"nodes": final_nodes, "edges": final_edges}
+    lap("merge_ms")
+
+    if mode == "apply":
+        with open(graph_path, "w", encoding="utf-8") as f:
+            json.dump(final_graph, f, indent=2)
+            f.write("\n")
+        sb_graph_binary.write(final_graph, binary_path(graph_path), source_path=graph_path)
+    graph_changes = None
+    if canonical_jsonl:
+        log_path = change_log or os.path.join(os.path.dirname(os.path.abspath(canonical_jsonl)), sb_graph_changes.CHANGE_LOG_NAME)
+        graph_changes = sb_graph_changes.export_canonical(
+            canonical_jsonl, final_graph, change_log=log_path, apply=mode == "apply"
+        )
+    lap("write_ms")
+
+    summary: JsonObj = {
+        "mode": mode,
+        "graph_path": normalize_path(graph_path, repo_root),
+        "scenes_processed": len(scene_files),
+        "nodes_added": nodes_added,
+        "nodes_updated": nodes_updated,
+        "edges_added": edges_added,
+        "edges_deduped": edges_deduped,
+        "session_indexes_processed": indexes_processed,
+        "scenes_normalized": normalized,
+        "scenes_from_cache": len(scene_files) - normalized,
+        "timings_ms": timings,
+        "workers": workers,
+        "normalize_profile": profile_summary(fragments, profiles),
+    }
+    if graph_changes is not None:
+        summary["graph_changes"] = graph_changes
+    return summary
+
+
+def main(argv: list[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(description="Ingest scenes into graph/graph.json (see tools/sb_graph_ingest_v0.sh)")
+    ap.add_argument("--repo-root", default=str(REPO_ROOT))
+    ap.add_argument("--scene", required=True, help="Scene file or directory")
+    ap.add_argument("--graph", required=True, help="Graph JSON path")
+    ap.add_argument("--mode", choices=("apply", "dry_run"), default="dry_run")
+    ap.add_argument("--canonical-jsonl", default="", help="Canonical JSONL export path (written in apply mode; diffed in both)")
+    ap.add_argument(
+        "--change-log",
+        default="",
+        help=f"Change log appended in apply mode (default: {sb_graph_changes.CHANGE_LOG_NAME} next to --canonical-jsonl)",
+    )
+    ap.add_argument("--include-session-indexes", default="", help="Sessions directory whose index.json files are ingested")
+    ap.add_argument("--cache-dir", default=str(DEFAULT_CACHE_DIR), help="Per-scene fragment cache directory")
+    ap.add_argument("--no-cache", action="store_true", help="Normalize every scene and leave the cache untouched")
+    ap.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help=f"Processes for normalizing uncached scenes (default: CPU count; runs inline below {PARALLEL_MIN_SCENES} scenes)",
+    )
+    args = ap.parse_args(argv)
+    if args.workers < 1:
+        die("--workers must be >= 1")
+
+    summary = run(
+        args.repo_root,
+        args.scene,
+        args.graph,
+        args.mode,
+        canonical_jsonl=args.canonical_jsonl,
+        indexes_dir=args.include_session_indexes,
+        cache_dir=None if args.no_cache else Path(args.cache_dir),
+        change_log=args.change_log,
+        workers=args.workers,
+    )
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
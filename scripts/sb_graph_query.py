@@ -0,0 +1,217 @@
+"""Graph queries (neighbors, k-hop, shortest path, induced subgraph) for `sb graph` and the KPI tools.
+
+GraphIndex wraps sb_graph_binary.GraphBinary. It maps graph/graph.bin when the
+ingest's stamp still matches graph.json. Otherwise it encodes graph.json once, in
+memory. Either way the adjacency is CSR grouped by edge type, and every query
+walks integer arrays. Queries are generators, so callers can stop early.
+Loaded indexes are memoized per graph file (reused across queries inside
+`sb serve`).
+"""
+from __future__ import annotations
+
+import json
+import os
+from collections import deque
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+import sb_graph_binary
+
+DIRECTIONS = ("out", "in", "both")
+
+JsonObj = dict[str, Any]
+
+_LOADED: dict[str, tuple[tuple[int, int], GraphIndex]] = {}
+
+
+class GraphIndex:
+    def __init__(self, graph: sb_graph_binary.GraphBinary, backend: str) -> None:
+        self.graph = graph
+        self.backend = backend  # "binary" (mapped graph.bin) or "json" (encoded in memory)
+        self._node_count: int | None = None
+
+    def __len__(self) -> int:
+        if self._node_count is None:
+            self._node_count = sum(1 for i in range(self.graph.n_nodes) if self.graph.has_node(i))
+        return self._node_count
+
+    @property
+    def edge_count(self) -> int:
+        return self.graph.n_edges
+
+    def index_of(self, node_id: str) -> int | None:
+        return self.graph.index_of(node_id)
+
+    def node(self, node_id: str) -> JsonObj | None:
+        i = self.graph.index_of(node_id)
+        return None if i is None else self.graph.node(i)
+
+    def node_ids(self) -> Iterator[str]:
+        return self.graph.node_ids()
+
+    def degree(self, node_id: str) -> int:
+        i = self.graph.index_of(node_id)
+        return 0 if i is None else self.graph.out_degree(i) + self.graph.in_degree(i)
+
+    def _expand(self, i: int, direction: str, edge_types: Iterable[str] | None) -> Iterator[tuple[int, int, str]]:
+        """Yield (neighbor, edge index, "out"|"in") for node `i`."""
+        g = self.graph
+        types: Iterable[str | None] = edge_types or (None,)
+        if direction in ("out", "both"):
+            for t in types:
+                for k in g.out_edges(i, t):
+                    yield g.edge_endpoints(k)[1], k, "out"
+        if direction in ("in", "both"):
+            for t in types:
+                for k in g.in_edges(i, t):
+                    yield g.edge_endpoints(k)[0], k, "in"
+
+    def _type_ok(self, i: int, node_types: set[str] | None) -> bool:
+        return node_types is None or self.graph.node_type(i) in node_types
+
+    def _resolve(self, node_ids: Iterable[str]) -> list[int]:
+        out: list[int] = []
+        for node_id in node_ids:
+            i = self.graph.index_of(node_id)
+            if i is None:
+                raise KeyError(node_id)
+            out.append(i)
+        return out
+
+    def neighbors(
+        self,
+        node_id: str,
+        direction: str = "out",
+        edge_types: list[str] | None = None,
+        node_types: set[str] | None = None,
+    ) -> Iterator[JsonObj]:
+        """One record per incident edge: the neighbor id and type plus the edge itself."""
+        (i,) = self._resolve([node_id])
+        g = self.graph
+        for j, k, side in self._expand(i, direction, edge_types):
+            if not self._type_ok(j, node_types):
+                continue
+            yield {"id": g.node_id(j), "type": g.node_type(j), "direction": side, "edge": g.edge(k)}
+
+    def _bfs(
+        self,
+        seeds: list[int],
+        depth: int | None,
+        direction: str,
+        edge_types: list[str] | None,
+        node_types: set[str] | None,
+    ) -> Iterator[tuple[int, int, int | None, int | None]]:
+        """Yield (node, depth, parent, edge) in BFS order; nodes failing `node_types` are not entered."""
+        seen = set(seeds)
+        queue: deque[tuple[int, int]] = deque()
+        for i in seeds:
+            yield i, 0, None, None
+            queue.append((i, 0))
+        while queue:
+            i, d = queue.popleft()
+            if depth is not None and d >= depth:
+                continue
+            for j, k, _side in self._expand(i, direction, edge_types):
+                if j in seen or not self._type_ok(j, node_types):
+                    continue
+                seen.add(j)
+                yield j, d + 1, i, k
+                queue.append((j, d + 1))
+
+    def k_hop(
+        self,
+        seeds: list[str],
+        depth: int | None,
+        direction: str = "out",
+        edge_types: list[str] | None = None,
+        node_types: set[str] | None = None,
+    ) -> Iterator[JsonObj]:
+        """Nodes within `depth` hops of any seed (unbounded when None), nearest first."""
+        g = self.graph
+        for j, d, parent, k in self._bfs(self._resolve(seeds), depth, direction, edge_types, node_types):
+            yield {
+                "id": g.node_id(j),
+                "type": g.node_type(j),
+                "depth": d,
+                "via": None if parent is None else g.node_id(parent),
+                "edge_type": None if k is None else g.edge_type_names[g.edge_endpoints(k)[2]],
+            }
+
+    def reachable_count(self, seed: str, direction: str = "out", edge_types: list[str] | None = None) -> int:
+        return sum(1 for _ in self._bfs(self._resolve([seed]), None, direction, edge_types, None))
+
+    def shortest_path(
+        self,
+        source: str,
+        target: str,
+        direction: str = "out",
+        edge_types: list[str] | None = None,
+        node_types: set[str] | None = None,
+        max_depth: int | None = None,
+    ) -> list[JsonObj] | None:
+        """Fewest-hop path as [{id, type, edge}] (edge is None on the first step), or None."""
+        src, dst = self._resolve([source, target])
+        g = self.graph
+        parents: dict[int, tuple[int | None, int | None]] = {}
+        for j, _d, parent, k in self._bfs([src], max_depth, direction, edge_types, node_types):
+            parents[j] = (parent, k)
+            if j == dst:
+                break
+        if dst not in parents:
+            return None
+        steps: list[JsonObj] = []
+        cur: int | None = dst
+        while cur is not None:
+            parent, k = parents[cur]
+            steps.append({"id": g.node_id(cur), "type": g.node_type(cur), "edge": None if k is None else g.edge(k)})
+            cur = parent
+        steps.reverse()
+        return steps
+
+    def subgraph(
+        self,
+        node_ids: Iterable[str],
+        edge_types: list[str] | None = None,
+    ) -> Iterator[JsonObj]:
+        """Induced subgraph in canonical.jsonl shape: node records (id order), then edge records (graph order)."""
+        members = sorted(set(self._resolve(node_ids)))
+        member_set = set(members)
+        g = self.graph
+        edge_ids: list[int] = []
+        for i in members:
+            node = g.node(i)
+            if node is not None:
+                yield {"kind": "node", "data": node}
+            for t in edge_types or (None,):
+                edge_ids.extend(k for k in g.out_edges(i, t) if g.edge_endpoints(k)[1] in member_set)
+        for k in sorted(edge_ids):
+            yield {"kind": "edge", "data": g.edge(k)}
+
+
+def binary_path(graph_file: Path) -> Path:
+    return graph_file.with_suffix(".bin")
+
+
+def load(graph_file: Path, bin_file: Path | None = None) -> GraphIndex:
+    """Index for `graph_file`, preferring its graph.bin when fresh; raises OSError/ValueError on bad input."""
+    graph_file = Path(graph_file)
+    st = os.stat(graph_file)
+    signature = (st.st_size, st.st_mtime_ns)
+    key = str(graph_file.resolve())
+    cached = _LOADED.get(key)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    graph = sb_graph_binary.open_fresh(bin_file or binary_path(graph_file), graph_file)
+    if graph is not None:
+        index = GraphIndex(graph, "binary")
+    else:
+        value = json.loads(graph_file.read_text(encoding="utf-8"))
+        if not isinstance(value, dict) or not isinstance(value.get("nodes"), list) or not isinstance(value.get("edges"), list):
+            raise ValueError(f"graph file must contain nodes[] and edges[]: {graph_file}")
+        data = sb_graph_binary.encode(value)
+        index = GraphIndex(sb_graph_binary.GraphBinary(graph_file, data=data), "json")
+    if cached is not None:
+        cached[1].graph.close()
+    _LOADED[key] = (signature, index)
+    return index
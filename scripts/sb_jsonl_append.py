@@ -0,0 +1,203 @@
+"""Shared appender for line-oriented logs (ledger, alerts, mailbox, checkpoint index, coord_claims.md).
+
+A writer that finds the log's `flock` free appends directly. One that finds it
+held drops its lines into a spool directory next to the log and waits for the
+lock. Whoever holds the lock next becomes the leader: it moves every spooled
+batch into the log with one write and one fsync. Writers that queued behind
+it find their batch already committed and return without doing any I/O of
+their own, so N concurrent appends cost one fsync instead of N.
+
+Lines are never interleaved or torn. A last line without its newline, left
+by a writer outside this module, is checked before the next append: in a
+JSONL log a tail that is not a JSON object is a torn write and is moved to
+`<log>.torn`. Any other tail, and every tail of a non-JSONL log such as
+coord_claims.md, is a complete record and just gets its newline.
+"""
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import itertools
+import json
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, BinaryIO, Iterable
+
+SPOOL_SUFFIX = ".spool"
+TORN_SUFFIX = ".torn"
+JSONL_SUFFIXES = {".jsonl", ".ndjson"}
+LOCK_NAME = ".lock"
+INFLIGHT_NAME = ".inflight"
+RECORD_SUFFIX = ".rec"
+SPOOL_POLL_MIN_S = 0.0001
+SPOOL_POLL_MAX_S = 0.002
+
+_seq = itertools.count()
+
+
+def spool_dir(path: Path) -> Path:
+    return path.with_name(f".{path.name}{SPOOL_SUFFIX}")
+
+
+def torn_path(path: Path) -> Path:
+    return path.with_name(path.name + TORN_SUFFIX)
+
+
+def encode_record(record: dict[str, Any]) -> str:
+    return json.dumps(record, separators=(",", ":"))
+
+
+def _spool(spool: Path, data: bytes) -> Path:
+    """Publish one caller's lines as a spool entry; the rename makes it visible to a leader only when complete."""
+    name = f"{time.time_ns():020d}-{os.getpid()}-{next(_seq)}"
+    tmp = spool / f".{name}.tmp"
+    tmp.write_bytes(data)
+    entry = spool / f"{name}{RECORD_SUFFIX}"
+    os.replace(tmp, entry)
+    return entry
+
+
+def _complete_record(path: Path, tail: bytes) -> bool:
+    if path.suffix not in JSONL_SUFFIXES:
+        return True
+    try:
+        return isinstance(json.loads(tail), dict)
+    except ValueError:
+        return False
+
+
+def _trim_torn_tail(path: Path, f: BinaryIO) -> int:
+    """Terminate or set aside the bytes after the last newline of the log open as `f`; returns how many were moved.
+
+    A complete record gets its missing newline; a torn one goes to the .torn sidecar.
+    """
+    size = f.seek(0, os.SEEK_END)
+    if size == 0:
+        return 0
+    f.seek(size - 1)
+    if f.read(1) == b"\n":
+        return 0
+    pos = size
+    while pos > 0:
+        step = min(pos, 1 << 16)
+        f.seek(pos - step)
+        chunk = f.read(step)
+        nl = chunk.rfind(b"\n")
+        if nl >= 0:
+            pos = pos - step + nl + 1
+            break
+        pos -= step
+    f.seek(pos)
+    tail = f.read()
+    if _complete_record(path, tail):
+        f.write(b"\n")
+        return 0
+    stamp = datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
+    with torn_path(path).open("ab") as t:
+        t.write(f"# {stamp} torn tail at byte {pos} of {path.name}\n".encode("utf-8") + tail + b"\n")
+    f.truncate(pos)
+    return len(tail)
+
+
+def _recover_inflight(path: Path, spool: Path) -> None:
+    """Finish or roll back a batch whose leader died between starting its write and cleaning the spool."""
+    inflight = spool / INFLIGHT_NAME
+    try:
+        state = json.loads(inflight.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return
+    except ValueError:
+        inflight.unlink()  # died while writing the marker, before touching the log
+        return
+    start, length = state["start_size"], state["length"]
+    landed = False
+    try:
+        with path.open("r+b") as f:
+            f.seek(start)
+            landed = hashlib.sha256(f.read(length)).hexdigest() == state["sha256"] and f.tell() == start + length
+            if not landed:
+                f.truncate(start)  # partial batch: its spool entries are still there and go out with the next one
+    except FileNotFoundError:
+        pass
+    if landed:
+        for n in state["entries"]:
+            (spool / n).unlink(missing_ok=True)
+    inflight.unlink()
+
+
+def _wait_turn(lock: Any, entry: Path) -> bool:
+    """Wait until we hold the lock (True) or a leader has committed `entry` (False), whichever comes first.
+
+    Polling rather than a blocking flock lets a follower return the moment its
+    batch lands instead of queueing for the lock behind later leaders.
+    """
+    delay = SPOOL_POLL_MIN_S
+    while True:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return entry.exists()
+        except BlockingIOError:
+            pass
+        if not entry.exists():
+            return False
+        time.sleep(delay)
+        delay = min(delay * 2, SPOOL_POLL_MAX_S)
+
+
+def append_lines(path: Path, lines: Iterable[str], fsync: bool = True) -> dict[str, Any]:
+    """Append `lines` (without newlines) to `path` as one contiguous block, group-committed with concurrent writers.
+
+    Returns {"leader", "batch_entries", "batch_bytes", "torn_bytes"}: whether
+    this call performed the write, and how large that write was.
+    """
+    data = b"".join(line.rstrip("\n").encode("utf-8") + b"\n" for line in lines)
+    out: dict[str, Any] = {"leader": False, "batch_entries": 0, "batch_bytes": 0, "torn_bytes": 0}
+    if not data:
+        return out
+    spool = spool_dir(path)
+    try:
+        lock = open(spool / LOCK_NAME, "a")
+    except FileNotFoundError:
+        spool.mkdir(parents=True, exist_ok=True)
+        lock = open(spool / LOCK_NAME, "a")
+    with lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            mine, own = None, data  # uncontended: write our lines directly, no spool entry
+        except BlockingIOError:
+            mine, own = _spool(spool, data), b""
+            if not _wait_turn(lock, mine):
+                return out  # a leader committed it while we waited
+        names = os.listdir(spool)
+        if INFLIGHT_NAME in names:
+            _recover_inflight(path, spool)
+            if mine is not None and not mine.exists():
+                return out  # recovery found it already written
+            names = os.listdir(spool)
+        entries = sorted(n for n in names if n.endswith(RECORD_SUFFIX))
+        batch = b"".join((spool / n).read_bytes() for n in entries) + own
+        with path.open("a+b") as f:
+            out["torn_bytes"] = _trim_torn_tail(path, f)
+            # truncate() leaves the position at the old end; the marker must record where the write really lands.
+            start = f.seek(0, os.SEEK_END)
+            if entries:
+                # Spool entries go only after the write; the marker tells the next leader how far this one got.
+                marker = {"start_size": start, "length": len(batch), "sha256": hashlib.sha256(batch).hexdigest(), "entries": entries}
+                (spool / INFLIGHT_NAME).write_text(json.dumps(marker), encoding="utf-8")
+            f.write(batch)
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+        if entries:
+            for n in entries:
+                (spool / n).unlink()
+            (spool / INFLIGHT_NAME).unlink()
+    out.update(leader=True, batch_entries=len(entries) + (1 if own else 0), batch_bytes=len(batch))
+    return out
+
+
+def append_records(path: Path, records: Iterable[dict[str, Any]], fsync: bool = True) -> dict[str, Any]:
+    """append_lines() for JSON objects, one compact JSON document per line."""
+    return append_lines(path, (encode_record(r) for r in records), fsync=fsync)
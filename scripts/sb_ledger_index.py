@@ -0,0 +1,390 @@
+"""Sidecar index over scene/ledger/mutations_v0.jsonl, used by `sb ledger`.
+
+The index under state/cache/ledger_v0/ maps three keys to the byte offsets of
+matching ledger lines:
+
+- target_path
+- agent_id
+- day (the YYYY-MM-DD prefix of `timestamp`)
+
+A query reads the offsets and seeks straight to those lines instead of
+scanning the whole ledger.
+
+The ledger is append-only, so the index is a list of immutable segments,
+each covering one byte range. Every query first catches up with whatever
+was appended since the last one, writing the new lines as a small delta
+segment. Deltas merge once more than MAX_DELTA_SEGMENTS pile up.
+
+A segment is two files:
+- seg_N.json holds, per key kind, the sorted keys with the [start, count]
+  of each key's run of offsets.
+- seg_N.bin holds those runs as packed little-endian u64 offsets.
+
+Sorted keys make a path-prefix or day-range query a bisect plus a
+contiguous slice. If the ledger shrinks or its head changes, it was
+rewritten, and the index is rebuilt.
+
+Queries take no lock. A merge or rebuild deletes the segments it replaced
+right after committing the new manifest, so a query that read the old
+manifest can find its segments gone. It then retries against the current
+manifest. The generation counter rises on every commit, rebuilds included,
+which is how a query tells a superseded manifest from a corrupt index.
+"""
+from __future__ import annotations
+
+import bisect
+import fcntl
+import hashlib
+import json
+import os
+import sys
+from array import array
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+INDEX_VERSION = 1
+KEY_KINDS = ("target_path", "agent_id", "day")
+MAX_DELTA_SEGMENTS = 8
+HEAD_BYTES = 4096
+READ_CHUNK = 1 << 20
+
+# key kind -> (sorted keys, [start, count] per key)
+SegmentDir = dict[str, tuple[list[str], list[list[int]]]]
+
+
+def _read_json(path: Path, default: Any) -> Any:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return default
+
+
+def _write_json_atomic(path: Path, data: Any) -> None:
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(data, separators=(",", ":")), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _head_digest(ledger: Path, covered: int) -> str:
+    with ledger.open("rb") as f:
+        return hashlib.sha256(f.read(min(covered, HEAD_BYTES))).hexdigest()
+
+
+def row_keys(row: dict[str, Any]) -> dict[str, str]:
+    """The index keys of one ledger row; kinds whose field is missing or not a string are left out."""
+    keys: dict[str, str] = {}
+    for kind, field in (("target_path", "target_path"), ("agent_id", "agent_id")):
+        value = row.get(field)
+        if isinstance(value, str):
+            keys[kind] = value
+    ts = row.get("timestamp")
+    if isinstance(ts, str) and len(ts) >= 10:
+        keys["day"] = ts[:10]
+    return keys
+
+
+def scan_ledger(ledger: Path, start: int) -> tuple[dict[str, dict[str, list[int]]], int, int, int]:
+    """Postings (kind -> key -> offsets) for complete lines from byte `start`; returns (postings, end, lines, skipped)."""
+    postings: dict[str, dict[str, list[int]]] = {kind: defaultdict(list) for kind in KEY_KINDS}
+    lines = skipped = 0
+    pos = start
+    with ledger.open("rb") as f:
+        f.seek(start)
+        pending = b""
+        while True:
+            chunk = f.read(READ_CHUNK)
+            if not chunk:
+                break
+            buf = pending + chunk
+            last_nl = buf.rfind(b"\n")
+            if last_nl < 0:
+                pending = buf
+                continue
+            pending = buf[last_nl + 1 :]
+            for raw in buf[: last_nl + 1].splitlines(keepends=True):
+                offset, pos = pos, pos + len(raw)
+                if not raw.strip():
+                    continue
+                try:
+                    row = json.loads(raw)
+                except ValueError:
+                    skipped += 1
+                    continue
+                if not isinstance(row, dict):
+                    skipped += 1
+                    continue
+                lines += 1
+                for kind, key in row_keys(row).items():
+                    postings[kind][key].append(offset)
+    # A trailing partial line stays unindexed until its writer finishes it.
+    return postings, pos, lines, skipped
+
+
+class LedgerIndex:
+    def __init__(self, index_dir: Path, ledger: Path) -> None:
+        self.index_dir = index_dir
+        self.ledger = ledger
+        self._dir_cache: dict[str, SegmentDir] = {}
+
+    # -- on-disk state -------------------------------------------------
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.index_dir / "manifest.json"
+
+    def load_manifest(self) -> dict[str, Any] | None:
+        manifest = _read_json(self.manifest_path, None)
+        if not isinstance(manifest, dict) or manifest.get("index_version") != INDEX_VERSION:
+            return None
+        if manifest.get("ledger") != str(self.ledger):
+            return None
+        return manifest
+
+    def _lock(self) -> Any:
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        fh = (self.index_dir / "lock").open("a")
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        return fh
+
+    def _write_segment(self, name: str, postings: dict[str, dict[str, list[int]]]) -> None:
+        directory: dict[str, Any] = {}
+        offsets = array("Q")
+        for kind in KEY_KINDS:
+            keys = sorted(postings.get(kind, {}))
+            runs: list[list[int]] = []
+            for key in keys:
+                run = postings[kind][key]
+                runs.append([len(offsets), len(run)])
+                offsets.extend(run)
+            directory[kind] = {"keys": keys, "runs": runs}
+        if offsets.itemsize != 8:
+            raise RuntimeError("array('Q') is not 64-bit on this platform")
+        if sys.byteorder != "little":
+            offsets.byteswap()
+        (self.index_dir / f"{name}.bin").write_bytes(offsets.tobytes())
+        _write_json_atomic(self.index_dir / f"{name}.json", directory)
+
+    def _segment_dir(self, name: str) -> SegmentDir:
+        cached = self._dir_cache.get(name)
+        if cached is None:
+            raw = _read_json(self.index_dir / f"{name}.json", None)
+            if not isinstance(raw, dict):
+                raise FileNotFoundError(self.index_dir / f"{name}.json")
+            cached = {kind: (raw[kind]["keys"], raw[kind]["runs"]) for kind in KEY_KINDS}
+            self._dir_cache[name] = cached
+        return cached
+
+    def _read_runs(self, name: str, runs: list[list[int]]) -> array:
+        """Offsets of consecutive keys; their runs are adjacent in seg_N.bin, so this is one read."""
+        start = runs[0][0]
+        end = runs[-1][0] + runs[-1][1]
+        out = array("Q")
+        with (self.index_dir / f"{name}.bin").open("rb") as f:
+            f.seek(start * 8)
+            out.frombytes(f.read((end - start) * 8))
+        if sys.byteorder != "little":
+            out.byteswap()
+        return out
+
+    def _segment_postings(self, name: str) -> dict[str, dict[str, list[int]]]:
+        seg = self._segment_dir(name)
+        with (self.index_dir / f"{name}.bin").open("rb") as f:
+            offsets = array("Q", f.read())
+        if sys.byteorder != "little":
+            offsets.byteswap()
+        return {kind: {key: offsets[s : s + c].tolist() for key, (s, c) in zip(*seg[kind])} for kind in KEY_KINDS}
+
+    def _commit(self, manifest: dict[str, Any]) -> None:
+        manifest["generation"] = int(manifest.get("generation", 0)) + 1
+        _write_json_atomic(self.manifest_path, manifest)
+        live = {seg["name"] for seg in manifest["segments"]}
+        for child in self.index_dir.iterdir():
+            if child.name.startswith("seg_") and child.stem not in live:
+                child.unlink(missing_ok=True)
+                self._dir_cache.pop(child.stem, None)
+
+    # -- maintenance ---------------------------------------------------
+
+    def rebuild(self) -> dict[str, Any]:
+        with self._lock():
+            return self._refresh_locked(self.load_manifest(), force_rebuild=True)
+
+    def refresh(self) -> dict[str, Any]:
+        """Index lines appended since the last refresh; returns {rebuilt, lines_indexed, lines_skipped}."""
+        manifest = self.load_manifest()
+        try:
+            size = self.ledger.stat().st_size
+        except FileNotFoundError:
+            size = 0
+        if manifest is not None and manifest["covered_bytes"] == size:
+            return {"rebuilt": False, "lines_indexed": 0, "lines_skipped": 0}
+        with self._lock():
+            return self._refresh_locked(self.load_manifest())
+
+    def _refresh_locked(self, manifest: dict[str, Any] | None, force_rebuild: bool = False) -> dict[str, Any]:
+        try:
+            size = self.ledger.stat().st_size
+        except FileNotFoundError:
+            size = 0
+        # Segment names never repeat, so a reader holding an old manifest never sees a rewritten
+        # segment; at worst it finds one deleted, and offsets() retries on the new manifest.
+        next_segment = int(manifest["next_segment"]) if manifest is not None else 0
+        generation = int(manifest.get("generation", 0)) if manifest is not None else 0
+        rebuilt = manifest is None or force_rebuild
+        if manifest is not None and not rebuilt:
+            covered = int(manifest["covered_bytes"])
+            if covered > size or (covered and _head_digest(self.ledger, covered) != manifest["head_sha256"]):
+                rebuilt = True
+        if rebuilt:
+            manifest = {
+                "index_version": INDEX_VERSION,
+                "ledger": str(self.ledger),
+                "generation": generation,
+                "next_segment": next_segment,
+                "covered_bytes": 0,
+                "head_sha256": "",
+                "lines": 0,
+                "skipped": 0,
+                "segments": [],
+            }
+        start = int(manifest["covered_bytes"])
+        if start == size and not rebuilt:
+            return {"rebuilt": False, "lines_indexed": 0, "lines_skipped": 0}
+        if size > start:
+            postings, end, lines, skipped = scan_ledger(self.ledger, start)
+        else:
+            postings, end, lines, skipped = {}, start, 0, 0
+        if lines:
+            name = f"seg_{manifest['next_segment']:06d}"
+            manifest["next_segment"] += 1
+            self._write_segment(name, postings)
+            manifest["segments"].append({"name": name, "from_byte": start, "to_byte": end, "lines": lines})
+        manifest["covered_bytes"] = end
+        manifest["head_sha256"] = _head_digest(self.ledger, end) if end else ""
+        manifest["lines"] += lines
+        manifest["skipped"] += skipped
+        if len(manifest["segments"]) > MAX_DELTA_SEGMENTS + 1:
+            self._merge(manifest)
+        self._commit(manifest)
+        return {"rebuilt": rebuilt, "lines_indexed": lines, "lines_skipped": skipped}
+
+    def _merge(self, manifest: dict[str, Any]) -> None:
+        """Merge the deltas into one segment, folding in the base too once the deltas outgrow it."""
+        segs = manifest["segments"]
+        base, deltas = segs[0], segs[1:]
+        merging = segs if sum(s["lines"] for s in deltas) >= base["lines"] else deltas
+        # Segments cover increasing byte ranges, so concatenating runs keeps every run sorted.
+        merged: dict[str, dict[str, list[int]]] = {kind: defaultdict(list) for kind in KEY_KINDS}
+        for seg in merging:
+            for kind, keyed in self._segment_postings(seg["name"]).items():
+                for key, offsets in keyed.items():
+                    merged[kind][key].extend(offsets)
+        name = f"seg_{manifest['next_segment']:06d}"
+        manifest["next_segment"] += 1
+        self._write_segment(name, merged)
+        combined = {
+            "name": name,
+            "from_byte": merging[0]["from_byte"],
+            "to_byte": merging[-1]["to_byte"],
+            "lines": sum(s["lines"] for s in merging),
+        }
+        manifest["segments"] = [combined] if merging is segs else [base, combined]
+
+    # -- queries -------------------------------------------------------
+
+    def offsets(
+        self,
+        kind: str,
+        key: str | None = None,
+        prefix: str | None = None,
+        key_range: tuple[str | None, str | None] | None = None,
+    ) -> list[int]:
+        """Sorted ledger offsets for an exact key, a key prefix, or an inclusive key range of one kind."""
+        manifest = self.load_manifest()
+        while manifest is not None:
+            try:
+                return self._manifest_offsets(manifest, kind, key, prefix, key_range)
+            except FileNotFoundError:
+                # A merge or rebuild committed since the manifest was read and deleted its segments.
+                fresh = self.load_manifest()
+                if fresh is not None and fresh.get("generation") == manifest.get("generation"):
+                    raise
+                manifest = fresh
+        return []
+
+    def _manifest_offsets(
+        self,
+        manifest: dict[str, Any],
+        kind: str,
+        key: str | None,
+        prefix: str | None,
+        key_range: tuple[str | None, str | None] | None,
+    ) -> list[int]:
+        out: list[int] = []
+        for seg in manifest["segments"]:
+            keys, runs = self._segment_dir(seg["name"])[kind]
+            if key is not None:
+                lo = bisect.bisect_left(keys, key)
+                hi = lo + 1 if lo < len(keys) and keys[lo] == key else lo
+            elif prefix is not None:
+                lo = bisect.bisect_left(keys, prefix)
+                hi = bisect.bisect_left(keys, prefix + "\U0010ffff")
+            else:
+                first, last = key_range or (None, None)
+                lo = bisect.bisect_left(keys, first) if first is not None else 0
+                hi = bisect.bisect_right(keys, last) if last is not None else len(keys)
+            if lo < hi:
+                offsets = self._read_runs(seg["name"], runs[lo:hi])
+                # Runs of several keys interleave; one key's run is already sorted.
+                out.extend(sorted(offsets) if hi - lo > 1 else offsets)
+        return out
+
+    def rows(self, offsets: Iterable[int]) -> Iterator[tuple[int, dict[str, Any]]]:
+        """(offset, row) for each offset, read by seeking into the ledger."""
+        with self.ledger.open("rb") as f:
+            for offset in offsets:
+                f.seek(offset)
+                raw = f.readline()
+                try:
+                    row = json.loads(raw)
+                except ValueError:
+                    continue
+                if isinstance(row, dict):
+                    yield offset, row
+
+    def select(
+        self,
+        path: str | None = None,
+        path_prefix: str | None = None,
+        agent: str | None = None,
+        since: str | None = None,
+        until: str | None = None,
+        descending: bool = False,
+    ) -> tuple[list[int], str]:
+        """Candidate offsets for the given filters, and which key kind produced them.
+
+        Each filter narrows to one posting list; the smallest list is
+        intersected with the others. Exact `timestamp` bounds are applied by
+        the caller on the rows, since the day index only narrows to whole days.
+        """
+        lists: list[tuple[str, list[int]]] = []
+        if path is not None:
+            lists.append(("target_path", self.offsets("target_path", key=path)))
+        if path_prefix is not None:
+            lists.append(("target_path", self.offsets("target_path", prefix=path_prefix)))
+        if agent is not None:
+            lists.append(("agent_id", self.offsets("agent_id", key=agent)))
+        if since is not None or until is not None:
+            day_range = (since[:10] if since else None, until[:10] if until else None)
+            lists.append(("day", self.offsets("day", key_range=day_range)))
+        if not lists:
+            raise ValueError("at least one of path, path_prefix, agent, since or until is required")
+        lists.sort(key=lambda kv: len(kv[1]))
+        via, selected = lists[0]
+        for _, other in lists[1:]:
+            keep = set(other)
+            selected = [o for o in selected if o in keep]
+        if descending:
+            selected.reverse()
+        return selected, via
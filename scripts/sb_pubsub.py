@@ -0,0 +1,1234 @@
+"""File-native pub/sub bus (meta/PUBSUB_BUS_SPEC_v0.md) shared by tools/sb_pubsub_*_v0.sh and `sb pubsub`."""
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import heapq
+import json
+import mmap
+import os
+import struct
+import time
+from bisect import bisect_right
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Iterator, NamedTuple
+from urllib.parse import quote
+
+LINE_INDEX_SUFFIX = ".lineidx"
+LINE_INDEX_STRIDE = 1024
+
+SEGMENT_FORMAT = "pubsub_segments_v0"
+MANIFEST_NAME = "manifest.json"
+TOMBSTONES_NAME = "tombstones.ndjson"
+LOCK_NAME = ".lock"
+SEGMENT_MAX_BYTES = 8 * 1024 * 1024
+SEGMENT_MAX_AGE_S = 86400
+TOMBSTONE_RETENTION_S = 7 * 86400
+TOPIC_INDEX_FORMAT = "pubsub_topic_index_v0"
+TOPIC_INDEX_DIR = "topics"
+TOPIC_INDEX_SUFFIX = ".tidx"
+LOG_END_NAME = "end.bin"
+IDEMPOTENCY_INDEX_NAME = "idempotency.idx"
+IDEMPOTENCY_INDEX_MAGIC = b"sbidem01"
+IDEMPOTENCY_INDEX_MIN_SLOTS = 1024
+SUBSCRIBE_COMMIT_EVERY = 100
+SUBSCRIBE_COMMIT_INTERVAL_S = 1.0
+
+
+def parse_rfc3339_z(value: str) -> datetime:
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        raise ValueError("timestamp must include timezone")
+    return dt.astimezone(timezone.utc)
+
+
+def format_ts(dt: datetime) -> str:
+    return dt.replace(microsecond=0).isoformat().replace("+00:00", "Z")
+
+
+def build_event(
+    topic: str,
+    scope: str,
+    actor: str,
+    payload_json: str,
+    ttl_s: int,
+    idem_key: str = "",
+    ts_override: str = "",
+    event_id_override: str = "",
+) -> dict[str, Any]:
+    try:
+        payload = json.loads(payload_json)
+    except Exception as e:
+        raise SystemExit(f"invalid --payload-json: {e}")
+    if not isinstance(payload, dict):
+        raise SystemExit("--payload-json must decode to a JSON object")
+    if ttl_s < 0:
+        raise SystemExit("--ttl-s must be >= 0")
+
+    ts_dt = parse_rfc3339_z(ts_override) if ts_override else datetime.now(timezone.utc)
+    ts = format_ts(ts_dt)
+
+    if event_id_override:
+        event_id = event_id_override
+    else:
+        stamp = ts_dt.strftime("%Y%m%dT%H%M%SZ")
+        seed = f"{topic}|{scope}|{actor}|{ts}|{json.dumps(payload, sort_keys=True, separators=(',', ':'))}"
+        digest = hashlib.sha256(seed.encode("utf-8")).hexdigest()[:12]
+        event_id = f"evt_{stamp}_{digest}"
+
+    return {
+        "event_id": event_id,
+        "ts": ts,
+        "topic": topic,
+        "scope": scope,
+        "actor": actor,
+        "payload": payload,
+        "ttl_s": ttl_s,
+        # The default key is the event_id, which covers the payload: an identical retry
+        # dedupes, while distinct events from one actor in the same second do not.
+        "idempotency_key": idem_key or event_id,
+    }
+
+
+def event_from_record(record: Any, default_ttl_s: int) -> dict[str, Any]:
+    """Build an event from one batch-publish record (publish's options as JSON fields); ValueError if malformed."""
+    if not isinstance(record, dict):
+        raise ValueError("record must be a JSON object")
+    for field in ("topic", "scope", "actor"):
+        if not isinstance(record.get(field), str) or not record[field]:
+            raise ValueError(f"{field} must be a non-empty string")
+    payload = record.get("payload", {})
+    if not isinstance(payload, dict):
+        raise ValueError("payload must be a JSON object")
+    ttl_s = record.get("ttl_s", default_ttl_s)
+    if not isinstance(ttl_s, int) or isinstance(ttl_s, bool) or ttl_s < 0:
+        raise ValueError("ttl_s must be a non-negative integer")
+    for field in ("idempotency_key", "ts", "event_id"):
+        if not isinstance(record.get(field, ""), str):
+            raise ValueError(f"{field} must be a string")
+    return build_event(
+        record["topic"],
+        record["scope"],
+        record["actor"],
+        json.dumps(payload),
+        ttl_s,
+        idem_key=record.get("idempotency_key", ""),
+        ts_override=record.get("ts", ""),
+        event_id_override=record.get("event_id", ""),
+    )
+
+
+def encode_event(event: dict[str, Any]) -> str:
+    return json.dumps(event, sort_keys=True, separators=(",", ":"))
+
+
+def is_expired(evt: dict[str, Any], now: datetime) -> bool:
+    ts = evt.get("ts")
+    ttl_s = evt.get("ttl_s")
+    try:
+        evt_ts = parse_rfc3339_z(ts) if isinstance(ts, str) else None
+        if evt_ts and isinstance(ttl_s, int) and ttl_s > 0:
+            return now >= (evt_ts + timedelta(seconds=ttl_s))
+    except Exception:
+        return False
+    return False
+
+
+def read_offset(offset_file: Path) -> dict[str, Any]:
+    if offset_file.exists():
+        try:
+            offset_obj = json.loads(offset_file.read_text(encoding="utf-8"))
+            if isinstance(offset_obj, dict):
+                return offset_obj
+        except Exception:
+            pass
+    return {}
+
+
+def line_index_path(events_file: Path) -> Path:
+    return events_file.with_name(events_file.name + LINE_INDEX_SUFFIX)
+
+
+def _at_line_start(f: BinaryIO, pos: int) -> bool:
+    if pos == 0:
+        return True
+    f.seek(pos - 1)
+    return f.read(1) == b"\n"
+
+
+class LineIndex:
+    """Sparse line -> byte map for the append-only events file.
+
+    Entry k of the sidecar (little-endian u64) is the byte offset where line
+    k * LINE_INDEX_STRIDE + 1 starts, so resolving any line costs one lookup
+    plus at most STRIDE - 1 skipped lines. Readers extend it as they pass new
+    stride boundaries; it is discarded and rebuilt if it no longer fits the log.
+    """
+
+    def __init__(self, path: Path, entries: list[int], on_disk: int) -> None:
+        self.path = path
+        self.entries = entries
+        self.on_disk = on_disk
+
+    @classmethod
+    def load(cls, path: Path, events: BinaryIO, size: int) -> LineIndex:
+        try:
+            raw = path.read_bytes()
+        except FileNotFoundError:
+            raw = b""
+        entries = list(struct.unpack(f"<{len(raw) // 8}Q", raw[: len(raw) // 8 * 8]))
+        valid = bool(entries) and entries[0] == 0 and entries[-1] <= size and _at_line_start(events, entries[-1])
+        valid = valid and all(a < b for a, b in zip(entries, entries[1:]))
+        if not valid:
+            return cls(path, [0], -1)
+        return cls(path, entries, len(entries))
+
+    def lookup(self, line: int) -> tuple[int, int]:
+        """Nearest indexed (line, byte) at or before `line`."""
+        k = min(max(0, line - 1) // LINE_INDEX_STRIDE, len(self.entries) - 1)
+        return k * LINE_INDEX_STRIDE + 1, self.entries[k]
+
+    def observe(self, line: int, byte: int) -> None:
+        """Record that `line` starts at `byte` if it is the next stride boundary."""
+        if line == len(self.entries) * LINE_INDEX_STRIDE + 1:
+            self.entries.append(byte)
+
+    def save(self) -> None:
+        if len(self.entries) == self.on_disk:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "ab") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            if self.on_disk < 0:
+                f.truncate(0)
+            # Another reader may have extended it meanwhile; entries are deterministic, so append only the tail.
+            have = f.seek(0, os.SEEK_END) // 8
+            if len(self.entries) > have:
+                f.seek(have * 8)
+                f.truncate()
+                f.write(struct.pack(f"<{len(self.entries) - have}Q", *self.entries[have:]))
+        self.on_disk = len(self.entries)
+
+
+_POSITION = struct.Struct("<QQ")  # (global byte, global line): topic index entries and the log end marker
+_IDEM_HEADER = struct.Struct("<8sQQQQ")  # magic, slots, keys, covered next line, covered next byte
+_IDEM_SLOT = struct.Struct("<16sQ")  # key digest, global line of the event (0 = empty slot)
+
+
+class Segment(NamedTuple):
+    path: Path
+    base_line: int  # global line number of the segment's first line
+    base_byte: int  # global byte offset of the segment's first byte
+    end_line: int | None  # None while the segment is active
+    end_byte: int | None
+
+
+def segments_dir(events_file: Path) -> Path:
+    return events_file.with_suffix(".segments")
+
+
+def read_manifest(events_file: Path) -> dict[str, Any] | None:
+    path = segments_dir(events_file) / MANIFEST_NAME
+    try:
+        manifest = json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+    except ValueError as e:
+        raise SystemExit(f"invalid segment manifest {path}: {e}")
+    if not isinstance(manifest, dict) or manifest.get("format") != SEGMENT_FORMAT or not manifest.get("segments"):
+        raise SystemExit(f"invalid segment manifest {path}: expected format {SEGMENT_FORMAT} with segments[]")
+    return manifest
+
+
+def load_segments(events_file: Path) -> list[Segment] | None:
+    """Retained segments oldest first, or None while the log is still a single unsegmented file."""
+    manifest = read_manifest(events_file)
+    if manifest is None:
+        return None
+    return _manifest_segments(segments_dir(events_file), manifest)
+
+
+def _manifest_segments(d: Path, manifest: dict[str, Any]) -> list[Segment]:
+    return [
+        Segment(d / s["name"], s["base_line"], s["base_byte"], s.get("end_line"), s.get("end_byte"))
+        for s in manifest["segments"]
+    ]
+
+
+def _write_manifest(d: Path, manifest: dict[str, Any]) -> None:
+    tmp = d / f".{MANIFEST_NAME}.{os.getpid()}.tmp"
+    tmp.write_text(json.dumps(manifest, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+    os.replace(tmp, d / MANIFEST_NAME)
+
+
+@contextmanager
+def _writer_lock(events_file: Path) -> Iterator[Path]:
+    """Serialize publishers and compaction; readers never take it."""
+    d = segments_dir(events_file)
+    d.mkdir(parents=True, exist_ok=True)
+    with open(d / LOCK_NAME, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        yield d
+
+
+def _segment_entry(base_line: int, base_byte: int, now: datetime) -> dict[str, Any]:
+    return {"name": f"{base_line:020d}.ndjson", "base_line": base_line, "base_byte": base_byte, "created_at": format_ts(now)}
+
+
+def _open_manifest(events_file: Path, d: Path, now: datetime) -> dict[str, Any]:
+    manifest = read_manifest(events_file)
+    if manifest is not None:
+        return manifest
+    first = _segment_entry(1, 0, now)
+    manifest = {"format": SEGMENT_FORMAT, "segments": [first]}
+    # Manifest first: a reader racing the move sees a missing active segment (no new events), never a reset log.
+    _write_manifest(d, manifest)
+    if events_file.is_file():
+        os.replace(events_file, d / first["name"])
+        if line_index_path(events_file).exists():
+            os.replace(line_index_path(events_file), line_index_path(d / first["name"]))
+    return manifest
+
+
+def _line_event(raw: bytes) -> dict[str, Any] | None:
+    try:
+        evt = json.loads(raw)
+    except ValueError:
+        return None
+    return evt if isinstance(evt, dict) else None
+
+
+def _event_expiry(evt: dict[str, Any]) -> datetime | None:
+    """When `evt` expires under is_expired(), or None if it never does."""
+    ts, ttl_s = evt.get("ts"), evt.get("ttl_s")
+    if not isinstance(ts, str) or not isinstance(ttl_s, int) or ttl_s <= 0:
+        return None
+    try:
+        return parse_rfc3339_z(ts) + timedelta(seconds=ttl_s)
+    except ValueError:
+        return None
+
+
+def _seal(d: Path, entry: dict[str, Any], now: datetime) -> None:
+    """Freeze the active segment: record its end position and when its last event expires."""
+    lines = 0
+    expires: datetime | None = None
+    never = False
+    with open(d / entry["name"], "a+b") as f:
+        f.seek(0)
+        last = b""
+        for raw in f:
+            last = raw
+            lines += 1
+            evt = _line_event(raw)
+            if evt is None:
+                continue  # blank or garbage lines are never delivered
+            exp = _event_expiry(evt)
+            if exp is None:
+                never = True
+            elif expires is None or exp > expires:
+                expires = exp
+        if last and not last.endswith(b"\n"):
+            f.write(b"\n")  # torn tail from a crashed publisher: close it so it stays one (undeliverable) line
+        size = f.seek(0, os.SEEK_END)
+    entry["end_line"] = entry["base_line"] + lines
+    entry["end_byte"] = entry["base_byte"] + size
+    entry["expires_at"] = None if never or expires is None else format_ts(expires)
+    entry["sealed_at"] = format_ts(now)
+
+
+def _maybe_roll(d: Path, manifest: dict[str, Any], now: datetime, max_bytes: int | None, max_age_s: int) -> bool:
+    active = manifest["segments"][-1]
+    try:
+        size = (d / active["name"]).stat().st_size
+    except FileNotFoundError:
+        size = 0
+    age_s = (now - parse_rfc3339_z(active["created_at"])).total_seconds()
+    if size == 0 or ((max_bytes is None or size < max_bytes) and age_s < max_age_s):
+        return False
+    _seal(d, active, now)
+    manifest["segments"].append(_segment_entry(active["end_line"], active["end_byte"], now))
+    return True
+
+
+def topic_index_path(d: Path, topic: str) -> Path:
+    return d / TOPIC_INDEX_DIR / (quote(topic, safe="") + TOPIC_INDEX_SUFFIX)
+
+
+def _read_log_end(d: Path) -> tuple[int, int] | None:
+    """(next global line, next global byte) after the last indexed append, or None before indexing starts."""
+    try:
+        raw = (d / LOG_END_NAME).read_bytes()
+    except FileNotFoundError:
+        return None
+    if len(raw) != _POSITION.size:
+        return None
+    byte, line = _POSITION.unpack(raw)
+    return line, byte
+
+
+def _write_log_end(d: Path, line: int, byte: int) -> None:
+    fd = os.open(d / LOG_END_NAME, os.O_WRONLY | os.O_CREAT, 0o644)
+    try:
+        os.pwrite(fd, _POSITION.pack(byte, line), 0)
+    finally:
+        os.close(fd)
+
+
+def _append_topic_entries(d: Path, positions: list[tuple[Any, int, int]]) -> None:
+    """Append (topic, global line, global byte) entries, one write per topic file."""
+    entries: dict[str, bytearray] = {}
+    for topic, line, byte in positions:
+        if isinstance(topic, str):
+            entries.setdefault(topic, bytearray()).extend(_POSITION.pack(byte, line))
+    for topic, data in entries.items():
+        path = topic_index_path(d, topic)
+        path.parent.mkdir(exist_ok=True)
+        with open(path, "ab") as f:
+            f.write(data)
+
+
+def _build_topic_index(d: Path, manifest: dict[str, Any]) -> None:
+    """Index every retained event by topic (one pass, run once per log when indexing is first enabled)."""
+    entries: dict[str, bytearray] = {}
+    line = byte = 0
+    for entry in manifest["segments"]:
+        line, byte = entry["base_line"], entry["base_byte"]
+        try:
+            f = open(d / entry["name"], "rb")
+        except FileNotFoundError:
+            continue
+        with f:
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break
+                evt = _line_event(raw)
+                if evt is not None and isinstance(evt.get("topic"), str):
+                    entries.setdefault(evt["topic"], bytearray()).extend(_POSITION.pack(byte, line))
+                line += 1
+                byte += len(raw)
+    tdir = d / TOPIC_INDEX_DIR
+    tdir.mkdir(exist_ok=True)
+    for stale in tdir.glob(f"*{TOPIC_INDEX_SUFFIX}"):
+        stale.unlink()
+    for topic, data in entries.items():
+        topic_index_path(d, topic).write_bytes(bytes(data))
+    _write_log_end(d, line, byte)
+
+
+def _trim_topic_index(d: Path, dropped: list[dict[str, Any]]) -> None:
+    """Rewrite topic index files without entries that point into dropped segments."""
+    ranges = sorted((e["base_byte"], e["end_byte"]) for e in dropped)
+    starts = [r[0] for r in ranges]
+    for path in (d / TOPIC_INDEX_DIR).glob(f"*{TOPIC_INDEX_SUFFIX}"):
+        data = path.read_bytes()
+        kept = bytearray()
+        for byte, line in _POSITION.iter_unpack(data[: len(data) // _POSITION.size * _POSITION.size]):
+            i = bisect_right(starts, byte) - 1
+            if i < 0 or byte >= ranges[i][1]:
+                kept.extend(_POSITION.pack(byte, line))
+        if len(kept) == len(data):
+            continue
+        if not kept:
+            path.unlink()
+            continue
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(bytes(kept))
+        os.replace(tmp, path)
+
+
+def _active_end(f: BinaryIO, d: Path, active: dict[str, Any]) -> tuple[int, int]:
+    """Where the next append to the active segment lands, as (global line, global byte)."""
+    size = f.seek(0, os.SEEK_END)
+    end = _read_log_end(d)
+    if end is not None and end[1] == active["base_byte"] + size:
+        return end
+    # A publisher died between its append and the end marker (or mid-append): recount the active segment once.
+    if size:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b"\n":
+            f.write(b"\n")
+            f.flush()
+            size += 1
+    f.seek(0)
+    lines = sum(chunk.count(b"\n") for chunk in iter(lambda: f.read(1 << 20), b""))
+    return active["base_line"] + lines, active["base_byte"] + size
+
+
+def read_tombstones(events_file: Path) -> dict[str, dict[str, Any]]:
+    """Idempotency keys of events reclaimed by compaction, keyed by idempotency_key."""
+    out: dict[str, dict[str, Any]] = {}
+    try:
+        f = (segments_dir(events_file) / TOMBSTONES_NAME).open("r", encoding="utf-8")
+    except FileNotFoundError:
+        return out
+    with f:
+        for raw in f:
+            try:
+                record = json.loads(raw)
+            except ValueError:
+                continue
+            if isinstance(record, dict) and isinstance(record.get("idempotency_key"), str):
+                out[record["idempotency_key"]] = record
+    return out
+
+
+def _idem_digest(key: str) -> bytes:
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+
+
+class IdempotencyIndex:
+    """Open-addressing hash table of idempotency keys in `<segments_dir>/idempotency.idx`.
+
+    Slots hold a 16-byte blake2b digest of the key and the global line of the
+    event that first used it, so a lookup costs a couple of probes however
+    long the log grows. The header records how far into the log the table is
+    complete; publishers catch up from there before trusting it. Only
+    publishers (under the segment lock) open it.
+    """
+
+    def __init__(self, path: Path, f: BinaryIO, mm: mmap.mmap) -> None:
+        self.path = path
+        self._f = f
+        self._mm = mm
+        _magic, self.slots, self.keys, self.next_line, self.next_byte = _IDEM_HEADER.unpack_from(mm, 0)
+
+    @classmethod
+    def create(cls, path: Path, slots: int, next_line: int, next_byte: int) -> IdempotencyIndex:
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with tmp.open("wb") as f:
+            f.write(_IDEM_HEADER.pack(IDEMPOTENCY_INDEX_MAGIC, slots, 0, next_line, next_byte))
+            f.truncate(_IDEM_HEADER.size + slots * _IDEM_SLOT.size)
+        os.replace(tmp, path)
+        index = cls.open(path)
+        assert index is not None
+        return index
+
+    @classmethod
+    def open(cls, path: Path) -> IdempotencyIndex | None:
+        """The table at `path`, or None if it is missing or does not look like one."""
+        try:
+            f = path.open("r+b")
+        except FileNotFoundError:
+            return None
+        size = f.seek(0, os.SEEK_END)
+        if size >= _IDEM_HEADER.size:
+            f.seek(0)
+            magic, slots, _keys, _line, _byte = _IDEM_HEADER.unpack(f.read(_IDEM_HEADER.size))
+            if magic == IDEMPOTENCY_INDEX_MAGIC and slots and slots & (slots - 1) == 0 and size == _IDEM_HEADER.size + slots * _IDEM_SLOT.size:
+                return cls(path, f, mmap.mmap(f.fileno(), 0))
+        f.close()
+        return None
+
+    def close(self) -> None:
+        self._mm.close()
+        self._f.close()
+
+    def _probe(self, digest: bytes) -> tuple[int, int]:
+        """(slot, stored line) holding `digest`, or (first empty slot, 0)."""
+        mask = self.slots - 1
+        slot = int.from_bytes(digest[:8], "little") & mask
+        while True:
+            stored, line = _IDEM_SLOT.unpack_from(self._mm, _IDEM_HEADER.size + slot * _IDEM_SLOT.size)
+            if line == 0 or stored == digest:
+                return slot, line
+            slot = (slot + 1) & mask
+
+    def lookup(self, key: str) -> int | None:
+        """Global line of the event that first used `key`, or None if it is unused."""
+        return self._probe(_idem_digest(key))[1] or None
+
+    def insert(self, key: str, line: int) -> bool:
+        """Record `key` at `line` unless it is already present; the caller keeps the load factor under 1/2."""
+        digest = _idem_digest(key)
+        slot, existing = self._probe(digest)
+        if existing:
+            return False
+        _IDEM_SLOT.pack_into(self._mm, _IDEM_HEADER.size + slot * _IDEM_SLOT.size, digest, line)
+        self.keys += 1
+        return True
+
+    def entries(self) -> Iterator[tuple[bytes, int]]:
+        for digest, line in _IDEM_SLOT.iter_unpack(self._mm[_IDEM_HEADER.size :]):
+            if line:
+                yield digest, line
+
+    def commit(self, next_line: int, next_byte: int) -> None:
+        """Mark the table complete through (next_line, next_byte) of the log."""
+        self.next_line, self.next_byte = next_line, next_byte
+        _IDEM_HEADER.pack_into(self._mm, 0, IDEMPOTENCY_INDEX_MAGIC, self.slots, self.keys, next_line, next_byte)
+
+    def reserve(self, extra: int) -> IdempotencyIndex:
+        """This table, or a larger copy (replacing it on disk) if `extra` more keys would pass half full."""
+        if (self.keys + extra) * 2 <= self.slots:
+            return self
+        slots = self.slots
+        while (self.keys + extra) * 2 > slots:
+            slots *= 2
+        grown = IdempotencyIndex.create(self.path.with_name(f".{self.path.name}.grow"), slots, self.next_line, self.next_byte)
+        for digest, line in self.entries():
+            slot, _ = grown._probe(digest)
+            _IDEM_SLOT.pack_into(grown._mm, _IDEM_HEADER.size + slot * _IDEM_SLOT.size, digest, line)
+        grown.keys = self.keys
+        grown.commit(self.next_line, self.next_byte)
+        grown._mm.flush()
+        os.replace(grown.path, self.path)
+        grown.path = self.path
+        self.close()
+        return grown
+
+
+def _scan_keys(d: Path, manifest: dict[str, Any], line: int, byte: int) -> Iterator[tuple[str, int]]:
+    """(idempotency_key, global line) of every complete event at or after global `byte`."""
+    for entry in manifest["segments"]:
+        end_byte = entry.get("end_byte")
+        if end_byte is not None and byte >= end_byte:
+            continue
+        local = max(0, byte - entry["base_byte"])
+        line_no = line if byte >= entry["base_byte"] else entry["base_line"]
+        try:
+            f = open(d / entry["name"], "rb")
+        except FileNotFoundError:
+            continue
+        with f:
+            f.seek(local)
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break
+                evt = _line_event(raw)
+                if evt is not None and isinstance(evt.get("idempotency_key"), str):
+                    yield evt["idempotency_key"], line_no
+                line_no += 1
+
+
+def _open_idempotency_index(events_file: Path, d: Path, manifest: dict[str, Any], end_line: int, end_byte: int) -> IdempotencyIndex:
+    """The idempotency table, complete through the log end (end_line, end_byte).
+
+    A table that stops short of the end (a publisher died between its append
+    and the table update) catches up from where it stopped. A missing or
+    unusable table, or one whose covered position fell out of the retained
+    segments, is rebuilt from the tombstones plus every retained event.
+    """
+    path = d / IDEMPOTENCY_INDEX_NAME
+    index = IdempotencyIndex.open(path)
+    first_byte = manifest["segments"][0]["base_byte"]
+    if index is not None and first_byte <= index.next_byte <= end_byte and index.next_line <= end_line:
+        if index.next_byte == end_byte:
+            return index
+        pending = list(_scan_keys(d, manifest, index.next_line, index.next_byte))
+        index = index.reserve(len(pending))
+        for key, line in pending:
+            index.insert(key, line)
+        index.commit(end_line, end_byte)
+        return index
+    if index is not None:
+        index.close()
+
+    tombstones = read_tombstones(events_file)
+    retained = list(_scan_keys(d, manifest, manifest["segments"][0]["base_line"], first_byte))
+    slots = IDEMPOTENCY_INDEX_MIN_SLOTS
+    while (len(tombstones) + len(retained)) * 2 > slots:
+        slots *= 2
+    index = IdempotencyIndex.create(path, slots, end_line, end_byte)
+    for key, t in tombstones.items():
+        index.insert(key, t["line"] if isinstance(t.get("line"), int) and t["line"] > 0 else 1)
+    for key, line in retained:
+        index.insert(key, line)
+    index.commit(end_line, end_byte)
+    return index
+
+
+def _compact_locked(
+    events_file: Path,
+    d: Path,
+    manifest: dict[str, Any],
+    now: datetime,
+    retention_s: int,
+    apply: bool = True,
+) -> dict[str, Any]:
+    keep: list[dict[str, Any]] = []
+    dropped: list[dict[str, Any]] = []
+    for entry in manifest["segments"]:
+        expires_at = entry.get("expires_at")
+        if "end_byte" in entry and expires_at and parse_rfc3339_z(expires_at) <= now:
+            dropped.append(entry)
+        else:
+            keep.append(entry)
+
+    tombstones = read_tombstones(events_file)
+    before = len(tombstones)
+    tombstones = {
+        k: t
+        for k, t in tombstones.items()
+        if not isinstance(t.get("expired_at"), str) or parse_rfc3339_z(t["expired_at"]) + timedelta(seconds=retention_s) > now
+    }
+    pruned = before - len(tombstones)
+    added = 0
+    for entry in dropped:
+        line_no = entry["base_line"]
+        with open(d / entry["name"], "rb") as f:
+            for raw in f:
+                evt = _line_event(raw)
+                if evt is not None and isinstance(evt.get("idempotency_key"), str):
+                    exp = _event_expiry(evt)
+                    added += evt["idempotency_key"] not in tombstones
+                    tombstones[evt["idempotency_key"]] = {
+                        "idempotency_key": evt["idempotency_key"],
+                        "event_id": evt.get("event_id"),
+                        "line": line_no,
+                        "expired_at": None if exp is None else format_ts(exp),
+                    }
+                line_no += 1
+
+    reclaimed = sum(e["end_byte"] - e["base_byte"] for e in dropped)
+    if apply and (dropped or pruned):
+        tmp = d / f".{TOMBSTONES_NAME}.{os.getpid()}.tmp"
+        with tmp.open("w", encoding="utf-8") as f:
+            for t in sorted(tombstones.values(), key=lambda t: t["line"]):
+                f.write(json.dumps(t, sort_keys=True, separators=(",", ":")) + "\n")
+        os.replace(tmp, d / TOMBSTONES_NAME)
+        manifest["segments"] = keep
+        _write_manifest(d, manifest)
+        # Files go only after the manifest stops listing them; readers skip segments that vanish under them.
+        for entry in dropped:
+            (d / entry["name"]).unlink(missing_ok=True)
+            line_index_path(d / entry["name"]).unlink(missing_ok=True)
+        if dropped and manifest.get("topic_index") == TOPIC_INDEX_FORMAT:
+            _trim_topic_index(d, dropped)
+        if pruned:
+            # Pruned keys become reusable; the next publish rebuilds the table without them.
+            (d / IDEMPOTENCY_INDEX_NAME).unlink(missing_ok=True)
+    return {
+        "segments_dropped": [e["name"] for e in dropped],
+        "segments_retained": len(keep),
+        "bytes_reclaimed": reclaimed,
+        "tombstones_added": added,
+        "tombstones_pruned": pruned,
+        "tombstones": len(tombstones),
+    }
+
+
+def publish_batch(
+    events_file: Path,
+    events: list[dict[str, Any]],
+    segment_max_bytes: int = SEGMENT_MAX_BYTES,
+    segment_max_age_s: int = SEGMENT_MAX_AGE_S,
+) -> dict[str, Any]:
+    """Append `events` in order under one lock and one fsync, skipping any whose idempotency_key is already used.
+
+    Keys are checked against the idempotency table (which covers tombstoned
+    keys of compacted segments) and against earlier events of the same batch.
+    The whole batch lands in the active segment; rolling happens between batches.
+    """
+    if not events:
+        return {"published": 0, "duplicates": [], "first_line": None, "next_line": None, "next_byte": None}
+    # Roll and retention run on the wall clock; an event's own ts (e.g. --ts in the future) must not expire live data.
+    now = datetime.now(timezone.utc)
+    with _writer_lock(events_file) as d:
+        manifest = _open_manifest(events_file, d, now)
+        if _maybe_roll(d, manifest, now, segment_max_bytes, segment_max_age_s):
+            # Rolling is the natural compaction point: it is the only time a segment becomes droppable.
+            _compact_locked(events_file, d, manifest, now, TOMBSTONE_RETENTION_S)
+            _write_manifest(d, manifest)
+        if manifest.get("topic_index") != TOPIC_INDEX_FORMAT or _read_log_end(d) is None:
+            _build_topic_index(d, manifest)
+            manifest["topic_index"] = TOPIC_INDEX_FORMAT
+            _write_manifest(d, manifest)
+        active = manifest["segments"][-1]
+        with open(d / active["name"], "a+b") as f:
+            first_line, first_byte = _active_end(f, d, active)
+            index = _open_idempotency_index(events_file, d, manifest, first_line, first_byte)
+            try:
+                line, byte = first_line, first_byte
+                accepted: list[tuple[Any, int, int]] = []
+                batch_keys: dict[str, int] = {}
+                duplicates: list[dict[str, Any]] = []
+                chunks: list[bytes] = []
+                for n, event in enumerate(events):
+                    key = event.get("idempotency_key")
+                    if isinstance(key, str):
+                        prior = batch_keys.get(key) or index.lookup(key)
+                        if prior is not None:
+                            duplicates.append(
+                                {"batch_index": n, "event_id": event.get("event_id"), "idempotency_key": key, "duplicate_of_line": prior}
+                            )
+                            continue
+                        batch_keys[key] = line
+                    data = encode_event(event).encode("utf-8") + b"\n"
+                    accepted.append((event.get("topic"), line, byte))
+                    chunks.append(data)
+                    line += 1
+                    byte += len(data)
+                if chunks:
+                    # Index entries before the append and end marker after it: every event below the marker is indexed.
+                    _append_topic_entries(d, accepted)
+                    f.write(b"".join(chunks))
+                    f.flush()
+                    os.fsync(f.fileno())
+                    # The table only ever covers appended bytes; a crash before this is caught up on the next publish.
+                    index = index.reserve(len(batch_keys))
+                    for key, key_line in batch_keys.items():
+                        index.insert(key, key_line)
+                index.commit(line, byte)
+            finally:
+                index.close()
+        if chunks:
+            _write_log_end(d, line, byte)
+    return {
+        "published": len(chunks),
+        "duplicates": duplicates,
+        "first_line": first_line if chunks else None,
+        "next_line": line,
+        "next_byte": byte,
+    }
+
+
+def publish(
+    events_file: Path,
+    event: dict[str, Any],
+    segment_max_bytes: int = SEGMENT_MAX_BYTES,
+    segment_max_age_s: int = SEGMENT_MAX_AGE_S,
+) -> str | None:
+    """Append one event and return its log line, or None if its idempotency_key is already on the bus."""
+    result = publish_batch(events_file, [event], segment_max_bytes, segment_max_age_s)
+    return encode_event(event) if result["published"] else None
+
+
+def compact(
+    events_file: Path,
+    now_ts: str = "",
+    retention_s: int = TOMBSTONE_RETENTION_S,
+    segment_max_age_s: int = SEGMENT_MAX_AGE_S,
+    apply: bool = True,
+) -> dict[str, Any]:
+    """Roll an idle active segment past max age, then drop sealed segments whose events have all expired."""
+    now = parse_rfc3339_z(now_ts) if now_ts else datetime.now(timezone.utc)
+    out: dict[str, Any] = {"events_file": str(events_file), "segments_dir": str(segments_dir(events_file)), "mode": "apply" if apply else "dry-run"}
+    if not apply and read_manifest(events_file) is None:
+        return {**out, "rolled": False, "segments_dropped": [], "segments_retained": 0, "bytes_reclaimed": 0}
+    with _writer_lock(events_file) as d:
+        manifest = _open_manifest(events_file, d, now)
+        rolled = apply and _maybe_roll(d, manifest, now, None, segment_max_age_s)
+        if rolled:
+            _write_manifest(d, manifest)
+        summary = _compact_locked(events_file, d, manifest, now, retention_s, apply=apply)
+    return {**out, "rolled": rolled, **summary}
+
+
+def _segment_size(seg: Segment) -> int:
+    if seg.end_byte is not None:
+        return seg.end_byte - seg.base_byte
+    try:
+        return seg.path.stat().st_size
+    except FileNotFoundError:
+        return 0
+
+
+def _resolve_start(segments: list[Segment], offset_obj: dict[str, Any], next_line: int) -> tuple[int, int, int | None]:
+    """(segment position, global line, global byte) to resume from.
+
+    The stored next_byte wins while it still starts a line inside a retained
+    segment. Otherwise the byte is None and the caller finds `line` through
+    that segment's line index. Positions inside compacted segments move to the
+    next retained one; their events had all expired.
+    """
+    next_byte = offset_obj.get("next_byte")
+    if isinstance(next_byte, int) and next_byte >= 0:
+        i = bisect_right([s.base_byte for s in segments], next_byte) - 1
+        if i < 0:
+            return 0, segments[0].base_line, segments[0].base_byte
+        seg = segments[i]
+        local = next_byte - seg.base_byte
+        if seg.end_byte is not None and next_byte >= seg.end_byte and i + 1 < len(segments):
+            return i + 1, segments[i + 1].base_line, segments[i + 1].base_byte
+        if local <= _segment_size(seg):
+            try:
+                with seg.path.open("rb") as f:
+                    if _at_line_start(f, local):
+                        return i, next_line, next_byte
+            except FileNotFoundError:
+                pass
+    i = bisect_right([s.base_line for s in segments], next_line) - 1
+    if i < 0:
+        return 0, segments[0].base_line, segments[0].base_byte
+    seg = segments[i]
+    if seg.end_line is not None and next_line >= seg.end_line and i + 1 < len(segments):
+        return i + 1, segments[i + 1].base_line, segments[i + 1].base_byte
+    return i, next_line, None
+
+
+def _topic_positions(path: Path, start_line: int, start_byte: int | None, end_byte: int) -> Iterator[tuple[int, int]]:
+    """(byte, line) entries of one topic index at or after the start position and below `end_byte`."""
+    try:
+        f = path.open("rb")
+    except FileNotFoundError:
+        return
+    with f:
+        n = f.seek(0, os.SEEK_END) // _POSITION.size
+        if n == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            lo, hi = 0, n
+            while lo < hi:
+                mid = (lo + hi) // 2
+                byte, line = _POSITION.unpack_from(mm, mid * _POSITION.size)
+                if (byte < start_byte) if start_byte is not None else (line < start_line):
+                    lo = mid + 1
+                else:
+                    hi = mid
+            for k in range(lo, n):
+                byte, line = _POSITION.unpack_from(mm, k * _POSITION.size)
+                if byte >= end_byte:
+                    break
+                yield byte, line
+
+
+def _read_indexed(
+    events_file: Path,
+    offset_obj: dict[str, Any],
+    next_line: int,
+    topics: set[str],
+    now: datetime,
+    max_events: int,
+    drain: bool,
+    match: Callable[[dict[str, Any]], bool] | None = None,
+) -> tuple[list[dict[str, Any]], int, int, int] | None:
+    """read_events() for a topic filter through the per-topic indexes; None when the log has none."""
+    d = segments_dir(events_file)
+    # End marker first: every event below it was indexed and appended before it was written,
+    # and the manifest read after it lists every segment those events live in.
+    end = _read_log_end(d)
+    manifest = read_manifest(events_file)
+    if end is None or manifest is None or manifest.get("topic_index") != TOPIC_INDEX_FORMAT:
+        return None
+    end_line, end_byte = end
+    segments = _manifest_segments(d, manifest)
+    _pos, line, start_byte = _resolve_start(segments, offset_obj, next_line)
+    if start_byte is None and line > end_line:
+        return [], end_byte, end_line, end_byte  # line offset past the end: resume at the end, as a scan would
+    if start_byte is not None and start_byte > end_byte:
+        return [], start_byte, line, start_byte  # ahead of a lagging end marker: hold position
+
+    bases = [seg.base_byte for seg in segments]
+    handles: dict[int, BinaryIO] = {}
+    selected: list[dict[str, Any]] = []
+    positions = heapq.merge(*(_topic_positions(topic_index_path(d, t), line, start_byte, end_byte) for t in sorted(topics)))
+    from_byte = start_byte
+    last_byte = -1
+    next_pos = (end_line, end_byte)
+    try:
+        for byte, abs_line_no in positions:
+            if byte == last_byte:
+                continue  # entry left by a publisher that died before its append
+            last_byte = byte
+            if from_byte is None:
+                from_byte = byte
+            if len(selected) >= max_events and (selected or not drain):
+                break  # drained reads jump to the end marker anyway
+            i = bisect_right(bases, byte) - 1
+            if i < 0 or (segments[i].end_byte is not None and byte >= segments[i].end_byte):
+                continue  # compacted
+            f = handles.get(i)
+            if f is None:
+                try:
+                    f = handles[i] = segments[i].path.open("rb")
+                except FileNotFoundError:
+                    continue
+            f.seek(byte - segments[i].base_byte)
+            raw = f.readline()
+            evt = _line_event(raw) if raw.endswith(b"\n") else None
+            if evt is None or evt.get("topic") not in topics or is_expired(evt, now):
+                continue
+            evt["_line"] = abs_line_no
+            if match is not None and not match(evt):
+                continue
+            selected.append(evt)
+            if not drain:
+                next_pos = (abs_line_no + 1, byte + len(raw))
+    finally:
+        for f in handles.values():
+            f.close()
+    if drain or len(selected) < max_events:
+        next_pos = (end_line, end_byte)
+    return selected, end_byte if from_byte is None else from_byte, next_pos[0], next_pos[1]
+
+
+def read_events(
+    events_file: Path,
+    offset_obj: dict[str, Any],
+    next_line: int,
+    topics: set[str],
+    now: datetime,
+    max_events: int,
+    drain: bool = True,
+    use_topic_index: bool = True,
+    match: Callable[[dict[str, Any]], bool] | None = None,
+) -> tuple[list[dict[str, Any]], int, int, int]:
+    """Deliverable events after a consumer position, as (events, from_byte, next_line, next_byte).
+
+    With `drain` the position always advances to the last complete line, even
+    past events beyond `max_events` (poll's contract). Without it, reading stops
+    right after the max_events-th event, so nothing is skipped. A topic filter
+    on an indexed log reads and decodes only that topic's lines. `match`, when
+    given, further selects events (already tagged with `_line`).
+    """
+    if topics and use_topic_index:
+        indexed = _read_indexed(events_file, offset_obj, next_line, topics, now, max_events, drain, match)
+        if indexed is not None:
+            return indexed
+    segments = load_segments(events_file)
+    if segments is None:
+        events_file.touch()
+        segments = load_segments(events_file) or [Segment(events_file, 1, 0, None, None)]
+
+    selected: list[dict[str, Any]] = []
+    pos, line, start_byte = _resolve_start(segments, offset_obj, next_line)
+    byte = segments[pos].base_byte if start_byte is None else start_byte
+    from_byte: int | None = start_byte
+    for seg in segments[pos:]:
+        if byte < seg.base_byte:
+            line, byte = seg.base_line, seg.base_byte  # gap left by compaction
+        try:
+            f = seg.path.open("rb")
+        except FileNotFoundError:
+            if seg.end_line is None:
+                break  # active segment not created yet
+            line, byte = seg.end_line, seg.end_byte  # compacted while we read
+            continue
+        stop = False
+        with f:
+            size = f.seek(0, os.SEEK_END)
+            index = LineIndex.load(line_index_path(seg.path), f, size)
+            if start_byte is None:
+                # Resolve the line-only offset through this segment's index (local lines are 1-based).
+                local_line, local = index.lookup(line - seg.base_line + 1)
+                f.seek(local)
+                while local_line < line - seg.base_line + 1:
+                    raw = f.readline()
+                    if not raw.endswith(b"\n"):
+                        break  # log ends before next_line: resume at its end
+                    local_line += 1
+                    local += len(raw)
+                    index.observe(local_line, local)
+                line, byte = seg.base_line + local_line - 1, seg.base_byte + local
+                start_byte = from_byte = byte
+            if from_byte is None:
+                from_byte = byte
+            f.seek(byte - seg.base_byte)
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    stop = True  # torn tail from an in-flight append: picked up by the next read
+                    break
+                if not drain and len(selected) >= max_events:
+                    stop = True
+                    break
+                abs_line_no = line
+                line += 1
+                byte += len(raw)
+                index.observe(line - seg.base_line + 1, byte - seg.base_byte)
+                if len(selected) >= max_events and selected:
+                    continue
+                if not raw.strip():
+                    continue
+                try:
+                    evt = json.loads(raw)
+                except Exception:
+                    continue
+                if not isinstance(evt, dict):
+                    continue
+                if topics and evt.get("topic") not in topics:
+                    continue
+                if is_expired(evt, now):
+                    continue
+                evt["_line"] = abs_line_no
+                if match is not None and not match(evt):
+                    continue
+                selected.append(evt)
+            index.save()
+        if stop:
+            break
+    return selected, byte if from_byte is None else from_byte, line, byte
+
+
+def write_offset(offset_file: Path, consumer: str, events_file: Path, next_line: int, next_byte: int, now: datetime) -> None:
+    offset_out = {
+        "consumer": consumer,
+        "events_file": str(events_file),
+        "next_byte": next_byte,
+        "next_line": next_line,
+        "updated_at": format_ts(now),
+    }
+    tmp = offset_file.with_name(f".{offset_file.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(offset_out, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+    os.replace(tmp, offset_file)
+
+
+def poll(
+    events_file: Path,
+    offset_file: Path,
+    consumer: str,
+    topics: set[str],
+    max_events: int,
+    now_ts: str = "",
+) -> dict[str, Any]:
+    now = parse_rfc3339_z(now_ts) if now_ts else datetime.now(timezone.utc)
+    events_file.parent.mkdir(parents=True, exist_ok=True)
+    offset_file.parent.mkdir(parents=True, exist_ok=True)
+
+    next_line = 1
+    offset_obj = read_offset(offset_file)
+    if isinstance(offset_obj.get("next_line"), int):
+        next_line = max(1, offset_obj["next_line"])
+
+    selected, from_byte, line, byte = read_events(events_file, offset_obj, next_line, topics, now, max_events)
+    write_offset(offset_file, consumer, events_file, line, byte, now)
+
+    return {
+        "consumer": consumer,
+        "events_file": str(events_file),
+        "offset_file": str(offset_file),
+        "topics_filter": sorted(topics),
+        "from_line": next_line,
+        "from_byte": from_byte,
+        "to_line": line - 1,
+        "next_line": line,
+        "next_byte": byte,
+        "events_returned": selected,
+    }
+
+
+def _is_log_path(events_file: Path, path: str) -> bool:
+    p = Path(path)
+    if p == events_file:
+        return True
+    return p.parent == segments_dir(events_file) and not p.name.endswith(LINE_INDEX_SUFFIX) and p.name != LOCK_NAME
+
+
+def subscribe(
+    events_file: Path,
+    offset_file: Path,
+    consumer: str,
+    topics: set[str],
+    emit: Callable[[dict[str, Any]], None],
+    timeout_s: float | None = None,
+    max_events: int | None = None,
+    commit_every: int = SUBSCRIBE_COMMIT_EVERY,
+    commit_interval_s: float = SUBSCRIBE_COMMIT_INTERVAL_S,
+    poll_interval: float = 0.5,
+    force_poll: bool = False,
+    now_ts: str = "",
+) -> dict[str, Any]:
+    """Deliver events to `emit` as they are appended, blocking on file-change notification in between.
+
+    Returns when `max_events` have been delivered, when `timeout_s` passes
+    with nothing delivered, or on KeyboardInterrupt. The offset is committed
+    after every `commit_every` delivered events or `commit_interval_s`,
+    whichever comes first, and again on exit. A commit always follows the
+    emit of every event it covers, so a crash re-delivers a batch rather than
+    losing one. If `emit` raises, the batch being emitted is left uncommitted
+    and the exception propagates.
+    """
+    events_file.parent.mkdir(parents=True, exist_ok=True)
+    offset_file.parent.mkdir(parents=True, exist_ok=True)
+    offset_obj = read_offset(offset_file)
+    line = max(1, offset_obj["next_line"]) if isinstance(offset_obj.get("next_line"), int) else 1
+    byte = offset_obj.get("next_byte") if isinstance(offset_obj.get("next_byte"), int) else None
+    committed = (line, byte)
+    fixed_now = parse_rfc3339_z(now_ts) if now_ts else None
+
+    delivered = commits = reads = 0
+    uncommitted = 0
+    commit_due: float | None = None
+    reason = "timeout"
+    started = last_delivery = time.monotonic()
+
+    def commit() -> None:
+        nonlocal committed, uncommitted, commit_due, commits
+        if byte is not None and (line, byte) != committed:
+            write_offset(offset_file, consumer, events_file, line, byte, fixed_now or datetime.now(timezone.utc))
+            committed = (line, byte)
+            commits += 1
+        uncommitted = 0
+        commit_due = None
+
+    # Loads ctypes; only the blocking subscribe path needs it.
+    from sb_fswatch import FsWatcher
+
+    # Watch before the first read so an append racing it still wakes us.
+    watcher = FsWatcher(events_file.parent, depth=1, poll_interval=poll_interval, force_poll=force_poll)
+    try:
+        dirty = True
+        while True:
+            if dirty:
+                remaining = 1 << 62 if max_events is None else max_events - delivered
+                position = {"next_byte": byte} if byte is not None else {}
+                now = fixed_now or datetime.now(timezone.utc)
+                selected, _, new_line, new_byte = read_events(events_file, position, line, topics, now, remaining, drain=False)
+                reads += 1
+                for evt in selected:
+                    try:
+                        emit(evt)
+                    except Exception:
+                        # Commit what earlier reads fully delivered; this read's batch is left for the next subscriber.
+                        commit()
+                        reason = "emit_failed"
+                        raise
+                if (new_line, new_byte) != (line, byte):
+                    line, byte = new_line, new_byte
+                    if commit_due is None:
+                        commit_due = time.monotonic() + commit_interval_s
+                if selected:
+                    delivered += len(selected)
+                    uncommitted += len(selected)
+                    last_delivery = time.monotonic()
+                if max_events is not None and delivered >= max_events:
+                    reason = "max_events"
+                    break
+                if uncommitted >= commit_every:
+                    commit()
+                dirty = False
+
+            clock = time.monotonic()
+            if commit_due is not None and clock >= commit_due:
+                commit()
+            waits = []
+            if timeout_s is not None:
+                idle_left = timeout_s - (clock - last_delivery)
+                if idle_left <= 0:
+                    reason = "timeout"
+                    break
+                waits.append(idle_left)
+            if commit_due is not None:
+                waits.append(max(0.0, commit_due - clock))
+            fs_events = watcher.events(min(waits) if waits else None)
+            dirty = any(e.kind == "overflow" or _is_log_path(events_file, e.path) for e in fs_events)
+    except KeyboardInterrupt:
+        reason = "interrupted"
+    finally:
+        watcher.close()
+        if reason != "emit_failed":
+            commit()
+
+    return {
+        "consumer": consumer,
+        "events_file": str(events_file),
+        "offset_file": str(offset_file),
+        "backend": watcher.backend,
+        "reason": reason,
+        "delivered": delivered,
+        "reads": reads,
+        "commits": commits,
+        "next_line": line,
+        "next_byte": byte,
+        "elapsed_ms": round((time.monotonic() - started) * 1000.0, 3),
+    }
+
+
+def parse_topics(topics_csv: str) -> set[str]:
+    if not topics_csv.strip():
+        return set()
+    return {t.strip() for t in topics_csv.split(",") if t.strip()}
@@ -0,0 +1,384 @@
+"""Consumer groups and lag reporting for the pub/sub bus (meta/PUBSUB_BUS_SPEC_v0.md), behind `sb pubsub group-*` and `sb pubsub lag`."""
+from __future__ import annotations
+
+import fcntl
+import heapq
+import json
+import os
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Iterator
+from urllib.parse import unquote
+
+from sb_pubsub import (
+    TOPIC_INDEX_DIR,
+    TOPIC_INDEX_FORMAT,
+    TOPIC_INDEX_SUFFIX,
+    _read_log_end,
+    _segment_size,
+    _topic_positions,
+    format_ts,
+    load_segments,
+    parse_rfc3339_z,
+    read_events,
+    read_manifest,
+    read_offset,
+    segments_dir,
+)
+
+GROUP_FORMAT = "pubsub_group_v0"
+GROUP_PARTITIONS = 4
+GROUP_LEASE_S = 30
+PARTITION_KEY = "scope"
+
+
+def partition_of(evt: dict[str, Any], partitions: int) -> int:
+    """Partition of an event: crc32 of its scope, so every event about one scope goes to the same worker in order."""
+    return zlib.crc32(str(evt.get(PARTITION_KEY, "")).encode("utf-8")) % partitions
+
+
+def group_file(groups_dir: Path, group: str) -> Path:
+    return groups_dir / f"{group}.json"
+
+
+@contextmanager
+def _group_lock(groups_dir: Path, group: str) -> Iterator[None]:
+    groups_dir.mkdir(parents=True, exist_ok=True)
+    with open(groups_dir / f"{group}.lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+
+def read_group(groups_dir: Path, group: str) -> dict[str, Any] | None:
+    path = group_file(groups_dir, group)
+    try:
+        state = json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+    except ValueError as e:
+        raise SystemExit(f"invalid group state {path}: {e}")
+    if not isinstance(state, dict) or state.get("format") != GROUP_FORMAT:
+        raise SystemExit(f"invalid group state {path}: expected format {GROUP_FORMAT}")
+    return state
+
+
+def _write_group(groups_dir: Path, state: dict[str, Any]) -> None:
+    path = group_file(groups_dir, state["group"])
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(state, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _new_group(group: str, events_file: Path, partitions: int, now: datetime) -> dict[str, Any]:
+    return {
+        "format": GROUP_FORMAT,
+        "group": group,
+        "events_file": str(events_file),
+        "partitions": partitions,
+        "partition_key": PARTITION_KEY,
+        "created_at": format_ts(now),
+        "offsets": [{"next_line": 1, "next_byte": 0, "updated_at": None} for _ in range(partitions)],
+        "leases": [{"worker": None, "epoch": 0, "expires_at": None} for _ in range(partitions)],
+        "workers": {},
+    }
+
+
+def _expired(ts: str | None, now: datetime) -> bool:
+    return ts is None or parse_rfc3339_z(ts) <= now
+
+
+def _rebalance(state: dict[str, Any], worker: str, now: datetime, lease_s: int) -> list[int]:
+    """Renew `worker`, then move it toward an even share of partitions; returns the partitions it now leases.
+
+    A worker over its share releases the excess, and a worker under it takes
+    free partitions. Every change of owner bumps the partition's epoch, which
+    fences commits from the previous owner.
+    """
+    expires_at = format_ts(now + timedelta(seconds=lease_s))
+    workers = {w: v for w, v in state["workers"].items() if not _expired(v.get("expires_at"), now)}
+    workers[worker] = {"expires_at": expires_at}
+    state["workers"] = workers
+    leases: list[dict[str, Any]] = state["leases"]
+    for lease in leases:
+        if lease["worker"] is not None and (lease["worker"] not in workers or _expired(lease["expires_at"], now)):
+            lease["worker"] = lease["expires_at"] = None
+
+    share = -(-len(leases) // len(workers))
+    mine = [p for p, lease in enumerate(leases) if lease["worker"] == worker]
+    for p in mine[share:]:
+        leases[p]["worker"] = leases[p]["expires_at"] = None
+    mine = mine[:share]
+    for p, lease in enumerate(leases):
+        if len(mine) >= share:
+            break
+        if lease["worker"] is None:
+            lease["worker"] = worker
+            lease["epoch"] += 1
+            mine.append(p)
+    for p in mine:
+        leases[p]["expires_at"] = expires_at
+    return sorted(mine)
+
+
+def group_poll(
+    events_file: Path,
+    groups_dir: Path,
+    group: str,
+    worker: str,
+    topics: set[str],
+    max_events: int,
+    partitions: int | None = None,
+    lease_s: int = GROUP_LEASE_S,
+    now_ts: str = "",
+) -> dict[str, Any]:
+    """Lease partitions for `worker` and return their next events plus the cursor to hand to group_commit().
+
+    Nothing is committed here: the group offsets move only when the worker
+    commits the returned cursor, so a worker that dies mid-batch leaves its
+    events to whoever leases the partitions next.
+    """
+    now = parse_rfc3339_z(now_ts) if now_ts else datetime.now(timezone.utc)
+    with _group_lock(groups_dir, group):
+        state = read_group(groups_dir, group)
+        if state is None:
+            state = _new_group(group, events_file, partitions or GROUP_PARTITIONS, now)
+        elif partitions is not None and partitions != state["partitions"]:
+            raise SystemExit(f"group {group} has {state['partitions']} partitions, not {partitions}")
+        owned = _rebalance(state, worker, now, lease_s)
+        state["updated_at"] = format_ts(now)
+        _write_group(groups_dir, state)
+
+    out: dict[str, Any] = {
+        "group": group,
+        "worker": worker,
+        "events_file": str(events_file),
+        "topics_filter": sorted(topics),
+        "partitions": state["partitions"],
+        "partitions_owned": owned,
+        "lease_expires_at": state["workers"][worker]["expires_at"],
+        "cursor": {},
+        "events_returned": [],
+    }
+    if not owned:
+        return out
+
+    offsets = {p: state["offsets"][p] for p in owned}
+    start = min(offsets.values(), key=lambda o: (o["next_byte"], o["next_line"]))
+    n_partitions = state["partitions"]
+
+    def match(evt: dict[str, Any]) -> bool:
+        p = partition_of(evt, n_partitions)
+        evt["_partition"] = p
+        return p in offsets and evt["_line"] >= offsets[p]["next_line"]
+
+    selected, _from_byte, line, byte = read_events(
+        events_file, dict(start), start["next_line"], topics, now, max_events, drain=False, match=match
+    )
+    for p in owned:
+        ahead = offsets[p]["next_byte"] > byte
+        out["cursor"][str(p)] = {
+            "epoch": state["leases"][p]["epoch"],
+            "from_line": offsets[p]["next_line"],
+            "next_line": offsets[p]["next_line"] if ahead else line,
+            "next_byte": offsets[p]["next_byte"] if ahead else byte,
+        }
+    out["events_returned"] = selected
+    return out
+
+
+def group_commit(
+    groups_dir: Path,
+    group: str,
+    worker: str,
+    cursor: dict[str, Any],
+    lease_s: int = GROUP_LEASE_S,
+    now_ts: str = "",
+) -> dict[str, Any]:
+    """Commit a group_poll() cursor for the partitions `worker` still leases, unexpired and at the same epoch, renewing them."""
+    now = parse_rfc3339_z(now_ts) if now_ts else datetime.now(timezone.utc)
+    committed: list[int] = []
+    rejected: list[dict[str, Any]] = []
+    with _group_lock(groups_dir, group):
+        state = read_group(groups_dir, group)
+        if state is None:
+            raise SystemExit(f"unknown group: {group}")
+        expires_at = format_ts(now + timedelta(seconds=lease_s))
+        for key, pos in sorted(cursor.items(), key=lambda kv: int(kv[0])):
+            p = int(key)
+            if not 0 <= p < state["partitions"]:
+                rejected.append({"partition": p, "reason": "unknown_partition"})
+                continue
+            lease = state["leases"][p]
+            if lease["worker"] != worker or lease["epoch"] != pos.get("epoch") or _expired(lease["expires_at"], now):
+                # Expired or reassigned since the poll: the next owner re-reads from the last committed offset.
+                rejected.append({"partition": p, "reason": "lease_lost"})
+                continue
+            offset = state["offsets"][p]
+            if pos["next_byte"] > offset["next_byte"]:
+                offset.update(next_line=pos["next_line"], next_byte=pos["next_byte"], updated_at=format_ts(now))
+            lease["expires_at"] = expires_at
+            committed.append(p)
+        if committed:
+            state["workers"][worker] = {"expires_at": expires_at}
+        state["updated_at"] = format_ts(now)
+        _write_group(groups_dir, state)
+    return {"group": group, "worker": worker, "committed": committed, "rejected": rejected}
+
+
+def group_leave(groups_dir: Path, group: str, worker: str, now_ts: str = "") -> dict[str, Any]:
+    """Release every lease `worker` holds so the remaining workers pick the partitions up on their next poll."""
+    now = parse_rfc3339_z(now_ts) if now_ts else datetime.now(timezone.utc)
+    with _group_lock(groups_dir, group):
+        state = read_group(groups_dir, group)
+        if state is None:
+            raise SystemExit(f"unknown group: {group}")
+        released = [p for p, lease in enumerate(state["leases"]) if lease["worker"] == worker]
+        for p in released:
+            state["leases"][p]["worker"] = state["leases"][p]["expires_at"] = None
+        state["workers"].pop(worker, None)
+        state["updated_at"] = format_ts(now)
+        _write_group(groups_dir, state)
+    return {"group": group, "worker": worker, "released": released}
+
+
+def _count_through_last_newline(path: Path) -> tuple[int, int]:
+    """(lines, bytes) of `path` up to its last complete line."""
+    lines = size = consumed = 0
+    try:
+        f = path.open("rb")
+    except FileNotFoundError:
+        return 0, 0
+    with f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            n = chunk.count(b"\n")
+            if n:
+                lines += n
+                size = consumed + chunk.rfind(b"\n") + 1
+            consumed += len(chunk)
+    return lines, size
+
+
+def log_bounds(events_file: Path) -> dict[str, int]:
+    """First retained and next-to-append (line, byte) of the log, from the manifest and end marker."""
+    segments = load_segments(events_file)
+    if segments is None:
+        lines, size = _count_through_last_newline(events_file)
+        return {"first_line": 1, "first_byte": 0, "end_line": 1 + lines, "end_byte": size}
+    active = segments[-1]
+    end = _read_log_end(segments_dir(events_file))
+    if end is not None and end[1] == active.base_byte + _segment_size(active):
+        end_line, end_byte = end
+    else:
+        # End marker missing or behind an in-flight append: count the active segment only.
+        lines, size = _count_through_last_newline(active.path)
+        end_line, end_byte = active.base_line + lines, active.base_byte + size
+    return {"first_line": segments[0].base_line, "first_byte": segments[0].base_byte, "end_line": end_line, "end_byte": end_byte}
+
+
+def _has_topic_index(events_file: Path) -> bool:
+    manifest = read_manifest(events_file)
+    return manifest is not None and manifest.get("topic_index") == TOPIC_INDEX_FORMAT
+
+
+def _topic_lag(events_file: Path, start_line: int, start_byte: int | None, end_byte: int) -> dict[str, dict[str, int]] | None:
+    """Per-topic events and bytes between a position and the end marker, from the topic indexes alone.
+
+    An event's size is the distance to the next indexed event, so bytes add up
+    without reading the log. None when the log has no topic index.
+    """
+    if not _has_topic_index(events_file):
+        return None
+    tdir = segments_dir(events_file) / TOPIC_INDEX_DIR
+    streams = [
+        ((byte, unquote(path.name[: -len(TOPIC_INDEX_SUFFIX)])) for byte, _line in _topic_positions(path, start_line, start_byte, end_byte))
+        for path in sorted(tdir.glob(f"*{TOPIC_INDEX_SUFFIX}"))
+    ]
+    out: dict[str, dict[str, int]] = {}
+    prev: tuple[int, str] | None = None
+    for byte, topic in heapq.merge(*streams):
+        if prev is not None:
+            out[prev[1]]["lag_bytes"] += byte - prev[0]
+        out.setdefault(topic, {"lag_events": 0, "lag_bytes": 0})["lag_events"] += 1
+        prev = (byte, topic)
+    if prev is not None:
+        out[prev[1]]["lag_bytes"] += end_byte - prev[0]
+    return out
+
+
+def _position_lag(bounds: dict[str, int], next_line: int, next_byte: int | None) -> dict[str, Any]:
+    """Lag of one offset; positions inside compacted segments count from the first retained event."""
+    line = max(next_line, bounds["first_line"])
+    return {
+        "lag_events": max(0, bounds["end_line"] - line),
+        "lag_bytes": None if next_byte is None else max(0, bounds["end_byte"] - max(next_byte, bounds["first_byte"])),
+    }
+
+
+def lag(events_file: Path, offsets_dir: Path, groups_dir: Path, by_topic: bool = True, now_ts: str = "") -> dict[str, Any]:
+    """Per-consumer and per-group lag in events (log lines) and bytes, plus a per-topic breakdown from the topic indexes."""
+    now = parse_rfc3339_z(now_ts) if now_ts else datetime.now(timezone.utc)
+    bounds = log_bounds(events_file)
+
+    def topics_for(next_line: int, next_byte: int | None) -> dict[str, dict[str, int]] | None:
+        if not by_topic:
+            return None
+        start_byte = None if next_byte is None else max(next_byte, bounds["first_byte"])
+        return _topic_lag(events_file, max(next_line, bounds["first_line"]), start_byte, bounds["end_byte"])
+
+    consumers: list[dict[str, Any]] = []
+    for path in sorted(offsets_dir.glob("*.json")) if offsets_dir.is_dir() else []:
+        offset_obj = read_offset(path)
+        next_line = offset_obj["next_line"] if isinstance(offset_obj.get("next_line"), int) else 1
+        next_byte = offset_obj["next_byte"] if isinstance(offset_obj.get("next_byte"), int) else None
+        row: dict[str, Any] = {
+            "consumer": offset_obj.get("consumer", path.stem),
+            "next_line": next_line,
+            "next_byte": next_byte,
+            "updated_at": offset_obj.get("updated_at"),
+            **_position_lag(bounds, next_line, next_byte),
+        }
+        if by_topic:
+            row["topics"] = topics_for(next_line, next_byte)
+        consumers.append(row)
+
+    groups: list[dict[str, Any]] = []
+    for path in sorted(groups_dir.glob("*.json")) if groups_dir.is_dir() else []:
+        state = read_group(groups_dir, path.stem)
+        if state is None:
+            continue
+        rows = []
+        for p, (offset, lease) in enumerate(zip(state["offsets"], state["leases"])):
+            live = lease["worker"] is not None and not _expired(lease["expires_at"], now)
+            rows.append(
+                {
+                    "partition": p,
+                    "worker": lease["worker"] if live else None,
+                    "lease_expires_at": lease["expires_at"] if live else None,
+                    "epoch": lease["epoch"],
+                    "next_line": offset["next_line"],
+                    "next_byte": offset["next_byte"],
+                    "updated_at": offset["updated_at"],
+                    **_position_lag(bounds, offset["next_line"], offset["next_byte"]),
+                }
+            )
+        slowest = min(state["offsets"], key=lambda o: o["next_byte"])
+        row = {
+            "group": state["group"],
+            "partitions": state["partitions"],
+            "workers": sorted(w for w, v in state["workers"].items() if not _expired(v.get("expires_at"), now)),
+            **_position_lag(bounds, slowest["next_line"], slowest["next_byte"]),
+            "partition_lag": rows,
+        }
+        if by_topic:
+            row["topics"] = topics_for(slowest["next_line"], slowest["next_byte"])
+        groups.append(row)
+
+    return {
+        "events_file": str(events_file),
+        "log": bounds,
+        "topic_index": _has_topic_index(events_file),
+        "consumers": consumers,
+        "groups": groups,
+    }
@@ -0,0 +1,388 @@
+"""Merged, date-sorted view over every sessions/<tool>/index.json, used by `sb query`.
+
+Rows are stored column-wise in (date, id, tool) order so date ranges are two
+bisects. Secondary orders on resumption_score (scored rows only) and id make
+--min-score and --id-prefix bisects too. The merged columns are snapshotted to
+state/cache/query_index_v0.bin, keyed by each tool index's (size, mtime_ns).
+When one tool index changes, only that tool's rows are re-read and merged back in.
+
+The snapshot is read through mmap so a cold process does not decode 100k rows
+to answer one query. Layout (little-endian, sections 8-byte aligned):
+
+    header        HEADER struct (magic, version, counts, meta and blob sizes)
+    meta          JSON {"signatures": ..., "tool_names": ...}
+    tools         u32[n_rows]          index into tool_names
+    scores        i64[n_rows]          NO_SCORE when unscored
+    score_order   u32[n_scored]        scored rows by (score, row)
+    id_order      u32[n_rows]          rows by id
+    str_offsets   u32[3 * n_rows + 1]  dates, then ids, then snippets
+    str_blob      utf-8 bytes
+"""
+from __future__ import annotations
+
+import bisect
+import heapq
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Any, Iterator, Sequence
+
+CACHE_VERSION = 2
+DATE_RE = re.compile(r"^[0-9]{4}-[0-9]{2}-[0-9]{2}$")
+MAGIC = b"SBQUERY\0"
+# magic, version, n_rows, n_scored, meta_len, blob_len
+HEADER = struct.Struct("<8sIIIIQ")
+NO_SCORE = -(2**63)
+SCORE_MAX = 2**63 - 1
+
+_LOADED: dict[str, SessionQueryIndex] = {}
+
+
+class _StrColumn:
+    """Read-only str sequence over a slice of the snapshot's string table, decoded per access."""
+
+    def __init__(self, buf: mmap.mmap, blob_start: int, offsets: Sequence[int], first: int, n: int) -> None:
+        self._buf = buf
+        self._blob_start = blob_start
+        self._offsets = offsets
+        self._first = first
+        self._n = n
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __getitem__(self, i: int) -> str:
+        if not 0 <= i < self._n:
+            raise IndexError(i)
+        k = self._first + i
+        start = self._blob_start + self._offsets[k]
+        return self._buf[start : self._blob_start + self._offsets[k + 1]].decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        return (self[i] for i in range(self._n))
+
+
+class _ScoreColumn:
+    """Read-only view of the snapshot's i64 score column with NO_SCORE mapped back to None."""
+
+    def __init__(self, values: Sequence[int]) -> None:
+        self._values = values
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __getitem__(self, i: int) -> int | None:
+        v = self._values[i]
+        return None if v == NO_SCORE else v
+
+    def __iter__(self) -> Iterator[int | None]:
+        return (None if v == NO_SCORE else v for v in self._values)
+
+
+class SessionQueryIndex:
+    def __init__(self, columns: dict[str, Any], signatures: dict[str, list[int]]) -> None:
+        # Columns are lists when freshly built, mmap-backed views when loaded from a snapshot.
+        self.tool_names: list[str] = columns["tool_names"]
+        self.tools: Sequence[int] = columns["tools"]
+        self.ids: Sequence[str] = columns["ids"]
+        self.dates: Sequence[str] = columns["dates"]
+        self.scores: Sequence[int | None] = columns["scores"]
+        self.snippets: Sequence[str] = columns["snippets"]
+        self.score_order: Sequence[int] = columns["score_order"]
+        self.id_order: Sequence[int] = columns["id_order"]
+        self.signatures = signatures
+        self._by_tool: dict[int, list[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def record(self, pos: int) -> dict[str, Any]:
+        return {
+            "tool": self.tool_names[self.tools[pos]],
+            "id": self.ids[pos],
+            "date": self.dates[pos],
+            "resumption_score": self.scores[pos],
+            "summary_snippet": self.snippets[pos],
+        }
+
+    def tool_positions(self, tool_idx: int) -> list[int]:
+        if tool_idx not in self._by_tool:
+            self._by_tool[tool_idx] = [i for i, t in enumerate(self.tools) if t == tool_idx]
+        return self._by_tool[tool_idx]
+
+    def select(
+        self,
+        since: str | None = None,
+        until: str | None = None,
+        min_score: int | None = None,
+        tools: list[str] | None = None,
+        id_prefix: str | None = None,
+        descending: bool = False,
+    ) -> Iterator[int]:
+        """Yield matching row positions in date order, driving from the most selective index."""
+        lo = bisect.bisect_left(self.dates, since) if since else 0
+        hi = bisect.bisect_right(self.dates, until) if until else len(self.dates)
+        if lo >= hi:
+            return
+
+        candidates: list[tuple[int, str, Any]] = [(hi - lo, "date", None)]
+        if min_score is not None:
+            # score_order holds scored rows only, so no threshold can match an unscored row.
+            start = bisect.bisect_left(self.score_order, min_score, key=self.scores.__getitem__)
+            score_slice = self.score_order[start:]
+            candidates.append((len(score_slice), "score", score_slice))
+        if id_prefix:
+            a = bisect.bisect_left(self.id_order, id_prefix, key=self.ids.__getitem__)
+            b = bisect.bisect_left(self.id_order, id_prefix + "\U0010ffff", key=self.ids.__getitem__)
+            prefix_slice = self.id_order[a:b]
+            candidates.append((len(prefix_slice), "id", prefix_slice))
+        tool_set: set[int] | None = None
+        if tools:
+            tool_set = {self.tool_names.index(t) for t in tools if t in self.tool_names}
+            if not tool_set:
+                return
+            total = sum(len(self.tool_positions(t)) for t in tool_set)
+            candidates.append((total, "tool", None))
+
+        _, driver, driver_rows = min(candidates, key=lambda c: c[0])
+        rows: Any
+        if driver == "date":
+            rows = range(lo, hi)
+        elif driver == "tool":
+            assert tool_set is not None
+            rows = sorted(p for t in tool_set for p in self.tool_positions(t))
+        else:
+            rows = sorted(driver_rows)
+        if descending:
+            rows = reversed(rows)
+
+        scores, ids, tool_col = self.scores, self.ids, self.tools
+        for pos in rows:
+            if driver != "date" and not (lo <= pos < hi):
+                continue
+            if min_score is not None and driver != "score":
+                score = scores[pos]
+                if score is None or score < min_score:
+                    continue
+            if id_prefix and driver != "id" and not ids[pos].startswith(id_prefix):
+                continue
+            if tool_set is not None and driver != "tool" and tool_col[pos] not in tool_set:
+                continue
+            yield pos
+
+
+def _row_key(row: tuple[str, str, str, int | None, str]) -> tuple[str, str, str]:
+    return row[0], row[1], row[2]
+
+
+def valid_date(value: str) -> bool:
+    return bool(DATE_RE.match(value))
+
+
+def index_signatures(sessions_dir: Path) -> dict[str, list[int]]:
+    out: dict[str, list[int]] = {}
+    if not sessions_dir.is_dir():
+        return out
+    for entry in sorted(os.scandir(sessions_dir), key=lambda e: e.name):
+        if not entry.is_dir():
+            continue
+        try:
+            st = os.stat(os.path.join(entry.path, "index.json"))
+        except OSError:
+            continue
+        out[entry.name] = [st.st_size, st.st_mtime_ns]
+    return out
+
+
+def read_tool_rows(sessions_dir: Path, tool: str) -> list[tuple[str, str, str, int | None, str]]:
+    try:
+        value = json.loads((sessions_dir / tool / "index.json").read_text(encoding="utf-8"))
+    except Exception:
+        return []
+    artifacts = value.get("artifacts") if isinstance(value, dict) else value
+    rows: list[tuple[str, str, str, int | None, str]] = []
+    if not isinstance(artifacts, list):
+        return rows
+    for a in artifacts:
+        if isinstance(a, str):
+            # Legacy list-of-ids index: no date, score or snippet to offer.
+            rows.append(("", a, tool, None, ""))
+        elif isinstance(a, dict) and isinstance(a.get("id"), str):
+            date = a.get("date")
+            score = a.get("resumption_score")
+            snippet = a.get("summary_snippet")
+            rows.append(
+                (
+                    date if isinstance(date, str) else "",
+                    a["id"],
+                    tool,
+                    score if isinstance(score, int) and not isinstance(score, bool) and NO_SCORE < score <= SCORE_MAX else None,
+                    snippet if isinstance(snippet, str) else "",
+                )
+            )
+    rows.sort(key=_row_key)
+    return rows
+
+
+def build_columns(rows: Iterator[tuple[str, str, str, int | None, str]] | list[Any], tool_names: list[str]) -> dict[str, Any]:
+    tool_idx = {t: i for i, t in enumerate(tool_names)}
+    dates: list[str] = []
+    ids: list[str] = []
+    tools: list[int] = []
+    scores: list[int | None] = []
+    snippets: list[str] = []
+    for date, aid, tool, score, snippet in rows:
+        dates.append(date)
+        ids.append(aid)
+        tools.append(tool_idx[tool])
+        scores.append(score)
+        snippets.append(snippet)
+    score_order = sorted((p for p in range(len(ids)) if scores[p] is not None), key=lambda p: (scores[p], p))
+    id_order = sorted(range(len(ids)), key=ids.__getitem__)
+    return {
+        "tool_names": tool_names,
+        "tools": tools,
+        "ids": ids,
+        "dates": dates,
+        "scores": scores,
+        "snippets": snippets,
+        "score_order": score_order,
+        "id_order": id_order,
+    }
+
+
+def refresh(
+    previous: SessionQueryIndex | None, sessions_dir: Path, signatures: dict[str, list[int]]
+) -> SessionQueryIndex:
+    old_sigs = previous.signatures if previous is not None else {}
+    changed = {t for t in set(signatures) | set(old_sigs) if signatures.get(t) != old_sigs.get(t)}
+    tool_names = sorted(signatures)
+
+    kept: Iterator[tuple[str, str, str, int | None, str]] | list[Any] = []
+    if previous is not None:
+        prev = previous
+        kept = (
+            (prev.dates[i], prev.ids[i], prev.tool_names[prev.tools[i]], prev.scores[i], prev.snippets[i])
+            for i in range(len(prev))
+            if prev.tool_names[prev.tools[i]] not in changed
+        )
+    fresh = [read_tool_rows(sessions_dir, t) for t in sorted(changed) if t in signatures]
+    merged = heapq.merge(kept, *fresh, key=_row_key)
+    return SessionQueryIndex(build_columns(merged, tool_names), signatures)
+
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def _packed(code: str, values: Iterator[int] | Sequence[int]) -> bytes:
+    arr = array(code, values)
+    if sys.byteorder != "little":
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def _unpacked(view: memoryview, code: str) -> Sequence[int]:
+    if sys.byteorder == "little":
+        return view.cast(code)
+    arr = array(code)
+    arr.frombytes(view)
+    arr.byteswap()
+    return arr
+
+
+def encode(index: SessionQueryIndex) -> bytes:
+    n = len(index)
+    meta = json.dumps({"signatures": index.signatures, "tool_names": index.tool_names}, separators=(",", ":")).encode("utf-8")
+    blob = bytearray()
+    str_offsets = [0]
+    for column in (index.dates, index.ids, index.snippets):
+        for value in column:
+            blob += value.encode("utf-8")
+            str_offsets.append(len(blob))
+    sections = [
+        _packed("I", index.tools),
+        _packed("q", (NO_SCORE if v is None else v for v in index.scores)),
+        _packed("I", index.score_order),
+        _packed("I", index.id_order),
+        _packed("I", str_offsets),
+    ]
+    out = bytearray(HEADER.pack(MAGIC, CACHE_VERSION, n, len(index.score_order), len(meta), len(blob)))
+    out += meta
+    for section in sections:
+        out += b"\0" * (_align(len(out)) - len(out))
+        out += section
+    out += b"\0" * (_align(len(out)) - len(out))
+    out += blob
+    return bytes(out)
+
+
+def load_snapshot(cache_file: Path) -> SessionQueryIndex | None:
+    """Map a snapshot written by save_snapshot(); None when missing, stale-format or truncated."""
+    try:
+        with open(cache_file, "rb") as f:
+            if os.fstat(f.fileno()).st_size < HEADER.size:
+                return None
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    magic, version, n, n_scored, meta_len, blob_len = HEADER.unpack_from(mm, 0)
+    if magic != MAGIC or version != CACHE_VERSION:
+        return None
+    view = memoryview(mm)
+    pos = HEADER.size + meta_len
+    try:
+        meta = json.loads(bytes(view[HEADER.size : pos]).decode("utf-8"))
+    except ValueError:
+        return None
+    cols: list[Sequence[int]] = []
+    for code, size, count in (("I", 4, n), ("q", 8, n), ("I", 4, n_scored), ("I", 4, n), ("I", 4, 3 * n + 1)):
+        pos = _align(pos)
+        if pos + size * count > len(mm):
+            return None
+        cols.append(_unpacked(view[pos : pos + size * count], code))
+        pos += size * count
+    blob_start = _align(pos)
+    if blob_start + blob_len > len(mm):
+        return None
+    tools, scores, score_order, id_order, str_offsets = cols
+    columns = {
+        "tool_names": meta.get("tool_names"),
+        "tools": tools,
+        "dates": _StrColumn(mm, blob_start, str_offsets, 0, n),
+        "ids": _StrColumn(mm, blob_start, str_offsets, n, n),
+        "snippets": _StrColumn(mm, blob_start, str_offsets, 2 * n, n),
+        "scores": _ScoreColumn(scores),
+        "score_order": score_order,
+        "id_order": id_order,
+    }
+    if not isinstance(columns["tool_names"], list) or not isinstance(meta.get("signatures"), dict):
+        return None
+    return SessionQueryIndex(columns, meta["signatures"])
+
+
+def save_snapshot(cache_file: Path, index: SessionQueryIndex) -> None:
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp = cache_file.with_name(f".{cache_file.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(encode(index))
+    os.replace(tmp, cache_file)
+
+
+def load(sessions_dir: Path, cache_file: Path) -> SessionQueryIndex:
+    """Return an up-to-date index, reusing the in-process copy (e.g. inside `sb serve`) when possible."""
+    signatures = index_signatures(sessions_dir)
+    key = str(cache_file)
+    index = _LOADED.get(key)
+    if index is None or index.signatures != signatures:
+        if index is None:
+            index = load_snapshot(cache_file)
+        if index is None or index.signatures != signatures:
+            index = refresh(index, sessions_dir, signatures)
+            save_snapshot(cache_file, index)
+        _LOADED[key] = index
+    return index
@@ -0,0 +1,167 @@
+"""Compile the draft-07 subset used by scenes/_schemas/*.schema.json into reusable validators.
+
+Supported keywords: type, enum, const, required, properties, additionalProperties,
+items, minLength, minimum, maximum, format=date, oneOf and file-relative $ref.
+"""
+from __future__ import annotations
+
+import json
+import re
+from pathlib import Path
+from typing import Any, Callable
+
+Validator = Callable[[Any, str], list[str]]
+
+SCENE_SCHEMA_NAMES = ("graph_scene_v0", "phase_event_v0", "phase_history_v0")
+
+DATE_RE = re.compile(r"^[0-9]{4}-[0-9]{2}-[0-9]{2}$")
+
+_TYPE_CHECKS: dict[str, Callable[[Any], bool]] = {
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+    "string": lambda v: isinstance(v, str),
+    "boolean": lambda v: isinstance(v, bool),
+    "null": lambda v: v is None,
+    "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+}
+
+
+class SchemaCompiler:
+    def __init__(self, schemas_dir: Path) -> None:
+        self.schemas_dir = schemas_dir
+        self._by_file: dict[str, Validator] = {}
+
+    def compile_file(self, name: str) -> Validator:
+        if name in self._by_file:
+            return self._by_file[name]
+        # Register a forwarding stub first so recursive $refs resolve lazily.
+        resolved: list[Validator] = []
+        self._by_file[name] = lambda v, at: resolved[0](v, at)
+        schema = json.loads((self.schemas_dir / name).read_text(encoding="utf-8"))
+        validator = self.compile(schema)
+        resolved.append(validator)
+        self._by_file[name] = validator
+        return validator
+
+    def compile(self, schema: Any) -> Validator:
+        if schema is True or schema == {}:
+            return lambda _v, _at: []
+        if schema is False:
+            return lambda _v, at: [f"{at}: not allowed"]
+        if not isinstance(schema, dict):
+            raise ValueError(f"unsupported schema node: {schema!r}")
+
+        ref = schema.get("$ref")
+        if isinstance(ref, str):
+            target = ref.split("#", 1)[0]
+            return lambda v, at: self.compile_file(target)(v, at)
+
+        checks: list[Validator] = []
+
+        types = schema.get("type")
+        if isinstance(types, str):
+            types = [types]
+        if isinstance(types, list):
+            type_fns = [_TYPE_CHECKS[t] for t in types]
+            label = "|".join(types)
+            checks.append(lambda v, at: [] if any(fn(v) for fn in type_fns) else [f"{at}: expected {label}"])
+
+        if "enum" in schema:
+            allowed = list(schema["enum"])
+            checks.append(lambda v, at: [] if v in allowed else [f"{at}: value not in enum {allowed}"])
+        if "const" in schema:
+            const = schema["const"]
+            checks.append(lambda v, at: [] if v == const else [f"{at}: expected const {const!r}"])
+
+        min_len = schema.get("minLength")
+        if isinstance(min_len, int):
+            checks.append(
+                lambda v, at: [f"{at}: shorter than {min_len}"] if isinstance(v, str) and len(v) < min_len else []
+            )
+        if schema.get("format") == "date":
+            checks.append(
+                lambda v, at: [f"{at}: expected YYYY-MM-DD date"] if isinstance(v, str) and not DATE_RE.match(v) else []
+            )
+        minimum, maximum = schema.get("minimum"), schema.get("maximum")
+        if minimum is not None or maximum is not None:
+
+            def check_range(v: Any, at: str) -> list[str]:
+                if not _TYPE_CHECKS["number"](v):
+                    return []
+                if minimum is not None and v < minimum:
+                    return [f"{at}: below minimum {minimum}"]
+                if maximum is not None and v > maximum:
+                    return [f"{at}: above maximum {maximum}"]
+                return []
+
+            checks.append(check_range)
+
+        one_of = schema.get("oneOf")
+        if isinstance(one_of, list):
+            branches = [self.compile(s) for s in one_of]
+
+            def check_one_of(v: Any, at: str) -> list[str]:
+                matched = sum(1 for b in branches if not b(v, at))
+                return [] if matched == 1 else [f"{at}: matched {matched} oneOf branches (expected 1)"]
+
+            checks.append(check_one_of)
+
+        required = schema.get("required")
+        props = {k: self.compile(s) for k, s in (schema.get("properties") or {}).items()}
+        additional = schema.get("additionalProperties", True)
+        additional_fn = None if additional is True else self.compile(additional)
+        if required or props or additional_fn is not None:
+            req = list(required or [])
+
+            def check_object(v: Any, at: str) -> list[str]:
+                if not isinstance(v, dict):
+                    return []
+                errs = [f"{at}: missing required key {k!r}" for k in req if k not in v]
+                for key, value in v.items():
+                    fn = props.get(key, additional_fn)
+                    if fn is not None:
+                        errs.extend(fn(value, f"{at}/{key}"))
+                return errs
+
+            checks.append(check_object)
+
+        if "items" in schema:
+            item_fn = self.compile(schema["items"])
+
+            def check_items(v: Any, at: str) -> list[str]:
+                if not isinstance(v, list):
+                    return []
+                errs: list[str] = []
+                for i, item in enumerate(v):
+                    errs.extend(item_fn(item, f"{at}/{i}"))
+                return errs
+
+            checks.append(check_items)
+
+        def run(v: Any, at: str) -> list[str]:
+            errs: list[str] = []
+            for check in checks:
+                errs.extend(check(v, at))
+            return errs
+
+        return run
+
+
+def compile_scene_validators(schemas_dir: Path) -> dict[str, Validator]:
+    compiler = SchemaCompiler(schemas_dir)
+    out: dict[str, Validator] = {}
+    for name in SCENE_SCHEMA_NAMES:
+        if (schemas_dir / f"{name}.schema.json").is_file():
+            out[name] = compiler.compile_file(f"{name}.schema.json")
+    return out
+
+
+def scene_schema_name(scene: dict[str, Any]) -> str | None:
+    # Mirrors the graph ingest classify(): only graph-native and phase-history
+    # scenes have a published contract; other shapes are free-form documents.
+    if isinstance(scene.get("nodes"), list) and isinstance(scene.get("edges"), list):
+        return "graph_scene_v0"
+    if all(k in scene for k in ("schema_version", "project_id", "phase_events")):
+        return "phase_history_v0"
+    return None
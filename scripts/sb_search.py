@@ -0,0 +1,409 @@
+"""Persistent BM25 full-text index over session text and scene node labels, used by `sb search`.
+
+Documents are the sb_corpus.flatten_text() of each session artifact plus one
+document per labelled scene node. The index under state/cache/search_v0/ is a
+list of immutable segments. Each segment holds postings sharded by term hash,
+with entries of the form term -> [[doc, tf, doc_len, kind], ...], plus doc
+metadata sharded by doc number. A query therefore reads only the shards its
+terms hash to.
+
+Commits append a small delta segment and tombstone the documents it replaces.
+Once more than MAX_DELTA_SEGMENTS deltas pile up they are merged with each
+other. The base segment is only rewritten by --rebuild, or when tombstones
+outweigh live documents.
+"""
+from __future__ import annotations
+
+import fcntl
+import heapq
+import json
+import math
+import os
+import re
+import shutil
+import zlib
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any
+
+import sb_corpus
+
+INDEX_VERSION = 1
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+BM25_K1 = 1.2
+BM25_B = 0.75
+MAX_DELTA_SEGMENTS = 8
+POSTINGS_PER_SHARD = 20_000
+SOURCE_SHARDS = 64
+KINDS = ("session", "scene")
+
+# (display id, kind, repo-relative source path, stored text for scene labels)
+DocMeta = list[Any]
+Doc = tuple[str, str, str]  # (display id, kind, text)
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_RE.findall(text.lower())
+
+
+def source_docs(repo_root: Path, path: Path) -> list[Doc]:
+    """Documents contributed by one session or scene file (empty when missing or unparsable)."""
+    try:
+        obj = json.loads(path.read_text(encoding="utf-8"))
+    except Exception:
+        return []
+    if path.name.endswith(".scene.json"):
+        scene = sb_corpus.scene_record(obj, path)
+        return [(nid, "scene", label) for nid, label in scene.node_labels]
+    rec = sb_corpus.session_record(obj, path, path.parent.name)
+    return [(rec.artifact_id, "session", rec.text)] if rec is not None else []
+
+
+def corpus_sources(repo_root: Path) -> list[Path]:
+    sessions = [p for p, _tool in sb_corpus.session_paths(repo_root / "sessions")]
+    scenes_dir = repo_root / "scenes"
+    scenes = sorted(scenes_dir.glob("*.scene.json")) if scenes_dir.is_dir() else []
+    return sessions + scenes
+
+
+def is_source(repo_root: Path, path: Path) -> bool:
+    try:
+        rel = path.resolve().relative_to(repo_root.resolve())
+    except ValueError:
+        return False
+    parts = rel.parts
+    if len(parts) == 3 and parts[0] == "sessions":
+        return parts[2].endswith(".json") and parts[2] != "index.json"
+    return len(parts) == 2 and parts[0] == "scenes" and parts[1].endswith(".scene.json")
+
+
+def _shard_of(term: str, shards: int) -> int:
+    return zlib.crc32(term.encode("utf-8")) % shards
+
+
+def _source_shard(rel: str) -> int:
+    return zlib.crc32(rel.encode("utf-8")) % SOURCE_SHARDS
+
+
+def _read_json(path: Path, default: Any) -> Any:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return default
+
+
+def _write_json_atomic(path: Path, data: Any) -> None:
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(data, separators=(",", ":")), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+class SearchIndex:
+    def __init__(self, index_dir: Path, repo_root: Path) -> None:
+        self.index_dir = index_dir
+        self.repo_root = repo_root
+        self._shard_cache: dict[Path, tuple[int, Any]] = {}
+
+    # -- on-disk state -------------------------------------------------
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.index_dir / "manifest.json"
+
+    def sources_path(self, shard: int) -> Path:
+        return self.index_dir / "sources" / f"s{shard}.json"
+
+    def load_manifest(self) -> dict[str, Any] | None:
+        manifest = _read_json(self.manifest_path, None)
+        if not isinstance(manifest, dict) or manifest.get("index_version") != INDEX_VERSION:
+            return None
+        return manifest
+
+    def load_sources(self, manifest: dict[str, Any], rels: list[str] | None = None) -> dict[str, Any] | None:
+        """Source entries (repo-relative path -> {sig, docs: [[doc, len], ...]}) for the shards holding `rels`.
+
+        Shards are rewritten before the manifest, so a shard newer than the
+        manifest means a writer died mid-commit and the index must be rebuilt.
+        """
+        shards = range(SOURCE_SHARDS) if rels is None else sorted({_source_shard(r) for r in rels})
+        files: dict[str, Any] = {}
+        for shard in shards:
+            value = _read_json(self.sources_path(shard), {"generation": 0, "files": {}})
+            if not isinstance(value, dict) or int(value.get("generation", 0)) > int(manifest.get("generation", 0)):
+                return None
+            entries = value.get("files")
+            if not isinstance(entries, dict):
+                return None
+            files.update(entries)
+        return files
+
+    def _commit(self, manifest: dict[str, Any], files: dict[str, Any], rels: list[str] | None = None) -> None:
+        manifest["generation"] = int(manifest.get("generation", 0)) + 1
+        shards: dict[int, dict[str, Any]] = {}
+        if rels is None:
+            shards = {i: {} for i in range(SOURCE_SHARDS)}
+        else:
+            shards = {_source_shard(r): {} for r in rels}
+        for rel, entry in files.items():
+            shard = _source_shard(rel)
+            if shard in shards:
+                shards[shard][rel] = entry
+        self.sources_path(0).parent.mkdir(parents=True, exist_ok=True)
+        for shard, entries in shards.items():
+            _write_json_atomic(self.sources_path(shard), {"generation": manifest["generation"], "files": entries})
+        _write_json_atomic(self.manifest_path, manifest)
+        live = {seg["name"] for seg in manifest["segments"]}
+        for child in self.index_dir.iterdir():
+            if child.is_dir() and child.name.startswith("seg_") and child.name not in live:
+                shutil.rmtree(child, ignore_errors=True)
+
+    def _lock(self) -> Any:
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        fh = (self.index_dir / "lock").open("a")
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        return fh
+
+    def _write_segment(
+        self, manifest: dict[str, Any], docs: dict[int, DocMeta], postings: dict[str, list[list[int]]]
+    ) -> dict[str, Any]:
+        n_postings = sum(len(v) for v in postings.values())
+        shards = 1
+        while shards < 1024 and n_postings / shards > POSTINGS_PER_SHARD:
+            shards *= 2
+        name = f"seg_{int(manifest['next_segment']):06d}"
+        manifest["next_segment"] = int(manifest["next_segment"]) + 1
+        seg_dir = self.index_dir / name
+        seg_dir.mkdir(parents=True, exist_ok=True)
+        by_shard: list[dict[str, list[list[int]]]] = [{} for _ in range(shards)]
+        for term, plist in postings.items():
+            by_shard[_shard_of(term, shards)][term] = plist
+        docs_by_shard: list[dict[str, DocMeta]] = [{} for _ in range(shards)]
+        for doc, meta in docs.items():
+            docs_by_shard[doc % shards][str(doc)] = meta
+        for i in range(shards):
+            (seg_dir / f"p{i}.json").write_text(json.dumps(by_shard[i], separators=(",", ":")), encoding="utf-8")
+            (seg_dir / f"d{i}.json").write_text(json.dumps(docs_by_shard[i], separators=(",", ":")), encoding="utf-8")
+        return {"name": name, "shards": shards, "docs": len(docs)}
+
+    def _load_shard(self, path: Path) -> Any:
+        # Segments are immutable once written; the mtime check only guards against
+        # the whole index directory being deleted and rebuilt under a long-lived
+        # process such as `sb serve`.
+        try:
+            mtime_ns = path.stat().st_mtime_ns
+        except OSError:
+            return {}
+        cached = self._shard_cache.get(path)
+        if cached is not None and cached[0] == mtime_ns:
+            return cached[1]
+        value = _read_json(path, {})
+        self._shard_cache[path] = (mtime_ns, value)
+        return value
+
+    # -- building ------------------------------------------------------
+
+    def _index_docs(
+        self, manifest: dict[str, Any], paths: list[Path]
+    ) -> tuple[dict[str, Any], dict[int, DocMeta], dict[str, list[list[int]]]]:
+        entries: dict[str, Any] = {}
+        docs: dict[int, DocMeta] = {}
+        postings: dict[str, list[list[int]]] = defaultdict(list)
+        for path in paths:
+            rel = str(path.relative_to(self.repo_root))
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            doc_entries: list[list[int]] = []
+            for display_id, kind, text in source_docs(self.repo_root, path):
+                tokens = tokenize(text)
+                if not tokens:
+                    continue
+                doc = int(manifest["next_doc"])
+                manifest["next_doc"] = doc + 1
+                kind_code = KINDS.index(kind)
+                for term, tf in Counter(tokens).items():
+                    postings[term].append([doc, tf, len(tokens), kind_code])
+                docs[doc] = [display_id, kind, rel, text if kind == "scene" else ""]
+                doc_entries.append([doc, len(tokens)])
+                manifest["n_docs"] += 1
+                manifest["total_len"] += len(tokens)
+            entries[rel] = {"sig": [st.st_size, st.st_mtime_ns], "docs": doc_entries}
+        return entries, docs, postings
+
+    def rebuild(self) -> dict[str, Any]:
+        fh = self._lock()
+        try:
+            return self._rebuild_locked()
+        finally:
+            fh.close()
+
+    def _rebuild_locked(self) -> dict[str, Any]:
+        previous = self.load_manifest() or {}
+        manifest = {
+            "index_version": INDEX_VERSION,
+            "generation": previous.get("generation", 0),
+            "next_segment": previous.get("next_segment", 0),
+            "next_doc": 0,
+            "n_docs": 0,
+            "total_len": 0,
+            "deleted": [],
+            "segments": [],
+        }
+        files, docs, postings = self._index_docs(manifest, corpus_sources(self.repo_root))
+        manifest["segments"] = [self._write_segment(manifest, docs, postings)]
+        self._commit(manifest, files)
+        return manifest
+
+    def update(self, paths: list[Path]) -> int:
+        """Re-index these source files (added, changed or deleted); returns how many were given."""
+        fh = self._lock()
+        try:
+            rels = [str(path.resolve().relative_to(self.repo_root.resolve())) for path in paths]
+            manifest = self.load_manifest()
+            files = self.load_sources(manifest, rels) if manifest is not None else None
+            if manifest is None or files is None:
+                self._rebuild_locked()
+                return len(paths)
+
+            deleted = set(manifest["deleted"])
+            present: list[Path] = []
+            for rel in rels:
+                old = files.pop(rel, None)
+                if old is not None:
+                    for doc, length in old["docs"]:
+                        deleted.add(doc)
+                        manifest["n_docs"] -= 1
+                        manifest["total_len"] -= length
+                if (self.repo_root / rel).exists():
+                    present.append(self.repo_root / rel)
+
+            entries, docs, postings = self._index_docs(manifest, present)
+            files.update(entries)
+            if docs:
+                manifest["segments"].append(self._write_segment(manifest, docs, postings))
+            manifest["deleted"] = sorted(deleted)
+            self._maybe_merge(manifest)
+            self._commit(manifest, files, rels)
+            return len(paths)
+        finally:
+            fh.close()
+
+    def refresh(self) -> int:
+        """Stat-scan sessions/ and scenes/ and re-index whatever changed since the last update."""
+        manifest = self.load_manifest()
+        files = self.load_sources(manifest) if manifest is not None else None
+        if manifest is None or files is None:
+            built = self.rebuild()
+            return int(built["n_docs"])
+        changed: list[Path] = []
+        seen: set[str] = set()
+        for path in corpus_sources(self.repo_root):
+            rel = str(path.relative_to(self.repo_root))
+            seen.add(rel)
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entry = files.get(rel)
+            if entry is None or entry.get("sig") != [st.st_size, st.st_mtime_ns]:
+                changed.append(path)
+        changed.extend(self.repo_root / rel for rel in files if rel not in seen)
+        return self.update(changed) if changed else 0
+
+    def _maybe_merge(self, manifest: dict[str, Any]) -> None:
+        segments = manifest["segments"]
+        deleted = set(manifest["deleted"])
+        if len(segments) > 1 and len(deleted) > manifest["n_docs"]:
+            # Mostly tombstones: merge everything, base included.
+            merge_from = 0
+        elif len(segments) > MAX_DELTA_SEGMENTS + 1:
+            merge_from = 1
+        else:
+            return
+        docs: dict[int, DocMeta] = {}
+        merged_docs: set[int] = set()
+        postings: dict[str, list[list[int]]] = defaultdict(list)
+        for seg in segments[merge_from:]:
+            seg_dir = self.index_dir / seg["name"]
+            for i in range(seg["shards"]):
+                for doc_key, meta in _read_json(seg_dir / f"d{i}.json", {}).items():
+                    doc = int(doc_key)
+                    merged_docs.add(doc)
+                    if doc not in deleted:
+                        docs[doc] = meta
+                for term, plist in _read_json(seg_dir / f"p{i}.json", {}).items():
+                    postings[term].extend(p for p in plist if p[0] not in deleted)
+        manifest["segments"] = segments[:merge_from] + [self._write_segment(manifest, docs, postings)]
+        # Tombstones for docs that lived in the merged segments are physically gone now.
+        manifest["deleted"] = sorted(deleted - merged_docs)
+
+    # -- querying ------------------------------------------------------
+
+    def search(self, query: str, limit: int = 10, kind: str | None = None) -> list[dict[str, Any]]:
+        manifest = self.load_manifest()
+        if manifest is None:
+            self.rebuild()
+            manifest = self.load_manifest()
+            assert manifest is not None
+        terms = list(dict.fromkeys(tokenize(query)))
+        n_docs = max(1, int(manifest["n_docs"]))
+        avgdl = max(1.0, manifest["total_len"] / n_docs)
+        deleted = set(manifest["deleted"])
+        kind_code = KINDS.index(kind) if kind else None
+
+        scores: dict[int, float] = defaultdict(float)
+        for term in terms:
+            plists: list[list[list[int]]] = []
+            for seg in manifest["segments"]:
+                shard = self._load_shard(self.index_dir / seg["name"] / f"p{_shard_of(term, seg['shards'])}.json")
+                plists.append(shard.get(term, []))
+            live = [p for plist in plists for p in plist if p[0] not in deleted]
+            if not live:
+                continue
+            idf = math.log(1.0 + (n_docs - len(live) + 0.5) / (len(live) + 0.5))
+            for doc, tf, dl, k in live:
+                if kind_code is not None and k != kind_code:
+                    continue
+                scores[doc] += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * dl / avgdl))
+
+        top = heapq.nsmallest(limit, scores.items(), key=lambda kv: (-kv[1], kv[0]))
+        out: list[dict[str, Any]] = []
+        for doc, score in top:
+            meta = self._doc_meta(manifest, doc)
+            if meta is None:
+                continue
+            display_id, doc_kind, rel, stored = meta
+            out.append(
+                {
+                    "id": display_id,
+                    "kind": doc_kind,
+                    "source": rel,
+                    "score": round(score, 4),
+                    "snippet": make_snippet(stored or self._session_text(rel, display_id), terms),
+                }
+            )
+        return out
+
+    def _doc_meta(self, manifest: dict[str, Any], doc: int) -> DocMeta | None:
+        for seg in manifest["segments"]:
+            meta = self._load_shard(self.index_dir / seg["name"] / f"d{doc % seg['shards']}.json").get(str(doc))
+            if meta is not None:
+                return meta
+        return None
+
+    def _session_text(self, rel: str, display_id: str) -> str:
+        for doc_id, _kind, text in source_docs(self.repo_root, self.repo_root / rel):
+            if doc_id == display_id:
+                return text
+        return ""
+
+
+def make_snippet(text: str, terms: list[str], width: int = 160) -> str:
+    flat = " ".join(text.split())
+    if not terms:
+        return flat[:width]
+    m = re.search(r"(?<![a-z0-9])(" + "|".join(re.escape(t) for t in terms) + r")", flat, re.IGNORECASE)
+    start = max(0, m.start() - width // 3) if m else 0
+    snippet = flat[start : start + width]
+    return ("..." if start > 0 else "") + snippet + ("..." if start + width < len(flat) else "")
@@ -0,0 +1,62 @@
+"""The sessions/<tool>/index.json record for one session artifact.
+
+Shared by `sb reindex`/`sb commit-session`, scripts/update_index.py and
+sb_closeout.sh (through sb_corpus) so every writer produces the same index.
+"""
+from __future__ import annotations
+
+import re
+from typing import Any
+
+ARTIFACT_PREFIX = "artifact/"
+SNIPPET_MAX = 160
+
+_ID_DATE_RE = re.compile(r"([0-9]{4})_([0-9]{2})_([0-9]{2})")
+
+
+def artifact_id(data: dict[str, Any]) -> str | None:
+    aid = data.get("artifact_id") or data.get("id")
+    return aid if isinstance(aid, str) else None
+
+
+def session_date(data: dict[str, Any], aid: str) -> str:
+    """session_date as written, else the YYYY_MM_DD embedded in the artifact id, else ""."""
+    sd = data.get("session_date")
+    if isinstance(sd, str):
+        return sd
+    m = _ID_DATE_RE.search(aid)
+    return f"{m.group(1)}-{m.group(2)}-{m.group(3)}" if m else ""
+
+
+def resumption_score(data: dict[str, Any]) -> int | None:
+    score = data.get("resumption_score")
+    return score if isinstance(score, int) else None
+
+
+def summary_snippet(data: dict[str, Any]) -> str:
+    summary = data.get("summary")
+    snippet = ""
+    if isinstance(summary, str):
+        snippet = summary.strip()
+    elif isinstance(summary, dict):
+        hl = summary.get("high_level")
+        if isinstance(hl, str):
+            snippet = hl.strip()
+    if len(snippet) > SNIPPET_MAX:
+        snippet = snippet[: SNIPPET_MAX - 3] + "..."
+    return snippet
+
+
+def index_record(data: Any) -> dict[str, Any] | None:
+    """The index entry for a session JSON object; None unless its id starts with artifact/."""
+    if not isinstance(data, dict):
+        return None
+    aid = artifact_id(data)
+    if aid is None or not aid.startswith(ARTIFACT_PREFIX):
+        return None
+    return {
+        "id": aid,
+        "date": session_date(data, aid),
+        "resumption_score": resumption_score(data),
+        "summary_snippet": summary_snippet(data),
+    }
@@ -0,0 +1,272 @@
+"""Parallel runner for batches of agent cycles (spec/swarm_runner_v0.md), used by `sb swarm run`.
+
+Each job is one sb_agent_cycle run: agent id, targets, and an optional exec
+command. A job's write footprint is its targets plus its agent's cursor.
+Admission goes through the same plan and authority check as a single cycle.
+Jobs touching a scope closed by a blocked gate are excluded with a warning.
+The gates, and the paths each one closes beyond its own scope, come from the
+spec's Non-Interference Rule.
+
+Two admitted jobs conflict when their footprints overlap: the same path, or
+one path is an ancestor directory of the other. Conflicting jobs run in
+submission order. Everything else runs concurrently on a thread pool, so
+wall time approaches that of the longest chain of conflicting jobs instead
+of the sum of all jobs.
+"""
+from __future__ import annotations
+
+import json
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any
+
+import sb_agent_cycle
+
+RUN_FORMAT = "swarm_run_v0"
+DEFAULT_WORKERS = 4
+GATE_BLOCKED_PREFIX = "BLOCKED"
+RULE_HEADING = "Non-Interference Rule"
+_RULE_PATH_RE = re.compile(r"^\s+- `([^`]+)`\s*$")
+JOB_FIELDS = ("job_id", "agent_id", "targets", "reason", "exec_cmd", "task_id", "phase", "mutation_type", "inputs", "actor")
+
+
+def parse_jobs(raw: str) -> list[dict[str, Any]]:
+    """Jobs from a JSON array or NDJSON; raises ValueError on malformed input."""
+    text = raw.strip()
+    if not text:
+        raise ValueError("no jobs given")
+    if text.startswith("["):
+        values = json.loads(text)
+    else:
+        values = [json.loads(line) for line in text.splitlines() if line.strip()]
+    jobs: list[dict[str, Any]] = []
+    seen: set[str] = set()
+    for n, value in enumerate(values, start=1):
+        if not isinstance(value, dict):
+            raise ValueError(f"job {n} must be a JSON object")
+        unknown = sorted(set(value) - set(JOB_FIELDS))
+        if unknown:
+            raise ValueError(f"job {n} has unknown fields: {', '.join(unknown)}")
+        if not isinstance(value.get("agent_id"), str) or not value.get("targets"):
+            raise ValueError(f"job {n} needs agent_id and targets")
+        job = dict(value)
+        job.setdefault("job_id", f"job_{n:03d}")
+        for key in ("targets", "inputs"):
+            if isinstance(job.get(key), list):
+                job[key] = ",".join(str(v) for v in job[key])
+        if job["job_id"] in seen:
+            raise ValueError(f"duplicate job_id: {job['job_id']}")
+        seen.add(job["job_id"])
+        jobs.append(job)
+    return jobs
+
+
+def spec_gates(spec_text: str) -> dict[str, list[str]]:
+    """Gate scene file -> the paths it closes while blocked, from the spec's Non-Interference Rule sections.
+
+    Within such a section, the nested bullets under "must not mutate:" are the
+    closed paths, and those under "Gate status source of record:" the gates.
+    """
+    gates: dict[str, list[str]] = {}
+    for section in re.split(r"^## ", spec_text, flags=re.M):
+        if not section.startswith(RULE_HEADING):
+            continue
+        closed: list[str] = []
+        sources: list[str] = []
+        bucket: list[str] | None = None
+        for line in section.splitlines()[1:]:
+            if line.startswith("- "):
+                bucket = closed if "must not mutate" in line else sources if "source of record" in line else None
+            elif bucket is not None and (m := _RULE_PATH_RE.match(line)):
+                bucket.append(m.group(1))
+        for source in sources:
+            gates.setdefault(source, []).extend(closed)
+    return gates
+
+
+def blocked_scopes(repo_root: Path, gates: dict[str, list[str]]) -> list[str]:
+    """Paths closed to mutation by gate scenes whose current status is blocked: their scope plus the spec's paths."""
+    scopes: list[str] = []
+    for gate_file, closed in gates.items():
+        try:
+            gate = json.loads((repo_root / gate_file).read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            continue
+        status = gate.get("current_status", {}) if isinstance(gate, dict) else {}
+        if not (isinstance(status, dict) and str(status.get("status", "")).startswith(GATE_BLOCKED_PREFIX)):
+            continue
+        scopes.extend(s for s in gate.get("scope", []) if isinstance(s, str))
+        scopes.extend(closed)
+    return scopes
+
+
+def paths_overlap(a: str, b: str) -> bool:
+    a, b = a.rstrip("/"), b.rstrip("/")
+    return a == b or a.startswith(b + "/") or b.startswith(a + "/")
+
+
+def conflict_graph(footprints: list[list[str]]) -> list[list[int]]:
+    """For each job, the earlier jobs it must wait for (overlapping footprints)."""
+    waits: list[list[int]] = []
+    for i, mine in enumerate(footprints):
+        waits.append([j for j in range(i) if any(paths_overlap(a, b) for a in mine for b in footprints[j])])
+    return waits
+
+
+class RunHashCache(sb_agent_cycle.HashCache):
+    """The hash cache every job of a run shares: run_cycle()'s per-job saves are skipped and flush() writes it once."""
+
+    def save(self) -> None:
+        pass
+
+    def flush(self) -> None:
+        super().save()
+
+
+class SwarmRun:
+    def __init__(
+        self,
+        repo_root: Path,
+        registry_file: Path,
+        ledger_file: Path,
+        claims_file: Path,
+        metrics_file: Path,
+        hash_cache_file: Path,
+        gates: dict[str, list[str]],
+        workers: int = DEFAULT_WORKERS,
+    ) -> None:
+        self.repo_root = repo_root
+        self.registry_file = registry_file
+        self.ledger_file = ledger_file
+        self.claims_file = claims_file
+        self.metrics_file = metrics_file
+        self.hash_cache_file = hash_cache_file
+        self.gates = gates
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._running = 0
+        self._peak = 0
+
+    def admit(self, jobs: list[dict[str, Any]]) -> tuple[list[dict[str, Any]], list[dict[str, Any]], list[str]]:
+        """Plan every job; returns (admitted [{job, plan}], rejected [{job_id, error}], warnings)."""
+        blocked = blocked_scopes(self.repo_root, self.gates)
+        admitted: list[dict[str, Any]] = []
+        rejected: list[dict[str, Any]] = []
+        warnings: list[str] = []
+        for job in jobs:
+            # Gate first: a blocked-scope job is reported as such even when it would also fail authority.
+            raw_targets = [t.strip() for t in job["targets"].split(",") if t.strip()]
+            hits = sorted({t for t in raw_targets for scope in blocked if paths_overlap(t, scope)})
+            if hits:
+                warnings.append(f"{job['job_id']} excluded: blocked gate scope: {', '.join(hits)}")
+                rejected.append({"job_id": job["job_id"], "error": "blocked gate scope: " + ", ".join(hits)})
+                continue
+            try:
+                plan = sb_agent_cycle.build_plan(
+                    self.repo_root,
+                    job["agent_id"],
+                    job["targets"],
+                    job.get("reason") or f"swarm job {job['job_id']}",
+                    self.registry_file,
+                    self.ledger_file,
+                    actor=job.get("actor", ""),
+                    mutation_type=job.get("mutation_type", "UPDATE"),
+                    inputs_csv=job.get("inputs", ""),
+                    task_id=job.get("task_id", ""),
+                    phase=job.get("phase", "cycle_complete"),
+                )
+            except SystemExit as e:
+                rejected.append({"job_id": job["job_id"], "error": str(e.code)})
+                continue
+            admitted.append({"job": job, "plan": plan})
+        return admitted, rejected, warnings
+
+    def _run_job(self, entry: dict[str, Any], hash_cache: RunHashCache, t_start: float) -> dict[str, Any]:
+        with self._lock:
+            self._running += 1
+            self._peak = max(self._peak, self._running)
+        started = time.perf_counter()
+        result: dict[str, Any] = {"job_id": entry["job"]["job_id"], "agent_id": entry["plan"]["agent_id"], "status": "ok"}
+        try:
+            out = sb_agent_cycle.run_cycle(
+                self.repo_root,
+                entry["plan"],
+                self.claims_file,
+                self.metrics_file,
+                hash_cache,
+                exec_cmd=entry["job"].get("exec_cmd", ""),
+            )
+            result["timestamp"] = out["timestamp"]
+        except SystemExit as e:
+            result.update(status="failed", error=e.code if isinstance(e.code, int) else str(e.code))
+        except Exception as e:
+            result.update(status="failed", error=f"{type(e).__name__}: {e}")
+        finished = time.perf_counter()
+        with self._lock:
+            self._running -= 1
+        result["queued_ms"] = round((started - t_start) * 1000.0, 3)
+        result["run_ms"] = round((finished - started) * 1000.0, 3)
+        result["latency_ms"] = round((finished - t_start) * 1000.0, 3)
+        return result
+
+    def run(self, jobs: list[dict[str, Any]]) -> dict[str, Any]:
+        admitted, rejected, warnings = self.admit(jobs)
+        waits = conflict_graph([entry["plan"]["targets"] for entry in admitted])
+        results: list[dict[str, Any] | None] = [None] * len(admitted)
+        pending = set(range(len(admitted)))
+        running: dict[Future[dict[str, Any]], int] = {}
+        hash_cache = RunHashCache(self.hash_cache_file)
+        t_start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="swarm") as pool:
+            while pending or running:
+                # Submission order is the tie-break: a job starts once every earlier conflicting job is done.
+                for i in sorted(pending):
+                    if len(running) >= self.workers:
+                        break
+                    if all(results[j] is not None for j in waits[i]):
+                        pending.discard(i)
+                        running[pool.submit(self._run_job, admitted[i], hash_cache, t_start)] = i
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    results[running.pop(fut)] = fut.result()
+        wall_ms = (time.perf_counter() - t_start) * 1000.0
+        hash_cache.flush()
+
+        job_results = [
+            {**(r or {}), "targets": entry["plan"]["targets"], "serialized_after": [admitted[j]["job"]["job_id"] for j in waits[i]]}
+            for i, (entry, r) in enumerate(zip(admitted, results))
+        ]
+        busy_ms = sum(r["run_ms"] for r in job_results)
+        latencies = sorted(r["latency_ms"] for r in job_results)
+        return {
+            "format": RUN_FORMAT,
+            "workers": self.workers,
+            "jobs_submitted": len(jobs),
+            "jobs_run": len(job_results),
+            "jobs_failed": sum(1 for r in job_results if r["status"] != "ok"),
+            "jobs_rejected": rejected,
+            "warnings": warnings,
+            "conflict_edges": sum(len(w) for w in waits),
+            "critical_path_jobs": critical_path(waits),
+            "wall_ms": round(wall_ms, 3),
+            "busy_ms": round(busy_ms, 3),
+            # Average jobs in flight: 1.0 means the batch ran serially.
+            "parallelism": round(busy_ms / wall_ms, 3) if wall_ms else 0.0,
+            "peak_concurrency": self._peak,
+            "latency_ms": {
+                "p50": latencies[len(latencies) // 2] if latencies else None,
+                "max": latencies[-1] if latencies else None,
+            },
+            "jobs": job_results,
+        }
+
+
+def critical_path(waits: list[list[int]]) -> int:
+    """Length, in jobs, of the longest chain of conflicting jobs: the floor on serialized steps."""
+    depth: list[int] = []
+    for w in waits:
+        depth.append(1 + max((depth[j] for j in w), default=0))
+    return max(depth, default=0)
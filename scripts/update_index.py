@@ -1,7 +1,13 @@
+import argparse
 import os
 import json
+import statistics
+import time
+from collections import deque
 from datetime import datetime, timezone
 
+from sb_session_index import index_record
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 SESSIONS_DIR = os.path.join(BASE_DIR, "sessions")
 
@@ -16,77 +22,207 @@ def save_json(path, data):
         json.dump(data, f, indent=2)
 
 
-def summary_snippet(data):
-    summary = data.get("summary")
-    out = ""
-    if isinstance(summary, str):
-        out = summary.strip()
-    elif isinstance(summary, dict):
-        high = summary.get("high_level")
-        if isinstance(high, str):
-            out = high.strip()
-    return (out[:157] + "...") if len(out) > 160 else out
+def utc_now_z():
+    return datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
 
 
-def session_date_from_artifact_id(artifact_id):
-    if not isinstance(artifact_id, str):
-        return ""
-    tail = artifact_id.split("/", 1)[-1]
-    parts = tail.split("_")
-    for i in range(len(parts) - 2):
-        a, b, c = parts[i], parts[i + 1], parts[i + 2]
-        if len(a) == 4 and len(b) == 2 and len(c) == 2 and a.isdigit() and b.isdigit() and c.isdigit():
-            return f"{a}-{b}-{c}"
-    return ""
+def is_session_file(filename):
+    return filename.endswith(".json") and filename != "index.json"
 
 
-def update_index_for_directory(directory):
-    index_path = os.path.join(directory, "index.json")
-    tool = os.path.basename(directory)
-    records_by_id = {}
+def read_record(file_path):
+    try:
+        with open(file_path, "r") as f:
+            data = json.load(f)
+    except Exception:
+        print(f"Skipping invalid JSON: {file_path}")
+        return None
+    return index_record(data)
 
-    for filename in os.listdir(directory):
-        if not filename.endswith(".json"):
-            continue
-        if filename == "index.json":
-            continue
 
-        file_path = os.path.join(directory, filename)
+def sorted_artifacts(records):
+    records_by_id = {}
+    for record in records:
+        if record is not None:
+            records_by_id[record["id"]] = record
+    return sorted(records_by_id.values(), key=lambda r: ((r.get("date") or ""), r["id"]))
 
-        try:
-            with open(file_path, "r") as f:
-                data = json.load(f)
-                if not isinstance(data, dict):
-                    continue
-                artifact_id = data.get("artifact_id") or data.get("id")
-                if not isinstance(artifact_id, str):
-                    continue
-                session_date = data.get("session_date")
-                if not isinstance(session_date, str):
-                    session_date = session_date_from_artifact_id(artifact_id)
-                resumption_score = data.get("resumption_score")
-                if not isinstance(resumption_score, int):
-                    resumption_score = None
-                records_by_id[artifact_id] = {
-                    "id": artifact_id,
-                    "date": session_date,
-                    "resumption_score": resumption_score,
-                    "summary_snippet": summary_snippet(data),
-                }
-        except Exception:
-            print(f"Skipping invalid JSON: {file_path}")
-
-    artifacts = sorted(records_by_id.values(), key=lambda r: ((r.get("date") or ""), r["id"]))
+
+def write_index(directory, artifacts):
     save_json(
-        index_path,
+        os.path.join(directory, "index.json"),
         {
-            "tool": tool,
+            "tool": os.path.basename(directory),
             "artifacts": artifacts,
-            "last_updated": datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z"),
+            "last_updated": utc_now_z(),
         },
     )
 
+
+def update_index_for_directory(directory):
+    records = []
+    for filename in os.listdir(directory):
+        if is_session_file(filename):
+            records.append(read_record(os.path.join(directory, filename)))
+    write_index(directory, sorted_artifacts(records))
+
+
+def scan_directory(directory):
+    return {
+        filename: read_record(os.path.join(directory, filename))
+        for filename in sorted(os.listdir(directory))
+        if is_session_file(filename)
+    }
+
+
+def write_index_if_changed(directory, files):
+    # Only rewrite when the artifact list actually moved, so no-op saves and
+    # touch(1) do not churn last_updated in git.
+    artifacts = sorted_artifacts(files[name] for name in sorted(files))
+    try:
+        current = load_json(os.path.join(directory, "index.json"), None)
+    except Exception:
+        current = None
+    if isinstance(current, dict) and current.get("tool") == os.path.basename(directory) and current.get("artifacts") == artifacts:
+        return False
+    write_index(directory, artifacts)
+    return True
+
+
+def tool_directories():
+    return sorted(e.path for e in os.scandir(SESSIONS_DIR) if e.is_dir(follow_symlinks=False))
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def watch(debounce_ms=200, max_wait_ms=2000, poll_interval=1.0, force_poll=False, metrics_file=None):
+    """Keep every sessions/<tool>/index.json fresh from filesystem events.
+
+    Bursts are coalesced until `debounce_ms` of quiet (capped at `max_wait_ms`
+    so a steady stream still flushes), then only the touched files of the
+    touched tools are re-read. Latency is measured from the first event of a
+    batch being observed to that tool's index being written.
+    """
+    # Loads ctypes for inotify; one-shot rebuilds never need it.
+    from sb_fswatch import FsWatcher
+
+    state = {directory: scan_directory(directory) for directory in tool_directories()}
+    for directory, files in state.items():
+        write_index_if_changed(directory, files)
+
+    watcher = FsWatcher(SESSIONS_DIR, depth=1, poll_interval=poll_interval, force_poll=force_poll)
+    latencies = deque(maxlen=1000)
+    totals = {"flushes": 0, "events": 0, "indexes_written": 0}
+    print(json.dumps({"event": "watching", "backend": watcher.backend, "sessions_dir": SESSIONS_DIR, "tools": len(state)}), flush=True)
+
+    try:
+        while True:
+            events = watcher.events(None)
+            if not events:
+                continue
+            deadline = min(e.observed for e in events) + max_wait_ms / 1000.0
+            while True:
+                remaining = min(debounce_ms / 1000.0, deadline - time.monotonic())
+                if remaining <= 0:
+                    break
+                more = watcher.events(remaining)
+                if not more:
+                    break
+                events.extend(more)
+
+            dirty = {}
+            rescan = set()
+            for event in events:
+                if event.kind == "overflow":
+                    rescan.update(tool_directories())
+                    continue
+                parent, name = os.path.split(event.path)
+                if parent == SESSIONS_DIR and event.is_dir:
+                    directory = event.path
+                    rescan.add(directory)
+                elif os.path.dirname(parent) == SESSIONS_DIR and is_session_file(name):
+                    directory = parent
+                else:
+                    continue
+                pending = dirty.setdefault(directory, [event.observed, set(), 0])
+                pending[0] = min(pending[0], event.observed)
+                pending[2] += 1
+                if directory == parent:
+                    pending[1].add(name)
+
+            for directory in sorted(set(dirty) | rescan):
+                if not os.path.isdir(directory):
+                    state.pop(directory, None)
+                    continue
+                observed, names, n_events = dirty.get(directory, [time.monotonic(), set(), 0])
+                if directory in rescan or directory not in state:
+                    state[directory] = scan_directory(directory)
+                else:
+                    files = state[directory]
+                    for name in names:
+                        path = os.path.join(directory, name)
+                        if os.path.isfile(path):
+                            files[name] = read_record(path)
+                        else:
+                            files.pop(name, None)
+                written = write_index_if_changed(directory, state[directory])
+                latency_ms = round((time.monotonic() - observed) * 1000.0, 3)
+                latencies.append(latency_ms)
+                totals["flushes"] += 1
+                totals["events"] += n_events
+                totals["indexes_written"] += int(written)
+                print(
+                    json.dumps(
+                        {
+                            "event": "index_updated" if written else "index_unchanged",
+                            "tool": os.path.basename(directory),
+                            "files_changed": len(names),
+                            "events": n_events,
+                            "latency_ms": latency_ms,
+                        }
+                    ),
+                    flush=True,
+                )
+
+            if metrics_file and latencies:
+                save_json(metrics_file, watch_metrics(watcher, totals, latencies))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+    if latencies:
+        print(json.dumps(watch_metrics(watcher, totals, latencies)), flush=True)
+
+
+def watch_metrics(watcher, totals, latencies):
+    return {
+        "backend": watcher.backend,
+        **totals,
+        "event_to_index_ms": {
+            "samples": len(latencies),
+            "p50": round(statistics.median(latencies), 3),
+            "p95": percentile(latencies, 95),
+            "max": max(latencies),
+        },
+        "updated_at": utc_now_z(),
+    }
+
 def main():
+    ap = argparse.ArgumentParser(description="Rebuild sessions/<tool>/index.json files")
+    ap.add_argument("--watch", action="store_true", help="Stay running and update indexes from filesystem events")
+    ap.add_argument("--debounce-ms", type=int, default=200, help="Quiet period that closes an event burst (watch mode)")
+    ap.add_argument("--max-wait-ms", type=int, default=2000, help="Upper bound on how long a burst is held back (watch mode)")
+    ap.add_argument("--poll", action="store_true", help="Force the stat-polling backend instead of inotify")
+    ap.add_argument("--poll-interval", type=float, default=1.0, help="Seconds between scans for the polling backend")
+    ap.add_argument("--metrics-file", help="Rewrite aggregate latency metrics to this JSON file after each flush")
+    args = ap.parse_args()
+
+    if args.watch:
+        watch(args.debounce_ms, args.max_wait_ms, args.poll_interval, args.poll, args.metrics_file)
+        return
     for root, dirs, files in os.walk(SESSIONS_DIR):
         if root == SESSIONS_DIR:
             continue  # skip top-level sessions/
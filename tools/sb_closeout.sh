@@ -134,6 +134,11 @@ import re
 import sys
 from collections import Counter
 from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(sys.argv[7], "scripts"))
+import sb_corpus  # noqa: E402
+import sb_search  # noqa: E402
 
 
 def die(msg: str) -> None:
@@ -152,74 +157,21 @@ def uniq_keep_order(xs):
 
 
 def load_scene_catalog(repo_root: str):
-    scenes_dir = os.path.join(repo_root, "scenes")
-    project_ids = set()
-    principle_ids = set()
-    pattern_ids = set()
-    scene_refs = []
-    if not os.path.isdir(scenes_dir):
-        return project_ids, principle_ids, pattern_ids, scene_refs
-
-    for name in sorted(os.listdir(scenes_dir)):
-        if not name.endswith(".scene.json"):
-            continue
-        path = os.path.join(scenes_dir, name)
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-        except Exception:
-            continue
-        nodes = data.get("nodes") if isinstance(data, dict) else None
-        edges = data.get("edges") if isinstance(data, dict) else None
-        node_ids = set()
-        if isinstance(nodes, list):
-            for n in nodes:
-                if isinstance(n, dict):
-                    nid = n.get("id")
-                    if isinstance(nid, str):
-                        node_ids.add(nid)
-                        if nid.startswith("project/"):
-                            project_ids.add(nid)
-                        elif nid.startswith("principle/"):
-                            principle_ids.add(nid)
-                        elif nid.startswith("pattern/"):
-                            pattern_ids.add(nid)
-        edge_endpoints = set()
-        if isinstance(edges, list):
-            for e in edges:
-                if isinstance(e, dict):
-                    for k in ("from", "to"):
-                        v = e.get(k)
-                        if isinstance(v, str):
-                            edge_endpoints.add(v)
-        scene_refs.append((name, node_ids, edge_endpoints))
-
-    return project_ids, principle_ids, pattern_ids, scene_refs
+    scenes = sb_corpus.load_scenes(Path(repo_root) / "scenes")
+    scene_refs = [(sc.name, set(sc.node_ids), set(sc.edge_endpoints)) for sc in scenes]
+    return (
+        sb_corpus.canonical_ids(scenes, "project/"),
+        sb_corpus.canonical_ids(scenes, "principle/"),
+        sb_corpus.canonical_ids(scenes, "pattern/"),
+        scene_refs,
+    )
 
 
 def load_project_aliases(repo_root: str):
-    alias_path = os.path.join(repo_root, "scenes", "project_id_alias_map.scene.json")
-    aliases = {}
-    if not os.path.isfile(alias_path):
-        return aliases
-    try:
-        with open(alias_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-    except Exception:
-        return aliases
-    nodes = data.get("nodes") if isinstance(data, dict) else None
-    if not isinstance(nodes, list):
-        return aliases
-    for n in nodes:
-        if not isinstance(n, dict):
-            continue
-        mapping = n.get("mapping")
-        if isinstance(mapping, dict):
-            src = mapping.get("from")
-            dst = mapping.get("to")
-            if isinstance(src, str) and isinstance(dst, str):
-                aliases[src] = dst
-    return aliases
+    for sc in sb_corpus.load_scenes(Path(repo_root) / "scenes"):
+        if sc.name == "project_id_alias_map.scene.json":
+            return dict(sc.mappings)
+    return {}
 
 
 def suggest_scenes(scene_refs, target_ids):
@@ -402,52 +354,12 @@ with open(out_path, "w", encoding="utf-8") as f:
 
 index_path = os.path.join(out_dir, "index.json")
 
+search_dir = Path(repo_root) / "state" / "cache" / "search_v0"
+if (search_dir / "manifest.json").exists() and sb_search.is_source(Path(repo_root), Path(out_path)):
+    sb_search.SearchIndex(search_dir, Path(repo_root)).update([Path(out_path)])
+
 if update_index:
-    records = []
-    for name in sorted(os.listdir(out_dir)):
-        if not name.endswith(".json") or name == "index.json":
-            continue
-        p = os.path.join(out_dir, name)
-        try:
-            with open(p, "r", encoding="utf-8") as f:
-                obj = json.load(f)
-        except Exception:
-            continue
-        if not isinstance(obj, dict):
-            continue
-
-        aid = obj.get("artifact_id") or obj.get("id")
-        if not isinstance(aid, str):
-            continue
-
-        date = obj.get("session_date")
-        if not isinstance(date, str):
-            mm = re.search(r"([0-9]{4})_([0-9]{2})_([0-9]{2})", aid)
-            date = f"{mm.group(1)}-{mm.group(2)}-{mm.group(3)}" if mm else ""
-
-        resumption = obj.get("resumption_score")
-        if not isinstance(resumption, int):
-            resumption = None
-
-        summary = obj.get("summary")
-        summary_snippet = ""
-        if isinstance(summary, str):
-            summary_snippet = summary.strip()
-        elif isinstance(summary, dict):
-            hl = summary.get("high_level")
-            if isinstance(hl, str):
-                summary_snippet = hl.strip()
-        if len(summary_snippet) > 160:
-            summary_snippet = summary_snippet[:157] + "..."
-
-        records.append(
-            {
-                "id": aid,
-                "date": date,
-                "resumption_score": resumption,
-                "summary_snippet": summary_snippet,
-            }
-        )
+    records = [r for rec in sb_corpus.load_sessions(Path(sessions_dir), tools=[tool]) if (r := rec.index_record()) is not None]
 
     by_id = {r["id"]: r for r in records}
     artifacts = sorted(by_id.values(), key=lambda r: (r.get("date") or "", r["id"]))
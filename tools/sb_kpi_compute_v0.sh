@@ -50,11 +50,13 @@ python3 - "$REPO_ROOT" "$SESSIONS_DIR" "$GRAPH_FILE" "$OUT_FILE" "$CORE_ID" "$CO
 import json
 import os
 import sys
-from collections import defaultdict, deque
 from datetime import datetime, timezone
 from pathlib import Path
 
 repo_root, sessions_dir, graph_file, out_file, core_id, coord_kpi_file = sys.argv[1:7]
+sys.path.insert(0, os.path.join(repo_root, "scripts"))
+import sb_corpus  # noqa: E402
+import sb_graph_query  # noqa: E402
 
 
 def load_json(path):
@@ -62,82 +64,19 @@ def load_json(path):
         return json.load(f)
 
 # Canonical principle IDs from scenes.
-principles = set()
-scenes_dir = os.path.join(repo_root, "scenes")
-if os.path.isdir(scenes_dir):
-    for n in sorted(os.listdir(scenes_dir)):
-        if not n.endswith(".scene.json"):
-            continue
-        p = os.path.join(scenes_dir, n)
-        try:
-            s = load_json(p)
-        except Exception:
-            continue
-        nodes = s.get("nodes") if isinstance(s, dict) else None
-        if isinstance(nodes, list):
-            for node in nodes:
-                if isinstance(node, dict):
-                    nid = node.get("id")
-                    if isinstance(nid, str) and nid.startswith("principle/"):
-                        principles.add(nid)
+principles = sb_corpus.canonical_principle_ids(Path(repo_root) / "scenes")
 
 artifacts = []
-for tool in sorted(os.listdir(sessions_dir)) if os.path.isdir(sessions_dir) else []:
-    tdir = os.path.join(sessions_dir, tool)
-    if not os.path.isdir(tdir):
-        continue
-    for fn in sorted(os.listdir(tdir)):
-        if not fn.endswith(".json") or fn == "index.json":
-            continue
-        fp = os.path.join(tdir, fn)
-        try:
-            obj = load_json(fp)
-        except Exception:
-            continue
-        if not isinstance(obj, dict):
-            continue
-
-        aid = obj.get("artifact_id") or obj.get("id")
-        if not isinstance(aid, str):
-            continue
-
-        p_links = []
-        if isinstance(obj.get("principle_links"), list):
-            p_links.extend([x for x in obj["principle_links"] if isinstance(x, str)])
-        links = obj.get("links")
-        if isinstance(links, dict) and isinstance(links.get("principles"), list):
-            p_links.extend([x for x in links["principles"] if isinstance(x, str)])
-
-        summary = obj.get("summary")
-        has_summary = False
-        if isinstance(summary, str):
-            has_summary = bool(summary.strip())
-        elif isinstance(summary, dict):
-            hl = summary.get("high_level")
-            has_summary = isinstance(hl, str) and bool(hl.strip())
-
-        has_decisions = isinstance(obj.get("key_decisions"), list) and any(
-            isinstance(x, str) and x.strip() for x in obj.get("key_decisions", [])
-        )
-        if not has_decisions and isinstance(summary, dict):
-            kd = summary.get("key_decisions")
-            has_decisions = isinstance(kd, list) and any(isinstance(x, str) and x.strip() for x in kd)
-
-        has_steps = isinstance(obj.get("next_steps"), list) and any(
-            isinstance(x, str) and x.strip() for x in obj.get("next_steps", [])
-        )
-
-        rs = obj.get("resumption_score")
-        rs = rs if isinstance(rs, int) and 0 <= rs <= 10 else None
-
-        artifacts.append(
-            {
-                "artifact_id": aid,
-                "has_principle": any(x in principles for x in p_links),
-                "non_trivial": has_summary and (has_decisions or has_steps),
-                "resumption_score": rs,
-            }
-        )
+for rec in sb_corpus.load_sessions(Path(sessions_dir)):
+    rs = rec.resumption_score
+    artifacts.append(
+        {
+            "artifact_id": rec.artifact_id,
+            "has_principle": any(x in principles for x in rec.principle_links),
+            "non_trivial": rec.is_non_trivial,
+            "resumption_score": rs if rs is not None and 0 <= rs <= 10 else None,
+        }
+    )
 
 eligible = [a for a in artifacts if a["non_trivial"]]
 with_principle = [a for a in eligible if a["has_principle"]]
@@ -155,39 +94,15 @@ orphan_ratio = None
 coverage_from_core = None
 if os.path.isfile(graph_file):
     try:
-        g = load_json(graph_file)
-        nodes = g.get("nodes", []) if isinstance(g, dict) else []
-        edges = g.get("edges", []) if isinstance(g, dict) else []
-
-        node_ids = [n.get("id") for n in nodes if isinstance(n, dict) and isinstance(n.get("id"), str)]
-        node_set = set(node_ids)
-
-        degree = defaultdict(int)
-        adj = defaultdict(set)
-        for e in edges:
-            if not isinstance(e, dict):
-                continue
-            a = e.get("from")
-            b = e.get("to")
-            if isinstance(a, str) and isinstance(b, str):
-                degree[a] += 1
-                degree[b] += 1
-                adj[a].add(b)
+        g = sb_graph_query.load(Path(graph_file))
+        node_set = set(g.node_ids())
 
         if node_set:
-            orphans = [n for n in node_set if degree[n] < 1]
+            orphans = [n for n in node_set if g.degree(n) < 1]
             orphan_ratio = round(100.0 * len(orphans) / len(node_set), 2)
 
             if core_id in node_set:
-                q = deque([core_id])
-                seen = {core_id}
-                while q:
-                    cur = q.popleft()
-                    for nxt in adj.get(cur, set()):
-                        if nxt not in seen:
-                            seen.add(nxt)
-                            q.append(nxt)
-                coverage_from_core = round(100.0 * len(seen) / len(node_set), 2)
+                coverage_from_core = round(100.0 * g.reachable_count(core_id) / len(node_set), 2)
             else:
                 coverage_from_core = 0.0
     except Exception:
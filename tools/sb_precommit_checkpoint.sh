@@ -85,6 +85,7 @@ EOF
 cp "$report_file" "$latest_file"
 
 printf '{"timestamp":"%s","branch":"%s","head_before_commit":"%s","report_path":"%s","files_changed":%s,"insertions":%s,"deletions":%s}\n' \
-  "$ts_iso" "$branch" "$head_short" "$report_file" "$files_changed" "$insertions" "$deletions" >> "$index_file"
+  "$ts_iso" "$branch" "$head_short" "$report_file" "$files_changed" "$insertions" "$deletions" \
+  | SB_NO_DAEMON=1 python3 tools/sb.py append --file "$index_file"
 
 git add "$report_file" "$latest_file" "$index_file"
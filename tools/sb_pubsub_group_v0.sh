@@ -0,0 +1,119 @@
+#!/usr/bin/env bash
+set -euo pipefail
+
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+REPO_ROOT="$(cd "${SCRIPT_DIR}/.." && pwd)"
+
+EVENTS_FILE="${REPO_ROOT}/state/pubsub/events_v0.ndjson"
+GROUPS_DIR="${REPO_ROOT}/state/pubsub/groups"
+ACTION=""
+GROUP=""
+WORKER=""
+TOPICS=""
+MAX_EVENTS="50"
+PARTITIONS=""
+LEASE_S=""
+NOW_TS=""
+
+usage() {
+  cat <<USAGE
+Usage: $(basename "$0") poll --group <name> --worker <name> [options]
+       $(basename "$0") commit [options] < poll_result.json
+       $(basename "$0") leave --group <name> --worker <name> [options]
+
+Consumer groups split the log across workers by partition (crc32 of scope).
+poll leases this worker's share of partitions and prints their next events
+with a cursor; commit records that cursor once the events are processed.
+
+Options:
+  --topics <csv>           Optional topic filter, comma-separated (poll)
+  --max-events <int>       Max events to return (poll, default: 50)
+  --partitions <int>       Partition count when the group is created (poll, default: 4)
+  --lease-s <seconds>      Lease length (poll/commit, default: 30)
+  --events-file <path>     Optional event log path
+  --groups-dir <path>      Optional consumer group directory
+  --now-ts <RFC3339>       Optional "now" override
+  -h, --help               Show this help
+USAGE
+}
+
+if [[ $# -gt 0 && "$1" != -* ]]; then
+  ACTION="$1"; shift
+fi
+
+while [[ $# -gt 0 ]]; do
+  case "$1" in
+    --group)
+      GROUP="$2"; shift 2 ;;
+    --worker)
+      WORKER="$2"; shift 2 ;;
+    --topics)
+      TOPICS="$2"; shift 2 ;;
+    --max-events)
+      MAX_EVENTS="$2"; shift 2 ;;
+    --partitions)
+      PARTITIONS="$2"; shift 2 ;;
+    --lease-s)
+      LEASE_S="$2"; shift 2 ;;
+    --events-file)
+      EVENTS_FILE="$2"; shift 2 ;;
+    --groups-dir)
+      GROUPS_DIR="$2"; shift 2 ;;
+    --now-ts)
+      NOW_TS="$2"; shift 2 ;;
+    -h|--help)
+      usage; exit 0 ;;
+    *)
+      echo "Unknown arg: $1" >&2
+      usage >&2
+      exit 1 ;;
+  esac
+done
+
+for v in "${MAX_EVENTS}" "${PARTITIONS}" "${LEASE_S}"; do
+  if [[ -n "${v}" ]] && ! [[ "${v}" =~ ^[0-9]+$ ]]; then
+    echo "--max-events, --partitions, and --lease-s must be non-negative integers" >&2
+    exit 1
+  fi
+done
+
+case "${ACTION}" in
+  poll|leave)
+    if [[ -z "${GROUP}" || -z "${WORKER}" ]]; then
+      echo "--group and --worker are required" >&2
+      usage >&2
+      exit 1
+    fi ;;
+  commit) ;;
+  *)
+    echo "First argument must be poll, commit, or leave" >&2
+    usage >&2
+    exit 1 ;;
+esac
+
+case "${ACTION}" in
+  poll)
+    mkdir -p "$(dirname "${EVENTS_FILE}")"
+    touch "${EVENTS_FILE}"
+    exec python3 "${REPO_ROOT}/tools/sb.py" pubsub group-poll \
+      --group "${GROUP}" \
+      --worker "${WORKER}" \
+      --topics "${TOPICS}" \
+      --max-events "${MAX_EVENTS}" \
+      --events-file "${EVENTS_FILE}" \
+      --groups-dir "${GROUPS_DIR}" \
+      ${PARTITIONS:+--partitions "${PARTITIONS}"} \
+      ${LEASE_S:+--lease-s "${LEASE_S}"} \
+      ${NOW_TS:+--now-ts "${NOW_TS}"} ;;
+  commit)
+    exec python3 "${REPO_ROOT}/tools/sb.py" pubsub group-commit \
+      --groups-dir "${GROUPS_DIR}" \
+      ${LEASE_S:+--lease-s "${LEASE_S}"} \
+      ${NOW_TS:+--now-ts "${NOW_TS}"} ;;
+  leave)
+    exec python3 "${REPO_ROOT}/tools/sb.py" pubsub group-leave \
+      --group "${GROUP}" \
+      --worker "${WORKER}" \
+      --groups-dir "${GROUPS_DIR}" \
+      ${NOW_TS:+--now-ts "${NOW_TS}"} ;;
+esac
@@ -0,0 +1,56 @@
+#!/usr/bin/env bash
+set -euo pipefail
+
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+REPO_ROOT="$(cd "${SCRIPT_DIR}/.." && pwd)"
+
+EVENTS_FILE="${REPO_ROOT}/state/pubsub/events_v0.ndjson"
+OFFSETS_DIR="${REPO_ROOT}/state/pubsub/offsets"
+GROUPS_DIR="${REPO_ROOT}/state/pubsub/groups"
+NO_TOPICS=""
+NOW_TS=""
+
+usage() {
+  cat <<USAGE
+Usage: $(basename "$0") [options]
+
+Report how far each consumer and consumer group is behind the log, in events
+and bytes, with a per-topic breakdown from the topic indexes.
+
+Options:
+  --events-file <path>     Optional event log path
+  --offsets-dir <path>     Optional offsets directory
+  --groups-dir <path>      Optional consumer group directory
+  --no-topics              Skip the per-topic breakdown
+  --now-ts <RFC3339>       Optional "now" override for lease liveness
+  -h, --help               Show this help
+USAGE
+}
+
+while [[ $# -gt 0 ]]; do
+  case "$1" in
+    --events-file)
+      EVENTS_FILE="$2"; shift 2 ;;
+    --offsets-dir)
+      OFFSETS_DIR="$2"; shift 2 ;;
+    --groups-dir)
+      GROUPS_DIR="$2"; shift 2 ;;
+    --no-topics)
+      NO_TOPICS=1; shift ;;
+    --now-ts)
+      NOW_TS="$2"; shift 2 ;;
+    -h|--help)
+      usage; exit 0 ;;
+    *)
+      echo "Unknown arg: $1" >&2
+      usage >&2
+      exit 1 ;;
+  esac
+done
+
+exec python3 "${REPO_ROOT}/tools/sb.py" pubsub lag \
+  --events-file "${EVENTS_FILE}" \
+  --offsets-dir "${OFFSETS_DIR}" \
+  --groups-dir "${GROUPS_DIR}" \
+  ${NO_TOPICS:+--no-topics} \
+  ${NOW_TS:+--now-ts "${NOW_TS}"}
@@ -13,18 +13,27 @@ TTL_S="600"
 IDEMPOTENCY_KEY=""
 TS_OVERRIDE=""
 EVENT_ID_OVERRIDE=""
+SEGMENT_MAX_BYTES=""
+SEGMENT_MAX_AGE_S=""
+BATCH=""
 
 usage() {
   cat <<USAGE
 Usage: $(basename "$0") --topic <topic> --scope <scope> --actor <actor> [options]
+       $(basename "$0") --batch [options] < events.ndjson
 
 Options:
   --payload-json <json>      JSON object payload (default: {})
-  --ttl-s <seconds>          TTL in seconds, advisory (default: 600)
-  --idempotency-key <key>    Optional explicit key
+  --ttl-s <seconds>          TTL in seconds, advisory (default: 600; batch: for records without ttl_s)
+  --idempotency-key <key>    Optional explicit key (default: the event id)
   --ts <RFC3339>             Optional timestamp override (UTC recommended)
   --event-id <id>            Optional event id override
   --events-file <path>       Optional event log path
+  --segment-max-bytes <int>  Roll the active segment at this size
+  --segment-max-age-s <int>  Roll the active segment at this age
+  --batch                    Read one JSON record per stdin line ({topic, scope, actor, payload,
+                             ttl_s, idempotency_key, ts, event_id}) and append them all under one
+                             lock and fsync; records whose idempotency_key is already used are skipped
   -h, --help                 Show this help
 USAGE
 }
@@ -49,6 +58,12 @@ while [[ $# -gt 0 ]]; do
       EVENT_ID_OVERRIDE="$2"; shift 2 ;;
     --events-file)
       EVENTS_FILE="$2"; shift 2 ;;
+    --segment-max-bytes)
+      SEGMENT_MAX_BYTES="$2"; shift 2 ;;
+    --segment-max-age-s)
+      SEGMENT_MAX_AGE_S="$2"; shift 2 ;;
+    --batch)
+      BATCH=1; shift ;;
     -h|--help)
       usage; exit 0 ;;
     *)
@@ -58,7 +73,12 @@ while [[ $# -gt 0 ]]; do
   esac
 done
 
-if [[ -z "${TOPIC}" || -z "${SCOPE}" || -z "${ACTOR}" ]]; then
+if [[ -n "${BATCH}" ]]; then
+  if [[ -n "${TOPIC}${SCOPE}${ACTOR}${IDEMPOTENCY_KEY}${TS_OVERRIDE}${EVENT_ID_OVERRIDE}" || "${PAYLOAD_JSON}" != "{}" ]]; then
+    echo "--batch takes event fields from stdin records, not flags" >&2
+    exit 1
+  fi
+elif [[ -z "${TOPIC}" || -z "${SCOPE}" || -z "${ACTOR}" ]]; then
   echo "--topic, --scope, and --actor are required" >&2
   usage >&2
   exit 1
@@ -69,70 +89,32 @@ if ! [[ "${TTL_S}" =~ ^[0-9]+$ ]]; then
   exit 1
 fi
 
-mkdir -p "$(dirname "${EVENTS_FILE}")"
-
-EVENT_LINE="$(
-python3 - "$TOPIC" "$SCOPE" "$ACTOR" "$PAYLOAD_JSON" "$TTL_S" "$IDEMPOTENCY_KEY" "$TS_OVERRIDE" "$EVENT_ID_OVERRIDE" <<'PY'
-import hashlib
-import json
-import re
-import sys
-from datetime import datetime, timezone
-
-topic, scope, actor, payload_json, ttl_s_raw, idem_key, ts_override, event_id_override = sys.argv[1:]
-
-try:
-    payload = json.loads(payload_json)
-except Exception as e:
-    raise SystemExit(f"invalid --payload-json: {e}")
-
-if not isinstance(payload, dict):
-    raise SystemExit("--payload-json must decode to a JSON object")
-
-ttl_s = int(ttl_s_raw)
-if ttl_s < 0:
-    raise SystemExit("--ttl-s must be >= 0")
-
-
-def parse_rfc3339_z(value: str) -> datetime:
-    if value.endswith("Z"):
-        value = value[:-1] + "+00:00"
-    dt = datetime.fromisoformat(value)
-    if dt.tzinfo is None:
-        raise ValueError("timestamp must include timezone")
-    return dt.astimezone(timezone.utc)
-
-
-ts_dt = parse_rfc3339_z(ts_override) if ts_override else datetime.now(timezone.utc)
-ts = ts_dt.replace(microsecond=0).isoformat().replace("+00:00", "Z")
-
-if event_id_override:
-    event_id = event_id_override
-else:
-    stamp = ts_dt.strftime("%Y%m%dT%H%M%SZ")
-    seed = f"{topic}|{scope}|{actor}|{ts}|{json.dumps(payload, sort_keys=True, separators=(',', ':'))}"
-    digest = hashlib.sha256(seed.encode("utf-8")).hexdigest()[:12]
-    event_id = f"evt_{stamp}_{digest}"
-
-if idem_key:
-    idempotency_key = idem_key
-else:
-    idempotency_key = f"{topic}|{scope}|{actor}|{ts}"
+for v in "${SEGMENT_MAX_BYTES}" "${SEGMENT_MAX_AGE_S}"; do
+  if [[ -n "${v}" ]] && ! [[ "${v}" =~ ^[0-9]+$ ]]; then
+    echo "--segment-max-bytes and --segment-max-age-s must be non-negative integers" >&2
+    exit 1
+  fi
+done
 
-event = {
-    "event_id": event_id,
-    "ts": ts,
-    "topic": topic,
-    "scope": scope,
-    "actor": actor,
-    "payload": payload,
-    "ttl_s": ttl_s,
-    "idempotency_key": idempotency_key,
-}
+mkdir -p "$(dirname "${EVENTS_FILE}")"
 
-print(json.dumps(event, sort_keys=True, separators=(",", ":")))
-PY
-)"
+if [[ -n "${BATCH}" ]]; then
+  exec python3 "${REPO_ROOT}/tools/sb.py" pubsub publish-batch \
+    --ttl-s "${TTL_S}" \
+    --events-file "${EVENTS_FILE}" \
+    ${SEGMENT_MAX_BYTES:+--segment-max-bytes "${SEGMENT_MAX_BYTES}"} \
+    ${SEGMENT_MAX_AGE_S:+--segment-max-age-s "${SEGMENT_MAX_AGE_S}"}
+fi
 
-printf '%s\n' "${EVENT_LINE}" >> "${EVENTS_FILE}"
-echo "${EVENT_LINE}"
+exec python3 "${REPO_ROOT}/tools/sb.py" pubsub publish \
+  --topic "${TOPIC}" \
+  --scope "${SCOPE}" \
+  --actor "${ACTOR}" \
+  --payload-json "${PAYLOAD_JSON}" \
+  --ttl-s "${TTL_S}" \
+  --events-file "${EVENTS_FILE}" \
+  ${IDEMPOTENCY_KEY:+--idempotency-key "${IDEMPOTENCY_KEY}"} \
+  ${TS_OVERRIDE:+--ts "${TS_OVERRIDE}"} \
+  ${EVENT_ID_OVERRIDE:+--event-id "${EVENT_ID_OVERRIDE}"} \
+  ${SEGMENT_MAX_BYTES:+--segment-max-bytes "${SEGMENT_MAX_BYTES}"} \
+  ${SEGMENT_MAX_AGE_S:+--segment-max-age-s "${SEGMENT_MAX_AGE_S}"}
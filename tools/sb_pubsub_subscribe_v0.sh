@@ -0,0 +1,106 @@
+#!/usr/bin/env bash
+set -euo pipefail
+
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+REPO_ROOT="$(cd "${SCRIPT_DIR}/.." && pwd)"
+
+EVENTS_FILE="${REPO_ROOT}/state/pubsub/events_v0.ndjson"
+OFFSETS_DIR="${REPO_ROOT}/state/pubsub/offsets"
+CONSUMER=""
+TOPICS=""
+TIMEOUT_S=""
+MAX_EVENTS=""
+COMMIT_EVERY=""
+COMMIT_INTERVAL_MS=""
+NOW_TS=""
+FORCE_POLL=""
+STATS=""
+
+usage() {
+  cat <<USAGE
+Usage: $(basename "$0") --consumer <name> [options]
+
+Streams new events to stdout as NDJSON, blocking on file changes (inotify,
+stat polling elsewhere) instead of re-running the poll in a loop.
+
+Options:
+  --topics <csv>              Optional topic filter, comma-separated
+  --timeout-s <seconds>       Exit after this long without delivering an event (default: wait forever)
+  --max-events <int>          Exit after delivering this many events (default: unlimited)
+  --commit-every <int>        Commit the offset after this many events (default: 100)
+  --commit-interval-ms <int>  Commit an advanced offset at least this often (default: 1000)
+  --events-file <path>        Optional event log path
+  --offsets-dir <path>        Optional offsets directory
+  --now-ts <RFC3339>          Optional "now" override for TTL filtering
+  --poll                      Use stat polling instead of inotify
+  --stats                     Print a delivery summary to stderr on exit
+  -h, --help                  Show this help
+USAGE
+}
+
+while [[ $# -gt 0 ]]; do
+  case "$1" in
+    --consumer)
+      CONSUMER="$2"; shift 2 ;;
+    --topics)
+      TOPICS="$2"; shift 2 ;;
+    --timeout-s)
+      TIMEOUT_S="$2"; shift 2 ;;
+    --max-events)
+      MAX_EVENTS="$2"; shift 2 ;;
+    --commit-every)
+      COMMIT_EVERY="$2"; shift 2 ;;
+    --commit-interval-ms)
+      COMMIT_INTERVAL_MS="$2"; shift 2 ;;
+    --events-file)
+      EVENTS_FILE="$2"; shift 2 ;;
+    --offsets-dir)
+      OFFSETS_DIR="$2"; shift 2 ;;
+    --now-ts)
+      NOW_TS="$2"; shift 2 ;;
+    --poll)
+      FORCE_POLL=1; shift ;;
+    --stats)
+      STATS=1; shift ;;
+    -h|--help)
+      usage; exit 0 ;;
+    *)
+      echo "Unknown arg: $1" >&2
+      usage >&2
+      exit 1 ;;
+  esac
+done
+
+if [[ -z "${CONSUMER}" ]]; then
+  echo "--consumer is required" >&2
+  usage >&2
+  exit 1
+fi
+
+if [[ -n "${TIMEOUT_S}" ]] && ! [[ "${TIMEOUT_S}" =~ ^[0-9]+([.][0-9]+)?$ ]]; then
+  echo "--timeout-s must be a non-negative number" >&2
+  exit 1
+fi
+
+for v in "${MAX_EVENTS}" "${COMMIT_EVERY}" "${COMMIT_INTERVAL_MS}"; do
+  if [[ -n "${v}" ]] && ! [[ "${v}" =~ ^[0-9]+$ ]]; then
+    echo "--max-events, --commit-every and --commit-interval-ms must be non-negative integers" >&2
+    exit 1
+  fi
+done
+
+mkdir -p "$(dirname "${EVENTS_FILE}")"
+mkdir -p "${OFFSETS_DIR}"
+
+exec python3 "${REPO_ROOT}/tools/sb.py" pubsub subscribe \
+  --consumer "${CONSUMER}" \
+  --topics "${TOPICS}" \
+  --events-file "${EVENTS_FILE}" \
+  --offsets-dir "${OFFSETS_DIR}" \
+  ${TIMEOUT_S:+--timeout-s "${TIMEOUT_S}"} \
+  ${MAX_EVENTS:+--max-events "${MAX_EVENTS}"} \
+  ${COMMIT_EVERY:+--commit-every "${COMMIT_EVERY}"} \
+  ${COMMIT_INTERVAL_MS:+--commit-interval-ms "${COMMIT_INTERVAL_MS}"} \
+  ${NOW_TS:+--now-ts "${NOW_TS}"} \
+  ${FORCE_POLL:+--poll} \
+  ${STATS:+--stats}
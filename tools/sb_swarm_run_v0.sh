@@ -0,0 +1,79 @@
+#!/usr/bin/env bash
+set -euo pipefail
+
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+REPO_ROOT="$(cd "${SCRIPT_DIR}/.." && pwd)"
+
+JOBS_FILE=""
+WORKERS="4"
+REGISTRY_FILE="${REPO_ROOT}/scene/authority/registry_v0.json"
+LEDGER_FILE="${REPO_ROOT}/scene/ledger/mutations_v0.jsonl"
+SPEC_FILE=""
+OUT_FILE=""
+
+usage() {
+  cat <<USAGE
+Usage: $(basename "$0") [--jobs-file <path>] [options]
+       $(basename "$0") [options] < jobs.ndjson
+
+Run a batch of agent cycles (see sb_agent_run_cycle_v0.sh) on a worker pool.
+Each job is one JSON object: {agent_id, targets, exec_cmd, reason, task_id,
+phase, mutation_type, inputs, actor, job_id}; targets and inputs take a list
+or a comma-separated string. Jobs whose targets (or agent cursor) overlap run
+one after another in submission order; all others run concurrently. Jobs that
+fail the authority check or touch a blocked gate scope are not run.
+
+Prints a JSON report with per-job latency and the achieved parallelism.
+Exits 1 if any job was rejected or failed.
+
+Options:
+  --jobs-file <path>       JSON array or NDJSON of jobs (default: stdin)
+  --workers <n>            Worker threads (default: 4)
+  --registry-file <path>   Optional authority registry path
+  --ledger-file <path>     Optional mutation ledger path
+  --spec-file <path>       Optional spec naming the gates (default: spec/swarm_runner_v0.md)
+  --out-file <path>        Optional copy of the report
+  -h, --help               Show this help
+USAGE
+}
+
+while [[ $# -gt 0 ]]; do
+  case "$1" in
+    --jobs-file)
+      JOBS_FILE="$2"; shift 2 ;;
+    --workers)
+      WORKERS="$2"; shift 2 ;;
+    --registry-file)
+      REGISTRY_FILE="$2"; shift 2 ;;
+    --ledger-file)
+      LEDGER_FILE="$2"; shift 2 ;;
+    --spec-file)
+      SPEC_FILE="$2"; shift 2 ;;
+    --out-file)
+      OUT_FILE="$2"; shift 2 ;;
+    -h|--help)
+      usage; exit 0 ;;
+    *)
+      echo "Unknown arg: $1" >&2
+      usage >&2
+      exit 1 ;;
+  esac
+done
+
+if ! [[ "${WORKERS}" =~ ^[1-9][0-9]*$ ]]; then
+  echo "--workers must be a positive integer" >&2
+  exit 1
+fi
+
+if [[ -n "${JOBS_FILE}" && ! -f "${JOBS_FILE}" ]]; then
+  echo "jobs file not found: ${JOBS_FILE}" >&2
+  exit 1
+fi
+
+exec python3 "${REPO_ROOT}/tools/sb.py" swarm run \
+  --workers "${WORKERS}" \
+  --registry-file "${REGISTRY_FILE}" \
+  --ledger-file "${LEDGER_FILE}" \
+  ${JOBS_FILE:+--jobs-file "${JOBS_FILE}"} \
+  ${SPEC_FILE:+--spec-file "${SPEC_FILE}"} \
+  ${OUT_FILE:+--out-file "${OUT_FILE}"}
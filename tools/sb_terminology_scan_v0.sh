@@ -47,16 +47,19 @@ while [[ $# -gt 0 ]]; do
   esac
 done
 
-python3 - "${SESSIONS_DIR}" "${OUT_FILE}" "${LIMIT}" <<'PY'
+python3 - "${REPO_ROOT}" "${SESSIONS_DIR}" "${OUT_FILE}" "${LIMIT}" <<'PY'
 import json
 import re
 import sys
 from datetime import date, datetime, timezone
 from pathlib import Path
 
-sessions_dir = Path(sys.argv[1])
-out_file = Path(sys.argv[2])
-limit = int(sys.argv[3])
+sys.path.insert(0, str(Path(sys.argv[1]) / "scripts"))
+import sb_corpus  # noqa: E402
+
+sessions_dir = Path(sys.argv[2])
+out_file = Path(sys.argv[3])
+limit = int(sys.argv[4])
 
 patterns = [
     (
@@ -81,67 +84,21 @@ patterns = [
     ),
 ]
 
-def artifact_date_key(obj: dict, path: Path) -> str:
-    sd = obj.get("session_date")
-    if isinstance(sd, str) and re.match(r"^\d{4}-\d{2}-\d{2}$", sd):
-        return sd
-    m = re.search(r"(\d{4})_(\d{2})_(\d{2})", str(obj.get("artifact_id", "")))
-    if m:
-        return f"{m.group(1)}-{m.group(2)}-{m.group(3)}"
-    m2 = re.search(r"(\d{4})-(\d{2})-(\d{2})", path.name)
-    if m2:
-        return f"{m2.group(1)}-{m2.group(2)}-{m2.group(3)}"
-    return "0000-00-00"
-
-def flatten_text(obj: dict) -> str:
-    parts: list[str] = []
-    summary = obj.get("summary")
-    if isinstance(summary, str):
-        parts.append(summary)
-    elif isinstance(summary, dict):
-        for v in summary.values():
-            if isinstance(v, str):
-                parts.append(v)
-            elif isinstance(v, list):
-                parts.extend(str(x) for x in v if isinstance(x, str))
-    for key in ("key_decisions", "open_questions", "next_steps", "resumption_notes"):
-        v = obj.get(key)
-        if isinstance(v, list):
-            parts.extend(str(x) for x in v if isinstance(x, str))
-        elif isinstance(v, str):
-            parts.append(v)
-    return "\n".join(parts)
-
-artifacts = []
-for tool_dir in sorted([p for p in sessions_dir.iterdir() if p.is_dir()]):
-    for p in sorted(tool_dir.glob("*.json")):
-        if p.name == "index.json":
-            continue
-        try:
-            obj = json.loads(p.read_text(encoding="utf-8"))
-        except Exception:
-            continue
-        if not isinstance(obj, dict):
-            continue
-        aid = obj.get("artifact_id") or obj.get("id")
-        if not isinstance(aid, str):
-            continue
-        artifacts.append((artifact_date_key(obj, p), p, aid, obj))
-
-artifacts.sort(key=lambda x: (x[0], x[2]), reverse=True)
+artifacts = sb_corpus.load_sessions(sessions_dir)
+artifacts.sort(key=lambda r: (r.date_key, r.artifact_id), reverse=True)
 scan_set = artifacts[:limit]
 
 violations = []
-for dkey, path, aid, obj in scan_set:
-    text = flatten_text(obj)
+for rec in scan_set:
+    text = rec.text
     for vid, regex, desc in patterns:
         m = regex.search(text)
         if m:
             snippet = text[max(0, m.start() - 40): m.end() + 40].replace("\n", " ").strip()
             violations.append(
                 {
-                    "artifact_id": aid,
-                    "artifact_path": str(path.relative_to(sessions_dir.parent)),
+                    "artifact_id": rec.artifact_id,
+                    "artifact_path": str(Path(rec.path).relative_to(sessions_dir.parent)),
                     "violation_id": vid,
                     "description": desc,
                     "snippet": snippet[:220],
@@ -0,0 +1,36 @@
+#!/usr/bin/env bash
+set -euo pipefail
+
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+REPO_ROOT="$(cd "${SCRIPT_DIR}/.." && pwd)"
+TEST_ROOT="$(mktemp -d)"
+trap 'rm -rf "${TEST_ROOT}"' EXIT
+
+# scripts/sb_jsonl_append.py: a last line missing only its newline is kept and
+# terminated; only a torn JSONL record is moved to <log>.torn.
+python3 - <<'PY' "${REPO_ROOT}" "${TEST_ROOT}"
+import sys
+from pathlib import Path
+
+root, tmp = Path(sys.argv[1]), Path(sys.argv[2])
+sys.path.insert(0, str(root / "scripts"))
+import sb_jsonl_append
+
+def append(name, existing, line):
+    path = tmp / name
+    path.write_bytes(existing)
+    res = sb_jsonl_append.append_lines(path, [line], fsync=False)
+    torn = sb_jsonl_append.torn_path(path)
+    return path.read_bytes(), res["torn_bytes"], torn.read_bytes() if torn.exists() else None
+
+# A complete JSON object without its newline stays in the log.
+assert append("ledger.jsonl", b'{"n":1}\n{"n":2}', '{"n":3}') == (b'{"n":1}\n{"n":2}\n{"n":3}\n', 0, None)
+# A torn JSON record is set aside.
+log, moved, torn = append("alerts.jsonl", b'{"n":1}\n{"n":', '{"n":3}')
+assert log == b'{"n":1}\n{"n":3}\n' and moved == 5 and torn.endswith(b'\n{"n":\n'), (log, moved, torn)
+# Non-JSONL logs such as coord_claims.md never lose a line.
+claim = b"- 2026-01-01T00:00:00Z | CLAIM | a | scene/x.md | edit"
+assert append("coord_claims.md", b"# Claims\n" + claim, "next") == (b"# Claims\n" + claim + b"\nnext\n", 0, None)
+assert append("notes.md", b"partial", "next") == (b"partial\nnext\n", 0, None)
+print("torn_tail_keeps_complete_records_ok")
+PY
@@ -0,0 +1,69 @@
+#!/usr/bin/env bash
+set -euo pipefail
+
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+REPO_ROOT="$(cd "${SCRIPT_DIR}/.." && pwd)"
+TEST_ROOT="$(mktemp -d)"
+trap 'rm -rf "${TEST_ROOT}"' EXIT
+
+# scripts/sb_ledger_index.py: an unlocked query that read the manifest before a
+# merge or rebuild deleted its segments retries on the new manifest.
+python3 - <<'PY' "${REPO_ROOT}" "${TEST_ROOT}"
+import json, sys
+from pathlib import Path
+
+root, tmp = Path(sys.argv[1]), Path(sys.argv[2])
+sys.path.insert(0, str(root / "scripts"))
+import sb_ledger_index
+
+ledger = tmp / "mutations_v0.jsonl"
+index_dir = tmp / "ledger_v0"
+n = 0
+
+def append(count):
+    global n
+    with ledger.open("a", encoding="utf-8") as f:
+        for _ in range(count):
+            row = {"timestamp": f"2026-01-{1 + n % 28:02d}T00:00:00Z", "agent_id": f"a{n % 3}", "target_path": f"scene/p{n % 5}.md"}
+            f.write(json.dumps(row) + "\n")
+            n += 1
+
+def reader_with(stale):
+    """A second index instance whose first manifest read returns `stale`, as if it read it just before the writer committed."""
+    idx = sb_ledger_index.LedgerIndex(index_dir, ledger)
+    pending = [stale]
+    fresh = idx.load_manifest
+    idx.load_manifest = lambda: pending.pop() if pending else fresh()
+    return idx
+
+writer = sb_ledger_index.LedgerIndex(index_dir, ledger)
+append(10)
+writer.refresh()
+stale = writer.load_manifest()
+for _ in range(sb_ledger_index.MAX_DELTA_SEGMENTS + 1):
+    append(3)
+    writer.refresh()
+live = writer.load_manifest()
+assert not {s["name"] for s in stale["segments"]} & {s["name"] for s in live["segments"]}, "merge kept the old segments"
+expected = writer.offsets("agent_id", key="a1")
+assert len(expected) == len([i for i in range(n) if i % 3 == 1])
+assert reader_with(stale).offsets("agent_id", key="a1") == expected
+assert reader_with(stale).select(path_prefix="scene/p", agent="a1")[0] == expected
+
+# A rebuild never reuses a generation, so readers holding the old manifest notice it was replaced.
+stale = writer.load_manifest()
+writer.rebuild()
+assert writer.load_manifest()["generation"] > stale["generation"]
+assert reader_with(stale).offsets("day", key_range=("2026-01-02", "2026-01-02")) == writer.offsets("day", key="2026-01-02")
+
+# Segments missing from the current manifest are a broken index, not a race.
+seg = writer.load_manifest()["segments"][0]["name"]
+(index_dir / f"{seg}.bin").unlink()
+try:
+    sb_ledger_index.LedgerIndex(index_dir, ledger).offsets("agent_id", key="a1")
+except FileNotFoundError:
+    pass
+else:
+    raise AssertionError("missing live segment went unnoticed")
+print("ledger_index_reader_survives_merge_ok")
+PY
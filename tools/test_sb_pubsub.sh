@@ -0,0 +1,403 @@
+#!/usr/bin/env bash
+set -euo pipefail
+
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+REPO_ROOT="$(cd "${SCRIPT_DIR}/.." && pwd)"
+TEST_ROOT="$(mktemp -d)"
+trap 'rm -rf "${TEST_ROOT}"' EXIT
+
+# Legacy line-only offsets keep working across the first segmented publish,
+# which moves the single-file log (and its line index) into segments.
+mkdir -p "${TEST_ROOT}/legacy/offsets"
+python3 - <<'PY' "${REPO_ROOT}" "${TEST_ROOT}/legacy"
+import json, sys
+from pathlib import Path
+
+root, tmp = Path(sys.argv[1]), Path(sys.argv[2])
+sys.path.insert(0, str(root / "scripts"))
+import sb_pubsub
+
+events_file = tmp / "events_v0.ndjson"
+offsets = tmp / "offsets"
+lines = [
+    sb_pubsub.encode_event(sb_pubsub.build_event(f"t{n % 3}", f"s/{n}", "a", json.dumps({"n": n}), 0, ts_override="2026-01-01T00:00:00Z"))
+    for n in range(1, 2601)
+]
+events_file.write_text("".join(line + "\n" for line in lines), encoding="utf-8")
+size = events_file.stat().st_size
+
+def poll(consumer, **kw):
+    return sb_pubsub.poll(events_file, offsets / f"{consumer}.json", consumer, set(), kw.get("max_events", 5000))
+
+(offsets / "mid.json").write_text(json.dumps({"consumer": "mid", "next_line": 2000}), encoding="utf-8")
+(offsets / "tail.json").write_text(json.dumps({"consumer": "tail", "next_line": 2601}), encoding="utf-8")
+head = poll("head", max_events=10)
+assert [e["payload"]["n"] for e in head["events_returned"]] == list(range(1, 11)), head["events_returned"][:3]
+assert (head["next_line"], head["next_byte"]) == (2601, size)
+# The drain indexed every stride it passed; drop that so the line-only read below rebuilds it.
+sb_pubsub.line_index_path(events_file).unlink()
+assert [e["payload"]["n"] for e in sb_pubsub.read_events(events_file, {}, 2000, set(), sb_pubsub.parse_rfc3339_z("2026-01-02T00:00:00Z"), 1, drain=False)[0]] == [2000]
+assert sb_pubsub.line_index_path(events_file).exists()
+
+new = sb_pubsub.build_event("t9", "s/new", "a", '{"n": 2601}', 0, ts_override="2026-01-01T00:00:00Z")
+assert sb_pubsub.publish(events_file, new) is not None
+assert not events_file.exists()
+segments = sb_pubsub.load_segments(events_file)
+assert segments is not None and len(segments) == 1 and segments[0].base_line == 1
+assert sb_pubsub.line_index_path(segments[0].path).exists(), "line index did not move with the log"
+
+mid = poll("mid")
+assert [e["_line"] for e in mid["events_returned"]] == list(range(2000, 2602))
+assert [e["payload"]["n"] for e in mid["events_returned"]] == list(range(2000, 2602))
+assert mid["from_line"] == 2000 and mid["next_line"] == 2602
+for name in ("head", "tail"):
+    got = poll(name)
+    assert [e["payload"]["n"] for e in got["events_returned"]] == [2601], (name, got["events_returned"][:2])
+    assert got["next_byte"] == mid["next_byte"]
+assert json.loads((offsets / "mid.json").read_text(encoding="utf-8"))["next_byte"] == mid["next_byte"]
+print("legacy_line_offsets_survive_segmentation_ok")
+PY
+
+# The wrapper resumes a line-only offset written by an older poller.
+printf '{"consumer":"wrapped","next_line":2600}\n' > "${TEST_ROOT}/legacy/offsets/wrapped.json"
+SB_NO_DAEMON=1 "${SCRIPT_DIR}/sb_pubsub_poll_v0.sh" --consumer wrapped --max-events 5 \
+  --events-file "${TEST_ROOT}/legacy/events_v0.ndjson" --offsets-dir "${TEST_ROOT}/legacy/offsets" > "${TEST_ROOT}/wrapped.json"
+python3 - <<'PY' "${TEST_ROOT}/wrapped.json"
+import json, sys
+
+out = json.load(open(sys.argv[1], encoding="utf-8"))
+assert [e["payload"]["n"] for e in out["events_returned"]] == [2600, 2601], out["events_returned"]
+assert out["next_line"] == 2602
+print("wrapper_legacy_offset_ok")
+PY
+
+# Compaction drops fully expired segments, keeps their idempotency keys as
+# tombstones (so dedupe survives it), and moves offsets inside dropped
+# segments to the first retained event.
+mkdir -p "${TEST_ROOT}/compact/offsets"
+python3 - <<'PY' "${REPO_ROOT}" "${TEST_ROOT}/compact"
+import json, sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+root, tmp = Path(sys.argv[1]), Path(sys.argv[2])
+sys.path.insert(0, str(root / "scripts"))
+import sb_pubsub
+
+events_file = tmp / "events_v0.ndjson"
+offsets = tmp / "offsets"
+d = sb_pubsub.segments_dir(events_file)
+# Rolling and roll-time compaction use the wall clock, so events are stamped just before it.
+now = datetime.now(timezone.utc)
+ts = sb_pubsub.format_ts(now - timedelta(seconds=10))
+later = sb_pubsub.format_ts(now + timedelta(hours=2))
+
+def batch(prefix, n, ttl_s):
+    return [sb_pubsub.build_event("t", f"s/{prefix}{i}", "a", json.dumps({"k": f"{prefix}{i}"}), ttl_s, idem_key=f"{prefix}{i}", ts_override=ts) for i in range(n)]
+
+def publish(events):
+    # A 1-byte limit rolls the active segment before every batch.
+    return sb_pubsub.publish_batch(events_file, events, segment_max_bytes=1)
+
+assert publish(batch("a", 20, 3600))["published"] == 20
+assert publish(batch("b", 20, 3600))["published"] == 20
+assert publish(batch("c", 5, 0))["published"] == 5
+assert [len(s.path.read_bytes().splitlines()) for s in sb_pubsub.load_segments(events_file)] == [20, 20, 5]
+
+def poll(consumer):
+    return sb_pubsub.poll(events_file, offsets / f"{consumer}.json", consumer, set(), 100, now_ts=later)
+
+first_two = sb_pubsub.load_segments(events_file)[:2]
+line6 = sum(len(raw) for raw in first_two[0].path.read_bytes().splitlines(keepends=True)[:5])
+(offsets / "bytes.json").write_text(json.dumps({"consumer": "bytes", "next_line": 6, "next_byte": line6}), encoding="utf-8")
+(offsets / "lines.json").write_text(json.dumps({"consumer": "lines", "next_line": 25}), encoding="utf-8")
+
+dry = sb_pubsub.compact(events_file, now_ts=later, apply=False)
+assert dry["segments_dropped"] == [s.path.name for s in first_two] and all(s.path.exists() for s in first_two)
+done = sb_pubsub.compact(events_file, now_ts=later)
+assert done["segments_dropped"] == dry["segments_dropped"] and done["tombstones_added"] == 40, done
+assert not any(s.path.exists() or sb_pubsub.line_index_path(s.path).exists() for s in first_two)
+tombstones = sb_pubsub.read_tombstones(events_file)
+assert sorted(tombstones) == sorted([f"a{i}" for i in range(20)] + [f"b{i}" for i in range(20)])
+assert tombstones["b0"]["line"] == 21
+
+# Topic index entries into dropped segments are gone.
+retained = sb_pubsub.load_segments(events_file)
+assert len(retained) == 1 and retained[0].base_line == 41
+entries = list(sb_pubsub._topic_positions(sb_pubsub.topic_index_path(d, "t"), 1, None, 1 << 62))
+assert [line for _byte, line in entries] == list(range(41, 46))
+
+# Offsets inside dropped segments (byte-based and line-only) resume at the first retained event.
+for consumer in ("bytes", "lines"):
+    got = poll(consumer)
+    assert [e["payload"]["k"] for e in got["events_returned"]] == [f"c{i}" for i in range(5)], (consumer, got)
+    assert got["next_line"] == 46
+
+# Dedupe survives compaction, including when the hashed table has to be rebuilt from tombstones.
+again = publish(batch("a", 20, 3600) + batch("b", 1, 3600))
+assert again["published"] == 0 and len(again["duplicates"]) == 21
+assert again["duplicates"][0]["duplicate_of_line"] == 1 and again["duplicates"][20]["duplicate_of_line"] == 21
+(d / sb_pubsub.IDEMPOTENCY_INDEX_NAME).unlink()
+again = publish(batch("a", 2, 3600) + batch("c", 1, 0))
+assert again["published"] == 0 and [x["duplicate_of_line"] for x in again["duplicates"]] == [1, 2, 41]
+
+# Once tombstones outlive the retention window they are pruned and the keys are reusable.
+pruned = sb_pubsub.compact(events_file, now_ts=sb_pubsub.format_ts(now + timedelta(hours=3)), retention_s=60)
+assert pruned["tombstones_pruned"] == 40 and pruned["tombstones"] == 0, pruned
+assert publish(batch("a", 1, 3600))["published"] == 1
+assert publish(batch("c", 1, 0))["published"] == 0
+print("compaction_tombstones_ok")
+print("dedupe_survives_compaction_ok")
+PY
+
+# subscribe blocks until appends land, honours the topic filter and TTLs,
+# commits its offset, and returns on an idle timeout (inotify and polling).
+mkdir -p "${TEST_ROOT}/subscribe"
+python3 - <<'PY' "${REPO_ROOT}" "${TEST_ROOT}/subscribe"
+import json, sys, threading, time
+from pathlib import Path
+
+root, tmp = Path(sys.argv[1]), Path(sys.argv[2])
+sys.path.insert(0, str(root / "scripts"))
+import sb_pubsub
+
+for force_poll in (False, True):
+    events_file = tmp / f"poll{int(force_poll)}" / "events_v0.ndjson"
+    offset_file = events_file.parent / "offsets" / "sub.json"
+    got: list[tuple[float, dict]] = []
+    result: dict = {}
+
+    def run() -> None:
+        result.update(
+            sb_pubsub.subscribe(
+                events_file, offset_file, "sub", {"want"}, lambda e: got.append((time.monotonic(), e)),
+                timeout_s=10, max_events=3, commit_every=2, poll_interval=0.05, force_poll=force_poll,
+            )
+        )
+
+    worker = threading.Thread(target=run)
+    worker.start()
+    time.sleep(0.3)
+    published = {}
+    for n, (topic, ts, ttl_s) in enumerate(
+        [("want", "", 0), ("other", "", 0), ("want", "2026-01-01T00:00:00Z", 1), ("want", "", 0), ("want", "", 0), ("want", "", 0)]
+    ):
+        evt = sb_pubsub.build_event(topic, "s", "a", json.dumps({"n": n}), ttl_s, idem_key=f"k{n}", ts_override=ts)
+        published[n] = time.monotonic()
+        sb_pubsub.publish(events_file, evt)
+        time.sleep(0.05)
+    worker.join(15)
+    assert not worker.is_alive()
+    assert result["reason"] == "max_events" and result["delivered"] == 3, result
+    assert [e["payload"]["n"] for _t, e in got] == [0, 3, 4], [e for _t, e in got]
+    assert all(t - published[e["payload"]["n"]] < 2.0 for t, e in got), "delivery waited for a timeout"
+    offset = json.loads(offset_file.read_text(encoding="utf-8"))
+    assert (offset["next_line"], offset["next_byte"]) == (result["next_line"], result["next_byte"]) and offset["next_line"] == 6
+    assert result["commits"] >= 2  # one after commit_every=2 deliveries, one on exit
+
+    # Resumes from the committed offset, then gives up after the idle timeout.
+    got.clear()
+    t0 = time.monotonic()
+    rest = sb_pubsub.subscribe(events_file, offset_file, "sub", {"want"}, lambda e: got.append((0.0, e)), timeout_s=0.3, poll_interval=0.05, force_poll=force_poll)
+    assert rest["reason"] == "timeout" and [e["payload"]["n"] for _t, e in got] == [5], rest
+    assert time.monotonic() - t0 < 3.0
+print("subscribe_blocks_filters_commits_ok")
+PY
+
+# Topic-filtered reads through the per-topic indexes return exactly what a
+# full scan returns, from any line or byte offset, before and after compaction.
+mkdir -p "${TEST_ROOT}/topics"
+python3 - <<'PY' "${REPO_ROOT}" "${TEST_ROOT}/topics"
+import itertools, json, random, sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+root, tmp = Path(sys.argv[1]), Path(sys.argv[2])
+sys.path.insert(0, str(root / "scripts"))
+import sb_pubsub
+
+rng = random.Random(18)
+events_file = tmp / "events_v0.ndjson"
+now = datetime.now(timezone.utc)
+old = sb_pubsub.format_ts(now - timedelta(seconds=30))
+n = 0
+for batch in range(6):
+    events = []
+    for _ in range(25):
+        topic = rng.choices(["hot", "warm", "cold", "a/b c"], weights=[70, 20, 8, 2])[0]
+        # Early batches expire in a minute (compactable later); some events are already expired.
+        ttl_s = 60 if batch < 2 else rng.choice([0, 0, 0, 5])
+        events.append(sb_pubsub.build_event(topic, f"s/{n % 7}", "a", json.dumps({"n": n}), ttl_s, idem_key=f"k{n}", ts_override=old))
+        n += 1
+    assert sb_pubsub.publish_batch(events_file, events, segment_max_bytes=4096)["published"] == 25
+assert len(sb_pubsub.load_segments(events_file)) > 2
+
+def line_starts():
+    out, byte, line = [], 0, 0
+    for seg in sb_pubsub.load_segments(events_file):
+        line, byte = seg.base_line, seg.base_byte
+        for raw in seg.path.read_bytes().splitlines(keepends=True):
+            out.append((line, byte))
+            line += 1
+            byte += len(raw)
+    return out + [(line, byte)]
+
+def check(read_now):
+    compared = 0
+    for (line, byte), topics, max_events, drain in itertools.product(
+        line_starts()[::3], [{"hot"}, {"cold"}, {"warm", "a/b c"}, {"missing"}], [1, 4, 1000], [True, False]
+    ):
+        for offset in ({"next_byte": byte}, {}):
+            args = (events_file, offset, line, topics, read_now, max_events, drain)
+            indexed = sb_pubsub.read_events(*args)
+            scanned = sb_pubsub.read_events(*args, use_topic_index=False)
+            assert indexed[0] == scanned[0] and indexed[2:] == scanned[2:], (line, byte, topics, max_events, drain, offset)
+            compared += 1
+    return compared
+
+assert check(now) > 1000
+sb_pubsub.compact(events_file, now_ts=sb_pubsub.format_ts(now + timedelta(minutes=5)))
+assert sb_pubsub.load_segments(events_file)[0].base_line > 1
+assert check(now + timedelta(minutes=5)) > 500
+print("topic_index_reads_match_full_scan_ok")
+PY
+
+# Without an explicit key, only an identical retry dedupes: distinct payloads
+# from one actor in the same second all publish, singly, batched and through the wrapper.
+mkdir -p "${TEST_ROOT}/idem"
+python3 - <<'PY' "${REPO_ROOT}" "${TEST_ROOT}/idem"
+import json, sys
+from pathlib import Path
+
+root, tmp = Path(sys.argv[1]), Path(sys.argv[2])
+sys.path.insert(0, str(root / "scripts"))
+import sb_pubsub
+
+events_file = tmp / "events_v0.ndjson"
+ts = "2026-01-01T00:00:00Z"
+
+def event(n, **kw):
+    return sb_pubsub.build_event("want", "s", "a", json.dumps({"n": n}), 0, ts_override=ts, **kw)
+
+assert event(1)["idempotency_key"] == event(1)["event_id"] != event(2)["event_id"]
+assert sb_pubsub.publish(events_file, event(1)) is not None
+assert sb_pubsub.publish(events_file, event(2)) is not None
+assert sb_pubsub.publish(events_file, event(1)) is None
+res = sb_pubsub.publish_batch(events_file, [event(3), event(4), event(3), event(2)])
+assert res["published"] == 2 and [d["batch_index"] for d in res["duplicates"]] == [2, 3], res
+
+# An explicit key still dedupes across different payloads.
+assert sb_pubsub.publish(events_file, event(5, idem_key="same")) is not None
+assert sb_pubsub.publish(events_file, event(6, idem_key="same")) is None
+
+def payloads(events_file):
+    segs = sb_pubsub.load_segments(events_file)
+    return [json.loads(line)["payload"]["n"] for seg in segs for line in seg.path.read_text(encoding="utf-8").splitlines()]
+
+assert payloads(events_file) == [1, 2, 3, 4, 5], payloads(events_file)
+PY
+for n in 7 8 7; do
+  SB_NO_DAEMON=1 "${SCRIPT_DIR}/sb_pubsub_publish_v0.sh" --topic want --scope s --actor a --ts 2026-01-01T00:00:00Z \
+    --payload-json "{\"n\": ${n}}" --events-file "${TEST_ROOT}/idem/events_v0.ndjson" 2>> "${TEST_ROOT}/idem/stderr" > /dev/null
+done
+python3 - <<'PY' "${REPO_ROOT}" "${TEST_ROOT}/idem"
+import json, sys
+from pathlib import Path
+
+root, tmp = Path(sys.argv[1]), Path(sys.argv[2])
+sys.path.insert(0, str(root / "scripts"))
+import sb_pubsub
+
+segs = sb_pubsub.load_segments(tmp / "events_v0.ndjson")
+got = [json.loads(line)["payload"]["n"] for seg in segs for line in seg.path.read_text(encoding="utf-8").splitlines()]
+assert got == [1, 2, 3, 4, 5, 7, 8], got
+assert (tmp / "stderr").read_text(encoding="utf-8").count("skipped:") == 1
+print("default_idempotency_key_keeps_distinct_events_ok")
+PY
+
+# Group leases fence commits: once a worker's lease expires or moves, its commit
+# is rejected as lease_lost and the next owner re-reads from the last committed offset.
+mkdir -p "${TEST_ROOT}/group"
+python3 - <<'PY' "${REPO_ROOT}" "${TEST_ROOT}/group"
+import json, sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+root, tmp = Path(sys.argv[1]), Path(sys.argv[2])
+sys.path.insert(0, str(root / "scripts"))
+import sb_pubsub
+import sb_pubsub_groups as groups
+
+events_file = tmp / "events_v0.ndjson"
+groups_dir = tmp / "groups"
+t0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+def at(seconds):
+    return sb_pubsub.format_ts(t0 + timedelta(seconds=seconds))
+
+def publish(first, count):
+    events = [sb_pubsub.build_event("t", f"s/{n % 10}", "a", json.dumps({"n": n}), 0, ts_override=at(0)) for n in range(first, first + count)]
+    assert sb_pubsub.publish_batch(events_file, events)["published"] == count
+
+def poll(worker, seconds):
+    return groups.group_poll(events_file, groups_dir, "g", worker, set(), 100, partitions=2, now_ts=at(seconds))
+
+def commit(res, seconds):
+    return groups.group_commit(groups_dir, "g", res["worker"], res["cursor"], now_ts=at(seconds))
+
+def ns(res, partition=None):
+    return sorted(e["payload"]["n"] for e in res["events_returned"] if partition is None or groups.partition_of(e, 2) == partition)
+
+def offsets():
+    return [(o["next_line"], o["next_byte"]) for o in groups.read_group(groups_dir, "g")["offsets"]]
+
+publish(0, 20)
+a = poll("a", 0)
+assert a["partitions_owned"] == [0, 1] and ns(a) == list(range(20))
+assert ns(a, 0) and ns(a, 1)
+
+# a's lease expires and b takes both partitions over: a is fenced, b re-reads everything.
+b = poll("b", 60)
+assert b["partitions_owned"] == [0, 1] and ns(b) == ns(a)
+assert [b["cursor"][p]["epoch"] for p in "01"] == [a["cursor"][p]["epoch"] + 1 for p in "01"]
+res = commit(a, 60)
+assert res["committed"] == [] and res["rejected"] == [{"partition": 0, "reason": "lease_lost"}, {"partition": 1, "reason": "lease_lost"}], res
+assert offsets() == [(1, 0), (1, 0)]
+assert commit(b, 61)["committed"] == [0, 1]
+committed = offsets()
+
+# An expired lease is fenced even before anyone else claims it.
+publish(20, 6)
+b = poll("b", 62)
+assert ns(b) == list(range(20, 26))
+assert commit(b, 62 + groups.GROUP_LEASE_S)["rejected"] == [{"partition": 0, "reason": "lease_lost"}, {"partition": 1, "reason": "lease_lost"}]
+assert offsets() == committed
+c = poll("c", 200)
+assert ns(c) == list(range(20, 26))
+
+# Rebalancing moves a partition from c to d before c commits: only that partition is rejected.
+d = poll("d", 201)
+assert d["partitions_owned"] == []
+c2 = poll("c", 202)
+assert c2["partitions_owned"] == [0]
+d = poll("d", 203)
+assert d["partitions_owned"] == [1] and d["cursor"]["1"]["epoch"] == c["cursor"]["1"]["epoch"] + 1
+assert ns(d) == ns(c, 1)
+res = commit(c, 204)
+assert res["committed"] == [0] and res["rejected"] == [{"partition": 1, "reason": "lease_lost"}], res
+assert offsets()[1] == committed[1] and offsets()[0] != committed[0]
+assert commit(d, 204)["committed"] == [1]
+(tmp / "stale.json").write_text(json.dumps(c), encoding="utf-8")
+PY
+if SB_NO_DAEMON=1 "${SCRIPT_DIR}/sb_pubsub_group_v0.sh" commit --groups-dir "${TEST_ROOT}/group/groups" --now-ts 2026-01-01T00:03:25Z \
+  < "${TEST_ROOT}/group/stale.json" > "${TEST_ROOT}/group/stale_commit.json"; then
+  echo "stale group commit should exit 1" >&2
+  exit 1
+fi
+python3 - <<'PY' "${TEST_ROOT}/group/stale_commit.json"
+import json, sys
+
+out = json.load(open(sys.argv[1], encoding="utf-8"))
+assert out["committed"] == [0] and out["rejected"] == [{"partition": 1, "reason": "lease_lost"}], out
+print("group_lease_fencing_ok")
+PY
@@ -0,0 +1,68 @@
+#!/usr/bin/env bash
+set -euo pipefail
+
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+REPO_ROOT="$(cd "${SCRIPT_DIR}/.." && pwd)"
+TEST_ROOT="$(mktemp -d)"
+trap 'rm -rf "${TEST_ROOT}"' EXIT
+
+# scripts/sb_query.py: the mmap'd snapshot answers exactly like a fresh build,
+# and --min-score never returns unscored rows, whichever index drives the query.
+python3 - <<'PY' "${REPO_ROOT}" "${TEST_ROOT}"
+import itertools, json, random, sys
+from pathlib import Path
+
+root, tmp = Path(sys.argv[1]), Path(sys.argv[2])
+sys.path.insert(0, str(root / "scripts"))
+import sb_query
+
+rng = random.Random(5)
+sessions = tmp / "sessions"
+for tool in ("claude", "codex"):
+    arts = [
+        {
+            "id": f"artifact/{tool}_session_2026_0{1 + i % 3}_{i:04d}",
+            "date": f"2026-0{1 + rng.randrange(3)}-{1 + rng.randrange(28):02d}",
+            "resumption_score": rng.choice([None, None, -3, 0, 4, 8, 10, True]),
+            "summary_snippet": f"sné{i}",
+        }
+        for i in range(300)
+    ]
+    arts.append("artifact/legacy_id_only")
+    (sessions / tool).mkdir(parents=True)
+    (sessions / tool / "index.json").write_text(json.dumps({"tool": tool, "artifacts": arts}), encoding="utf-8")
+
+cache = tmp / "query_index_v0.bin"
+fresh = sb_query.load(sessions, cache)
+sb_query._LOADED.clear()
+mapped = sb_query.load(sessions, cache)
+assert type(mapped.ids).__name__ == "_StrColumn", "snapshot was rebuilt instead of mapped"
+assert len(mapped) == len(fresh) == 602
+
+def rows(index, **kw):
+    return [index.record(p) for p in index.select(**kw)]
+
+for since, min_score, tools, prefix, desc in itertools.product(
+    [None, "2026-02-01"], [None, -10, -3, 0, 5, 11], [None, ["codex"], ["nope"]], [None, "artifact/codex_session_2026_02"], [False, True]
+):
+    kw = dict(since=since, min_score=min_score, tools=tools, id_prefix=prefix, descending=desc)
+    got = rows(mapped, **kw)
+    assert got == rows(fresh, **kw), kw
+    if min_score is not None:
+        assert all(r["resumption_score"] is not None and r["resumption_score"] >= min_score for r in got), kw
+
+# Negative thresholds: the score index drives (it is the smallest candidate) and still skips unscored rows.
+scored = [r for r in rows(fresh) if r["resumption_score"] is not None]
+assert rows(mapped, min_score=-10) == scored
+assert {r["resumption_score"] for r in rows(mapped, min_score=-3)} == {-3, 0, 4, 8, 10}
+
+# A truncated or foreign snapshot is ignored and rebuilt.
+cache.write_bytes(cache.read_bytes()[:64])
+assert sb_query.load_snapshot(cache) is None
+cache.write_text("{}", encoding="utf-8")
+assert sb_query.load_snapshot(cache) is None
+sb_query._LOADED.clear()
+assert rows(sb_query.load(sessions, cache)) == rows(fresh)
+print("query_snapshot_matches_fresh_ok")
+print("query_min_score_skips_unscored_ok")
+PY
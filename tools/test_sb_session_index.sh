@@ -0,0 +1,51 @@
+#!/usr/bin/env bash
+set -euo pipefail
+
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+REPO_ROOT="$(cd "${SCRIPT_DIR}/.." && pwd)"
+TEST_ROOT="$(mktemp -d)"
+trap 'rm -rf "${TEST_ROOT}"' EXIT
+
+# sb reindex, scripts/update_index.py and sb_closeout.sh (via sb_corpus) must
+# write identical sessions/<tool>/index.json artifact lists.
+python3 - <<'PY' "${REPO_ROOT}" "${TEST_ROOT}"
+import json, sys
+from pathlib import Path
+
+root, tmp = Path(sys.argv[1]), Path(sys.argv[2])
+sys.path.insert(0, str(root / "scripts"))
+import sb_cli
+import sb_corpus
+import update_index
+
+tool_dir = tmp / "sessions" / "codex"
+tool_dir.mkdir(parents=True)
+docs = {
+    "a.json": {"artifact_id": "artifact/codex_session_2026_03_04_a", "summary": "  short  ", "resumption_score": 7},
+    "b.json": {"id": "artifact/codex_b", "session_date": "2026-03-01", "summary": {"high_level": "x" * 200}, "resumption_score": "9"},
+    "c.json": {"artifact_id": "project/not_an_artifact_2026_03_05", "summary": "skipped everywhere"},
+    "d.json": {"artifact_id": "artifact/codex_session_2026_03_02_d", "summary": {"key_decisions": ["k"]}},
+}
+for name, doc in docs.items():
+    (tool_dir / name).write_text(json.dumps(doc), encoding="utf-8")
+
+update_index.update_index_for_directory(str(tool_dir))
+from_update_index = json.loads((tool_dir / "index.json").read_text(encoding="utf-8"))["artifacts"]
+
+sb_cli.INDEX_MANIFEST_DIR = tmp / "manifest"
+(tool_dir / "index.json").unlink()
+sb_cli.rebuild_tool_index(tool_dir, full=True)
+from_reindex = json.loads((tool_dir / "index.json").read_text(encoding="utf-8"))["artifacts"]
+
+sb_corpus.CACHE_DIR = tmp / "corpus"
+records = [r for rec in sb_corpus.load_sessions(tmp / "sessions", tools=["codex"]) if (r := rec.index_record()) is not None]
+from_corpus = sorted({r["id"]: r for r in records}.values(), key=lambda r: (r.get("date") or "", r["id"]))
+
+assert from_update_index == from_reindex == from_corpus, (from_update_index, from_reindex, from_corpus)
+assert [r["id"] for r in from_reindex] == ["artifact/codex_b", "artifact/codex_session_2026_03_02_d", "artifact/codex_session_2026_03_04_a"]
+b, d, a = from_reindex
+assert b["resumption_score"] is None and len(b["summary_snippet"]) == 160 and b["summary_snippet"].endswith("...")
+assert d["date"] == "2026-03-02" and d["summary_snippet"] == ""
+assert a["summary_snippet"] == "short" and a["resumption_score"] == 7
+print("session_index_writers_agree_ok")
+PY
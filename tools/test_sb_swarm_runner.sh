@@ -0,0 +1,68 @@
+#!/usr/bin/env bash
+set -euo pipefail
+
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+REPO_ROOT="$(cd "${SCRIPT_DIR}/.." && pwd)"
+TEST_ROOT="$(mktemp -d)"
+trap 'rm -rf "${TEST_ROOT}"' EXIT
+
+# scripts/sb_swarm_runner.py: blocked gates come from the spec's Non-Interference
+# Rule, and jobs share one hash cache that is written once per run.
+python3 - <<'PY' "${REPO_ROOT}" "${TEST_ROOT}"
+import json, sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+root, tmp = Path(sys.argv[1]), Path(sys.argv[2])
+sys.path.insert(0, str(root / "scripts"))
+import sb_swarm_runner
+
+# The shipped spec closes the Kalshi pipeline scene while the Kalshi gate is blocked.
+gates = sb_swarm_runner.spec_gates((root / "spec" / "swarm_runner_v0.md").read_text(encoding="utf-8"))
+assert "scenes/kalshi_15m_btc_pipeline.scene.json" in gates["scenes/kalshi_data_gate_v0.scene.json"], gates
+
+spec = """# Spec
+
+## Non-Interference Rule (demo gate)
+- Swarm runner must not mutate:
+  - `scenes/demo.scene.json`
+  - `project/demo`
+  while the demo gate is blocked.
+- Gate status source of record:
+  - `scenes/demo_gate.scene.json`
+
+## Other
+- Swarm runner must not mutate:
+  - `scenes/unrelated.scene.json`
+"""
+gates = sb_swarm_runner.spec_gates(spec)
+assert gates == {"scenes/demo_gate.scene.json": ["scenes/demo.scene.json", "project/demo"]}, gates
+
+(tmp / "scenes").mkdir()
+gate_file = tmp / "scenes" / "demo_gate.scene.json"
+gate_file.write_text(json.dumps({"scope": ["project/demo_data"], "current_status": {"status": "BLOCKED_FOR_DEMO"}}), encoding="utf-8")
+assert sb_swarm_runner.blocked_scopes(tmp, gates) == ["project/demo_data", "scenes/demo.scene.json", "project/demo"]
+runner = sb_swarm_runner.SwarmRun(tmp, tmp / "registry.json", tmp / "ledger.jsonl", tmp / "claims.md", tmp / "metrics.json", tmp / "hash.json", gates)
+admitted, rejected, warnings = runner.admit([{"job_id": "j1", "agent_id": "agent/x_v1", "targets": "scenes/demo.scene.json"}])
+assert admitted == [] and rejected[0]["job_id"] == "j1" and "scenes/demo.scene.json" in warnings[0], (rejected, warnings)
+gate_file.write_text(json.dumps({"scope": ["project/demo_data"], "current_status": {"status": "OPEN"}}), encoding="utf-8")
+assert sb_swarm_runner.blocked_scopes(tmp, gates) == []
+
+# Concurrent jobs share one cache: nothing is written until flush(), which keeps every job's entries.
+files = []
+for n in range(64):
+    path = tmp / "files" / f"f{n}.txt"
+    path.parent.mkdir(exist_ok=True)
+    path.write_text(f"content {n}\n", encoding="utf-8")
+    files.append(f"files/f{n}.txt")
+cache_file = tmp / "hash.json"
+cache = sb_swarm_runner.RunHashCache(cache_file)
+with ThreadPoolExecutor(max_workers=8) as pool:
+    list(pool.map(lambda rel: (cache.digest(tmp, rel), cache.save()), files * 2))
+assert not cache_file.exists(), "a job saved the shared cache"
+assert cache.misses + cache.hits == 128 and cache.misses >= 64
+cache.flush()
+assert set(json.loads(cache_file.read_text(encoding="utf-8"))["entries"]) == set(files)
+print("swarm_gates_from_spec_ok")
+print("swarm_hash_cache_saved_once_ok")
+PY
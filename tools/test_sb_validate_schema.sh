@@ -0,0 +1,126 @@
+#!/usr/bin/env bash
+set -euo pipefail
+
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+REPO_ROOT="$(cd "${SCRIPT_DIR}/.." && pwd)"
+TEST_ROOT="$(mktemp -d)"
+trap 'rm -rf "${TEST_ROOT}"' EXIT
+
+# The draft-07 subset validator (scripts/sb_schema.py) against the repo schemas.
+python3 - <<'PY' "${REPO_ROOT}"
+import copy, json, sys
+from pathlib import Path
+
+root = Path(sys.argv[1])
+sys.path.insert(0, str(root / "scripts"))
+import sb_schema
+
+validators = sb_schema.compile_scene_validators(root / "scenes" / "_schemas")
+assert set(validators) == set(sb_schema.SCENE_SCHEMA_NAMES), sorted(validators)
+
+# Every committed scene with a published shape conforms.
+checked = 0
+for f in sorted((root / "scenes").glob("*.json")):
+    scene = json.loads(f.read_text(encoding="utf-8"))
+    name = sb_schema.scene_schema_name(scene) if isinstance(scene, dict) else None
+    if name:
+        errs = validators[name](scene, "$")
+        assert errs == [], (f.name, errs)
+        checked += 1
+assert checked > 0
+
+graph = {"nodes": [{"id": "n/a", "type": "concept", "label": "A", "extra": 1}], "edges": [{"from": "n/a", "to": "n/b", "type": "rel"}]}
+history = {
+    "schema_version": "v0",
+    "project_id": "project/x",
+    "phase_events": [{"phase": "framing", "entered_on": "2026-01-02", "trigger_artifact": "artifact/x", "confidence_score": 0.5}],
+    "drift_signals": {"regression": False, "oscillation": "weekly", "custom_note": True},
+    "generated_on": "2026-01-03",
+}
+assert sb_schema.scene_schema_name(graph) == "graph_scene_v0"
+assert sb_schema.scene_schema_name(history) == "phase_history_v0"
+assert validators["graph_scene_v0"](graph, "$") == []
+assert validators["phase_history_v0"](history, "$") == []
+
+
+def mutated(doc, path, value):
+    out = copy.deepcopy(doc)
+    node = out
+    for key in path[:-1]:
+        node = node[key]
+    if value is KeyError:
+        del node[path[-1]]
+    else:
+        node[path[-1]] = value
+    return out
+
+
+cases = [
+    # (schema, document, expected error fragment)
+    ("graph_scene_v0", mutated(graph, ["nodes"], {}), "$/nodes: expected array"),
+    ("graph_scene_v0", mutated(graph, ["nodes", 0, "type"], KeyError), "$/nodes/0: missing required key 'type'"),
+    ("graph_scene_v0", mutated(graph, ["nodes", 0, "id"], ""), "$/nodes/0/id: shorter than 1"),
+    ("graph_scene_v0", mutated(graph, ["edges", 0, "to"], 3), "$/edges/0/to: expected string"),
+    ("phase_history_v0", mutated(history, ["schema_version"], "v1"), "$/schema_version: expected const 'v0'"),
+    ("phase_history_v0", mutated(history, ["generated_on"], "2026/01/03"), "$/generated_on: expected YYYY-MM-DD date"),
+    ("phase_history_v0", mutated(history, ["unexpected"], 1), "$/unexpected: not allowed"),
+    ("phase_history_v0", mutated(history, ["drift_signals"], KeyError), "$: missing required key 'drift_signals'"),
+    ("phase_history_v0", mutated(history, ["drift_signals", "regression"], 1), "$/drift_signals/regression: matched 0 oneOf branches"),
+    ("phase_history_v0", mutated(history, ["drift_signals", "custom_note"], None), "$/drift_signals/custom_note: matched 0 oneOf branches"),
+    # phase_events items resolve through the file-relative $ref to phase_event_v0.
+    ("phase_history_v0", mutated(history, ["phase_events", 0, "phase"], "shipping"), "$/phase_events/0/phase: value not in enum"),
+    ("phase_history_v0", mutated(history, ["phase_events", 0, "confidence_score"], 1.5), "$/phase_events/0/confidence_score: above maximum 1"),
+    ("phase_history_v0", mutated(history, ["phase_events", 0, "confidence_score"], -0.1), "$/phase_events/0/confidence_score: below minimum 0"),
+    ("phase_history_v0", mutated(history, ["phase_events", 0, "confidence_score"], True), "$/phase_events/0/confidence_score: expected number"),
+    ("phase_history_v0", mutated(history, ["phase_events", 0, "notes_x"], "n"), "$/phase_events/0/notes_x: not allowed"),
+    ("phase_event_v0", mutated(history["phase_events"][0], ["trigger_artifact"], KeyError), "$: missing required key 'trigger_artifact'"),
+]
+for name, doc, fragment in cases:
+    errs = validators[name](doc, "$")
+    assert any(fragment in e for e in errs), (name, fragment, errs)
+print("schema_validator_ok")
+PY
+
+# `sb validate` checks schemas only with --schema.
+mkdir -p "${TEST_ROOT}/scenes" "${TEST_ROOT}/sessions"
+python3 - <<'PY' "${REPO_ROOT}" "${TEST_ROOT}"
+import argparse, contextlib, io, json, sys
+from pathlib import Path
+
+repo, root = Path(sys.argv[1]), Path(sys.argv[2])
+sys.path.insert(0, str(repo / "scripts"))
+import sb_cli
+
+sb_cli.SCENES_DIR = root / "scenes"
+sb_cli.SESSIONS_DIR = root / "sessions"
+(root / "scenes" / "bad_graph.scene.json").write_text(json.dumps({"nodes": [{"id": "n/a"}], "edges": []}), encoding="utf-8")
+
+
+def run(schema: bool) -> tuple[int, str]:
+    out, err = io.StringIO(), io.StringIO()
+    code = 0
+    with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+        try:
+            sb_cli.cmd_validate(argparse.Namespace(jobs=1, ndjson=False, fail_fast=False, schema=schema))
+        except SystemExit as e:
+            code = int(e.code or 0)
+    return code, out.getvalue() + err.getvalue()
+
+
+code, text = run(schema=False)
+assert code == 0 and text.strip() == "ok", (code, text)
+code, text = run(schema=True)
+assert code == 1 and "graph_scene_v0 schema violation" in text and "missing required key 'type'" in text, (code, text)
+print("validate_schema_opt_in_ok")
+PY
+
+# A closed stdout ends the stream quietly instead of a BrokenPipeError traceback.
+set +o pipefail
+SB_NO_DAEMON=1 python3 "${REPO_ROOT}/tools/sb.py" validate --ndjson 2>"${TEST_ROOT}/pipe.err" | head -n 1 >/dev/null
+set -o pipefail
+if grep -q "Traceback" "${TEST_ROOT}/pipe.err"; then
+  echo "FAIL: validate --ndjson | head printed a traceback"
+  cat "${TEST_ROOT}/pipe.err"
+  exit 1
+fi
+echo "validate_broken_pipe_ok"